@@ -7,12 +7,40 @@ CREATE CONSTRAINT constraint_template_id IF NOT EXISTS FOR (t:PromptTemplate) RE
 CREATE CONSTRAINT constraint_set_id IF NOT EXISTS FOR (p:ParameterSet) REQUIRE p.setID IS UNIQUE;
 CREATE CONSTRAINT constraint_tag_name IF NOT EXISTS FOR (t:Tag) REQUIRE t.tagName IS UNIQUE;
 CREATE CONSTRAINT constraint_model_name IF NOT EXISTS FOR (m:AiModel) REQUIRE m.modelName IS UNIQUE;
+CREATE CONSTRAINT constraint_rating_stat_key IF NOT EXISTS FOR (st:RatingStat) REQUIRE st.key IS UNIQUE; // Incremental rating aggregates
 
 // Indexes (Improve query performance)
 CREATE INDEX index_tag_name IF NOT EXISTS FOR (t:Tag) ON (t.tagName);
 CREATE INDEX index_session_timestamp IF NOT EXISTS FOR (s:GenerationSession) ON (s.timestamp); // Recommended
 CREATE INDEX index_image_rating IF NOT EXISTS FOR (i:GeneratedImage) ON (i.rating); // Recommended
+CREATE RANGE INDEX index_image_rating_order IF NOT EXISTS FOR (i:GeneratedImage) ON (i.rating, i.sessionTimestamp, i.imageID); // query_images(orderBy="rating") keyset seeks
 CREATE INDEX index_image_status IF NOT EXISTS FOR (i:GeneratedImage) ON (i.generationStatus); // Recommended for filtering by status
+// Typed generation parameters (flattened from actualParameters / baseParameters, see grid/core/db/parameters.py)
+CREATE RANGE INDEX index_image_param_scale IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramScale);
+CREATE RANGE INDEX index_image_param_steps IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramSteps);
+CREATE RANGE INDEX index_image_param_sampler IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramSampler);
+CREATE RANGE INDEX index_image_param_size IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramWidth, i.paramHeight);
+CREATE RANGE INDEX index_image_param_seed IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramSeed);
+CREATE RANGE INDEX index_image_param_cfg_rescale IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramCfgRescale);
+CREATE RANGE INDEX index_image_param_ref_strength0 IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramReferenceStrength0);
+CREATE RANGE INDEX index_image_param_ref_strength1 IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramReferenceStrength1);
+CREATE RANGE INDEX index_image_param_ref_ie0 IF NOT EXISTS FOR (i:GeneratedImage) ON (i.paramReferenceInformationExtracted0);
+CREATE RANGE INDEX index_session_param_scale IF NOT EXISTS FOR (s:GenerationSession) ON (s.paramScale);
+CREATE RANGE INDEX index_session_param_sampler IF NOT EXISTS FOR (s:GenerationSession) ON (s.paramSampler);
+CREATE INDEX index_rating_stat_vibe IF NOT EXISTS FOR (st:RatingStat) ON (st.vibeID, st.parameter); // "Best settings for a vibe"
+CREATE INDEX index_rating_stat_template IF NOT EXISTS FOR (st:RatingStat) ON (st.kind, st.templateID); // "Best parameter sets for a template"
+// Full-text indexes for library search (grid/core/services/search_service.py); one per kind, so each can be ranked and limited on its own
+CREATE FULLTEXT INDEX fulltext_vibes IF NOT EXISTS FOR (v:VibeImage) ON EACH [v.notes, v.imagePath]
+OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words'}};
+CREATE FULLTEXT INDEX fulltext_templates IF NOT EXISTS FOR (t:PromptTemplate) ON EACH [t.name, t.description, t.contentPositive, t.contentNegative]
+OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words'}};
+CREATE FULLTEXT INDEX fulltext_parameter_sets IF NOT EXISTS FOR (p:ParameterSet) ON EACH [p.name, p.description]
+OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words'}};
+// Sessions are written during generation: update this index asynchronously so it never slows the write down
+CREATE FULLTEXT INDEX fulltext_sessions IF NOT EXISTS FOR (s:GenerationSession) ON EACH [s.name, s.notes, s.basePromptPositive, s.basePromptNegative]
+OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words', `fulltext.eventually_consistent`: true}};
+CREATE FULLTEXT INDEX fulltext_tags IF NOT EXISTS FOR (t:Tag) ON EACH [t.tagName]
+OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words', `fulltext.eventually_consistent`: true}};
 
 // Note: Consider adding indexes on other frequently queried properties as needed.
 
@@ -1,6 +1,7 @@
 # nvt_ws/config.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
+from typing import Literal, Optional
 import os
 from pathlib import Path
 
@@ -18,9 +19,23 @@ class ApiSettings(BaseSettings):
     eagle_api_host: str = "http://localhost:41595"
 
 class DatabaseSettings(BaseSettings):
+    backend: Literal["neo4j", "sqlite"] = "neo4j" # 永続化バックエンド (grid.core.db.base.create_repositoryで選択)
+    sqlite_path: Path = DEFAULT_DATA_DIR / "grid.sqlite3" # backend = "sqlite" の場合のデータベースファイル
+    write_behind: bool = False # Trueの場合、書き込みをローカルのoutboxに記録してからバックグラウンドでDBに反映する
+    outbox_path: Path = DEFAULT_DATA_DIR / "outbox.sqlite3" # write_behind用のoutboxジャーナル
     neo4j_uri: str = "neo4j://localhost:7687"
     neo4j_user: str | None = Field(None, validation_alias='NEO4J_USER') # .envから読み込み (任意)
     neo4j_password: str | None = Field(None, validation_alias='NEO4J_PASSWORD') # .envから読み込み (任意)
+    # コネクションプール設定 (Neo4jRepository.from_settingsで使用)
+    neo4j_max_connection_pool_size: int = 100 # プールの最大コネクション数
+    neo4j_connection_acquisition_timeout: float = 60.0 # 空きコネクションを待つ最大秒数
+    neo4j_max_connection_lifetime: float = 3600.0 # この秒数を超えたコネクションは破棄して張り直す
+    neo4j_fetch_size: int = 1000 # 結果をストリーミングする際に1回で取得するレコード数
+    neo4j_batch_size: int = 500 # バッチ書き込みでUNWIND 1回あたりに送る行数
+    neo4j_cache_size: int = 1024 # vibe/セッション/タグ読み取りキャッシュの最大エントリ数 (0で無効)
+    neo4j_cache_ttl: float = 60.0 # キャッシュエントリの有効秒数 (他プロセスの書き込みはこの秒数後に反映)
+    neo4j_slow_query_threshold: Optional[float] = 0.5 # サーバー側の処理時間がこの秒数以上のクエリをスロークエリとして記録 (Noneで無効)
+    neo4j_profile_slow_queries: bool = False # 全クエリをPROFILE付きで実行し、スロークエリの実行計画を記録する (調査用、負荷増)
 
 class PathSettings(BaseSettings):
     data_base_dir: Path = DEFAULT_DATA_DIR
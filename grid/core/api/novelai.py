@@ -1,89 +1,138 @@
 import requests
 from PIL import Image
 import base64
+import io
 import os
-import uuid
-from datetime import datetime
-from typing import Optional, Dict, List, Tuple, Any
+import shutil
+import tempfile
+import zipfile
+from typing import Optional, Dict, List, Tuple, Any, Callable, BinaryIO
+
+from grid.core.api.rate_limit import RequestScheduler
+from grid.core.api.transport import NovelAITransport
+from grid.core.api.vibe_cache import VibeCache
 # from grid.config import settings # 後で実装する設定化ログをインポート
 # import structlog # 後で実装する構造化ログをインポート
 
 # logger = structlog.get_logger(__name__) # ロガーの初期化
 
+DEFAULT_BASE_URL = "https://image.novelai.net"
+
+# Chunk size used when spooling generate-image responses and extracting zip members
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+def _remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def prepare_vibe_image(image_path: str) -> str:
+    """
+    Decode an image and return it as base64-encoded JPEG for /ai/encode-vibe.
+
+    Module-level so it can run in a ProcessPoolExecutor: decoding and JPEG
+    encoding are CPU-bound and would otherwise serialize on the GIL.
+    """
+    try:
+        with Image.open(image_path) as img:
+            # Convert image to RGB if necessary (JPEG does not support alpha channel)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            # Save image to a buffer and base64 encode
+            buf = io.BytesIO()
+            img.save(buf, format='JPEG') # Use JPEG format
+            return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+    except Exception as e:
+        # logger.error("Failed to read or process image for encoding", image_path=image_path, error=e)
+        raise RuntimeError(f"Failed to read or process image {image_path}: {e}")
+
 class NovelAIClient:
     # Modify the constructor to accept api_key
-    def __init__(self, api_key: str):
-        # TODO: Load base URL from settings
-        # Corrected base URL based on user feedback
-        self._base_url = "https://image.novelai.net"
+    def __init__(self, api_key: str, scheduler: Optional[RequestScheduler] = None, vibe_cache: Optional[VibeCache] = None,
+                 base_url: Optional[str] = None, transport: Optional[NovelAITransport] = None):
         self._api_key = api_key # Use the provided API key
-        self._session = requests.Session()
-        self._session.headers.update({
-            # Remove 'Bearer ' prefix based on curl example
-            "Authorization": f"{self._api_key}",
-            "Content-Type": "application/json"
-        })
+        # Every request goes through the scheduler (rate limits, 429/5xx backoff)
+        self._scheduler = scheduler if scheduler is not None else RequestScheduler()
+        # Encoded vibes are content-addressed, so re-encoding the same image is a cache hit
+        self._vibe_cache = vibe_cache if vibe_cache is not None else VibeCache()
+        # TODO: Load base URL from settings
+        # Pooled keep-alive transport; pass the same one to LibraryService to share warm connections.
+        # base_url can point at scripts/bench/mock_novelai_server.py for offline benchmarks.
+        if transport is None:
+            transport = NovelAITransport(api_key, base_url if base_url is not None else DEFAULT_BASE_URL)
+        self._transport = transport
+        self._session = transport.session
         # logger.info("NovelAIClient initialized")
 
-    def encode_vibe(self, image_path: str, ie_value: float) -> str:
+    def encode_vibe(self, image_path: str, ie_value: float, model: Optional[str] = None) -> str:
+        """
+        Encode an image into a vibe file, reusing the cached file when the same
+        image was already encoded with the same ie_value and model.
+
+        Returns:
+            The path of the .naiv4vibe file.
+        """
         if not os.path.exists(image_path):
             # logger.error("Image file not found", image_path=image_path)
             raise FileNotFoundError(f"Image file not found at {image_path}")
 
-        try:
-            with Image.open(image_path) as img:
-                # Convert image to RGB if necessary (NovelAI might expect specific formats)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Save image to a buffer and base64 encode
-                import io
-                buf = io.BytesIO()
-                # Change format to JPEG
-                img.save(buf, format='JPEG')
-                image_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
+        cache_key = VibeCache.make_key(image_path, ie_value, model)
+        cached_path = self._vibe_cache.get(cache_key)
+        if cached_path is not None:
+            # logger.info("Encoded vibe served from cache", image_path=image_path, cached_path=cached_path)
+            return cached_path
 
-        except Exception as e:
-            # logger.error("Failed to read or process image", image_path=image_path, error=e)
-            raise RuntimeError(f"Failed to read or process image {image_path}: {e}")
+        image_base64 = prepare_vibe_image(image_path)
+        return self.upload_vibe_image(image_base64, ie_value, model, cache_key)
 
-        url = f"{self._base_url}/ai/encode-vibe"
+    def upload_vibe_image(self, image_base64: str, ie_value: float, model: Optional[str], cache_key: str) -> str:
+        """POST an image prepared by prepare_vibe_image to /ai/encode-vibe and store the result in the vibe cache."""
         payload = {
             "image": image_base64,
             "information_extracted": ie_value,
             # "mask": "", # Optional
-            # "model": "" # Optional
         }
+        if model is not None:
+            payload["model"] = model
 
         try:
-            # logger.info("Sending encode-vibe request to NovelAI API", image_path=image_path, ie_value=ie_value)
-            response = self._session.post(url, json=payload)
+            # logger.info("Sending encode-vibe request to NovelAI API", ie_value=ie_value, model=model)
+            response = self._scheduler.execute("/ai/encode-vibe", lambda: self._transport.post("/ai/encode-vibe", json=payload))
             response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
 
-            # Save the binary response content to a file
-            encoded_vibe_data = response.content
-
-            # Determine save path (data/encoded/YYYY/MM/DD/vibe_<uuid>.naiv4vibe)
-            now = datetime.now()
-            save_dir = os.path.join("data", "encoded", str(now.year), f"{now.month:02d}", f"{now.day:02d}")
-            os.makedirs(save_dir, exist_ok=True) # Create directories if they don't exist
-
-            vibe_file_name = f"vibe_{uuid.uuid4()}.naiv4vibe" # Use uuid4 for file name
-            save_path = os.path.join(save_dir, vibe_file_name)
-
-            with open(save_path, "wb") as f:
-                f.write(encoded_vibe_data)
+            # Store the binary response content in the content-addressed cache
+            save_path = self._vibe_cache.put(cache_key, response.content, ie_value, model)
 
             # logger.info("Encoded vibe saved successfully", save_path=save_path)
             return save_path
 
         except requests.exceptions.RequestException as e:
-            # logger.error("NovelAI API request failed", url=url, error=e)
-            raise RuntimeError(f"NovelAI API request failed: {e}")
+            # logger.error("NovelAI API encode-vibe request failed", error=e)
+            raise RuntimeError(f"NovelAI API encode-vibe request failed: {e}")
         except Exception as e:
             # logger.error("Failed to save encoded vibe data", error=e)
             raise RuntimeError(f"Failed to save encoded vibe data: {e}")
 
+    @staticmethod
+    def _generate_image_payload(prompt: str, model: str, action: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "input": prompt,
+            "model": model,
+            "action": action,
+            "parameters": parameters,
+        }
+
+    @staticmethod
+    def _check_archive_content_type(response: requests.Response):
+        # Check if the response is a zip file
+        if 'content-type' not in response.headers or response.headers['content-type'] != 'binary/octet-stream':
+             # logger.error("Unexpected content type in generate-image response", content_type=response.headers.get('content-type'))
+             raise RuntimeError(f"Unexpected content type in generate-image response: {response.headers.get('content-type')}")
+
     def generate_image(self, prompt: str, model: str, action: str, parameters: Dict[str, Any]) -> List[Tuple[str, bytes]]:
         """
         Generate one or multiple image(s) using NovelAI API.
@@ -100,32 +149,16 @@ class NovelAIClient:
         Raises:
             RuntimeError: If the API request fails or the response is not a valid zip file.
         """
-        url = f"{self._base_url}/ai/generate-image"
-        payload = {
-            "input": prompt,
-            "model": model,
-            "action": action,
-            "parameters": parameters,
-        }
-
-        headers = {
-            "Authorization": f"Bearer {self._api_key}", # Use Bearer scheme
-            "Content-Type": "application/json"
-        }
+        payload = self._generate_image_payload(prompt, model, action, parameters)
 
         try:
             # logger.info("Sending generate-image request to NovelAI API", model=model, action=action)
-            response = self._session.post(url, json=payload, headers=headers)
+            response = self._scheduler.execute("/ai/generate-image", lambda: self._transport.post("/ai/generate-image", json=payload))
             response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
 
-            # Check if the response is a zip file
-            if 'content-type' not in response.headers or response.headers['content-type'] != 'binary/octet-stream':
-                 # logger.error("Unexpected content type in generate-image response", content_type=response.headers.get('content-type'))
-                 raise RuntimeError(f"Unexpected content type in generate-image response: {response.headers.get('content-type')}")
+            self._check_archive_content_type(response)
 
             # Extract images from the zip file
-            import zipfile
-            import io
             generated_images = []
             try:
                 with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
@@ -141,10 +174,130 @@ class NovelAIClient:
             return generated_images
 
         except requests.exceptions.RequestException as e:
-            # logger.error("NovelAI API generate-image request failed", url=url, error=e)
+            # logger.error("NovelAI API generate-image request failed", error=e)
             raise RuntimeError(f"NovelAI API generate-image request failed: {e}")
         except Exception as e:
             # logger.error("An unexpected error occurred during generate-image process", error=e)
             raise RuntimeError(f"An unexpected error occurred during generate-image process: {e}")
 
+    def generate_image_to_dir(self, prompt: str, model: str, action: str, parameters: Dict[str, Any],
+                              save_dir: str, filename_factory: Optional[Callable[[int, str], str]] = None) -> List[str]:
+        """
+        Generate image(s) and write them straight to disk.
+
+        Unlike generate_image, neither the zip response nor the images are held
+        in memory: the response body is spooled to a temporary file in chunks and
+        each zip member is copied directly to its final path, so peak memory stays
+        flat regardless of n_samples or resolution.
+
+        Args:
+            prompt: The prompt for image generation.
+            model: The image model name (e.g., "nai-diffusion-4-full").
+            action: The generation type (e.g., "generate").
+            parameters: A dictionary of generation parameters.
+            save_dir: Directory the images are extracted to. Created if missing.
+            filename_factory: Called with (index, zip member name) to name each
+                              output file. Defaults to the member name.
+
+        Returns:
+            The paths of the written images, in archive order.
+
+        Raises:
+            RuntimeError: If the API request fails, the response is not a valid zip
+                          file, or the images cannot be written.
+        """
+        with self.download_image_archive(prompt, model, action, parameters) as archive:
+            return self.extract_image_archive(archive, save_dir, filename_factory)
+
+    def download_image_archive(self, prompt: str, model: str, action: str, parameters: Dict[str, Any]) -> BinaryIO:
+        """
+        Network half of generate_image_to_dir: fetch the zip response into an
+        anonymous temporary file (positioned at 0) without extracting it.
+
+        Lets a pipeline start the next request while another stage extracts
+        this archive with extract_image_archive. The caller owns (and must
+        close) the returned file.
+
+        Raises:
+            RuntimeError: If the API request fails or returns an unexpected content type.
+        """
+        payload = self._generate_image_payload(prompt, model, action, parameters)
+
+        try:
+            return self._download_image_archive(payload)
+        except requests.exceptions.RequestException as e:
+            # logger.error("NovelAI API generate-image request failed", error=e)
+            raise RuntimeError(f"NovelAI API generate-image request failed: {e}")
+        except RuntimeError:
+            raise
+        except Exception as e:
+            # logger.error("An unexpected error occurred during generate-image process", error=e)
+            raise RuntimeError(f"An unexpected error occurred during generate-image process: {e}")
+
+    def _download_image_archive(self, payload: Dict[str, Any]) -> BinaryIO:
+        """Stream the generate-image response body into an anonymous temporary file."""
+        # logger.info("Sending generate-image request to NovelAI API (streaming)")
+        send = lambda: self._transport.post("/ai/generate-image", json=payload, stream=True)
+        with self._scheduler.execute("/ai/generate-image", send) as response:
+            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+            self._check_archive_content_type(response)
+
+            spool = tempfile.TemporaryFile()
+            try:
+                for chunk in response.iter_content(chunk_size=_STREAM_CHUNK_SIZE):
+                    spool.write(chunk)
+                spool.seek(0)
+            except Exception:
+                spool.close()
+                raise
+        return spool
+
+    @staticmethod
+    def extract_image_archive(archive: BinaryIO, save_dir: str, filename_factory: Optional[Callable[[int, str], str]] = None) -> List[str]:
+        """
+        Disk half of generate_image_to_dir: copy every file member of a zip
+        archive into save_dir, one chunk at a time.
+
+        Raises:
+            RuntimeError: If the archive is not a valid zip file or the images
+                          cannot be written. Partially written files are removed.
+        """
+        os.makedirs(save_dir, exist_ok=True) # Create directories if they don't exist
+        written_paths: List[str] = []
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                members = [info for info in zf.infolist() if not info.is_dir()]
+                for index, file_info in enumerate(members):
+                    file_name = filename_factory(index, file_info.filename) if filename_factory else os.path.basename(file_info.filename)
+                    target_path = os.path.join(save_dir, file_name)
+                    with zf.open(file_info) as src, open(target_path, "wb") as dst:
+                        written_paths.append(target_path)
+                        shutil.copyfileobj(src, dst, _STREAM_CHUNK_SIZE)
+            # logger.info("Extracted images from zip response", num_images=len(written_paths), save_dir=save_dir)
+            return written_paths
+        except zipfile.BadZipFile:
+            # logger.error("Received invalid zip file in generate-image response")
+            _remove_files(written_paths)
+            raise RuntimeError("Received invalid zip file in generate-image response")
+        except Exception as e:
+            # Do not leave half-written images behind
+            _remove_files(written_paths)
+            raise RuntimeError(f"Failed to write generated images to {save_dir}: {e}")
+
+    @property
+    def api_key(self) -> str:
+        return self._api_key
+
+    @property
+    def scheduler(self) -> RequestScheduler:
+        return self._scheduler
+
+    @property
+    def vibe_cache(self) -> VibeCache:
+        return self._vibe_cache
+
+    @property
+    def transport(self) -> NovelAITransport:
+        return self._transport
+
     # TODO: Implement generate_image method later # Remove this line
\ No newline at end of file
@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, List, Tuple, Any, Callable
+
+from grid.core.api.novelai import NovelAIClient
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+class AsyncNovelAIClient:
+    """
+    asyncio front-end for NovelAIClient.
+
+    The HTTP calls are delegated to a NovelAIClient running on a dedicated
+    thread pool, so awaiting a request never blocks the event loop (and the
+    GUI thread driving it). The pool size caps how many requests can be in
+    flight at once through this client.
+    """
+
+    def __init__(self, api_key: str, max_workers: int = 4, client: Optional[NovelAIClient] = None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self._client = client if client is not None else NovelAIClient(api_key)
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="novelai")
+        # logger.info("AsyncNovelAIClient initialized", max_workers=max_workers)
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def encode_vibe(self, image_path: str, ie_value: float, model: Optional[str] = None) -> str:
+        """Async counterpart of NovelAIClient.encode_vibe."""
+        if model is None:
+            return await self._call(self._client.encode_vibe, image_path, ie_value)
+        return await self._call(self._client.encode_vibe, image_path, ie_value, model)
+
+    async def generate_image(self, prompt: str, model: str, action: str, parameters: Dict[str, Any]) -> List[Tuple[str, bytes]]:
+        """Async counterpart of NovelAIClient.generate_image."""
+        return await self._call(self._client.generate_image, prompt, model, action, parameters)
+
+    async def generate_image_to_dir(self, prompt: str, model: str, action: str, parameters: Dict[str, Any],
+                                    save_dir: str, filename_factory: Optional[Callable[[int, str], str]] = None) -> List[str]:
+        """Async counterpart of NovelAIClient.generate_image_to_dir."""
+        return await self._call(self._client.generate_image_to_dir, prompt, model, action, parameters, save_dir, filename_factory)
+
+    def close(self):
+        """Shut down the worker threads. Pending requests are allowed to finish."""
+        self._executor.shutdown(wait=True)
+        # logger.info("AsyncNovelAIClient closed")
+
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self) -> "AsyncNovelAIClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
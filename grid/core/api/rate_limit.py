@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Callable, Iterable, Any
+
+import requests
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+# Statuses that signal throttling or a transient server-side failure
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Tolerance for float drift in token refills (avoids sub-ulp sleeps that never advance the clock)
+_TOKEN_EPSILON = 1e-9
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Parse a Retry-After header value into a delay in seconds.
+
+    Both forms allowed by RFC 9110 are supported: delay-seconds ("120") and an
+    HTTP-date. Returns None when the header is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at `rate` per second up
+    to `capacity`; acquire() blocks until a token is available. pause() holds
+    every caller back until a deadline, which is how server-imposed cool-downs
+    (Retry-After) are shared by all threads using the same endpoint.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1.")
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now <= self._updated_at:
+            return # Still inside a pause: nothing accrues until it ends
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens` from the bucket, blocking as needed. Returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= tokens - _TOKEN_EPSILON:
+                    self._tokens = max(0.0, self._tokens - tokens)
+                    return waited
+                else:
+                    delay = (tokens - self._tokens) / self._rate
+            self._sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Block all acquirers for at least `seconds` and drain the accumulated burst."""
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated_at = max(now, self._paused_until)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by max_delay."""
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 retry_statuses: Iterable[int] = RETRYABLE_STATUS_CODES, rng: Optional[random.Random] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based)."""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def delay_for(self, attempt: int, retry_after: Optional[float]) -> float:
+        # The server's Retry-After is a floor, never shortened by jitter
+        delay = self.backoff(attempt)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class EndpointLimit:
+    """Rate and concurrency limits applied to one API endpoint."""
+
+    def __init__(self, rate: float = 1.0, burst: int = 1, max_concurrency: int = 1):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+
+
+# Conservative defaults for the NovelAI image API. Sustained 429s push the
+# effective rate lower through Retry-After / backoff pauses.
+DEFAULT_ENDPOINT_LIMITS: Dict[str, EndpointLimit] = {
+    "/ai/generate-image": EndpointLimit(rate=1.0, burst=2, max_concurrency=2),
+    "/ai/encode-vibe": EndpointLimit(rate=2.0, burst=4, max_concurrency=4),
+}
+
+
+class RequestScheduler:
+    """
+    Gatekeeper for every NovelAI request.
+
+    Each endpoint gets its own token bucket (requests per second) and semaphore
+    (requests in flight). Throttled (429) and transient (5xx, connection error,
+    timeout) failures are retried with exponential backoff and jitter; a 429
+    also pauses the endpoint's bucket for the Retry-After period so concurrent
+    callers back off together instead of hammering the API.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, EndpointLimit]] = None, default_limit: Optional[EndpointLimit] = None,
+                 retry_policy: Optional[RetryPolicy] = None, sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        self._limits = dict(DEFAULT_ENDPOINT_LIMITS if limits is None else limits)
+        self._default_limit = default_limit or EndpointLimit()
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._sleep = sleep
+        self._clock = clock
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _endpoint_state(self, endpoint: str):
+        with self._lock:
+            if endpoint not in self._buckets:
+                limit = self._limits.get(endpoint, self._default_limit)
+                self._buckets[endpoint] = TokenBucket(limit.rate, limit.burst, clock=self._clock, sleep=self._sleep)
+                self._semaphores[endpoint] = threading.BoundedSemaphore(limit.max_concurrency)
+                self._stats[endpoint] = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0, "wait_seconds": 0.0}
+            return self._buckets[endpoint], self._semaphores[endpoint], self._stats[endpoint]
+
+    def _record(self, stats: Dict[str, float], key: str, amount: float = 1):
+        with self._lock:
+            stats[key] += amount
+
+    def execute(self, endpoint: str, send: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Run `send` under the endpoint's limits, retrying throttled/transient failures.
+
+        Args:
+            endpoint: The API path (e.g. "/ai/generate-image") used to select limits.
+            send: Performs the HTTP request and returns the response.
+
+        Returns:
+            The first non-retryable response, or the last response once retries
+            are exhausted (callers still apply raise_for_status()).
+
+        Raises:
+            requests.exceptions.RequestException: If the final attempt fails at
+                the connection level.
+        """
+        bucket, semaphore, stats = self._endpoint_state(endpoint)
+        policy = self._retry_policy
+
+        attempt = 0
+        while True:
+            self._record(stats, "wait_seconds", bucket.acquire())
+            with semaphore:
+                self._record(stats, "requests")
+                try:
+                    response = send()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if attempt >= policy.max_retries:
+                        self._record(stats, "failures")
+                        raise
+                    delay = policy.delay_for(attempt, None)
+                    # logger.warning("NovelAI request failed, retrying", endpoint=endpoint, attempt=attempt, delay=delay, error=e)
+                else:
+                    if response.status_code not in policy.retry_statuses:
+                        return response
+                    if attempt >= policy.max_retries:
+                        self._record(stats, "failures")
+                        return response
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    delay = policy.delay_for(attempt, retry_after)
+                    response.close()
+                    if response.status_code == 429:
+                        self._record(stats, "throttled")
+                        bucket.pause(delay)
+                    # logger.warning("NovelAI request throttled, retrying", endpoint=endpoint, status=response.status_code, attempt=attempt, delay=delay)
+            self._record(stats, "retries")
+            # Sleep outside the semaphore so the slot stays available to other callers
+            self._sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint counters: requests sent, retries, 429s, final failures and time spent waiting for tokens."""
+        with self._lock:
+            return {endpoint: dict(values) for endpoint, values in self._stats.items()}
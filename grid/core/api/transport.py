@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+# (connect, read) timeout in seconds, or a single value for both
+Timeout = Union[float, Tuple[float, float]]
+
+# generate-image can take well over a minute for large n_samples; encode-vibe is quick
+DEFAULT_TIMEOUTS: Dict[str, Timeout] = {
+    "/ai/generate-image": (10.0, 180.0),
+    "/ai/encode-vibe": (10.0, 60.0),
+}
+DEFAULT_TIMEOUT: Timeout = (10.0, 60.0)
+
+
+class NovelAITransport:
+    """
+    Pooled keep-alive HTTP transport shared by every NovelAI call site.
+
+    Wraps one requests.Session whose connection pool is sized with
+    pool_maxsize, so concurrent callers (NovelAIClient, LibraryService, the
+    async front-end's worker threads) reuse warm TCP/TLS connections instead of
+    paying a handshake per request. Retries are left to RequestScheduler, so the
+    adapter itself never retries.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str, pool_connections: int = 2, pool_maxsize: int = 8,
+                 pool_block: bool = True, keep_alive: bool = True, timeouts: Optional[Dict[str, Timeout]] = None,
+                 default_timeout: Timeout = DEFAULT_TIMEOUT):
+        if pool_maxsize < 1:
+            raise ValueError("pool_maxsize must be at least 1.")
+        self._base_url = base_url.rstrip("/")
+        self._timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+        self._default_timeout = default_timeout
+        self._adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block, max_retries=0)
+        self._session = requests.Session()
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        self._session.headers.update({
+            "Authorization": f"Bearer {api_key}", # Use Bearer scheme
+            "Content-Type": "application/json",
+            "Connection": "keep-alive" if keep_alive else "close",
+        })
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        # logger.info("NovelAITransport initialized", base_url=self._base_url, pool_maxsize=pool_maxsize)
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+    def url_for(self, endpoint: str) -> str:
+        return f"{self._base_url}{endpoint}"
+
+    def timeout_for(self, endpoint: str) -> Timeout:
+        return self._timeouts.get(endpoint, self._default_timeout)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        """POST to base_url + endpoint over the pooled session, applying the endpoint's timeout unless given."""
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+        started = time.perf_counter()
+        try:
+            return self._session.post(self.url_for(endpoint), **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self._stats.setdefault(endpoint, {"requests": 0, "seconds": 0.0})
+                stats["requests"] += 1
+                stats["seconds"] += elapsed
+
+    def _pool_counters(self) -> Tuple[int, int]:
+        """(connections opened, requests sent) summed over every urllib3 pool of the adapter."""
+        pools = self._adapter.poolmanager.pools
+        opened = sent = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return opened, sent
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Connection reuse metrics plus per-endpoint request counts and time.
+
+        `connections_opened` counts TCP(/TLS) handshakes; every other request
+        was served on a kept-alive connection (`connections_reused`).
+        """
+        opened, sent = self._pool_counters()
+        with self._lock:
+            endpoints = {endpoint: dict(values) for endpoint, values in self._stats.items()}
+        return {
+            "connections_opened": opened,
+            "requests_sent": sent,
+            "connections_reused": max(0, sent - opened),
+            "endpoints": endpoints,
+        }
+
+    def close(self):
+        self._session.close()
+        # logger.info("NovelAITransport closed")
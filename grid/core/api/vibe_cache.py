@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Iterable, List
+
+from grid.utils.files import read_json, write_json_atomic
+
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+# Encoded vibes live next to the date-based ones under data/encoded
+DEFAULT_CACHE_DIR = os.path.join("data", "encoded", "cache")
+_INDEX_FILE_NAME = "index.json"
+_HASH_CHUNK_SIZE = 1024 * 1024
+# Hits only touch lastUsedAt in memory; it reaches index.json at most this often (or with the next put/GC/flush)
+DEFAULT_USAGE_FLUSH_INTERVAL = 60.0
+
+def _normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+class VibeCache:
+    """
+    Content-addressed store for encoded vibes.
+
+    Entries are keyed by a SHA-256 of (image bytes, information_extracted,
+    model), so encoding the same image with the same settings twice reuses the
+    existing .naiv4vibe file instead of calling the API again. The key -> file
+    mapping is persisted in an index.json next to the files, which makes hits
+    survive restarts. Files that no VibeImage node references any more are
+    removed by collect_garbage().
+
+    A hit does not rewrite the index: lastUsedAt is updated in memory and
+    written with the next put/collect_garbage, by flush(), or once
+    usage_flush_interval seconds have passed since the last write.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, usage_flush_interval: float = DEFAULT_USAGE_FLUSH_INTERVAL):
+        self._cache_dir = cache_dir
+        self._index_path = os.path.join(cache_dir, _INDEX_FILE_NAME)
+        self._usage_flush_interval = usage_flush_interval
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        self._dirty = False # lastUsedAt changed since the index was last written
+        self._saved_at = time.monotonic()
+        # logger.info("VibeCache initialized", cache_dir=cache_dir, entries=len(self._index))
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        # A missing or unreadable index just means starting with an empty cache
+        index = read_json(self._index_path, {})
+        return index if isinstance(index, dict) else {}
+
+    def _save_index(self):
+        write_json_atomic(self._index_path, self._index)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Write lastUsedAt updates of cache hits that are still only in memory."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    @staticmethod
+    def make_key(image_path: str, ie_value: float, model: Optional[str]) -> str:
+        """Hash the raw image bytes together with the encoding settings."""
+        digest = hashlib.sha256()
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+        digest.update(repr(float(ie_value)).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update((model or "").encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        # Fan out by the first two hex digits to keep directories small
+        return os.path.join(self._cache_dir, key[:2], f"vibe_{key}.naiv4vibe")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the encoded vibe path for key, or None on a miss (including a file deleted behind our back)."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry["path"]):
+                del self._index[key]
+                self._save_index()
+                return None
+            entry["lastUsedAt"] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self._usage_flush_interval:
+                self._save_index()
+            return entry["path"]
+
+    def put(self, key: str, data: bytes, ie_value: float, model: Optional[str]) -> str:
+        """Store encoded vibe data under key and return its path. Existing entries are kept as-is."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and os.path.exists(entry["path"]):
+                return entry["path"]
+
+            path = self._path_for(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            now = time.time()
+            self._index[key] = {
+                "path": path,
+                "informationExtracted": ie_value,
+                "model": model,
+                "size": len(data),
+                "createdAt": now,
+                "lastUsedAt": now,
+            }
+            self._save_index()
+            # logger.info("Encoded vibe cached", key=key, path=path)
+            return path
+
+    def collect_garbage(self, referenced_paths: Iterable[str], min_age: float = 3600.0) -> List[str]:
+        """
+        Remove cached vibes that are no longer referenced.
+
+        Args:
+            referenced_paths: encodedVibePath of every VibeImage node that still exists.
+            min_age: Entries used within this many seconds are kept even when
+                     unreferenced, so a registration that has written its file
+                     but not yet created its node is not swept away.
+
+        Returns:
+            The paths of the removed files.
+        """
+        referenced = {_normalize_path(path) for path in referenced_paths if path}
+        cutoff = time.time() - min_age
+        removed: List[str] = []
+        with self._lock:
+            for key, entry in list(self._index.items()):
+                path = entry["path"]
+                if _normalize_path(path) in referenced:
+                    continue
+                if entry.get("lastUsedAt", 0) > cutoff and os.path.exists(path):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # logger.warning("Failed to remove cached vibe", path=path)
+                    continue
+                del self._index[key]
+                removed.append(path)
+            if removed or self._dirty:
+                self._save_index()
+        # logger.info("Vibe cache garbage collected", removed=len(removed))
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
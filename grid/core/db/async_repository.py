@@ -0,0 +1,595 @@
+import neo4j
+from typing import Optional, Any, Dict, List, Tuple, TYPE_CHECKING
+from datetime import datetime
+from grid.core.db.base import DEFAULT_BATCH_SIZE, MAX_PAGE_SIZE, search_terms
+from grid.core.db.cache import LRUCache
+from grid.core.db.metrics import AsyncInstrumentedSession, PoolMetrics
+from grid.core.db.parameters import flatten_parameters_json
+from grid.core.db.repository import (
+    _CREATE_VIBE_QUERY, _CREATE_VIBES_QUERY, _GET_VIBE_QUERY, _GET_IMAGE_QUERY, _LIST_ENCODED_VIBE_PATHS_QUERY,
+    _CREATE_PROMPT_TEMPLATE_QUERY, _CREATE_PARAMETER_SET_QUERY, _MERGE_USER_QUERY, _MERGE_AI_MODEL_QUERY,
+    _CREATE_SESSION_QUERY, _CREATE_SESSIONS_QUERY, _GET_SESSION_QUERY, _UPDATE_SESSION_STATUS_QUERY,
+    _LINK_SESSION_RESOURCES_QUERY, _SESSION_RATING_CONTEXT_QUERY, _CREATE_IMAGES_QUERY, _MERGE_RATING_STATS_QUERY,
+    _UPDATE_IMAGE_STATUS_QUERY, _UPDATE_IMAGE_STATUSES_QUERY, _UPDATE_RATINGS_QUERY, _RESET_RATING_STATS_QUERY,
+    _REBUILD_RATING_STATS_QUERY, _ADD_TAGS_QUERY, _GET_IMAGE_TAGS_QUERY, _EXPORT_SESSIONS_QUERY, _EXPORT_IMAGES_QUERY,
+    _EXPORT_IMAGE_TAGS_QUERY, _FULLTEXT_INDEXES, _chunks, _vibe_row, _vibe_from_node, _session_from_node,
+    _image_from_node, _session_rows, _image_rows, _rating_rows, _rating_stats_query, _vibe_buckets_filter,
+    _template_sets_filter, _fulltext_query, _search_hits, _node_page_query, _session_record_from_record,
+    _image_query_statement, _image_page, _lucene_query,
+)
+from grid.core.models.vibe import VibeImage
+from grid.core.models.session import GenerationSession, SessionRecord
+from grid.core.models.image import GeneratedImage, ImageQuery, ImagePage
+from grid.core.models.rating_stat import RatingStat
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.search import SearchHit, SEARCH_KINDS
+# import structlog # 後で実装する構造化ログをインポート
+
+if TYPE_CHECKING:
+    from grid.config import DatabaseSettings
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+
+async def _records(result) -> List[Any]:
+    return [record async for record in result]
+
+
+class AsyncNeo4jRepository:
+    """
+    asyncio counterpart of Neo4jRepository on neo4j.AsyncGraphDatabase, for
+    generation and evaluation code running on an event loop: awaiting a
+    query yields to other tasks instead of blocking the loop or a thread.
+
+    Same operations, statements, caching and pool_metrics() as
+    Neo4jRepository (the Cypher and row mapping are shared with it), as
+    coroutines. Every query runs in a managed transaction (execute_read /
+    execute_write), which the driver retries on transient errors (deadlocks,
+    leader changes, lost connections) for up to max_transaction_retry_time;
+    transaction functions therefore only touch the database.
+
+    The one-time maintenance jobs (flatten_stored_parameters,
+    backfill_image_session_timestamps, deduplicate_tag_relationships) stay
+    on Neo4jRepository.
+    """
+
+    def __init__(self, uri: str, user: str, password: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_connection_pool_size: int = 100, connection_acquisition_timeout: float = 60.0,
+                 max_connection_lifetime: float = 3600.0, fetch_size: int = 1000,
+                 cache_size: int = 1024, cache_ttl: float = 60.0, slow_query_threshold: Optional[float] = 0.5,
+                 profile_slow_queries: bool = False, slow_query_log_size: int = 100,
+                 max_transaction_retry_time: float = 30.0):
+        """
+        Args:
+            max_transaction_retry_time: Seconds a transaction that failed with a
+                transient error is retried before the error is raised (driver default 30).
+
+        The other arguments are those of Neo4jRepository.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self._batch_size = batch_size
+        self._metrics = PoolMetrics(max_pool_size=max_connection_pool_size, slow_query_threshold=slow_query_threshold,
+                                    slow_query_log_size=slow_query_log_size)
+        self._profile_slow_queries = profile_slow_queries
+        self._cache = LRUCache(max_entries=cache_size, ttl_seconds=cache_ttl)
+        self._driver = None
+        try:
+            self._driver = neo4j.AsyncGraphDatabase.driver(
+                uri, auth=(user, password),
+                max_connection_pool_size=max_connection_pool_size,
+                connection_acquisition_timeout=connection_acquisition_timeout,
+                max_connection_lifetime=max_connection_lifetime,
+                fetch_size=fetch_size,
+                max_transaction_retry_time=max_transaction_retry_time,
+            )
+            # logger.info("Async Neo4j driver created successfully")
+        except Exception as e:
+            # logger.error("Failed to create async Neo4j driver", error=e)
+            raise ConnectionError(f"Failed to connect to Neo4j: {e}")
+
+    @classmethod
+    def from_settings(cls, database: "DatabaseSettings") -> "AsyncNeo4jRepository":
+        """Build a repository from grid.config's DatabaseSettings (settings.database)."""
+        return cls(
+            database.neo4j_uri, database.neo4j_user, database.neo4j_password,
+            batch_size=database.neo4j_batch_size,
+            max_connection_pool_size=database.neo4j_max_connection_pool_size,
+            connection_acquisition_timeout=database.neo4j_connection_acquisition_timeout,
+            max_connection_lifetime=database.neo4j_max_connection_lifetime,
+            fetch_size=database.neo4j_fetch_size,
+            cache_size=database.neo4j_cache_size,
+            cache_ttl=database.neo4j_cache_ttl,
+            slow_query_threshold=database.neo4j_slow_query_threshold,
+            profile_slow_queries=database.neo4j_profile_slow_queries,
+        )
+
+    def _session(self) -> AsyncInstrumentedSession:
+        """A driver session whose transactions are recorded in pool_metrics()."""
+        return AsyncInstrumentedSession(self._driver.session(), self._metrics, profile=self._profile_slow_queries)
+
+    def _check_driver(self):
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        """See Neo4jRepository.pool_metrics."""
+        return self._metrics.snapshot()
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """See Neo4jRepository.slow_queries."""
+        return self._metrics.slow_queries()
+
+    def reset_pool_metrics(self):
+        self._metrics.reset()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    async def close_connection(self):
+        if self._driver:
+            await self._driver.close()
+            # logger.info("Async Neo4j driver closed")
+
+    async def __aenter__(self) -> "AsyncNeo4jRepository":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close_connection()
+        return False
+
+    async def check_connection(self) -> bool:
+        if not self._driver:
+            return False
+        try:
+            await self._driver.verify_connectivity()
+            # logger.info("Neo4j connection verified")
+            return True
+        except Exception as e:
+            # logger.error("Neo4j connection verification failed", error=e)
+            return False
+
+    @staticmethod
+    async def _run_chunks(tx, query: str, chunks, **params: Any) -> int:
+        """Run an UNWIND query per chunk inside tx and sum the returned counts."""
+        total = 0
+        for chunk in chunks:
+            record = await (await tx.run(query, rows=chunk, **params)).single()
+            total += record["count"] if record is not None else 0
+        return total
+
+    async def _write_batched(self, label: str, query: str, rows: List[Dict[str, Any]], batch_size: Optional[int] = None,
+                             **params: Any) -> int:
+        """See Neo4jRepository._write_batched."""
+        async def _batch_tx(tx, chunks):
+            return await self._run_chunks(tx, query, chunks, **params)
+        _batch_tx.__qualname__ = f"{label}.<locals>._batch_tx" # Label for pool_metrics()
+
+        self._check_driver()
+        if not rows:
+            return 0
+        async with self._session() as session:
+            return await session.execute_write(_batch_tx, list(_chunks(rows, batch_size or self._batch_size)))
+
+    async def _read(self, label: str, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Run one read statement in its own transaction and return its records. `label` names it in pool_metrics()."""
+        async def _read_tx(tx):
+            return await _records(await tx.run(query, parameters or {}))
+        _read_tx.__qualname__ = f"{label}.<locals>._read_tx" # Label for pool_metrics()
+
+        self._check_driver()
+        async with self._session() as session:
+            return await session.execute_read(_read_tx)
+
+    async def _write(self, label: str, query: str, parameters: Optional[Dict[str, Any]] = None):
+        """Run one write statement in its own transaction."""
+        async def _write_tx(tx):
+            await (await tx.run(query, parameters or {})).consume()
+        _write_tx.__qualname__ = f"{label}.<locals>._write_tx" # Label for pool_metrics()
+
+        self._check_driver()
+        async with self._session() as session:
+            await session.execute_write(_write_tx)
+
+    # --- Vibes ---
+
+    async def create_vibe(self, vibe_image: VibeImage):
+        self._check_driver()
+        try:
+            await self._write("create_vibe", _CREATE_VIBE_QUERY, _vibe_row(vibe_image))
+            # logger.info("Vibe node created successfully", vibe_id=vibe_image.vibeID)
+        except Exception as e:
+            # logger.error("Failed to create vibe node", vibe_id=vibe_image.vibeID, error=e)
+            raise RuntimeError(f"Failed to create vibe node {vibe_image.vibeID}: {e}")
+        finally:
+            self._cache.invalidate(("vibe", vibe_image.vibeID))
+
+    async def create_vibes(self, vibe_images: List[VibeImage], batch_size: Optional[int] = None) -> int:
+        """See Neo4jRepository.create_vibes."""
+        rows = [_vibe_row(vibe_image) for vibe_image in vibe_images]
+        try:
+            return await self._write_batched("create_vibes", _CREATE_VIBES_QUERY, rows, batch_size)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create vibe nodes", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to create {len(rows)} vibe nodes: {e}")
+        finally:
+            for row in rows:
+                self._cache.invalidate(("vibe", row["vibeID"]))
+
+    async def get_vibe(self, vibe_id: str) -> Optional[VibeImage]:
+        """Read-through cached (see cache_stats); missing vibes are not cached."""
+        cached = self._cache.get(("vibe", vibe_id))
+        if cached is not None:
+            return cached.model_copy(deep=True)
+        self._check_driver()
+        try:
+            records = await self._read("get_vibe", _GET_VIBE_QUERY, {"vibeID": vibe_id})
+        except Exception as e:
+            # logger.error("Failed to get vibe node", vibe_id=vibe_id, error=e)
+            raise RuntimeError(f"Failed to get vibe node {vibe_id}: {e}")
+        if not records:
+            return None
+        vibe = _vibe_from_node(records[0]["v"])
+        self._cache.put(("vibe", vibe_id), vibe.model_copy(deep=True))
+        return vibe
+
+    async def list_encoded_vibe_paths(self) -> List[str]:
+        self._check_driver()
+        try:
+            return [record["path"] for record in await self._read("list_encoded_vibe_paths", _LIST_ENCODED_VIBE_PATHS_QUERY)]
+        except Exception as e:
+            # logger.error("Failed to list encoded vibe paths", error=e)
+            raise RuntimeError(f"Failed to list encoded vibe paths: {e}")
+
+    # --- Prompt templates and parameter sets ---
+
+    async def create_prompt_template(self, template: PromptTemplate):
+        template_data = template.model_dump()
+        template_data['createdAt'] = template_data['createdAt'].isoformat() # ISO 8601形式に変換
+        self._check_driver()
+        try:
+            await self._write("create_prompt_template", _CREATE_PROMPT_TEMPLATE_QUERY, template_data)
+        except Exception as e:
+            # logger.error("Failed to create PromptTemplate node", template_id=template.templateID, error=e)
+            raise RuntimeError(f"Failed to create PromptTemplate node {template.templateID}: {e}")
+
+    async def create_parameter_set(self, parameter_set: ParameterSet):
+        set_data = parameter_set.model_dump()
+        set_data['createdAt'] = set_data['createdAt'].isoformat() # ISO 8601形式に変換
+        self._check_driver()
+        try:
+            await self._write("create_parameter_set", _CREATE_PARAMETER_SET_QUERY, set_data)
+        except Exception as e:
+            # logger.error("Failed to create ParameterSet node", set_id=parameter_set.setID, error=e)
+            raise RuntimeError(f"Failed to create ParameterSet node {parameter_set.setID}: {e}")
+
+    # --- Sessions ---
+
+    async def create_session(self, session: GenerationSession, user_id: str, model_name: str):
+        async def _create_session_tx(tx, session_data, user_id, model_name):
+            await (await tx.run(_MERGE_USER_QUERY, userId=user_id, createdAt=datetime.now().isoformat())).consume()
+            await (await tx.run(_MERGE_AI_MODEL_QUERY, modelName=model_name)).consume()
+            await (await tx.run(_CREATE_SESSION_QUERY, **session_data, userId=user_id, modelName=model_name,
+                                flatParameters=flatten_parameters_json(session_data['baseParameters']))).consume()
+
+        self._check_driver()
+        session_data = session.model_dump()
+        session_data['timestamp'] = session_data['timestamp'].isoformat() # Convert datetime
+        try:
+            async with self._session() as neo4j_session:
+                await neo4j_session.execute_write(_create_session_tx, session_data, user_id, model_name)
+            # logger.info("Session node created successfully", session_id=session.sessionID)
+        except Exception as e:
+            # logger.error("Failed to create session node", session_id=session.sessionID, error=e)
+            raise RuntimeError(f"Failed to create session node {session.sessionID}: {e}")
+        finally:
+            self._cache.invalidate(("session", session.sessionID))
+
+    async def create_sessions(self, records: List[SessionRecord], batch_size: Optional[int] = None) -> int:
+        """See Neo4jRepository.create_sessions."""
+        self._check_driver()
+        try:
+            return await self._write_batched("create_sessions", _CREATE_SESSIONS_QUERY, _session_rows(records), batch_size,
+                                             createdAt=datetime.now().isoformat())
+        except Exception as e:
+            # logger.error("Failed to create session nodes", count=len(records), error=e)
+            raise RuntimeError(f"Failed to create {len(records)} session nodes: {e}")
+        finally:
+            for record in records:
+                self._cache.invalidate(("session", record.sessionID))
+
+    async def get_session(self, session_id: str) -> Optional[GenerationSession]:
+        """Read-through cached (see cache_stats); missing sessions are not cached."""
+        cached = self._cache.get(("session", session_id))
+        if cached is not None:
+            return cached.model_copy(deep=True)
+        self._check_driver()
+        try:
+            records = await self._read("get_session", _GET_SESSION_QUERY, {"sessionID": session_id})
+        except Exception as e:
+            # logger.error("Failed to get session node", session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to get session node {session_id}: {e}")
+        if not records:
+            return None
+        generation_session = _session_from_node(records[0]["s"])
+        self._cache.put(("session", session_id), generation_session.model_copy(deep=True))
+        return generation_session
+
+    async def update_session_status(self, session_id: str, status: str):
+        self._check_driver()
+        try:
+            await self._write("update_session_status", _UPDATE_SESSION_STATUS_QUERY, {"sessionID": session_id, "status": status})
+        except Exception as e:
+            # logger.error("Failed to update session status", session_id=session_id, status=status, error=e)
+            raise RuntimeError(f"Failed to update status for session {session_id}: {e}")
+        finally:
+            self._cache.invalidate(("session", session_id))
+
+    async def link_session_resources(self, session_id: str, vibe_ids: Optional[List[str]] = None, template_id: Optional[str] = None,
+                                     parameter_set_id: Optional[str] = None):
+        """See Neo4jRepository.link_session_resources."""
+        self._check_driver()
+        vibes = [{"vibeID": vibe_id, "index": index} for index, vibe_id in enumerate(vibe_ids or [])]
+        try:
+            await self._write("link_session_resources", _LINK_SESSION_RESOURCES_QUERY,
+                              {"sessionId": session_id, "vibes": vibes, "templateId": template_id, "parameterSetId": parameter_set_id})
+        except Exception as e:
+            # logger.error("Failed to link session resources", session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to link resources to session {session_id}: {e}")
+
+    # --- Images ---
+
+    async def _create_images_in_tx(self, tx, images: List[GeneratedImage], session_id: str, batch_size: int) -> int:
+        """Create image nodes and fold their ratings into the RatingStat buckets, inside tx."""
+        context = await (await tx.run(_SESSION_RATING_CONTEXT_QUERY, sessionId=session_id)).single()
+        if context is None:
+            # _CREATE_IMAGES_QUERY would MATCH no session and silently create nothing
+            raise ValueError(f"Session {session_id} does not exist.")
+        rows, stats = _image_rows(images, context)
+        created = await self._run_chunks(tx, _CREATE_IMAGES_QUERY, _chunks(rows, batch_size), sessionId=session_id)
+        await self._run_chunks(tx, _MERGE_RATING_STATS_QUERY, _chunks(stats, batch_size))
+        return created
+
+    async def create_generated_image(self, image: GeneratedImage, session_id: str):
+        async def _create_image_tx(tx, image, session_id):
+            return await self._create_images_in_tx(tx, [image], session_id, self._batch_size)
+
+        self._check_driver()
+        try:
+            async with self._session() as session:
+                await session.execute_write(_create_image_tx, image, session_id)
+        except Exception as e:
+            # logger.error("Failed to create GeneratedImage node", image_id=image.imageID, session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to create GeneratedImage node {image.imageID} for session {session_id}: {e}")
+
+    async def create_generated_images(self, images: List[GeneratedImage], session_id: str, batch_size: Optional[int] = None) -> int:
+        """See Neo4jRepository.create_generated_images."""
+        async def _create_images_tx(tx, images, session_id):
+            return await self._create_images_in_tx(tx, images, session_id, batch_size or self._batch_size)
+
+        self._check_driver()
+        if not images:
+            return 0
+        try:
+            async with self._session() as session:
+                return await session.execute_write(_create_images_tx, list(images), session_id)
+        except Exception as e:
+            # logger.error("Failed to create GeneratedImage nodes", session_id=session_id, count=len(images), error=e)
+            raise RuntimeError(f"Failed to create {len(images)} GeneratedImage nodes for session {session_id}: {e}")
+
+    async def get_image(self, image_id: str) -> Optional[GeneratedImage]:
+        self._check_driver()
+        try:
+            records = await self._read("get_image", _GET_IMAGE_QUERY, {"imageID": image_id})
+        except Exception as e:
+            # logger.error("Failed to get GeneratedImage node", image_id=image_id, error=e)
+            raise RuntimeError(f"Failed to get GeneratedImage node {image_id}: {e}")
+        return _image_from_node(records[0]["i"]) if records else None
+
+    async def query_images(self, query: Optional[ImageQuery] = None, limit: int = 50, cursor: Optional[str] = None) -> ImagePage:
+        """See Neo4jRepository.query_images."""
+        query = query or ImageQuery()
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+        cypher, params = _image_query_statement(query, limit, cursor)
+        self._check_driver()
+        try:
+            records = await self._read("query_images", cypher, params)
+        except Exception as e:
+            # logger.error("Failed to query images", error=e)
+            raise RuntimeError(f"Failed to query images: {e}")
+        return _image_page(records, query, limit)
+
+    async def update_image_status(self, image_id: str, status: str, error_message: Optional[str] = None):
+        self._check_driver()
+        try:
+            await self._write("update_image_status", _UPDATE_IMAGE_STATUS_QUERY,
+                              {"imageID": image_id, "status": status, "errorMessage": error_message})
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage status", image_id=image_id, status=status, error=e)
+            raise RuntimeError(f"Failed to update status for image {image_id}: {e}")
+
+    async def update_image_statuses(self, updates: List[Tuple[str, str, Optional[str]]], batch_size: Optional[int] = None) -> int:
+        """See Neo4jRepository.update_image_statuses."""
+        rows = [{"imageID": image_id, "status": status, "errorMessage": error_message} for image_id, status, error_message in updates]
+        try:
+            return await self._write_batched("update_image_statuses", _UPDATE_IMAGE_STATUSES_QUERY, rows, batch_size)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage statuses", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to update status for {len(rows)} images: {e}")
+
+    async def update_image_rating(self, image_id: str, rating: int):
+        self._check_driver()
+        if not (0 <= rating <= 5):
+            raise ValueError("Rating must be between 0 and 5.")
+        try:
+            await self._write("update_image_rating", _UPDATE_RATINGS_QUERY, {"rows": [{"imageID": image_id, "rating": rating}]})
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage rating", image_id=image_id, rating=rating, error=e)
+            raise RuntimeError(f"Failed to update rating for image {image_id}: {e}")
+
+    async def update_image_ratings(self, ratings: Dict[str, int], batch_size: Optional[int] = None) -> int:
+        """See Neo4jRepository.update_image_ratings."""
+        rows = _rating_rows(ratings)
+        try:
+            return await self._write_batched("update_image_ratings", _UPDATE_RATINGS_QUERY, rows, batch_size)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage ratings", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to update rating for {len(rows)} images: {e}")
+
+    # --- Rating aggregates ---
+
+    async def _read_rating_stats(self, label: str, where: str, params: Dict[str, Any], min_count: int, limit: int) -> List[RatingStat]:
+        self._check_driver()
+        if min_count < 1:
+            raise ValueError("min_count must be at least 1.")
+        try:
+            records = await self._read(label, _rating_stats_query(where), {"minCount": min_count, "limit": limit, **params})
+        except Exception as e:
+            # logger.error("Failed to read rating stats", query=label, error=e)
+            raise RuntimeError(f"Failed to read rating stats ({label}): {e}")
+        return [RatingStat(**dict(record["st"])) for record in records]
+
+    async def best_vibe_parameter_buckets(self, vibe_id: str, parameter: Optional[str] = None, min_count: int = 1,
+                                          limit: int = 20) -> List[RatingStat]:
+        """See Neo4jRepository.best_vibe_parameter_buckets."""
+        where, params = _vibe_buckets_filter(vibe_id, parameter)
+        return await self._read_rating_stats("best_vibe_parameter_buckets", where, params, min_count, limit)
+
+    async def best_template_parameter_sets(self, template_id: Optional[str] = None, min_count: int = 1,
+                                           limit: int = 20) -> List[RatingStat]:
+        """See Neo4jRepository.best_template_parameter_sets."""
+        where, params = _template_sets_filter(template_id)
+        return await self._read_rating_stats("best_template_parameter_sets", where, params, min_count, limit)
+
+    async def rebuild_rating_stats(self) -> int:
+        """See Neo4jRepository.rebuild_rating_stats."""
+        async def _rebuild_stats_tx(tx):
+            await (await tx.run(_RESET_RATING_STATS_QUERY)).consume()
+            return (await (await tx.run(_REBUILD_RATING_STATS_QUERY)).single())["count"]
+
+        self._check_driver()
+        try:
+            async with self._session() as session:
+                return await session.execute_write(_rebuild_stats_tx)
+        except Exception as e:
+            # logger.error("Failed to rebuild rating stats", error=e)
+            raise RuntimeError(f"Failed to rebuild rating stats: {e}")
+
+    # --- Tags ---
+
+    async def add_tag_to_image(self, image_id: str, tag_name: str):
+        """Idempotent: tagging an image twice with the same tag keeps a single link."""
+        await self.add_tags_to_image(image_id, [tag_name])
+
+    async def add_tags_to_image(self, image_id: str, tag_names: List[str]) -> int:
+        return await self.add_tags_to_images([(image_id, tag_name) for tag_name in tag_names])
+
+    async def add_tags_to_images(self, image_tags: List[Tuple[str, str]], batch_size: Optional[int] = None) -> int:
+        """See Neo4jRepository.add_tags_to_images."""
+        rows = [{"imageID": image_id, "tagName": tag_name} for image_id, tag_name in dict.fromkeys(image_tags)]
+        try:
+            return await self._write_batched("add_tags_to_images", _ADD_TAGS_QUERY, rows, batch_size)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to add tags to GeneratedImages", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to add {len(rows)} tags to images: {e}")
+        finally:
+            for image_id in {row["imageID"] for row in rows}:
+                self._cache.invalidate(("image_tags", image_id))
+
+    async def get_image_tags(self, image_id: str) -> List[str]:
+        """Tag names of an image, sorted. Read-through cached (see cache_stats)."""
+        cached = self._cache.get(("image_tags", image_id))
+        if cached is not None:
+            return list(cached)
+        self._check_driver()
+        try:
+            records = await self._read("get_image_tags", _GET_IMAGE_TAGS_QUERY, {"imageID": image_id})
+        except Exception as e:
+            # logger.error("Failed to get image tags", image_id=image_id, error=e)
+            raise RuntimeError(f"Failed to get tags of image {image_id}: {e}")
+        tag_names = [record["tagName"] for record in records]
+        self._cache.put(("image_tags", image_id), tuple(tag_names))
+        return tag_names
+
+    # --- Search ---
+
+    async def search_text(self, text: str, kinds: List[str], limit: int) -> List[SearchHit]:
+        """See Neo4jRepository.search_text."""
+        unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown search kinds: {unknown}.")
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        terms = search_terms(text)
+        if not terms or not kinds:
+            return []
+        lucene_query = _lucene_query(terms)
+
+        async def _search_tx(tx):
+            hits = []
+            for kind in kinds:
+                parameters = {"index": _FULLTEXT_INDEXES[kind][0], "query": lucene_query, "limit": limit}
+                hits.extend(_search_hits(kind, await _records(await tx.run(_fulltext_query(kind), parameters))))
+            return hits
+
+        self._check_driver()
+        try:
+            async with self._session() as session:
+                return await session.execute_read(_search_tx)
+        except Exception as e:
+            # logger.error("Full-text search failed", text=text, kinds=kinds, error=e)
+            raise RuntimeError(f"Full-text search for {text!r} failed: {e}")
+
+    # --- Bulk export ---
+
+    async def _read_page(self, label: str, query: str, **params: Any) -> List[Any]:
+        try:
+            return await self._read(label, query, params)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to read export page", query=label, error=e)
+            raise RuntimeError(f"Failed to read {label} page: {e}")
+
+    async def export_vibes(self, after: Optional[str], limit: int) -> List[VibeImage]:
+        records = await self._read_page("export_vibes", _node_page_query("VibeImage", "vibeID"), after=after or "", limit=limit)
+        return [VibeImage(**dict(record["n"])) for record in records]
+
+    async def export_prompt_templates(self, after: Optional[str], limit: int) -> List[PromptTemplate]:
+        records = await self._read_page("export_prompt_templates", _node_page_query("PromptTemplate", "templateID"),
+                                        after=after or "", limit=limit)
+        return [PromptTemplate(**dict(record["n"])) for record in records]
+
+    async def export_parameter_sets(self, after: Optional[str], limit: int) -> List[ParameterSet]:
+        records = await self._read_page("export_parameter_sets", _node_page_query("ParameterSet", "setID"), after=after or "",
+                                        limit=limit)
+        return [ParameterSet(**dict(record["n"])) for record in records]
+
+    async def export_sessions(self, after: Optional[str], limit: int) -> List[SessionRecord]:
+        records = await self._read_page("export_sessions", _EXPORT_SESSIONS_QUERY, after=after or "", limit=limit)
+        return [_session_record_from_record(record) for record in records]
+
+    async def export_images(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, GeneratedImage]]:
+        after_session, after_image = after or ("", "")
+        records = await self._read_page("export_images", _EXPORT_IMAGES_QUERY, afterSession=after_session, afterImage=after_image,
+                                        limit=limit)
+        return [(record["sessionID"], _image_from_node(record["i"])) for record in records]
+
+    async def export_image_tags(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        after_image, after_tag = after or ("", "")
+        records = await self._read_page("export_image_tags", _EXPORT_IMAGE_TAGS_QUERY, afterImage=after_image, afterTag=after_tag,
+                                        limit=limit)
+        return [(record["imageID"], record["tagName"]) for record in records]
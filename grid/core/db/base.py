@@ -0,0 +1,259 @@
+import base64
+import json
+from abc import ABC, abstractmethod
+from typing import Optional, Any, Dict, List, Tuple, TYPE_CHECKING
+
+from grid.core.models.vibe import VibeImage
+from grid.core.models.session import GenerationSession, SessionRecord
+from grid.core.models.image import GeneratedImage, ImageQuery, ImagePage
+from grid.core.models.rating_stat import RatingStat
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.search import SearchHit
+
+if TYPE_CHECKING:
+    from grid.config import DatabaseSettings
+
+# Rows per UNWIND statement (Neo4j) / executemany call (SQLite) in the batch write methods
+DEFAULT_BATCH_SIZE = 500
+
+# Largest page query_images returns
+MAX_PAGE_SIZE = 1000
+
+# Sort keys of query_images per ImageQuery.orderBy, all descending. imageID (unique) breaks ties;
+# timestamp is the image's session timestamp.
+IMAGE_ORDER_FIELDS = {
+    "newest": ["timestamp", "imageID"],
+    "rating": ["rating", "timestamp", "imageID"],
+}
+
+
+def search_terms(text: str) -> List[str]:
+    """The words of a search fragment, lowercased (every word is matched as a prefix)."""
+    return [term for term in text.lower().split() if term]
+
+
+def encode_cursor(order_by: str, keys: List[Any]) -> str:
+    """Opaque query_images cursor holding the sort key of a page's last image."""
+    payload = json.dumps({"o": order_by, "k": keys}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, order_by: str) -> List[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        keys = payload["k"]
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if payload.get("o") != order_by or len(keys) != len(IMAGE_ORDER_FIELDS[order_by]):
+        raise ValueError(f"Cursor does not belong to a query ordered by {order_by!r}.")
+    return keys
+
+
+class Repository(ABC):
+    """
+    Persistence interface of Grid. Services depend on this, not on a backend:
+    Neo4jRepository (server, see docker/docker-compose.yml) and SQLiteRepository
+    (embedded file, for single-user setups and CI). create_repository picks one
+    from DatabaseSettings.backend.
+
+    Methods raise ConnectionError when the backend is closed or unreachable,
+    ValueError for invalid arguments and RuntimeError when the operation fails.
+    """
+
+    @abstractmethod
+    def close_connection(self):
+        ...
+
+    @abstractmethod
+    def check_connection(self) -> bool:
+        ...
+
+    # --- Vibes ---
+
+    @abstractmethod
+    def create_vibe(self, vibe_image: VibeImage):
+        ...
+
+    @abstractmethod
+    def create_vibes(self, vibe_images: List[VibeImage], batch_size: Optional[int] = None) -> int:
+        """All or nothing. Returns the number of vibes created."""
+
+    @abstractmethod
+    def get_vibe(self, vibe_id: str) -> Optional[VibeImage]:
+        ...
+
+    @abstractmethod
+    def list_encoded_vibe_paths(self) -> List[str]:
+        ...
+
+    # --- Prompt templates and parameter sets ---
+
+    @abstractmethod
+    def create_prompt_template(self, template: PromptTemplate):
+        ...
+
+    @abstractmethod
+    def create_parameter_set(self, parameter_set: ParameterSet):
+        ...
+
+    # --- Sessions ---
+
+    @abstractmethod
+    def create_session(self, session: GenerationSession, user_id: str, model_name: str):
+        ...
+
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[GenerationSession]:
+        ...
+
+    def create_sessions(self, records: List[SessionRecord], batch_size: Optional[int] = None) -> int:
+        """
+        Create sessions together with their user, model and resource links
+        (bulk import). Returns the number of sessions created. This default
+        makes two calls per session; backends override it with batch writes.
+        """
+        session_fields = list(GenerationSession.model_fields)
+        for record in records:
+            self.create_session(GenerationSession(**record.model_dump(include=set(session_fields))), record.userID, record.modelName)
+            self.link_session_resources(record.sessionID, record.vibeIDs, record.templateID, record.parameterSetID)
+        return len(records)
+
+    @abstractmethod
+    def update_session_status(self, session_id: str, status: str):
+        ...
+
+    @abstractmethod
+    def link_session_resources(self, session_id: str, vibe_ids: Optional[List[str]] = None, template_id: Optional[str] = None,
+                               parameter_set_id: Optional[str] = None):
+        """Record the vibes (in reference_*_multiple order), template and parameter set a session used."""
+
+    # --- Images ---
+
+    @abstractmethod
+    def create_generated_image(self, image: GeneratedImage, session_id: str):
+        ...
+
+    @abstractmethod
+    def create_generated_images(self, images: List[GeneratedImage], session_id: str, batch_size: Optional[int] = None) -> int:
+        """All or nothing. Returns the number of images created."""
+
+    @abstractmethod
+    def get_image(self, image_id: str) -> Optional[GeneratedImage]:
+        ...
+
+    @abstractmethod
+    def query_images(self, query: Optional[ImageQuery] = None, limit: int = 50, cursor: Optional[str] = None) -> ImagePage:
+        """Keyset-paginated image browsing; cursors are only valid for the backend that issued them."""
+
+    @abstractmethod
+    def update_image_status(self, image_id: str, status: str, error_message: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def update_image_statuses(self, updates: List[Tuple[str, str, Optional[str]]], batch_size: Optional[int] = None) -> int:
+        ...
+
+    @abstractmethod
+    def update_image_rating(self, image_id: str, rating: int):
+        ...
+
+    @abstractmethod
+    def update_image_ratings(self, ratings: Dict[str, int], batch_size: Optional[int] = None) -> int:
+        ...
+
+    # --- Rating aggregates ---
+
+    @abstractmethod
+    def best_vibe_parameter_buckets(self, vibe_id: str, parameter: Optional[str] = None, min_count: int = 1,
+                                    limit: int = 20) -> List[RatingStat]:
+        ...
+
+    @abstractmethod
+    def best_template_parameter_sets(self, template_id: Optional[str] = None, min_count: int = 1,
+                                     limit: int = 20) -> List[RatingStat]:
+        ...
+
+    @abstractmethod
+    def rebuild_rating_stats(self) -> int:
+        ...
+
+    # --- Tags ---
+
+    def add_tag_to_image(self, image_id: str, tag_name: str):
+        """Idempotent: tagging an image twice with the same tag keeps a single link."""
+        self.add_tags_to_image(image_id, [tag_name])
+
+    def add_tags_to_image(self, image_id: str, tag_names: List[str]) -> int:
+        """Attach all tag_names to one image in a single round trip (see add_tags_to_images)."""
+        return self.add_tags_to_images([(image_id, tag_name) for tag_name in tag_names])
+
+    @abstractmethod
+    def add_tags_to_images(self, image_tags: List[Tuple[str, str]], batch_size: Optional[int] = None) -> int:
+        """Returns the number of (image, tag) pairs now linked (existing links included)."""
+
+    @abstractmethod
+    def get_image_tags(self, image_id: str) -> List[str]:
+        ...
+
+    # --- Search ---
+
+    @abstractmethod
+    def search_text(self, text: str, kinds: List[str], limit: int) -> List[SearchHit]:
+        """
+        Full-text search of the library for a typed fragment: every word of
+        text must match (the last one may be incomplete, so all are matched as
+        prefixes). Returns up to limit hits per kind in kinds (see
+        SEARCH_KINDS), best first. Scores come from the backend's text ranking
+        and are only comparable within one kind; SearchService merges them.
+        """
+
+    # --- Bulk export ---
+    # Each call returns one page of up to limit records, in key order, starting
+    # strictly after the key `after` (None for the first page). Pages are read
+    # independently, so grid.core.db.transfer streams the whole library with
+    # constant memory.
+
+    @abstractmethod
+    def export_vibes(self, after: Optional[str], limit: int) -> List[VibeImage]:
+        """Keyed by vibeID."""
+
+    @abstractmethod
+    def export_prompt_templates(self, after: Optional[str], limit: int) -> List[PromptTemplate]:
+        """Keyed by templateID."""
+
+    @abstractmethod
+    def export_parameter_sets(self, after: Optional[str], limit: int) -> List[ParameterSet]:
+        """Keyed by setID."""
+
+    @abstractmethod
+    def export_sessions(self, after: Optional[str], limit: int) -> List[SessionRecord]:
+        """Keyed by sessionID."""
+
+    @abstractmethod
+    def export_images(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, GeneratedImage]]:
+        """(sessionID, image) pairs keyed by (sessionID, imageID), so each session's images are contiguous."""
+
+    @abstractmethod
+    def export_image_tags(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        """(imageID, tagName) pairs keyed by themselves."""
+
+
+def create_repository(database: "DatabaseSettings") -> Repository:
+    """
+    The repository selected by DatabaseSettings.backend ("neo4j" or "sqlite").
+    With DatabaseSettings.write_behind, it is wrapped in an OutboxRepository
+    whose flusher is already running.
+    """
+    if database.backend == "neo4j":
+        from grid.core.db.repository import Neo4jRepository
+        repository = Neo4jRepository.from_settings(database)
+    elif database.backend == "sqlite":
+        from grid.core.db.sqlite_repository import SQLiteRepository
+        repository = SQLiteRepository.from_settings(database)
+    else:
+        raise ValueError(f"Unknown database backend {database.backend!r}.")
+    if getattr(database, "write_behind", False):
+        from grid.core.db.outbox import OutboxRepository, WriteOutbox
+        repository = OutboxRepository(repository, WriteOutbox(str(database.outbox_path))).start()
+    return repository
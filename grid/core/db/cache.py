@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache bounded by entry count (least recently used
+    entries are evicted first) and by age (entries older than ttl_seconds read
+    as missing). max_entries=0 disables caching.
+
+    stats() is meant for sizing: many evictions with a low hit rate mean
+    max_entries is too small, many expirations mean ttl_seconds is too short.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        if max_entries < 0:
+            raise ValueError("max_entries must not be negative.")
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive.")
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return default
+            stored_at, value = entry
+            if self._clock() - stored_at >= self._ttl:
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self._max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return dict(self._counters, size=len(self._entries), max_entries=self._max_entries, ttl_seconds=self._ttl,
+                        hit_rate=self._counters["hits"] / lookups if lookups else 0.0)
@@ -0,0 +1,359 @@
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, Sequence, Callable
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ResultSummary.counters fields summed per query
+SUMMARY_COUNTERS = ("nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted", "properties_set",
+                    "labels_added", "labels_removed", "indexes_added", "indexes_removed", "constraints_added", "constraints_removed")
+
+# Statements that are not run with a PROFILE prefix
+_UNPROFILABLE = ("EXPLAIN", "PROFILE", "CREATE INDEX", "CREATE FULLTEXT", "CREATE CONSTRAINT", "DROP ", "SHOW ")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: per-bucket (non-cumulative) counts plus count, sum and max."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self._bounds = list(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket containing the q-quantile (max for the unbounded bucket)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count:
+                return self._bounds[index] if index < len(self._bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self._bounds] + ["le_inf"]
+        return {
+            "count": self.count,
+            "sum_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "p99_seconds": self.quantile(0.99),
+            "buckets": dict(zip(labels, self._counts)),
+        }
+
+
+def plan_tree(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact form of a ResultSummary.profile plan: operator, rows, db hits, details and children."""
+    args = plan.get("args", {})
+    return {
+        "operator": plan.get("operatorType"),
+        "rows": plan.get("rows", args.get("Rows")),
+        "dbHits": plan.get("dbHits", args.get("DbHits")),
+        "details": args.get("Details"),
+        "children": [plan_tree(child) for child in plan.get("children", [])],
+    }
+
+
+def _total_db_hits(plan: Dict[str, Any]) -> int:
+    return (plan.get("dbHits") or 0) + sum(_total_db_hits(child) for child in plan["children"])
+
+
+class PoolMetrics:
+    """
+    Connection pool and query metrics of a Neo4jRepository.
+
+    - acquisition: time from asking the driver to run a transaction until the
+      transaction function starts, i.e. waiting for a pooled connection (plus
+      BEGIN). Growing acquisition time with flat query time means the pool is
+      exhausted.
+    - in_use / peak_in_use: sessions currently running a transaction.
+    - queries: per-query latency of the transaction function itself, plus the
+      server-side time (result_available_after / result_consumed_after) and
+      update counters of the statements it ran.
+    - slow queries: the last slow_query_log_size statements whose server-side
+      time reached slow_query_threshold seconds, with their PROFILE plan when
+      statements are profiled (see InstrumentedSession).
+    """
+
+    def __init__(self, max_pool_size: Optional[int] = None, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 slow_query_threshold: Optional[float] = None, slow_query_log_size: int = 100):
+        self._lock = threading.Lock()
+        self._max_pool_size = max_pool_size
+        self._buckets = buckets
+        self._slow_query_threshold = slow_query_threshold
+        self._slow_query_log_size = slow_query_log_size
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._acquisition = Histogram(self._buckets)
+            self._queries: Dict[str, Histogram] = {}
+            self._errors: Dict[str, int] = {}
+            self._statements: Dict[str, Dict[str, Any]] = {}
+            self._slow_queries = deque(maxlen=self._slow_query_log_size)
+            self._in_use = 0
+            self._peak_in_use = 0
+
+    def checkout(self):
+        with self._lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+    def checkin(self):
+        with self._lock:
+            self._in_use -= 1
+
+    def observe_acquisition(self, seconds: float):
+        with self._lock:
+            self._acquisition.observe(seconds)
+
+    def observe_query(self, name: str, seconds: float, failed: bool = False):
+        with self._lock:
+            self._queries.setdefault(name, Histogram(self._buckets)).observe(seconds)
+            if failed:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def observe_statement(self, name: str, statement: str, parameter_names: List[str], summary):
+        """Record the ResultSummary of one statement run by query name."""
+        available = summary.result_available_after or 0
+        consumed = summary.result_consumed_after or 0
+        counters = {counter: getattr(summary.counters, counter, 0) for counter in SUMMARY_COUNTERS}
+        slow = self._slow_query_threshold is not None and (available + consumed) / 1000 >= self._slow_query_threshold
+        if slow:
+            plan = plan_tree(summary.profile) if summary.profile else None
+            record = {
+                "query": name,
+                "statement": statement.strip(),
+                "parameters": parameter_names,
+                "server_seconds": (available + consumed) / 1000,
+                "result_available_after_ms": available,
+                "result_consumed_after_ms": consumed,
+                "counters": {counter: value for counter, value in counters.items() if value},
+                "db_hits": _total_db_hits(plan) if plan else None,
+                "plan": plan,
+                "recorded_at": time.time(),
+            }
+        with self._lock:
+            totals = self._statements.setdefault(name, {"statements": 0, "result_available_after_ms": 0,
+                                                        "result_consumed_after_ms": 0, "counters": {}})
+            totals["statements"] += 1
+            totals["result_available_after_ms"] += available
+            totals["result_consumed_after_ms"] += consumed
+            for counter, value in counters.items():
+                if value:
+                    totals["counters"][counter] = totals["counters"].get(counter, 0) + value
+            if slow:
+                self._slow_queries.append(record)
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Recorded slow statements, oldest first."""
+        with self._lock:
+            return list(self._slow_queries)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            queries = {}
+            for name, histogram in sorted(self._queries.items()):
+                totals = self._statements.get(name, {})
+                queries[name] = dict(histogram.snapshot(), errors=self._errors.get(name, 0),
+                                     statements=totals.get("statements", 0),
+                                     result_available_after_ms=totals.get("result_available_after_ms", 0),
+                                     result_consumed_after_ms=totals.get("result_consumed_after_ms", 0),
+                                     counters=dict(totals.get("counters", {})))
+            return {
+                "max_pool_size": self._max_pool_size,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "acquisition": self._acquisition.snapshot(),
+                "queries": queries,
+                "slow_queries": len(self._slow_queries),
+            }
+
+
+def query_name(func: Callable) -> str:
+    """
+    Metric label of a transaction function: the repository method it is
+    defined in ('Neo4jRepository.create_vibe.<locals>._create_vibe_tx' ->
+    'create_vibe'), or its own name without the _tx suffix.
+    """
+    parts = getattr(func, "__qualname__", "").split(".")
+    if "<locals>" in parts and parts.index("<locals>") > 0:
+        return parts[parts.index("<locals>") - 1]
+    name = getattr(func, "__name__", "query").strip("_")
+    return name[:-3] if name.endswith("_tx") else name
+
+
+class ProfilingTransaction:
+    """
+    Wraps a managed transaction to keep the results of the statements run in
+    it, so their summaries can be read before the transaction closes, and to
+    prefix those statements with PROFILE when asked.
+    """
+
+    def __init__(self, tx, profile: bool = False):
+        self._tx = tx
+        self._profile = profile
+        self._runs = []
+
+    def _statement(self, query: str) -> str:
+        if self._profile and not query.lstrip().upper().startswith(_UNPROFILABLE):
+            return "PROFILE " + query
+        return query
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwparameters):
+        if parameters is None:
+            result = self._tx.run(self._statement(query), **kwparameters)
+        else:
+            result = self._tx.run(self._statement(query), parameters, **kwparameters)
+        self._runs.append((query, sorted({**(parameters or {}), **kwparameters}), result))
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+    def collect(self, name: str, metrics: PoolMetrics):
+        """Consume what is left of each result (the transaction function is done with them) and record its summary."""
+        for query, parameter_names, result in self._runs:
+            consume = getattr(result, "consume", None)
+            summary = consume() if consume is not None else None
+            if summary is not None:
+                metrics.observe_statement(name, query, parameter_names, summary)
+        self._runs.clear()
+
+
+class AsyncProfilingTransaction(ProfilingTransaction):
+    """ProfilingTransaction for a managed transaction of the async driver."""
+
+    async def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwparameters):
+        if parameters is None:
+            result = await self._tx.run(self._statement(query), **kwparameters)
+        else:
+            result = await self._tx.run(self._statement(query), parameters, **kwparameters)
+        self._runs.append((query, sorted({**(parameters or {}), **kwparameters}), result))
+        return result
+
+    async def collect(self, name: str, metrics: PoolMetrics):
+        for query, parameter_names, result in self._runs:
+            consume = getattr(result, "consume", None)
+            summary = await consume() if consume is not None else None
+            if summary is not None:
+                metrics.observe_statement(name, query, parameter_names, summary)
+        self._runs.clear()
+
+
+class InstrumentedSession:
+    """
+    Wraps a driver session so execute_read/execute_write feed PoolMetrics.
+    With profile, every statement runs with PROFILE (which costs extra server
+    work) and slow statements keep their plan.
+    """
+
+    def __init__(self, session, metrics: PoolMetrics, profile: bool = False):
+        self._session = session
+        self._metrics = metrics
+        self._profile = profile
+
+    def __enter__(self) -> "InstrumentedSession":
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._session.__exit__(*exc)
+
+    def _execute(self, execute: Callable, func: Callable, *args, **kwargs):
+        name = query_name(func)
+        requested = time.perf_counter()
+        acquired = []
+
+        def _timed(tx, *a, **kw):
+            started = time.perf_counter()
+            if not acquired: # Retries reuse the already acquired connection
+                acquired.append(started)
+                self._metrics.observe_acquisition(started - requested)
+            profiling_tx = ProfilingTransaction(tx, self._profile)
+            try:
+                result = func(profiling_tx, *a, **kw)
+                profiling_tx.collect(name, self._metrics)
+            except Exception:
+                self._metrics.observe_query(name, time.perf_counter() - started, failed=True)
+                raise
+            self._metrics.observe_query(name, time.perf_counter() - started)
+            return result
+
+        self._metrics.checkout()
+        try:
+            return execute(_timed, *args, **kwargs)
+        finally:
+            self._metrics.checkin()
+
+    def execute_write(self, func: Callable, *args, **kwargs):
+        return self._execute(self._session.execute_write, func, *args, **kwargs)
+
+    def execute_read(self, func: Callable, *args, **kwargs):
+        return self._execute(self._session.execute_read, func, *args, **kwargs)
+
+    def run(self, *args, **kwargs):
+        return self._session.run(*args, **kwargs)
+
+
+class AsyncInstrumentedSession:
+    """InstrumentedSession for a session of the async driver (AsyncNeo4jRepository)."""
+
+    def __init__(self, session, metrics: PoolMetrics, profile: bool = False):
+        self._session = session
+        self._metrics = metrics
+        self._profile = profile
+
+    async def __aenter__(self) -> "AsyncInstrumentedSession":
+        await self._session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._session.__aexit__(*exc)
+
+    async def _execute(self, execute: Callable, func: Callable, *args, **kwargs):
+        name = query_name(func)
+        requested = time.perf_counter()
+        acquired = []
+
+        async def _timed(tx, *a, **kw):
+            started = time.perf_counter()
+            if not acquired: # Retries reuse the already acquired connection
+                acquired.append(started)
+                self._metrics.observe_acquisition(started - requested)
+            profiling_tx = AsyncProfilingTransaction(tx, self._profile)
+            try:
+                result = await func(profiling_tx, *a, **kw)
+                await profiling_tx.collect(name, self._metrics)
+            except Exception:
+                self._metrics.observe_query(name, time.perf_counter() - started, failed=True)
+                raise
+            self._metrics.observe_query(name, time.perf_counter() - started)
+            return result
+
+        self._metrics.checkout()
+        try:
+            return await execute(_timed, *args, **kwargs)
+        finally:
+            self._metrics.checkin()
+
+    async def execute_write(self, func: Callable, *args, **kwargs):
+        return await self._execute(self._session.execute_write, func, *args, **kwargs)
+
+    async def execute_read(self, func: Callable, *args, **kwargs):
+        return await self._execute(self._session.execute_read, func, *args, **kwargs)
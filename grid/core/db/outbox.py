@@ -0,0 +1,503 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Any, Dict, List, Set, Tuple, Callable
+
+from grid.core.db.base import Repository
+from grid.core.models.vibe import VibeImage
+from grid.core.models.session import GenerationSession, SessionRecord
+from grid.core.models.image import GeneratedImage, ImageQuery, ImagePage
+from grid.core.models.rating_stat import RatingStat
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.search import SearchHit
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+DEFAULT_OUTBOX_PATH = os.path.join("data", "outbox.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, -- Replay order
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', -- 'pending' or 'dead' (gave up, kept for requeue_dead)
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_status ON entries (status, seq);
+"""
+
+# Ops whose consecutive entries are merged into one repository call when flushing
+_MERGEABLE_OPS = ("create_generated_images", "update_image_statuses", "update_image_ratings", "add_tags_to_images", "create_vibes")
+
+
+class OutboxEntry:
+    __slots__ = ("seq", "op", "payload", "attempts")
+
+    def __init__(self, seq: int, op: str, payload: Dict[str, Any], attempts: int):
+        self.seq = seq
+        self.op = op
+        self.payload = payload
+        self.attempts = attempts
+
+
+class WriteOutbox:
+    """
+    Local append-only journal of repository writes (SQLite, WAL mode).
+    Entries are appended in call order and removed only once the database
+    acknowledged them, so a write survives database outages and process
+    crashes alike.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_OUTBOX_PATH, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        if db_path != ":memory:" and os.path.dirname(str(db_path)):
+            os.makedirs(os.path.dirname(str(db_path)), exist_ok=True)
+        # One connection shared by callers and the flusher, serialized by a lock
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL") # An acknowledged append survives power loss
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def append(self, op: str, payload: Dict[str, Any]) -> int:
+        encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            return self._conn.execute("INSERT INTO entries (op, payload, created_at) VALUES (?, ?, ?)",
+                                      (op, encoded, self._clock())).lastrowid
+
+    def pending(self, limit: int) -> List[OutboxEntry]:
+        """The oldest pending entries, in append order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, op, payload, attempts FROM entries WHERE status = 'pending' ORDER BY seq LIMIT ?",
+                                      (limit,)).fetchall()
+        return [OutboxEntry(seq, op, json.loads(payload), attempts) for seq, op, payload, attempts in rows]
+
+    def ack(self, seqs: List[int]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM entries WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def record_failure(self, seqs: List[int], error: str, count_attempt: bool = True, dead: bool = False):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE entries SET attempts = attempts + ?, last_error = ?, status = ? WHERE seq = ?",
+                [(1 if count_attempt else 0, error, "dead" if dead else "pending", seq) for seq in seqs])
+
+    def requeue_dead(self) -> int:
+        """Put dead entries back in line (in their original order) after the cause was fixed."""
+        with self._lock:
+            return self._conn.execute("UPDATE entries SET status = 'pending', attempts = 0 WHERE status = 'dead'").rowcount
+
+    def dead_entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, op, attempts, last_error FROM entries WHERE status = 'dead' ORDER BY seq").fetchall()
+        return [{"seq": seq, "op": op, "attempts": attempts, "error": error} for seq, op, attempts, error in rows]
+
+    def dead_dependencies(self) -> Tuple[Set[str], Set[str]]:
+        """IDs of the sessions and images whose creating entries are dead (entries writing to them must wait too)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT op, payload FROM entries WHERE status = 'dead' AND op IN "
+                                      "('create_session', 'create_generated_images')").fetchall()
+        sessions, images = set(), set()
+        for op, payload in rows:
+            payload = json.loads(payload)
+            if op == "create_session":
+                sessions.add(payload["session"]["sessionID"])
+            else:
+                images.update(image["imageID"] for image in payload["images"])
+        return sessions, images
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, count(*) FROM entries GROUP BY status").fetchall()
+        counts = {"pending": 0, "dead": 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class OutboxRepository(Repository):
+    """
+    Write-behind Repository: writes are appended to a WriteOutbox and return
+    as soon as the journal has them; a background flusher replays them to the
+    target repository (Neo4j or SQLite). Generation therefore never waits on,
+    or fails because of, the database.
+
+    Guarantees:
+      * Ordering: entries are replayed strictly in append order. An entry that
+        fails blocks the ones behind it (an image is never written before its
+        session) until it succeeds or is dead-lettered.
+      * Idempotency: delivery is at-least-once (a crash between the database
+        commit and the acknowledgement replays the entry). Creates that are
+        retried skip the records that already exist; the other writes set
+        absolute values or merge links, so applying them twice is harmless.
+      * No loss: entries leave the journal only once applied. Attempts made
+        while the target is unreachable (check_connection() is False) are not
+        counted; an entry the reachable database keeps rejecting is marked
+        dead after max_attempts and kept until requeue_dead(). Entries that
+        write to a session or image whose creation is dead are dead-lettered
+        with it instead of being replayed against a missing node, and
+        requeue_dead() puts them back behind it.
+
+    Consecutive entries of the same batchable write (e.g. images of one
+    session, rating updates) are merged into one repository call, up to
+    batch_size entries per call. Reads go straight to the target, so they see
+    a write once it is flushed; call flush() to wait for that.
+    """
+
+    def __init__(self, target: Repository, outbox: Optional[WriteOutbox] = None, batch_size: int = 200, max_attempts: int = 10,
+                 base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Args:
+            target: The repository writes are replayed to.
+            outbox: The journal (default: data/outbox.sqlite3).
+            batch_size: Journal entries replayed per flush cycle.
+            max_attempts: Failed attempts against a reachable database before an entry is dead-lettered.
+            base_delay: Seconds to wait after the first failed flush; doubled per consecutive failure.
+            max_delay: Cap of the retry delay.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1.")
+        self._target = target
+        self._outbox = outbox if outbox is not None else WriteOutbox()
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._flush_lock = threading.Lock() # One flush cycle at a time
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"appended": 0, "flushed": 0, "flush_calls": 0, "failed_flushes": 0, "dead_lettered": 0}
+        self._last_error: Optional[str] = None
+
+    @property
+    def target(self) -> Repository:
+        return self._target
+
+    @property
+    def outbox(self) -> WriteOutbox:
+        return self._outbox
+
+    # --- Flushing ---
+
+    def start(self) -> "OutboxRepository":
+        """Start the background flusher (entries left by an earlier process are replayed first)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="outbox-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Stop the flusher after trying to drain the journal for up to timeout seconds. Unflushed entries stay journaled."""
+        if timeout:
+            self.flush(timeout)
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _flush_loop(self):
+        delay = 0.0
+        while not self._stopping.is_set():
+            try:
+                flushed = self.flush_once()
+            except Exception as e:
+                # logger.warning("Outbox flush failed", error=e)
+                delay = min(max(delay * 2, self._base_delay), self._max_delay)
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+            delay = 0.0
+            if flushed == 0:
+                self._wakeup.wait(1.0) # Woken early by appends
+                self._wakeup.clear()
+
+    def flush_once(self) -> int:
+        """
+        Replay the next group of entries (consecutive entries of one op,
+        merged). Raises the target's error when the group could not be
+        applied; the entries stay pending.
+
+        Returns:
+            The number of entries applied (0 when the journal is empty).
+        """
+        with self._flush_lock:
+            entries = self._outbox.pending(self._batch_size)
+            if not entries:
+                return 0
+            group = [entries[0]]
+            if group[0].op in _MERGEABLE_OPS:
+                for entry in entries[1:]:
+                    if entry.op != group[0].op or not self._same_target(group[0], entry):
+                        break
+                    group.append(entry)
+            group = self._hold_dependents(group)
+            if not group:
+                return 0
+            seqs = [entry.seq for entry in group]
+            with self._stats_lock:
+                self._stats["flush_calls"] += 1
+            try:
+                self._apply(group[0].op, [entry.payload for entry in group], retried=any(entry.attempts for entry in group))
+            except Exception as e:
+                reachable = self._target_reachable()
+                dead = reachable and max(entry.attempts for entry in group) + 1 >= self._max_attempts
+                self._outbox.record_failure(seqs, str(e), count_attempt=reachable, dead=dead)
+                with self._stats_lock:
+                    self._stats["failed_flushes"] += 1
+                    if dead:
+                        self._stats["dead_lettered"] += len(seqs)
+                    self._last_error = str(e)
+                # logger.warning("Outbox entries not applied", op=group[0].op, seqs=seqs, dead=dead, error=e)
+                if dead:
+                    return 0 # Dead entries no longer block the line; nothing was applied
+                raise
+            self._outbox.ack(seqs)
+            with self._stats_lock:
+                self._stats["flushed"] += len(seqs)
+            return len(seqs)
+
+    def _hold_dependents(self, group: List[OutboxEntry]) -> List[OutboxEntry]:
+        """Dead-letter the entries of group that depend on a dead session/image creation; return the rest."""
+        sessions, images = self._outbox.dead_dependencies()
+        if not sessions and not images:
+            return group
+        held = [entry for entry in group if self._depends_on(entry, sessions, images)]
+        if held:
+            self._outbox.record_failure([entry.seq for entry in held], "Depends on a dead-lettered entry",
+                                        count_attempt=False, dead=True)
+            with self._stats_lock:
+                self._stats["dead_lettered"] += len(held)
+            # logger.warning("Outbox entries held behind dead-lettered entries", op=group[0].op, seqs=[entry.seq for entry in held])
+        return [entry for entry in group if entry not in held]
+
+    @staticmethod
+    def _depends_on(entry: OutboxEntry, sessions: Set[str], images: Set[str]) -> bool:
+        payload = entry.payload
+        if entry.op in ("create_generated_images", "link_session_resources", "update_session_status"):
+            return payload["sessionID"] in sessions
+        if entry.op == "update_image_statuses":
+            return any(update[0] in images for update in payload["updates"])
+        if entry.op == "update_image_ratings":
+            return any(image_id in images for image_id in payload["ratings"])
+        if entry.op == "add_tags_to_images":
+            return any(pair[0] in images for pair in payload["pairs"])
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Replay pending entries until the journal is drained (dead entries
+        aside) or timeout seconds passed. Failed attempts are retried after
+        base_delay.
+
+        Returns:
+            True when no pending entries are left.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._outbox.counts()["pending"]:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            try:
+                self.flush_once()
+            except Exception:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                time.sleep(self._base_delay if remaining is None else min(self._base_delay, remaining))
+        return True
+
+    def _target_reachable(self) -> bool:
+        try:
+            return self._target.check_connection()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _same_target(first: OutboxEntry, entry: OutboxEntry) -> bool:
+        # Images are created per session: only entries of the same session merge
+        return first.op != "create_generated_images" or first.payload["sessionID"] == entry.payload["sessionID"]
+
+    def _apply(self, op: str, payloads: List[Dict[str, Any]], retried: bool):
+        """Replay entries of one op. Retried creates skip what an earlier, unacknowledged attempt already wrote."""
+        target = self._target
+        if op == "create_vibes":
+            vibes = [VibeImage(**vibe) for payload in payloads for vibe in payload["vibes"]]
+            if retried:
+                vibes = [vibe for vibe in vibes if target.get_vibe(vibe.vibeID) is None]
+            if vibes:
+                target.create_vibes(vibes)
+        elif op == "create_session":
+            payload = payloads[0]
+            session = GenerationSession(**payload["session"])
+            if not retried or target.get_session(session.sessionID) is None:
+                target.create_session(session, payload["userID"], payload["modelName"])
+        elif op == "update_session_status":
+            target.update_session_status(payloads[0]["sessionID"], payloads[0]["status"])
+        elif op == "link_session_resources":
+            payload = payloads[0]
+            target.link_session_resources(payload["sessionID"], payload["vibeIDs"], payload["templateID"], payload["parameterSetID"])
+        elif op == "create_generated_images":
+            images = [GeneratedImage(**image) for payload in payloads for image in payload["images"]]
+            if retried:
+                images = [image for image in images if target.get_image(image.imageID) is None]
+            if images:
+                target.create_generated_images(images, payloads[0]["sessionID"])
+        elif op == "update_image_statuses":
+            target.update_image_statuses([tuple(update) for payload in payloads for update in payload["updates"]])
+        elif op == "update_image_ratings":
+            ratings: Dict[str, int] = {}
+            for payload in payloads:
+                ratings.update(payload["ratings"]) # Later entries win, as if applied one by one
+            target.update_image_ratings(ratings)
+        elif op == "add_tags_to_images":
+            target.add_tags_to_images([tuple(pair) for payload in payloads for pair in payload["pairs"]])
+        else:
+            raise ValueError(f"Unknown outbox op {op!r}.")
+
+    def outbox_stats(self) -> Dict[str, Any]:
+        """Journal depth (pending/dead entries), flush counters and the last flush error."""
+        with self._stats_lock:
+            stats = dict(self._stats, last_error=self._last_error)
+        stats.update(self._outbox.counts())
+        return stats
+
+    def _append(self, op: str, payload: Dict[str, Any]):
+        self._outbox.append(op, payload)
+        with self._stats_lock:
+            self._stats["appended"] += 1
+        self._wakeup.set()
+
+    # --- Repository: writes are journaled ---
+
+    def close_connection(self):
+        self.stop()
+        self._target.close_connection()
+        self._outbox.close()
+
+    def check_connection(self) -> bool:
+        return self._target_reachable()
+
+    def create_vibe(self, vibe_image: VibeImage):
+        self.create_vibes([vibe_image])
+
+    def create_vibes(self, vibe_images: List[VibeImage], batch_size: Optional[int] = None) -> int:
+        self._append("create_vibes", {"vibes": [vibe_image.model_dump(mode="json") for vibe_image in vibe_images]})
+        return len(vibe_images)
+
+    # Templates and parameter sets are library edits made from the UI, not
+    # generation writes: they go straight to the target (and fail if it is down).
+
+    def create_prompt_template(self, template: PromptTemplate):
+        self._target.create_prompt_template(template)
+
+    def create_parameter_set(self, parameter_set: ParameterSet):
+        self._target.create_parameter_set(parameter_set)
+
+    def create_session(self, session: GenerationSession, user_id: str, model_name: str):
+        self._append("create_session", {"session": session.model_dump(mode="json"), "userID": user_id, "modelName": model_name})
+
+    def update_session_status(self, session_id: str, status: str):
+        self._append("update_session_status", {"sessionID": session_id, "status": status})
+
+    def link_session_resources(self, session_id: str, vibe_ids: Optional[List[str]] = None, template_id: Optional[str] = None,
+                               parameter_set_id: Optional[str] = None):
+        self._append("link_session_resources", {"sessionID": session_id, "vibeIDs": list(vibe_ids or []), "templateID": template_id,
+                                                "parameterSetID": parameter_set_id})
+
+    def create_generated_image(self, image: GeneratedImage, session_id: str):
+        self.create_generated_images([image], session_id)
+
+    def create_generated_images(self, images: List[GeneratedImage], session_id: str, batch_size: Optional[int] = None) -> int:
+        if not images:
+            return 0
+        self._append("create_generated_images", {"sessionID": session_id, "images": [image.model_dump(mode="json") for image in images]})
+        return len(images)
+
+    def update_image_status(self, image_id: str, status: str, error_message: Optional[str] = None):
+        self.update_image_statuses([(image_id, status, error_message)])
+
+    def update_image_statuses(self, updates: List[Tuple[str, str, Optional[str]]], batch_size: Optional[int] = None) -> int:
+        self._append("update_image_statuses", {"updates": [list(update) for update in updates]})
+        return len(updates)
+
+    def update_image_rating(self, image_id: str, rating: int):
+        self.update_image_ratings({image_id: rating})
+
+    def update_image_ratings(self, ratings: Dict[str, int], batch_size: Optional[int] = None) -> int:
+        # Validate now: a rejected entry would otherwise block the journal until dead-lettered
+        for image_id, rating in ratings.items():
+            if not (0 <= rating <= 5):
+                raise ValueError(f"Rating must be between 0 and 5 (image {image_id}: {rating}).")
+        self._append("update_image_ratings", {"ratings": dict(ratings)})
+        return len(ratings)
+
+    def add_tags_to_images(self, image_tags: List[Tuple[str, str]], batch_size: Optional[int] = None) -> int:
+        pairs = list(dict.fromkeys(image_tags))
+        self._append("add_tags_to_images", {"pairs": [list(pair) for pair in pairs]})
+        return len(pairs)
+
+    # --- Repository: reads go to the target ---
+
+    def get_vibe(self, vibe_id: str) -> Optional[VibeImage]:
+        return self._target.get_vibe(vibe_id)
+
+    def list_encoded_vibe_paths(self) -> List[str]:
+        return self._target.list_encoded_vibe_paths()
+
+    def get_session(self, session_id: str) -> Optional[GenerationSession]:
+        return self._target.get_session(session_id)
+
+    def get_image(self, image_id: str) -> Optional[GeneratedImage]:
+        return self._target.get_image(image_id)
+
+    def query_images(self, query: Optional[ImageQuery] = None, limit: int = 50, cursor: Optional[str] = None) -> ImagePage:
+        return self._target.query_images(query, limit, cursor)
+
+    def best_vibe_parameter_buckets(self, vibe_id: str, parameter: Optional[str] = None, min_count: int = 1,
+                                    limit: int = 20) -> List[RatingStat]:
+        return self._target.best_vibe_parameter_buckets(vibe_id, parameter, min_count, limit)
+
+    def best_template_parameter_sets(self, template_id: Optional[str] = None, min_count: int = 1,
+                                     limit: int = 20) -> List[RatingStat]:
+        return self._target.best_template_parameter_sets(template_id, min_count, limit)
+
+    def rebuild_rating_stats(self) -> int:
+        """Recomputes from flushed ratings only; call flush() first to include journaled ones."""
+        return self._target.rebuild_rating_stats()
+
+    def get_image_tags(self, image_id: str) -> List[str]:
+        return self._target.get_image_tags(image_id)
+
+    def search_text(self, text: str, kinds: List[str], limit: int) -> List[SearchHit]:
+        return self._target.search_text(text, kinds, limit)
+
+    def export_vibes(self, after: Optional[str], limit: int) -> List[VibeImage]:
+        return self._target.export_vibes(after, limit)
+
+    def export_prompt_templates(self, after: Optional[str], limit: int) -> List[PromptTemplate]:
+        return self._target.export_prompt_templates(after, limit)
+
+    def export_parameter_sets(self, after: Optional[str], limit: int) -> List[ParameterSet]:
+        return self._target.export_parameter_sets(after, limit)
+
+    def export_sessions(self, after: Optional[str], limit: int) -> List[SessionRecord]:
+        return self._target.export_sessions(after, limit)
+
+    def export_images(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, GeneratedImage]]:
+        return self._target.export_images(after, limit)
+
+    def export_image_tags(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        return self._target.export_image_tags(after, limit)
@@ -0,0 +1,75 @@
+import json
+from typing import Optional, Dict, Any, Tuple, Type
+
+# Generation parameters stored as typed, range-indexable node properties
+# (next to the full JSON payload, which is kept for reproducibility).
+FLATTENED_PARAMETERS: Dict[str, Tuple[str, Type]] = {
+    "scale": ("paramScale", float),
+    "steps": ("paramSteps", int),
+    "sampler": ("paramSampler", str),
+    "width": ("paramWidth", int),
+    "height": ("paramHeight", int),
+    "seed": ("paramSeed", int),
+    "cfg_rescale": ("paramCfgRescale", float),
+    "noise_schedule": ("paramNoiseSchedule", str),
+}
+
+# Per-vibe lists: element N becomes <prefix>N, e.g. reference_strength_multiple[0] -> paramReferenceStrength0
+PER_VIBE_PARAMETERS: Dict[str, str] = {
+    "reference_strength_multiple": "paramReferenceStrength",
+    "reference_information_extracted_multiple": "paramReferenceInformationExtracted",
+}
+
+
+def _coerce(value: Any, kind: Type) -> Optional[Any]:
+    if value is None or isinstance(value, bool):
+        return None
+    if kind is str:
+        return value if isinstance(value, str) else None
+    if not isinstance(value, (int, float)):
+        return None
+    if kind is int:
+        return int(value) if float(value).is_integer() else None
+    return float(value)
+
+
+def flatten_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Typed property values for the known generation parameters. Missing or
+    ill-typed values are left out rather than stored with the wrong type.
+    """
+    flat: Dict[str, Any] = {}
+    for name, (prop, kind) in FLATTENED_PARAMETERS.items():
+        value = _coerce(parameters.get(name), kind)
+        if value is not None:
+            flat[prop] = value
+    for name, prefix in PER_VIBE_PARAMETERS.items():
+        values = parameters.get(name)
+        if isinstance(values, list):
+            for index, item in enumerate(values):
+                value = _coerce(item, float)
+                if value is not None:
+                    flat[f"{prefix}{index}"] = value
+    return flat
+
+
+def flatten_parameters_json(parameters_json: Optional[str]) -> Dict[str, Any]:
+    """flatten_parameters for a JSON string payload; invalid JSON flattens to nothing."""
+    try:
+        parameters = json.loads(parameters_json) if parameters_json else {}
+    except (TypeError, json.JSONDecodeError):
+        return {}
+    return flatten_parameters(parameters) if isinstance(parameters, dict) else {}
+
+
+def parameter_property(name: str) -> str:
+    """
+    Node property of a parameter name, using the same dotted paths as sweep
+    axes: "scale" -> "paramScale", "reference_strength_multiple.0" -> "paramReferenceStrength0".
+    """
+    if name in FLATTENED_PARAMETERS:
+        return FLATTENED_PARAMETERS[name][0]
+    base, _, index = name.partition(".")
+    if base in PER_VIBE_PARAMETERS and index.isdigit():
+        return f"{PER_VIBE_PARAMETERS[base]}{index}"
+    raise ValueError(f"Parameter {name!r} is not stored as a queryable property.")
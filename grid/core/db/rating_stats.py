@@ -0,0 +1,71 @@
+from decimal import Decimal, ROUND_FLOOR
+from typing import Optional, Dict, Any, List
+
+# Bucket width per parameter tracked in (vibe, parameter, bucket) rating stats.
+# The per-vibe reference lists are resolved to the vibe's own entry.
+VIBE_PARAMETER_BUCKETS: Dict[str, float] = {
+    "scale": 0.5,
+    "steps": 4,
+    "cfg_rescale": 0.1,
+    "reference_strength": 0.1, # reference_strength_multiple[vibe index]
+    "reference_information_extracted": 0.1, # reference_information_extracted_multiple[vibe index]
+}
+
+# Session vibe parameters stored as lists aligned with the session's vibes
+_PER_VIBE_LISTS = {
+    "reference_strength": "reference_strength_multiple",
+    "reference_information_extracted": "reference_information_extracted_multiple",
+}
+
+
+def bucket_of(value: float, width: float) -> float:
+    """Lower bound of the bucket containing value (Decimal arithmetic, so 0.3 stays 0.3)."""
+    value_d, width_d = Decimal(str(value)), Decimal(str(width))
+    return float((value_d / width_d).to_integral_value(rounding=ROUND_FLOOR) * width_d)
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def rating_stat_rows(parameters: Dict[str, Any], vibes: List[Dict[str, Any]], template_id: Optional[str],
+                     set_id: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    The RatingStat buckets an image contributes to.
+
+    Args:
+        parameters: The image's actual generation parameters.
+        vibes: The session's vibes as {"vibeID", "index"} (index into the reference_*_multiple lists).
+        template_id: PromptTemplate used by the session, if any.
+        set_id: ParameterSet used by the session, if any.
+
+    Returns:
+        {"key", "props"} per bucket; key is unique per bucket and props are the
+        descriptive properties of a new RatingStat node.
+    """
+    rows = []
+    for vibe in vibes:
+        for parameter, width in VIBE_PARAMETER_BUCKETS.items():
+            if parameter in _PER_VIBE_LISTS:
+                values = parameters.get(_PER_VIBE_LISTS[parameter])
+                index = vibe.get("index")
+                value = values[index] if isinstance(values, list) and index is not None and index < len(values) else None
+            else:
+                value = parameters.get(parameter)
+            value = _number(value)
+            if value is None:
+                continue
+            bucket = bucket_of(value, width)
+            rows.append({
+                "key": f"vibe:{vibe['vibeID']}|{parameter}|{bucket}",
+                "props": {"kind": "vibe_parameter", "vibeID": vibe["vibeID"], "parameter": parameter,
+                          "bucket": bucket, "bucketWidth": float(width)},
+            })
+    if template_id is not None and set_id is not None:
+        rows.append({
+            "key": f"template:{template_id}|set:{set_id}",
+            "props": {"kind": "template_parameter_set", "templateID": template_id, "setID": set_id},
+        })
+    return rows
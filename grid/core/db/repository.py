@@ -1,26 +1,764 @@
+import json
 import neo4j
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple, Iterable, TYPE_CHECKING
 from datetime import datetime
 # from grid.config import settings # 後で実装する設定管理からインポート
+from grid.core.db.base import Repository, DEFAULT_BATCH_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, search_terms
+from grid.core.db.cache import LRUCache
+from grid.core.db.metrics import InstrumentedSession, PoolMetrics
+from grid.core.db.parameters import flatten_parameters, flatten_parameters_json, parameter_property
+from grid.core.db.rating_stats import rating_stat_rows
 from grid.core.models.vibe import VibeImage
-from grid.core.models.session import GenerationSession # Import GenerationSession
-from grid.core.models.image import GeneratedImage # Import GeneratedImage
+from grid.core.models.session import GenerationSession, SessionRecord # Import GenerationSession
+from grid.core.models.image import GeneratedImage, ImageQuery, ImagePage # Import GeneratedImage
 from grid.core.models.tag import Tag # Import Tag model
+from grid.core.models.rating_stat import RatingStat
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.search import SearchHit, SEARCH_KINDS
 # import structlog # 後で実装する構造化ログをインポート
 
+if TYPE_CHECKING:
+    from grid.config import DatabaseSettings
+
 # logger = structlog.get_logger(__name__) # ロガーの初期化
 
-class Neo4jRepository:
+# Cypher expressions of IMAGE_ORDER_FIELDS, per ImageQuery.orderBy. The rating order reads
+# the session timestamp copied onto the image, so the composite index_image_rating_order
+# (docker/init/init.cypher) covers all three keys
+_IMAGE_ORDER_KEYS = {
+    "newest": ["s.timestamp", "i.imageID"],
+    "rating": ["i.rating", "i.sessionTimestamp", "i.imageID"],
+}
+
+
+def _after_cursor_condition(expressions: List[str], offset: int = 0) -> str:
+    """
+    Keyset predicate "(k1, k2, ...) < ($cursor0, $cursor1, ...)" for a
+    descending sort, expanded so the planner can use the index on k1.
+    """
+    first = f"{expressions[0]} < $cursor{offset}"
+    if len(expressions) == 1:
+        return first
+    return f"({first} OR ({expressions[0]} = $cursor{offset} AND {_after_cursor_condition(expressions[1:], offset + 1)}))"
+
+# Full-text index per search kind (docker/init/init.cypher): index name, ID property,
+# and the title/snippet expressions of a matched node
+_FULLTEXT_INDEXES = {
+    "vibe": ("fulltext_vibes", "vibeID", "coalesce(node.notes, node.vibeID)", "node.imagePath"),
+    "template": ("fulltext_templates", "templateID", "node.name", "node.contentPositive"),
+    "parameter_set": ("fulltext_parameter_sets", "setID", "node.name", "node.description"),
+    "session": ("fulltext_sessions", "sessionID", "coalesce(node.name, node.basePromptPositive)", "node.basePromptPositive"),
+    "tag": ("fulltext_tags", "tagName", "node.tagName", "NULL"),
+}
+
+# Characters with a meaning in Lucene query syntax
+_LUCENE_SPECIAL = set('+-&|!(){}[]^"~*?:\\/')
+
+
+def _lucene_query(terms: List[str]) -> str:
+    """
+    Lucene query requiring every term, as a whole word (boosted: wildcard
+    matches are constant-scored) or as a prefix. Wildcard terms bypass the
+    analyzer, so terms must already be lowercase.
+    """
+    clauses = []
+    for term in terms:
+        escaped = "".join("\\" + char if char in _LUCENE_SPECIAL else char for char in term)
+        clauses.append(f"({escaped}^2 OR {escaped}*)")
+    return " AND ".join(clauses)
+
+# --- Rating aggregates ---
+# Every GeneratedImage stores the keys of the RatingStat buckets it counts
+# towards (ratingStatKeys, fixed at creation from its parameters and its
+# session's vibes/template/parameter set). Rated images (rating > 0) add
+# count/sum/sumSquares to those buckets; rating changes apply the difference,
+# so "best settings" queries read O(buckets) nodes instead of every image.
+
+_SESSION_RATING_CONTEXT_QUERY = """
+MATCH (s:GenerationSession {sessionID: $sessionId})
+OPTIONAL MATCH (s)-[u:USES_VIBE]->(v:VibeImage)
+WITH s, collect(CASE WHEN v IS NULL THEN NULL ELSE {vibeID: v.vibeID, index: u.index} END) AS vibes
+OPTIONAL MATCH (s)-[:USES_TEMPLATE]->(t:PromptTemplate)
+WITH s, vibes, head(collect(t.templateID)) AS templateID
+OPTIONAL MATCH (s)-[:USES_PARAMETER_SET]->(p:ParameterSet)
+RETURN vibes, templateID, head(collect(p.setID)) AS setID
+"""
+
+# Bulk session import: create_session and link_session_resources for a batch of sessions
+_CREATE_SESSIONS_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {userID: row.userID})
+ON CREATE SET u.createdAt = datetime($createdAt)
+MERGE (m:AiModel {modelName: row.modelName})
+ON CREATE SET m.type = 'unknown'
+CREATE (s:GenerationSession {
+    sessionID: row.sessionID,
+    name: row.name,
+    timestamp: row.timestamp,
+    baseParameters: row.baseParameters,
+    basePromptPositive: row.basePromptPositive,
+    basePromptNegative: row.basePromptNegative,
+    notes: row.notes,
+    overallStatus: row.overallStatus
+})
+SET s += row.flatParameters
+CREATE (s)-[:CREATED_BY]->(u)
+CREATE (s)-[:USES_MODEL]->(m)
+WITH s, row
+CALL {
+    WITH s, row
+    UNWIND row.vibes AS vibe
+    MATCH (v:VibeImage {vibeID: vibe.vibeID})
+    MERGE (s)-[r:USES_VIBE]->(v)
+    SET r.index = vibe.index
+    RETURN count(v) AS linkedVibes
+}
+CALL {
+    WITH s, row
+    OPTIONAL MATCH (t:PromptTemplate {templateID: row.templateID})
+    FOREACH (_ IN CASE WHEN t IS NULL THEN [] ELSE [1] END | MERGE (s)-[:USES_TEMPLATE]->(t))
+    RETURN count(t) AS linkedTemplates
+}
+CALL {
+    WITH s, row
+    OPTIONAL MATCH (p:ParameterSet {setID: row.parameterSetID})
+    FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | MERGE (s)-[:USES_PARAMETER_SET]->(p))
+    RETURN count(p) AS linkedSets
+}
+RETURN count(s) AS count
+"""
+
+# Bulk export pages. The outer MATCH walks a uniqueness-constraint index in key
+# order, so each page stops after `limit` rows instead of sorting the whole label.
+_EXPORT_SESSIONS_QUERY = """
+MATCH (s:GenerationSession) WHERE s.sessionID > $after
+WITH s ORDER BY s.sessionID LIMIT $limit
+OPTIONAL MATCH (s)-[:CREATED_BY]->(u:User)
+OPTIONAL MATCH (s)-[:USES_MODEL]->(m:AiModel)
+OPTIONAL MATCH (s)-[:USES_TEMPLATE]->(t:PromptTemplate)
+OPTIONAL MATCH (s)-[:USES_PARAMETER_SET]->(p:ParameterSet)
+WITH s, head(collect(u.userID)) AS userID, head(collect(m.modelName)) AS modelName,
+     head(collect(t.templateID)) AS templateID, head(collect(p.setID)) AS parameterSetID
+OPTIONAL MATCH (s)-[r:USES_VIBE]->(v:VibeImage)
+WITH s, userID, modelName, templateID, parameterSetID, r, v ORDER BY r.index
+RETURN s, userID, modelName, templateID, parameterSetID, [vibeID IN collect(v.vibeID) WHERE vibeID IS NOT NULL] AS vibeIDs
+ORDER BY s.sessionID
+"""
+
+_EXPORT_IMAGES_QUERY = """
+MATCH (s:GenerationSession) WHERE s.sessionID >= $afterSession
+WITH s ORDER BY s.sessionID
+CALL {
+    WITH s
+    MATCH (i:GeneratedImage)-[:GENERATED_IN]->(s)
+    WHERE s.sessionID > $afterSession OR i.imageID > $afterImage
+    RETURN i ORDER BY i.imageID
+}
+RETURN s.sessionID AS sessionID, i
+LIMIT $limit
+"""
+
+_EXPORT_IMAGE_TAGS_QUERY = """
+MATCH (i:GeneratedImage) WHERE i.imageID >= $afterImage
+WITH i ORDER BY i.imageID
+CALL {
+    WITH i
+    MATCH (i)-[:HAS_TAG]->(t:Tag)
+    WHERE i.imageID > $afterImage OR t.tagName > $afterTag
+    RETURN DISTINCT t.tagName AS tagName ORDER BY tagName
+}
+RETURN i.imageID AS imageID, tagName
+LIMIT $limit
+"""
+
+_CREATE_IMAGES_QUERY = """
+MATCH (s:GenerationSession {sessionID: $sessionId})
+WITH s
+UNWIND $rows AS row
+CREATE (i:GeneratedImage {
+    imageID: row.imageID,
+    imagePath: row.imagePath,
+    seed: row.seed,
+    actualParameters: row.actualParameters,
+    actualPromptPositive: row.actualPromptPositive,
+    actualPromptNegative: row.actualPromptNegative,
+    rating: row.rating,
+    eagleItemID: row.eagleItemID,
+    generationStatus: row.generationStatus,
+    errorMessage: row.errorMessage,
+    isVibeCandidate: row.isVibeCandidate,
+    sweepCoordinates: row.sweepCoordinates,
+    ratingStatKeys: row.ratingStatKeys,
+    sessionTimestamp: s.timestamp
+})
+SET i += row.flatParameters
+CREATE (i)-[:GENERATED_IN]->(s)
+RETURN count(i) AS count
+"""
+
+_BACKFILL_IMAGE_SESSION_TIMESTAMPS_QUERY = """
+MATCH (i:GeneratedImage)-[:GENERATED_IN]->(s:GenerationSession)
+WHERE i.sessionTimestamp IS NULL AND s.timestamp IS NOT NULL
+WITH i, s LIMIT $limit
+SET i.sessionTimestamp = s.timestamp
+RETURN count(i) AS count
+"""
+
+_MERGE_RATING_STATS_QUERY = """
+UNWIND $rows AS row
+MERGE (st:RatingStat {key: row.key})
+ON CREATE SET st += row.props, st.count = 0, st.sum = 0, st.sumSquares = 0
+SET st.count = st.count + row.count,
+    st.sum = st.sum + row.sum,
+    st.sumSquares = st.sumSquares + row.sumSquares
+RETURN count(st) AS count
+"""
+
+_UPDATE_RATINGS_QUERY = """
+UNWIND $rows AS row
+MATCH (i:GeneratedImage {imageID: row.imageID})
+// Lock the image before reading its old rating, so concurrent updates cannot both apply the same delta
+SET i.rating = coalesce(i.rating, 0)
+WITH i, row, i.rating AS old
+SET i.rating = row.rating
+WITH i, row, old
+CALL {
+    WITH i, row, old
+    UNWIND coalesce(i.ratingStatKeys, []) AS key
+    MATCH (st:RatingStat {key: key})
+    SET st.count = st.count + (CASE WHEN row.rating > 0 THEN 1 ELSE 0 END) - (CASE WHEN old > 0 THEN 1 ELSE 0 END),
+        st.sum = st.sum + row.rating - old,
+        st.sumSquares = st.sumSquares + row.rating * row.rating - old * old
+    RETURN count(st) AS touched
+}
+RETURN count(i) AS count
+"""
+
+# --- Statements and row mapping shared with AsyncNeo4jRepository ---
+
+_CREATE_VIBE_QUERY = """
+CREATE (v:VibeImage {
+    vibeID: $vibeID,
+    imagePath: $imagePath,
+    vibeType: $vibeType,
+    encodedIE: $encodedIE,
+    encodedVibePath: $encodedVibePath,
+    notes: $notes,
+    createdAt: $createdAt
+})
+RETURN v
+"""
+
+_CREATE_VIBES_QUERY = """
+UNWIND $rows AS row
+CREATE (v:VibeImage {
+    vibeID: row.vibeID,
+    imagePath: row.imagePath,
+    vibeType: row.vibeType,
+    encodedIE: row.encodedIE,
+    encodedVibePath: row.encodedVibePath,
+    notes: row.notes,
+    createdAt: row.createdAt
+})
+RETURN count(v) AS count
+"""
+
+_GET_VIBE_QUERY = """
+MATCH (v:VibeImage {vibeID: $vibeID})
+RETURN v
+"""
+
+_GET_IMAGE_QUERY = """
+MATCH (i:GeneratedImage {imageID: $imageID})
+RETURN i
+"""
+
+_LIST_ENCODED_VIBE_PATHS_QUERY = """
+MATCH (v:VibeImage)
+WHERE v.encodedVibePath IS NOT NULL
+RETURN DISTINCT v.encodedVibePath AS path
+"""
+
+_CREATE_PROMPT_TEMPLATE_QUERY = """
+CREATE (t:PromptTemplate {
+    templateID: $templateID,
+    name: $name,
+    description: $description,
+    contentPositive: $contentPositive,
+    contentNegative: $contentNegative,
+    createdAt: $createdAt
+})
+"""
+
+_CREATE_PARAMETER_SET_QUERY = """
+CREATE (p:ParameterSet {
+    setID: $setID,
+    name: $name,
+    description: $description,
+    parameters: $parameters,
+    createdAt: $createdAt
+})
+"""
+
+# Ensure User node exists (MVP assumes "default" user)
+_MERGE_USER_QUERY = """
+MERGE (u:User {userID: $userId})
+ON CREATE SET u.createdAt = datetime($createdAt)
+RETURN u
+"""
+
+# Ensure AiModel node exists
+_MERGE_AI_MODEL_QUERY = """
+MERGE (m:AiModel {modelName: $modelName})
+ON CREATE SET m.type = 'unknown' // Default type if not specified
+RETURN m
+"""
+
+# Create Session node and relationships
+_CREATE_SESSION_QUERY = """
+CREATE (s:GenerationSession {
+    sessionID: $sessionID,
+    name: $name,
+    timestamp: $timestamp,
+    baseParameters: $baseParameters,
+    basePromptPositive: $basePromptPositive,
+    basePromptNegative: $basePromptNegative,
+    notes: $notes,
+    overallStatus: $overallStatus
+})
+SET s += $flatParameters // Typed param* copies of baseParameters for indexed queries
+WITH s
+MATCH (u:User {userID: $userId})
+MATCH (m:AiModel {modelName: $modelName})
+CREATE (s)-[:CREATED_BY]->(u)
+CREATE (s)-[:USES_MODEL]->(m)
+RETURN s
+"""
+
+_GET_SESSION_QUERY = """
+MATCH (s:GenerationSession {sessionID: $sessionID})
+RETURN s
+"""
+
+_UPDATE_SESSION_STATUS_QUERY = """
+MATCH (s:GenerationSession {sessionID: $sessionID})
+SET s.overallStatus = $status
+RETURN s
+"""
+
+_LINK_SESSION_RESOURCES_QUERY = """
+MATCH (s:GenerationSession {sessionID: $sessionId})
+CALL {
+    WITH s
+    UNWIND $vibes AS vibe
+    MATCH (v:VibeImage {vibeID: vibe.vibeID})
+    MERGE (s)-[u:USES_VIBE]->(v)
+    SET u.index = vibe.index
+    RETURN count(v) AS linkedVibes
+}
+CALL {
+    WITH s
+    OPTIONAL MATCH (t:PromptTemplate {templateID: $templateId})
+    FOREACH (_ IN CASE WHEN t IS NULL THEN [] ELSE [1] END | MERGE (s)-[:USES_TEMPLATE]->(t))
+    RETURN count(t) AS linkedTemplates
+}
+CALL {
+    WITH s
+    OPTIONAL MATCH (p:ParameterSet {setID: $parameterSetId})
+    FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | MERGE (s)-[:USES_PARAMETER_SET]->(p))
+    RETURN count(p) AS linkedSets
+}
+RETURN linkedVibes, linkedTemplates, linkedSets
+"""
+
+_UPDATE_IMAGE_STATUS_QUERY = """
+MATCH (i:GeneratedImage {imageID: $imageID})
+SET i.generationStatus = $status,
+    i.errorMessage = $errorMessage
+RETURN i
+"""
+
+_UPDATE_IMAGE_STATUSES_QUERY = """
+UNWIND $rows AS row
+MATCH (i:GeneratedImage {imageID: row.imageID})
+SET i.generationStatus = row.status,
+    i.errorMessage = row.errorMessage
+RETURN count(i) AS count
+"""
+
+_RESET_RATING_STATS_QUERY = "MATCH (st:RatingStat) SET st.count = 0, st.sum = 0, st.sumSquares = 0"
+
+_REBUILD_RATING_STATS_QUERY = """
+MATCH (i:GeneratedImage)
+WHERE i.rating > 0
+UNWIND coalesce(i.ratingStatKeys, []) AS key
+WITH key, count(*) AS rated, sum(i.rating) AS total, sum(i.rating * i.rating) AS squares
+MATCH (st:RatingStat {key: key})
+SET st.count = rated, st.sum = total, st.sumSquares = squares
+RETURN count(st) AS count
+"""
+
+_ADD_TAGS_QUERY = """
+UNWIND $rows AS row
+MATCH (i:GeneratedImage {imageID: row.imageID})
+MERGE (t:Tag {tagName: row.tagName})
+MERGE (i)-[r:HAS_TAG]->(t)
+RETURN count(r) AS count
+"""
+
+_GET_IMAGE_TAGS_QUERY = """
+MATCH (:GeneratedImage {imageID: $imageID})-[:HAS_TAG]->(t:Tag)
+RETURN DISTINCT t.tagName AS tagName
+ORDER BY tagName
+"""
+
+
+def _chunks(rows: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _vibe_row(vibe_image: VibeImage) -> Dict[str, Any]:
+    vibe_data = vibe_image.model_dump() # Pydanticモデルを辞書に変換
+    # Convert datetime to string if necessary, depending on neo4j-driver's handling
+    vibe_data['createdAt'] = vibe_data['createdAt'].isoformat() # ISO 8601形式に変換
+    return vibe_data
+
+
+def _vibe_from_node(node) -> VibeImage:
+    # Map Neo4j node properties to Pydantic model
+    vibe_data = dict(node)
+    # Convert datetime string back to datetime object if necessary
+    if 'createdAt' in vibe_data and isinstance(vibe_data['createdAt'], str):
+        vibe_data['createdAt'] = datetime.fromisoformat(vibe_data['createdAt'])
+    return VibeImage(**vibe_data)
+
+
+def _session_from_node(node) -> GenerationSession:
+    session_data = dict(node)
+    if isinstance(session_data.get('timestamp'), str):
+        session_data['timestamp'] = datetime.fromisoformat(session_data['timestamp'])
+    return GenerationSession(**session_data)
+
+
+def _image_from_node(node) -> GeneratedImage:
+    image_data = dict(node)
+    if isinstance(image_data.get("actualParameters"), str):
+        image_data["actualParameters"] = json.loads(image_data["actualParameters"])
+    return GeneratedImage(**image_data)
+
+
+def _session_rows(records: List[SessionRecord]) -> List[Dict[str, Any]]:
+    """Rows of _CREATE_SESSIONS_QUERY."""
+    rows = []
+    for record in records:
+        row = record.model_dump()
+        row["timestamp"] = row["timestamp"].isoformat()
+        row["flatParameters"] = flatten_parameters_json(row["baseParameters"])
+        row["vibes"] = [{"vibeID": vibe_id, "index": index} for index, vibe_id in enumerate(record.vibeIDs)]
+        rows.append(row)
+    return rows
+
+
+def _image_rows(images: List[GeneratedImage], context) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Rows of _CREATE_IMAGES_QUERY and _MERGE_RATING_STATS_QUERY for images of
+    the session whose _SESSION_RATING_CONTEXT_QUERY record is context.
+    """
+    vibes = context["vibes"] if context is not None else []
+    template_id = context["templateID"] if context is not None else None
+    set_id = context["setID"] if context is not None else None
+
+    rows, stats = [], {}
+    for image in images:
+        row = image.model_dump()
+        # Nested maps are not valid property values: keep the full payload as JSON for
+        # reproducibility, plus typed param* properties for indexed queries
+        row["actualParameters"] = json.dumps(image.actualParameters, sort_keys=True, ensure_ascii=False)
+        row["flatParameters"] = flatten_parameters(image.actualParameters)
+        stat_rows = rating_stat_rows(image.actualParameters, vibes, template_id, set_id)
+        row["ratingStatKeys"] = [stat["key"] for stat in stat_rows]
+        rows.append(row)
+        rated = image.rating > 0
+        for stat in stat_rows:
+            # Buckets are created even for unrated images, so later rating updates only need MATCH
+            entry = stats.setdefault(stat["key"], dict(stat, count=0, sum=0, sumSquares=0))
+            if rated:
+                entry["count"] += 1
+                entry["sum"] += image.rating
+                entry["sumSquares"] += image.rating * image.rating
+    return rows, list(stats.values())
+
+
+def _rating_rows(ratings: Dict[str, int]) -> List[Dict[str, Any]]:
+    for image_id, rating in ratings.items():
+        if not (0 <= rating <= 5):
+            raise ValueError(f"Rating must be between 0 and 5 (image {image_id}: {rating}).")
+    return [{"imageID": image_id, "rating": rating} for image_id, rating in ratings.items()]
+
+
+def _rating_stats_query(where: str) -> str:
+    return f"""
+    MATCH (st:RatingStat)
+    WHERE {where} AND st.count >= $minCount
+    RETURN st
+    ORDER BY toFloat(st.sum) / st.count DESC, st.count DESC
+    LIMIT $limit
+    """
+
+
+def _vibe_buckets_filter(vibe_id: str, parameter: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """WHERE clause and parameters of best_vibe_parameter_buckets."""
+    where = "st.vibeID = $vibeId" + (" AND st.parameter = $parameter" if parameter is not None else "")
+    return where, {"vibeId": vibe_id, "parameter": parameter}
+
+
+def _template_sets_filter(template_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """WHERE clause and parameters of best_template_parameter_sets."""
+    where = "st.kind = 'template_parameter_set'" + (" AND st.templateID = $templateId" if template_id is not None else "")
+    return where, {"templateId": template_id}
+
+
+def _fulltext_query(kind: str) -> str:
+    """Statement querying the full-text index of kind (see _FULLTEXT_INDEXES)."""
+    _, id_property, title, snippet = _FULLTEXT_INDEXES[kind]
+    return f"""
+    CALL db.index.fulltext.queryNodes($index, $query, {{limit: $limit}}) YIELD node, score
+    RETURN node.{id_property} AS id, {title} AS title, {snippet} AS snippet, score
+    """
+
+
+def _search_hits(kind: str, records) -> List[SearchHit]:
+    return [SearchHit(kind=kind, id=record["id"], title=record["title"] or record["id"], snippet=record["snippet"],
+                      score=record["score"])
+            for record in records]
+
+
+def _node_page_query(label: str, key: str) -> str:
+    return f"""
+    MATCH (n:{label}) WHERE n.{key} > $after
+    RETURN n ORDER BY n.{key} LIMIT $limit
+    """
+
+
+def _session_record_from_record(record) -> SessionRecord:
+    """SessionRecord from a _EXPORT_SESSIONS_QUERY record."""
+    return SessionRecord(**dict(record["s"]), userID=record["userID"], modelName=record["modelName"], vibeIDs=record["vibeIDs"],
+                         templateID=record["templateID"], parameterSetID=record["parameterSetID"])
+
+
+def _image_query_statement(query: ImageQuery, limit: int, cursor: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """Cypher and parameters of a query_images page (limit + 1 rows, to tell whether another page exists)."""
+    order_keys = _IMAGE_ORDER_KEYS[query.orderBy]
+
+    params: Dict[str, Any] = {"limit": limit + 1}
+    # Start from the Tag index when tags are given: far fewer images carry a tag than exist
+    matches = []
+    for index, tag_name in enumerate(query.tags):
+        matches.append(f"MATCH (i:GeneratedImage)-[:HAS_TAG]->(:Tag {{tagName: $tag{index}}})")
+        params[f"tag{index}"] = tag_name
+    session_pattern = "(s:GenerationSession {sessionID: $sessionID})" if query.sessionID else "(s:GenerationSession)"
+    matches.append(f"MATCH (i:GeneratedImage)-[:GENERATED_IN]->{session_pattern}")
+    if query.sessionID:
+        params["sessionID"] = query.sessionID
+
+    # IS NOT NULL on the leading sort key lets the planner read it in index order
+    conditions = [f"{order_keys[0]} IS NOT NULL"]
+    if query.minRating is not None:
+        conditions.append("i.rating >= $minRating")
+        params["minRating"] = query.minRating
+    if query.maxRating is not None:
+        conditions.append("i.rating <= $maxRating")
+        params["maxRating"] = query.maxRating
+    if query.generationStatus is not None:
+        conditions.append("i.generationStatus = $generationStatus")
+        params["generationStatus"] = query.generationStatus
+    for index, (name, (low, high)) in enumerate(sorted(query.parameterRanges.items())):
+        prop = parameter_property(name)
+        if low is not None:
+            conditions.append(f"i.{prop} >= $paramMin{index}")
+            params[f"paramMin{index}"] = low
+        if high is not None:
+            conditions.append(f"i.{prop} <= $paramMax{index}")
+            params[f"paramMax{index}"] = high
+    for index, (name, value) in enumerate(sorted(query.parameterEquals.items())):
+        conditions.append(f"i.{parameter_property(name)} = $paramEq{index}")
+        params[f"paramEq{index}"] = value
+    # Session timestamps are stored as ISO 8601 strings, which sort chronologically
+    if query.sessionsSince is not None:
+        conditions.append("s.timestamp >= $sessionsSince")
+        params["sessionsSince"] = query.sessionsSince.isoformat()
+    if query.sessionsUntil is not None:
+        conditions.append("s.timestamp < $sessionsUntil")
+        params["sessionsUntil"] = query.sessionsUntil.isoformat()
+    order_by = ", ".join(f"{key} DESC" for key in order_keys)
+    if cursor is not None:
+        for index, value in enumerate(decode_cursor(cursor, query.orderBy)):
+            params[f"cursor{index}"] = value
+        if query.orderBy == "rating":
+            return _rating_page_statement("\n".join(matches), conditions, order_by), params
+        conditions.append(_after_cursor_condition(order_keys))
+
+    cypher = "\n".join(matches) + f"""
+    WHERE {" AND ".join(conditions)}
+    RETURN i, s.sessionID AS sessionID, s.timestamp AS sessionTimestamp
+    ORDER BY {order_by}
+    LIMIT $limit
+    """
+    return cypher, params
+
+
+def _rating_page_statement(match: str, conditions: List[str], order_by: str) -> str:
+    """
+    Statement of a rating-ordered page after a cursor. Ratings take six
+    values, so a single "after the cursor" predicate would make the index scan
+    step over every image of the cursor's rating that came before it. The
+    page is instead the union of two seeks on index_image_rating_order, each
+    starting at the cursor: the rest of the cursor's rating (equality on
+    rating, range on sessionTimestamp) and the lower ratings.
+    """
+    same_rating = conditions + [
+        "i.rating = $cursor0",
+        "i.sessionTimestamp <= $cursor1",
+        "(i.sessionTimestamp < $cursor1 OR i.imageID < $cursor2)",
+    ]
+    lower_ratings = conditions + ["i.rating < $cursor0"]
+    same_rating_branch, lower_ratings_branch = (
+        f"""{match}
+    WHERE {" AND ".join(branch)}
+    RETURN i, s
+    ORDER BY {order_by}
+    LIMIT $limit"""
+        for branch in (same_rating, lower_ratings)
+    )
+    return f"""
+    CALL {{
+    {same_rating_branch}
+    UNION ALL
+    {lower_ratings_branch}
+    }}
+    RETURN i, s.sessionID AS sessionID, s.timestamp AS sessionTimestamp
+    ORDER BY {order_by}
+    LIMIT $limit
+    """
+
+
+def _image_page(records: List[Any], query: ImageQuery, limit: int) -> ImagePage:
+    """ImagePage of the records of an _image_query_statement."""
+    page = ImagePage()
+    for record in records[:limit]:
+        image = _image_from_node(record["i"])
+        page.images.append(image)
+        page.sessionIDs[image.imageID] = record["sessionID"]
+    if len(records) > limit:
+        last = records[limit - 1]
+        # i.sessionTimestamp is a copy of s.timestamp
+        values = {"s.timestamp": last["sessionTimestamp"], "i.sessionTimestamp": last["sessionTimestamp"],
+                  "i.imageID": last["i"]["imageID"], "i.rating": last["i"]["rating"]}
+        page.nextCursor = encode_cursor(query.orderBy, [values[key] for key in _IMAGE_ORDER_KEYS[query.orderBy]])
+    return page
+
+class Neo4jRepository(Repository):
     # Modify the constructor to accept connection details
-    def __init__(self, uri: str, user: str, password: str):
+    def __init__(self, uri: str, user: str, password: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_connection_pool_size: int = 100, connection_acquisition_timeout: float = 60.0,
+                 max_connection_lifetime: float = 3600.0, fetch_size: int = 1000,
+                 cache_size: int = 1024, cache_ttl: float = 60.0, slow_query_threshold: Optional[float] = 0.5,
+                 profile_slow_queries: bool = False, slow_query_log_size: int = 100):
+        """
+        Args:
+            batch_size: Rows per UNWIND statement in the batch write methods.
+            max_connection_pool_size: Maximum pooled connections (driver default 100).
+            connection_acquisition_timeout: Seconds to wait for a free pooled connection before failing.
+            max_connection_lifetime: Seconds after which a pooled connection is closed and replaced.
+            fetch_size: Records fetched per batch when streaming query results.
+            cache_size: Entries kept by the read-through cache of get_vibe, get_session
+                and get_image_tags (0 disables it).
+            cache_ttl: Seconds a cached entry is served before it is re-read.
+            slow_query_threshold: Server-side seconds (result available + consumed) from
+                which a statement is kept in slow_queries() (None disables the log).
+            profile_slow_queries: Run every statement with PROFILE so slow ones keep their
+                execution plan (costs extra server work; for investigations).
+            slow_query_log_size: Slow statements kept (the oldest are dropped).
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self._batch_size = batch_size
+        self._metrics = PoolMetrics(max_pool_size=max_connection_pool_size, slow_query_threshold=slow_query_threshold,
+                                    slow_query_log_size=slow_query_log_size)
+        self._profile_slow_queries = profile_slow_queries
+        # Writes made through this repository invalidate the affected entries;
+        # writes from other processes become visible after cache_ttl.
+        self._cache = LRUCache(max_entries=cache_size, ttl_seconds=cache_ttl)
         self._driver = None
         try:
-            self._driver = neo4j.GraphDatabase.driver(uri, auth=(user, password))
+            self._driver = neo4j.GraphDatabase.driver(
+                uri, auth=(user, password),
+                max_connection_pool_size=max_connection_pool_size,
+                connection_acquisition_timeout=connection_acquisition_timeout,
+                max_connection_lifetime=max_connection_lifetime,
+                fetch_size=fetch_size,
+            )
             # logger.info("Neo4j driver created successfully")
         except Exception as e:
             # logger.error("Failed to create Neo4j driver", error=e)
             raise ConnectionError(f"Failed to connect to Neo4j: {e}")
 
+    @classmethod
+    def from_settings(cls, database: "DatabaseSettings") -> "Neo4jRepository":
+        """Build a repository from grid.config's DatabaseSettings (settings.database)."""
+        return cls(
+            database.neo4j_uri, database.neo4j_user, database.neo4j_password,
+            batch_size=database.neo4j_batch_size,
+            max_connection_pool_size=database.neo4j_max_connection_pool_size,
+            connection_acquisition_timeout=database.neo4j_connection_acquisition_timeout,
+            max_connection_lifetime=database.neo4j_max_connection_lifetime,
+            fetch_size=database.neo4j_fetch_size,
+            cache_size=database.neo4j_cache_size,
+            cache_ttl=database.neo4j_cache_ttl,
+            slow_query_threshold=database.neo4j_slow_query_threshold,
+            profile_slow_queries=database.neo4j_profile_slow_queries,
+        )
+
+    def _session(self) -> InstrumentedSession:
+        """A driver session whose transactions are recorded in pool_metrics()."""
+        return InstrumentedSession(self._driver.session(), self._metrics, profile=self._profile_slow_queries)
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        """
+        Connection pool and query metrics since creation (or reset_pool_metrics):
+        pool acquisition wait histogram, in-use/peak sessions and, per query
+        (keyed by method, e.g. "create_generated_images"), a latency histogram,
+        the server-side time of its statements and their update counters
+        (nodes_created, relationships_created, properties_set, ...).
+        """
+        return self._metrics.snapshot()
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """
+        Statements whose server-side time reached slow_query_threshold, oldest
+        first: method, statement text, parameter names, timings, counters and,
+        with profile_slow_queries, the PROFILE plan and its total db hits.
+        """
+        return self._metrics.slow_queries()
+
+    def dump_query_metrics(self, path: str):
+        """Write pool_metrics() and slow_queries() to path as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"metrics": self.pool_metrics(), "slow_queries": self.slow_queries()}, f, indent=2, default=str)
+
+    def reset_pool_metrics(self):
+        """Also clears the slow query log."""
+        self._metrics.reset()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Read-through cache counters (hits, misses, evictions, expirations, invalidations, size, hit_rate)."""
+        return self._cache.stats()
+
+    def clear_cache(self):
+        self._cache.clear()
+
     def close_connection(self):
         if self._driver:
             self._driver.close()
@@ -37,46 +775,90 @@ class Neo4jRepository:
             # logger.error("Neo4j connection verification failed", error=e)
             return False
 
+    @staticmethod
+    def _run_chunks(tx, query: str, chunks: Iterable[List[Dict[str, Any]]], **params: Any) -> int:
+        """Run an UNWIND query per chunk inside tx and sum the returned counts."""
+        total = 0
+        for chunk in chunks:
+            record = tx.run(query, rows=chunk, **params).single()
+            total += record["count"] if record is not None else 0
+        return total
+
+    def _write_batched(self, label: str, query: str, rows: List[Dict[str, Any]], batch_size: Optional[int] = None, **params: Any) -> int:
+        """
+        Run a parameterised `UNWIND $rows AS row ...` query once per chunk of
+        rows, all chunks inside a single write transaction, so the batch is
+        written completely or not at all. `params` are passed to every chunk.
+        The query must return `count(...) AS count`. `label` names the query
+        in pool_metrics().
+
+        Returns:
+            The sum of the counts returned by each chunk.
+        """
+        def _batch_tx(tx, chunks):
+            return self._run_chunks(tx, query, chunks, **params)
+        _batch_tx.__qualname__ = f"{label}.<locals>._batch_tx" # Label for pool_metrics()
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+        if not rows:
+            return 0
+        size = batch_size or self._batch_size
+        with self._session() as session:
+            return session.execute_write(_batch_tx, list(_chunks(rows, size)))
+
     def create_vibe(self, vibe_image: VibeImage):
         def _create_vibe_tx(tx, vibe_data):
-            query = """
-            CREATE (v:VibeImage {
-                vibeID: $vibeID,
-                imagePath: $imagePath,
-                vibeType: $vibeType,
-                encodedIE: $encodedIE,
-                encodedVibePath: $encodedVibePath,
-                notes: $notes,
-                createdAt: $createdAt
-            })
-            RETURN v
-            """
-            result = tx.run(query, vibe_data)
+            result = tx.run(_CREATE_VIBE_QUERY, vibe_data)
             return result.single() is not None # 成功すれば結果が返る
 
         if not self._driver:
             # logger.error("Driver is not initialized.")
             raise ConnectionError("Database driver is not initialized.")
 
-        vibe_data = vibe_image.model_dump() # Pydanticモデルを辞書に変換
-        # Convert datetime to string if necessary, depending on neo4j-driver's handling
-        vibe_data['createdAt'] = vibe_data['createdAt'].isoformat() # ISO 8601形式に変換
+        vibe_data = _vibe_row(vibe_image)
 
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 session.execute_write(_create_vibe_tx, vibe_data)
             # logger.info("Vibe node created successfully", vibe_id=vibe_image.vibeID)
         except Exception as e:
             # logger.error("Failed to create vibe node", vibe_id=vibe_image.vibeID, error=e)
             raise RuntimeError(f"Failed to create vibe node {vibe_image.vibeID}: {e}")
+        finally:
+            self._cache.invalidate(("vibe", vibe_image.vibeID))
+
+    def create_vibes(self, vibe_images: List[VibeImage], batch_size: Optional[int] = None) -> int:
+        """
+        Create many VibeImage nodes with UNWIND, batch_size rows per statement,
+        in a single transaction. Either all nodes are written or none are.
+
+        Returns:
+            The number of nodes created.
+        """
+        rows = [_vibe_row(vibe_image) for vibe_image in vibe_images]
+
+        try:
+            created = self._write_batched("create_vibes", _CREATE_VIBES_QUERY, rows, batch_size)
+            # logger.info("Vibe nodes created successfully", count=created)
+            return created
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create vibe nodes", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to create {len(rows)} vibe nodes: {e}")
+        finally:
+            for row in rows:
+                self._cache.invalidate(("vibe", row["vibeID"]))
 
     def get_vibe(self, vibe_id: str) -> Optional[VibeImage]:
+        """Read-through cached (see cache_stats); missing vibes are not cached."""
+        cached = self._cache.get(("vibe", vibe_id))
+        if cached is not None:
+            return cached.model_copy(deep=True)
+
         def _get_vibe_tx(tx, vibe_id):
-            query = """
-            MATCH (v:VibeImage {vibeID: $vibeID})
-            RETURN v
-            """
-            result = tx.run(query, vibeID=vibe_id)
+            result = tx.run(_GET_VIBE_QUERY, vibeID=vibe_id)
             return result.single()
 
         if not self._driver:
@@ -84,18 +866,13 @@ class Neo4jRepository:
             raise ConnectionError("Database driver is not initialized.")
 
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 record = session.execute_read(_get_vibe_tx, vibe_id)
 
             if record:
-                node = record["v"]
-                # Map Neo4j node properties to Pydantic model
-                vibe_data = dict(node)
-                # Convert datetime string back to datetime object if necessary
-                if 'createdAt' in vibe_data and isinstance(vibe_data['createdAt'], str):
-                     vibe_data['createdAt'] = datetime.fromisoformat(vibe_data['createdAt'])
-
-                return VibeImage(**vibe_data)
+                vibe = _vibe_from_node(record["v"])
+                self._cache.put(("vibe", vibe_id), vibe.model_copy(deep=True))
+                return vibe
             else:
                 # logger.info("Vibe node not found", vibe_id=vibe_id)
                 return None
@@ -103,45 +880,157 @@ class Neo4jRepository:
             # logger.error("Failed to get vibe node", vibe_id=vibe_id, error=e)
             raise RuntimeError(f"Failed to get vibe node {vibe_id}: {e}")
 
+    def get_image(self, image_id: str) -> Optional[GeneratedImage]:
+        def _get_image_tx(tx, image_id):
+            return tx.run(_GET_IMAGE_QUERY, imageID=image_id).single()
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                record = session.execute_read(_get_image_tx, image_id)
+        except Exception as e:
+            # logger.error("Failed to get GeneratedImage node", image_id=image_id, error=e)
+            raise RuntimeError(f"Failed to get GeneratedImage node {image_id}: {e}")
+        return _image_from_node(record["i"]) if record else None
+
+    def query_images(self, query: Optional[ImageQuery] = None, limit: int = 50, cursor: Optional[str] = None) -> ImagePage:
+        """
+        Browse GeneratedImage nodes by session, rating, status, tags,
+        generation parameters and session time, one page at a time.
+
+        Pagination is keyset-based: the page ends with a cursor holding the
+        sort key of its last image, and the next page starts strictly after
+        that key instead of skipping rows, so every page costs the same no
+        matter how deep it is. Filters and ordering use the indexed
+        properties (Tag.tagName, GeneratedImage.rating/generationStatus and
+        param* properties, GenerationSession.timestamp). The rating order is
+        served by the composite (rating, sessionTimestamp, imageID) index;
+        images created before sessionTimestamp existed need
+        backfill_image_session_timestamps() to appear in it.
+
+        Args:
+            query: Filters and order (newest sessions first by default).
+            limit: Page size (1-MAX_PAGE_SIZE).
+            cursor: ImagePage.nextCursor of the previous page, None for the first page.
+
+        Returns:
+            The page; nextCursor is None on the last page.
+        """
+        query = query or ImageQuery()
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+        cypher, params = _image_query_statement(query, limit, cursor)
+
+        def _query_images_tx(tx):
+            return list(tx.run(cypher, **params))
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                records = session.execute_read(_query_images_tx)
+        except Exception as e:
+            # logger.error("Failed to query images", error=e)
+            raise RuntimeError(f"Failed to query images: {e}")
+
+        page = _image_page(records, query, limit)
+        # logger.info("Images queried", num_images=len(page.images), has_more=page.nextCursor is not None)
+        return page
+
+    def list_encoded_vibe_paths(self) -> List[str]:
+        """
+        Return the encodedVibePath of every VibeImage node (used to garbage-collect the vibe cache).
+        """
+        def _list_paths_tx(tx):
+            result = tx.run(_LIST_ENCODED_VIBE_PATHS_QUERY)
+            return [record["path"] for record in result]
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                return session.execute_read(_list_paths_tx)
+        except Exception as e:
+            # logger.error("Failed to list encoded vibe paths", error=e)
+            raise RuntimeError(f"Failed to list encoded vibe paths: {e}")
+
+    def create_prompt_template(self, template: PromptTemplate):
+        def _create_template_tx(tx, template_data):
+            tx.run(_CREATE_PROMPT_TEMPLATE_QUERY, template_data)
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        template_data = template.model_dump()
+        template_data['createdAt'] = template_data['createdAt'].isoformat() # ISO 8601形式に変換
+        try:
+            with self._session() as session:
+                session.execute_write(_create_template_tx, template_data)
+            # logger.info("PromptTemplate node created successfully", template_id=template.templateID)
+        except Exception as e:
+            # logger.error("Failed to create PromptTemplate node", template_id=template.templateID, error=e)
+            raise RuntimeError(f"Failed to create PromptTemplate node {template.templateID}: {e}")
+
+    def create_parameter_set(self, parameter_set: ParameterSet):
+        def _create_parameter_set_tx(tx, set_data):
+            tx.run(_CREATE_PARAMETER_SET_QUERY, set_data)
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        set_data = parameter_set.model_dump()
+        set_data['createdAt'] = set_data['createdAt'].isoformat() # ISO 8601形式に変換
+        try:
+            with self._session() as session:
+                session.execute_write(_create_parameter_set_tx, set_data)
+            # logger.info("ParameterSet node created successfully", set_id=parameter_set.setID)
+        except Exception as e:
+            # logger.error("Failed to create ParameterSet node", set_id=parameter_set.setID, error=e)
+            raise RuntimeError(f"Failed to create ParameterSet node {parameter_set.setID}: {e}")
+
+    def search_text(self, text: str, kinds: List[str], limit: int) -> List[SearchHit]:
+        """
+        Query the full-text index of each kind (see _FULLTEXT_INDEXES) with
+        one read transaction; Lucene ranks the hits and stops at limit.
+        """
+        unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown search kinds: {unknown}.")
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        terms = search_terms(text)
+        if not terms or not kinds:
+            return []
+        lucene_query = _lucene_query(terms)
+
+        def _search_tx(tx):
+            hits = []
+            for kind in kinds:
+                parameters = {"index": _FULLTEXT_INDEXES[kind][0], "query": lucene_query, "limit": limit}
+                hits.extend(_search_hits(kind, tx.run(_fulltext_query(kind), parameters)))
+            return hits
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                return session.execute_read(_search_tx)
+        except Exception as e:
+            # logger.error("Full-text search failed", text=text, kinds=kinds, error=e)
+            raise RuntimeError(f"Full-text search for {text!r} failed: {e}")
+
     def create_session(self, session: GenerationSession, user_id: str, model_name: str):
         def _create_session_tx(tx, session_data, user_id, model_name):
-            # Ensure User node exists (MVP assumes "default" user)
-            create_user_query = """
-            MERGE (u:User {userID: $userId})
-            ON CREATE SET u.createdAt = datetime($createdAt)
-            RETURN u
-            """
-            tx.run(create_user_query, userId=user_id, createdAt=datetime.now().isoformat())
-
-            # Ensure AiModel node exists
-            create_model_query = """
-            MERGE (m:AiModel {modelName: $modelName})
-            ON CREATE SET m.type = 'unknown' // Default type if not specified
-            RETURN m
-            """
-            tx.run(create_model_query, modelName=model_name)
-
-            # Create Session node and relationships
-            create_session_query = """
-            CREATE (s:GenerationSession {
-                sessionID: $sessionID,
-                name: $name,
-                timestamp: $timestamp,
-                baseParameters: $baseParameters,
-                basePromptPositive: $basePromptPositive,
-                basePromptNegative: $basePromptNegative,
-                notes: $notes,
-                overallStatus: $overallStatus
-            })
-            WITH s
-            MATCH (u:User {userID: $userId})
-            MATCH (m:AiModel {modelName: $modelName})
-            CREATE (s)-[:CREATED_BY]->(u)
-            CREATE (s)-[:USES_MODEL]->(m)
-            RETURN s
-            """
+            tx.run(_MERGE_USER_QUERY, userId=user_id, createdAt=datetime.now().isoformat())
+            tx.run(_MERGE_AI_MODEL_QUERY, modelName=model_name)
             session_data['timestamp'] = session_data['timestamp'].isoformat() # Convert datetime
-            tx.run(create_session_query, **session_data, userId=user_id, modelName=model_name)
+            tx.run(_CREATE_SESSION_QUERY, **session_data, userId=user_id, modelName=model_name,
+                   flatParameters=flatten_parameters_json(session_data['baseParameters']))
 
         if not self._driver:
             raise ConnectionError("Database driver is not initialized.")
@@ -150,84 +1039,276 @@ class Neo4jRepository:
 
         try:
             # Change session variable name to avoid shadowing
-            with self._driver.session() as neo4j_session:
+            with self._session() as neo4j_session:
                 neo4j_session.execute_write(_create_session_tx, session_data, user_id, model_name)
             # logger.info("Session node created successfully", session_id=session.sessionID)
         except Exception as e:
             # logger.error("Failed to create session node", session_id=session.sessionID, error=e)
             raise RuntimeError(f"Failed to create session node {session.sessionID}: {e}")
+        finally:
+            self._cache.invalidate(("session", session.sessionID))
 
-    def create_generated_image(self, image: GeneratedImage, session_id: str):
-        def _create_image_tx(tx, image_data, session_id):
-            # Create GeneratedImage node
-            create_image_query = """
-            CREATE (i:GeneratedImage {
-                imageID: $imageID,
-                imagePath: $imagePath,
-                seed: $seed,
-                actualParameters: $actualParameters,
-                actualPromptPositive: $actualPromptPositive,
-                actualPromptNegative: $actualPromptNegative,
-                rating: $rating,
-                eagleItemID: $eagleItemID,
-                generationStatus: $generationStatus,
-                errorMessage: $errorMessage,
-                isVibeCandidate: $isVibeCandidate
-            })
-            WITH i
-            MATCH (s:GenerationSession {sessionID: $sessionId})
-            CREATE (i)-[:GENERATED_IN]->(s)
-            RETURN i
-            """
-            # Convert actualParameters dict to string if necessary, depending on neo4j-driver
-            # Neo4j driver should handle dicts directly for Map type
-            tx.run(create_image_query, **image_data, sessionId=session_id)
+    def get_session(self, session_id: str) -> Optional[GenerationSession]:
+        """Read-through cached (see cache_stats); missing sessions are not cached."""
+        cached = self._cache.get(("session", session_id))
+        if cached is not None:
+            return cached.model_copy(deep=True)
+
+        def _get_session_tx(tx, session_id):
+            return tx.run(_GET_SESSION_QUERY, sessionID=session_id).single()
 
         if not self._driver:
             raise ConnectionError("Database driver is not initialized.")
 
-        image_data = image.model_dump()
+        try:
+            with self._session() as session:
+                record = session.execute_read(_get_session_tx, session_id)
+        except Exception as e:
+            # logger.error("Failed to get session node", session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to get session node {session_id}: {e}")
+
+        if not record:
+            # logger.info("Session node not found", session_id=session_id)
+            return None
+        generation_session = _session_from_node(record["s"])
+        self._cache.put(("session", session_id), generation_session.model_copy(deep=True))
+        return generation_session
+
+    def update_session_status(self, session_id: str, status: str):
+        """
+        Update the overallStatus of a GenerationSession node
+        ('pending', 'running', 'completed', 'partially_failed', 'failed').
+        """
+        def _update_status_tx(tx, session_id, status):
+            tx.run(_UPDATE_SESSION_STATUS_QUERY, sessionID=session_id, status=status)
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                session.execute_write(_update_status_tx, session_id, status)
+            # logger.info("Session status updated", session_id=session_id, status=status)
+        except Exception as e:
+            # logger.error("Failed to update session status", session_id=session_id, status=status, error=e)
+            raise RuntimeError(f"Failed to update status for session {session_id}: {e}")
+        finally:
+            self._cache.invalidate(("session", session_id))
+
+    def link_session_resources(self, session_id: str, vibe_ids: Optional[List[str]] = None, template_id: Optional[str] = None,
+                               parameter_set_id: Optional[str] = None):
+        """
+        Record which library resources a session used: (s)-[:USES_VIBE {index}]->(v)
+        in reference_*_multiple order, (s)-[:USES_TEMPLATE]->(t) and
+        (s)-[:USES_PARAMETER_SET]->(p). Call before creating the session's
+        images; their rating aggregates are keyed by these resources.
+        """
+        def _link_resources_tx(tx, session_id, vibes, template_id, parameter_set_id):
+            tx.run(_LINK_SESSION_RESOURCES_QUERY, sessionId=session_id, vibes=vibes, templateId=template_id, parameterSetId=parameter_set_id)
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        vibes = [{"vibeID": vibe_id, "index": index} for index, vibe_id in enumerate(vibe_ids or [])]
+        try:
+            with self._session() as session:
+                session.execute_write(_link_resources_tx, session_id, vibes, template_id, parameter_set_id)
+            # logger.info("Session resources linked", session_id=session_id, num_vibes=len(vibes))
+        except Exception as e:
+            # logger.error("Failed to link session resources", session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to link resources to session {session_id}: {e}")
+
+    def _create_images_in_tx(self, tx, images: List[GeneratedImage], session_id: str, batch_size: int) -> int:
+        """Create image nodes and fold their ratings into the RatingStat buckets, inside tx."""
+        context = tx.run(_SESSION_RATING_CONTEXT_QUERY, sessionId=session_id).single()
+        if context is None:
+            # _CREATE_IMAGES_QUERY would MATCH no session and silently create nothing
+            raise ValueError(f"Session {session_id} does not exist.")
+        rows, stats = _image_rows(images, context)
+        created = self._run_chunks(tx, _CREATE_IMAGES_QUERY, _chunks(rows, batch_size), sessionId=session_id)
+        self._run_chunks(tx, _MERGE_RATING_STATS_QUERY, _chunks(stats, batch_size))
+        return created
+
+    def create_generated_image(self, image: GeneratedImage, session_id: str):
+        """
+        Create a GeneratedImage node linked to its session and register it in
+        the rating aggregates (see _SESSION_RATING_CONTEXT_QUERY).
+        """
+        def _create_image_tx(tx, image, session_id):
+            return self._create_images_in_tx(tx, [image], session_id, self._batch_size)
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
 
         try:
-            with self._driver.session() as session:
-                session.execute_write(_create_image_tx, image_data, session_id)
+            with self._session() as session:
+                session.execute_write(_create_image_tx, image, session_id)
             # logger.info("GeneratedImage node created successfully", image_id=image.imageID, session_id=session_id)
         except Exception as e:
             # logger.error("Failed to create GeneratedImage node", image_id=image.imageID, session_id=session_id, error=e)
             raise RuntimeError(f"Failed to create GeneratedImage node {image.imageID} for session {session_id}: {e}")
 
+    def create_generated_images(self, images: List[GeneratedImage], session_id: str, batch_size: Optional[int] = None) -> int:
+        """
+        Batch counterpart of create_generated_image: create GeneratedImage nodes
+        linked to one session, batch_size rows per UNWIND statement, in a single
+        transaction.
+
+        Returns:
+            The number of nodes created.
+        """
+        def _create_images_tx(tx, images, session_id):
+            return self._create_images_in_tx(tx, images, session_id, batch_size or self._batch_size)
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+        if not images:
+            return 0
+
+        try:
+            with self._session() as session:
+                created = session.execute_write(_create_images_tx, list(images), session_id)
+            # logger.info("GeneratedImage nodes created successfully", session_id=session_id, count=created)
+            return created
+        except Exception as e:
+            # logger.error("Failed to create GeneratedImage nodes", session_id=session_id, count=len(images), error=e)
+            raise RuntimeError(f"Failed to create {len(images)} GeneratedImage nodes for session {session_id}: {e}")
+
+    def flatten_stored_parameters(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        One-time backfill of the typed param* properties on images and
+        sessions created before they existed. Nodes are walked in ID order,
+        batch_size per transaction; payloads are re-stored as JSON strings.
+        Safe to re-run.
+
+        Returns:
+            {"images": n, "sessions": n} nodes updated.
+        """
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        size = batch_size or self._batch_size
+        targets = {
+            "images": ("GeneratedImage", "imageID", "actualParameters"),
+            "sessions": ("GenerationSession", "sessionID", "baseParameters"),
+        }
+        updated = {}
+        for target, (label, key, payload_property) in targets.items():
+            read_query = f"""
+            MATCH (n:{label})
+            WHERE n.{key} > $after
+            RETURN n.{key} AS id, n.{payload_property} AS payload
+            ORDER BY n.{key}
+            LIMIT $limit
+            """
+            write_query = f"""
+            UNWIND $rows AS row
+            MATCH (n:{label} {{{key}: row.id}})
+            SET n += row.flat, n.{payload_property} = row.payload
+            RETURN count(n) AS count
+            """
+
+            def _flatten_batch_tx(tx, after):
+                records = list(tx.run(read_query, after=after, limit=size))
+                rows = []
+                for record in records:
+                    payload = record["payload"]
+                    if isinstance(payload, dict): # Legacy map-valued payload
+                        payload = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+                    rows.append({"id": record["id"], "payload": payload, "flat": flatten_parameters_json(payload)})
+                self._run_chunks(tx, write_query, [rows] if rows else [])
+                return records[-1]["id"] if records else None, len(rows)
+
+            count, after = 0, ""
+            try:
+                with self._session() as session:
+                    while True:
+                        after, done = session.execute_write(_flatten_batch_tx, after)
+                        count += done
+                        if after is None:
+                            break
+            except Exception as e:
+                # logger.error("Failed to flatten stored parameters", target=target, updated=count, error=e)
+                raise RuntimeError(f"Failed to flatten stored parameters of {target} after updating {count}: {e}")
+            updated[target] = count
+        # logger.info("Stored parameters flattened", **updated)
+        # Session payloads were re-stored; drop everything rather than track which
+        self._cache.clear()
+        return updated
+
+    def backfill_image_session_timestamps(self, batch_size: Optional[int] = None) -> int:
+        """
+        One-time backfill of GeneratedImage.sessionTimestamp (the copy of its
+        session's timestamp the rating order is indexed on) for images created
+        before it existed, batch_size per transaction. Safe to re-run.
+
+        Returns:
+            The number of images updated.
+        """
+        def _backfill_batch_tx(tx, limit):
+            return tx.run(_BACKFILL_IMAGE_SESSION_TIMESTAMPS_QUERY, limit=limit).single()["count"]
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        size = batch_size or self._batch_size
+        count = 0
+        try:
+            with self._session() as session:
+                while True:
+                    done = session.execute_write(_backfill_batch_tx, size)
+                    count += done
+                    if done < size:
+                        break
+        except Exception as e:
+            # logger.error("Failed to backfill image session timestamps", updated=count, error=e)
+            raise RuntimeError(f"Failed to backfill image session timestamps after updating {count}: {e}")
+        # logger.info("Image session timestamps backfilled", updated=count)
+        return count
+
     def update_image_status(self, image_id: str, status: str, error_message: Optional[str] = None):
         def _update_status_tx(tx, image_id, status, error_message):
-            update_query = """
-            MATCH (i:GeneratedImage {imageID: $imageID})
-            SET i.generationStatus = $status,
-                i.errorMessage = $errorMessage
-            RETURN i
-            """
-            tx.run(update_query, imageID=image_id, status=status, errorMessage=error_message)
+            tx.run(_UPDATE_IMAGE_STATUS_QUERY, imageID=image_id, status=status, errorMessage=error_message)
 
         if not self._driver:
             raise ConnectionError("Database driver is not initialized.")
 
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 session.execute_write(_update_status_tx, image_id, status, error_message)
             # logger.info("GeneratedImage status updated", image_id=image_id, status=status)
         except Exception as e:
             # logger.error("Failed to update GeneratedImage status", image_id=image_id, status=status, error=e)
             raise RuntimeError(f"Failed to update status for image {image_id}: {e}")
 
+    def update_image_statuses(self, updates: List[Tuple[str, str, Optional[str]]], batch_size: Optional[int] = None) -> int:
+        """
+        Batch counterpart of update_image_status.
+
+        Args:
+            updates: (image_id, status, error_message) tuples.
+
+        Returns:
+            The number of images updated (unknown image IDs are skipped).
+        """
+        rows = [{"imageID": image_id, "status": status, "errorMessage": error_message} for image_id, status, error_message in updates]
+
+        try:
+            updated = self._write_batched("update_image_statuses", _UPDATE_IMAGE_STATUSES_QUERY, rows, batch_size)
+            # logger.info("GeneratedImage statuses updated", count=updated)
+            return updated
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage statuses", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to update status for {len(rows)} images: {e}")
+
     def update_image_rating(self, image_id: str, rating: int):
         """
-        Update the rating of a GeneratedImage node.
+        Update the rating of a GeneratedImage node and apply the change to its rating aggregates.
         """
         def _update_rating_tx(tx, image_id, rating):
-            update_query = """
-            MATCH (i:GeneratedImage {imageID: $imageID})
-            SET i.rating = $rating
-            RETURN i
-            """
-            tx.run(update_query, imageID=image_id, rating=rating)
+            tx.run(_UPDATE_RATINGS_QUERY, rows=[{"imageID": image_id, "rating": rating}])
 
         if not self._driver:
             raise ConnectionError("Database driver is not initialized.")
@@ -236,36 +1317,250 @@ class Neo4jRepository:
             raise ValueError("Rating must be between 0 and 5.")
 
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 session.execute_write(_update_rating_tx, image_id, rating)
             # logger.info("GeneratedImage rating updated", image_id=image_id, rating=rating)
         except Exception as e:
             # logger.error("Failed to update GeneratedImage rating", image_id=image_id, rating=rating, error=e)
             raise RuntimeError(f"Failed to update rating for image {image_id}: {e}")
 
-    def add_tag_to_image(self, image_id: str, tag_name: str):
+    def update_image_ratings(self, ratings: Dict[str, int], batch_size: Optional[int] = None) -> int:
+        """
+        Batch counterpart of update_image_rating (rating aggregates included).
+
+        Args:
+            ratings: image_id -> rating (0-5).
+
+        Returns:
+            The number of images updated (unknown image IDs are skipped).
+        """
+        rows = _rating_rows(ratings)
+
+        try:
+            updated = self._write_batched("update_image_ratings", _UPDATE_RATINGS_QUERY, rows, batch_size)
+            # logger.info("GeneratedImage ratings updated", count=updated)
+            return updated
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage ratings", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to update rating for {len(rows)} images: {e}")
+
+    def _read_rating_stats(self, label: str, where: str, params: Dict[str, Any], min_count: int, limit: int) -> List[RatingStat]:
+        def _rating_stats_tx(tx):
+            return [RatingStat(**dict(record["st"])) for record in tx.run(_rating_stats_query(where), minCount=min_count, limit=limit, **params)]
+        _rating_stats_tx.__qualname__ = f"{label}.<locals>._rating_stats_tx" # Label for pool_metrics()
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+        if min_count < 1:
+            raise ValueError("min_count must be at least 1.")
+
+        try:
+            with self._session() as session:
+                return session.execute_read(_rating_stats_tx)
+        except Exception as e:
+            # logger.error("Failed to read rating stats", query=label, error=e)
+            raise RuntimeError(f"Failed to read rating stats ({label}): {e}")
+
+    def best_vibe_parameter_buckets(self, vibe_id: str, parameter: Optional[str] = None, min_count: int = 1,
+                                    limit: int = 20) -> List[RatingStat]:
+        """
+        "Which parameter ranges worked best for this vibe?": the vibe's
+        (parameter, bucket) aggregates ordered by mean rating. Reads only
+        the aggregate nodes, never the images.
+
+        Args:
+            vibe_id: The vibe.
+            parameter: Restrict to one parameter (e.g. "scale"); all tracked parameters when None.
+            min_count: Ignore buckets with fewer rated images.
+            limit: Maximum number of buckets returned.
+        """
+        where, params = _vibe_buckets_filter(vibe_id, parameter)
+        return self._read_rating_stats("best_vibe_parameter_buckets", where, params, min_count, limit)
+
+    def best_template_parameter_sets(self, template_id: Optional[str] = None, min_count: int = 1,
+                                     limit: int = 20) -> List[RatingStat]:
+        """
+        "Which parameter sets raise this template's ratings?": template/parameter-set
+        pairings ordered by mean rating (all templates when template_id is None).
+        """
+        where, params = _template_sets_filter(template_id)
+        return self._read_rating_stats("best_template_parameter_sets", where, params, min_count, limit)
+
+    def rebuild_rating_stats(self) -> int:
+        """
+        Recompute every RatingStat from the images' ratings and ratingStatKeys
+        (O(images)); only needed to repair drift, e.g. after manual edits.
+
+        Returns:
+            The number of aggregates recomputed.
+        """
+        def _rebuild_stats_tx(tx):
+            tx.run(_RESET_RATING_STATS_QUERY)
+            return tx.run(_REBUILD_RATING_STATS_QUERY).single()["count"]
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                return session.execute_write(_rebuild_stats_tx)
+        except Exception as e:
+            # logger.error("Failed to rebuild rating stats", error=e)
+            raise RuntimeError(f"Failed to rebuild rating stats: {e}")
+
+    def add_tags_to_images(self, image_tags: List[Tuple[str, str]], batch_size: Optional[int] = None) -> int:
+        """
+        Batch counterpart of add_tag_to_image. Tag nodes are created as needed
+        and HAS_TAG relationships are merged, so re-tagging never duplicates edges.
+
+        Args:
+            image_tags: (image_id, tag_name) pairs, e.g. every tag of every image in a session.
+
+        Returns:
+            The number of (image, tag) pairs now linked (existing links included).
+        """
+        # Duplicate pairs within one batch would only make MERGE do redundant work
+        rows = [{"imageID": image_id, "tagName": tag_name} for image_id, tag_name in dict.fromkeys(image_tags)]
+
+        try:
+            created = self._write_batched("add_tags_to_images", _ADD_TAGS_QUERY, rows, batch_size)
+            # logger.info("Tags added to GeneratedImages", count=created)
+            return created
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to add tags to GeneratedImages", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to add {len(rows)} tags to images: {e}")
+        finally:
+            for image_id in {row["imageID"] for row in rows}:
+                self._cache.invalidate(("image_tags", image_id))
+
+    def get_image_tags(self, image_id: str) -> List[str]:
+        """Tag names of an image, sorted. Read-through cached (see cache_stats)."""
+        cached = self._cache.get(("image_tags", image_id))
+        if cached is not None:
+            return list(cached)
+
+        def _get_tags_tx(tx, image_id):
+            return [record["tagName"] for record in tx.run(_GET_IMAGE_TAGS_QUERY, imageID=image_id)]
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                tag_names = session.execute_read(_get_tags_tx, image_id)
+        except Exception as e:
+            # logger.error("Failed to get image tags", image_id=image_id, error=e)
+            raise RuntimeError(f"Failed to get tags of image {image_id}: {e}")
+        self._cache.put(("image_tags", image_id), tuple(tag_names))
+        return tag_names
+
+    def deduplicate_tag_relationships(self, batch_size: Optional[int] = None) -> int:
         """
-        Add a tag to a GeneratedImage node. Creates the Tag node if it doesn't exist.
+        One-time cleanup: collapse duplicate HAS_TAG relationships between the
+        same image and tag (left behind by the former CREATE-based tagging)
+        into one. Runs in transactions of at most batch_size (image, tag) pairs
+        until none are left.
+
+        Returns:
+            The number of duplicate relationships deleted.
         """
-        def _add_tag_tx(tx, image_id, tag_name):
-            # MERGE creates the Tag node if it doesn't exist
+        def _dedupe_tx(tx, limit):
             query = """
-            MATCH (i:GeneratedImage {imageID: $imageID})
-            MERGE (t:Tag {tagName: $tagName})
-            CREATE (i)-[:HAS_TAG]->(t)
-            RETURN i, t
+            MATCH (i:GeneratedImage)-[r:HAS_TAG]->(t:Tag)
+            WITH i, t, collect(r) AS rels
+            WHERE size(rels) > 1
+            WITH rels LIMIT $limit
+            UNWIND rels[1..] AS duplicate
+            DELETE duplicate
+            RETURN count(duplicate) AS count
             """
-            tx.run(query, imageID=image_id, tagName=tag_name)
+            return tx.run(query, limit=limit).single()["count"]
 
         if not self._driver:
             raise ConnectionError("Database driver is not initialized.")
 
+        limit = batch_size or self._batch_size
+        deleted = 0
         try:
-            with self._driver.session() as session:
-                session.execute_write(_add_tag_tx, image_id, tag_name)
-            # logger.info("Tag added to GeneratedImage", image_id=image_id, tag_name=tag_name)
+            with self._session() as session:
+                while True:
+                    removed = session.execute_write(_dedupe_tx, limit)
+                    deleted += removed
+                    if removed == 0:
+                        break
+            # logger.info("Duplicate HAS_TAG relationships removed", count=deleted)
+            return deleted
         except Exception as e:
-            # logger.error("Failed to add tag to GeneratedImage", image_id=image_id, tag_name=tag_name, error=e)
-            raise RuntimeError(f"Failed to add tag '{tag_name}' to image {image_id}: {e}")
+            # logger.error("Failed to deduplicate HAS_TAG relationships", deleted=deleted, error=e)
+            raise RuntimeError(f"Failed to deduplicate HAS_TAG relationships after removing {deleted}: {e}")
+
+    def create_sessions(self, records: List[SessionRecord], batch_size: Optional[int] = None) -> int:
+        """Batch version of create_session + link_session_resources (one write transaction)."""
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        rows = _session_rows(records)
+        try:
+            created = self._write_batched("create_sessions", _CREATE_SESSIONS_QUERY, rows, batch_size,
+                                          createdAt=datetime.now().isoformat())
+            # logger.info("Session nodes created successfully", count=created)
+            return created
+        except Exception as e:
+            # logger.error("Failed to create session nodes", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to create {len(rows)} session nodes: {e}")
+        finally:
+            for record in records:
+                self._cache.invalidate(("session", record.sessionID))
+
+    # --- Bulk export ---
+
+    def _read_page(self, label: str, query: str, **params: Any) -> List[Any]:
+        """Run an export page query in its own read transaction and return its records. `label` names it in pool_metrics()."""
+        def _page_tx(tx):
+            return list(tx.run(query, **params))
+        _page_tx.__qualname__ = f"{label}.<locals>._page_tx" # Label for pool_metrics()
+
+        if not self._driver:
+            raise ConnectionError("Database driver is not initialized.")
+
+        try:
+            with self._session() as session:
+                return session.execute_read(_page_tx)
+        except Exception as e:
+            # logger.error("Failed to read export page", query=label, error=e)
+            raise RuntimeError(f"Failed to read {label} page: {e}")
+
+    def export_vibes(self, after: Optional[str], limit: int) -> List[VibeImage]:
+        records = self._read_page("export_vibes", _node_page_query("VibeImage", "vibeID"), after=after or "", limit=limit)
+        return [VibeImage(**dict(record["n"])) for record in records]
+
+    def export_prompt_templates(self, after: Optional[str], limit: int) -> List[PromptTemplate]:
+        records = self._read_page("export_prompt_templates", _node_page_query("PromptTemplate", "templateID"),
+                                  after=after or "", limit=limit)
+        return [PromptTemplate(**dict(record["n"])) for record in records]
+
+    def export_parameter_sets(self, after: Optional[str], limit: int) -> List[ParameterSet]:
+        records = self._read_page("export_parameter_sets", _node_page_query("ParameterSet", "setID"), after=after or "", limit=limit)
+        return [ParameterSet(**dict(record["n"])) for record in records]
+
+    def export_sessions(self, after: Optional[str], limit: int) -> List[SessionRecord]:
+        records = self._read_page("export_sessions", _EXPORT_SESSIONS_QUERY, after=after or "", limit=limit)
+        return [_session_record_from_record(record) for record in records]
+
+    def export_images(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, GeneratedImage]]:
+        after_session, after_image = after or ("", "")
+        records = self._read_page("export_images", _EXPORT_IMAGES_QUERY, afterSession=after_session, afterImage=after_image,
+                                  limit=limit)
+        return [(record["sessionID"], _image_from_node(record["i"])) for record in records]
+
+    def export_image_tags(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        after_image, after_tag = after or ("", "")
+        records = self._read_page("export_image_tags", _EXPORT_IMAGE_TAGS_QUERY, afterImage=after_image, afterTag=after_tag,
+                                  limit=limit)
+        return [(record["imageID"], record["tagName"]) for record in records]
 
     # TODO: Add methods for other nodes (Session, Image, etc.)
\ No newline at end of file
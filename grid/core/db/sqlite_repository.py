@@ -0,0 +1,899 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Optional, Any, Dict, List, Tuple, Callable, Iterable, TYPE_CHECKING
+
+from grid.core.db.base import (Repository, DEFAULT_BATCH_SIZE, MAX_PAGE_SIZE, IMAGE_ORDER_FIELDS, encode_cursor, decode_cursor,
+                               search_terms)
+from grid.core.db.parameters import flatten_parameters, parameter_property
+from grid.core.db.rating_stats import rating_stat_rows
+from grid.core.models.vibe import VibeImage
+from grid.core.models.session import GenerationSession, SessionRecord
+from grid.core.models.image import GeneratedImage, ImageQuery, ImagePage
+from grid.core.models.rating_stat import RatingStat
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.search import SearchHit, SEARCH_KINDS
+# import structlog # 後で実装する構造化ログをインポート
+
+if TYPE_CHECKING:
+    from grid.config import DatabaseSettings
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+DEFAULT_DB_PATH = os.path.join("data", "grid.sqlite3")
+
+# Tables mirror the Neo4j graph: relationships become foreign keys (GENERATED_IN,
+# CREATED_BY, USES_MODEL, USES_TEMPLATE, USES_PARAMETER_SET) or link tables
+# (USES_VIBE, HAS_TAG). The param* properties of images live in image_parameters
+# (one row per typed parameter), indexed by (name, value) for range filters.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ai_models (
+    model_name TEXT PRIMARY KEY,
+    type TEXT NOT NULL DEFAULT 'unknown'
+);
+CREATE TABLE IF NOT EXISTS vibes (
+    vibe_id TEXT PRIMARY KEY,
+    image_path TEXT NOT NULL,
+    vibe_type TEXT NOT NULL,
+    encoded_ie REAL NOT NULL,
+    encoded_vibe_path TEXT NOT NULL,
+    notes TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    name TEXT,
+    timestamp TEXT NOT NULL,
+    base_parameters TEXT NOT NULL,
+    base_prompt_positive TEXT NOT NULL,
+    base_prompt_negative TEXT,
+    notes TEXT,
+    overall_status TEXT NOT NULL,
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    model_name TEXT NOT NULL REFERENCES ai_models(model_name),
+    template_id TEXT,
+    parameter_set_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_timestamp ON sessions (timestamp);
+CREATE TABLE IF NOT EXISTS prompt_templates (
+    template_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    content_positive TEXT NOT NULL,
+    content_negative TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parameter_sets (
+    set_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    parameters TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_vibes (
+    session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+    vibe_id TEXT NOT NULL REFERENCES vibes(vibe_id),
+    idx INTEGER NOT NULL,
+    PRIMARY KEY (session_id, vibe_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS images (
+    image_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+    session_timestamp TEXT NOT NULL, -- Copy of sessions.timestamp, so "newest" pages come from one index
+    image_path TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    actual_parameters TEXT NOT NULL,
+    actual_prompt_positive TEXT NOT NULL,
+    actual_prompt_negative TEXT,
+    rating INTEGER NOT NULL DEFAULT 0,
+    eagle_item_id TEXT,
+    generation_status TEXT NOT NULL,
+    error_message TEXT,
+    is_vibe_candidate INTEGER NOT NULL DEFAULT 0,
+    sweep_coordinates TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_images_newest ON images (session_timestamp, image_id);
+CREATE INDEX IF NOT EXISTS idx_images_rating ON images (rating, session_timestamp, image_id);
+CREATE INDEX IF NOT EXISTS idx_images_session ON images (session_id, session_timestamp, image_id);
+CREATE INDEX IF NOT EXISTS idx_images_status ON images (generation_status);
+CREATE TABLE IF NOT EXISTS image_parameters (
+    image_id TEXT NOT NULL REFERENCES images(image_id) ON DELETE CASCADE,
+    name TEXT NOT NULL, -- param* property name, see grid.core.db.parameters
+    value, -- INTEGER, REAL or TEXT per FLATTENED_PARAMETERS
+    PRIMARY KEY (image_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_image_parameters_value ON image_parameters (name, value);
+CREATE TABLE IF NOT EXISTS tags (
+    tag_name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS image_tags (
+    image_id TEXT NOT NULL REFERENCES images(image_id) ON DELETE CASCADE,
+    tag_name TEXT NOT NULL,
+    PRIMARY KEY (image_id, tag_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_image_tags_tag ON image_tags (tag_name, image_id);
+CREATE TABLE IF NOT EXISTS rating_stats (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    vibe_id TEXT,
+    parameter TEXT,
+    bucket REAL,
+    bucket_width REAL,
+    template_id TEXT,
+    set_id TEXT,
+    count INTEGER NOT NULL DEFAULT 0,
+    sum REAL NOT NULL DEFAULT 0,
+    sum_squares REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_rating_stats_vibe ON rating_stats (vibe_id, parameter);
+CREATE INDEX IF NOT EXISTS idx_rating_stats_template ON rating_stats (kind, template_id);
+CREATE TABLE IF NOT EXISTS image_rating_keys (
+    image_id TEXT NOT NULL REFERENCES images(image_id) ON DELETE CASCADE,
+    key TEXT NOT NULL REFERENCES rating_stats(key),
+    PRIMARY KEY (image_id, key)
+) WITHOUT ROWID;
+"""
+
+# Full-text search: one FTS5 table per search kind (like the per-kind Neo4j
+# indexes), filled by insert triggers on its source table. Rows are never
+# updated or deleted through the repository, so no other triggers are needed.
+# Expressions use {row} for the source row. ':' and '_' separate words, so
+# "anime" finds the tag "style:anime" and the quoted query "style:anime"* is
+# matched as a phrase.
+_SEARCH_SOURCES = {
+    # kind: (FTS table, source table, item ID, title (displayed, weighted higher), body, snippet)
+    "vibe": ("fts_vibes", "vibes", "{row}.vibe_id", "coalesce({row}.notes, {row}.vibe_id)", "{row}.image_path", "{row}.image_path"),
+    "template": ("fts_templates", "prompt_templates", "{row}.template_id", "{row}.name",
+                 "coalesce({row}.description, '') || ' ' || {row}.content_positive || ' ' || coalesce({row}.content_negative, '')",
+                 "{row}.content_positive"),
+    "parameter_set": ("fts_parameter_sets", "parameter_sets", "{row}.set_id", "{row}.name", "{row}.description", "{row}.description"),
+    "session": ("fts_sessions", "sessions", "{row}.session_id", "coalesce({row}.name, {row}.base_prompt_positive)",
+                "coalesce({row}.notes, '') || ' ' || {row}.base_prompt_positive || ' ' || coalesce({row}.base_prompt_negative, '')",
+                "{row}.base_prompt_positive"),
+    "tag": ("fts_tags", "tags", "{row}.tag_name", "{row}.tag_name", "NULL", "NULL"),
+}
+
+
+def _search_schema() -> str:
+    statements = []
+    for kind, (table, source, item_id, title, body, snippet) in _SEARCH_SOURCES.items():
+        values = ", ".join(expression.format(row="new") for expression in (item_id, title, body, snippet))
+        statements.append(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+            item_id UNINDEXED, title, body, snippet UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+        CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON {source} BEGIN
+            INSERT INTO {table} (item_id, title, body, snippet) VALUES ({values});
+        END;
+        """)
+    return "\n".join(statements)
+
+
+def _backfill_search(conn: sqlite3.Connection):
+    """Index rows written before the search tables existed (databases created by an older version)."""
+    for kind, (table, source, item_id, title, body, snippet) in _SEARCH_SOURCES.items():
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None:
+            columns = ", ".join(expression.format(row="src") for expression in (item_id, title, body, snippet))
+            conn.execute(f"INSERT INTO {table} (item_id, title, body, snippet) SELECT {columns} FROM {source} AS src")
+
+
+# Columns of IMAGE_ORDER_FIELDS
+_IMAGE_ORDER_COLUMNS = {"rating": "i.rating", "timestamp": "i.session_timestamp", "imageID": "i.image_id"}
+
+_IMAGE_COLUMNS = {
+    "imageID": "image_id", "imagePath": "image_path", "seed": "seed", "actualParameters": "actual_parameters",
+    "actualPromptPositive": "actual_prompt_positive", "actualPromptNegative": "actual_prompt_negative",
+    "rating": "rating", "eagleItemID": "eagle_item_id", "generationStatus": "generation_status",
+    "errorMessage": "error_message", "isVibeCandidate": "is_vibe_candidate", "sweepCoordinates": "sweep_coordinates",
+}
+
+_RATING_STAT_COLUMNS = {
+    "key": "key", "kind": "kind", "count": "count", "sum": "sum", "sumSquares": "sum_squares", "vibeID": "vibe_id",
+    "parameter": "parameter", "bucket": "bucket", "bucketWidth": "bucket_width", "templateID": "template_id", "setID": "set_id",
+}
+
+# SQLite's default limit on host parameters per statement is 999 on older builds
+_MAX_SQL_VARIABLES = 900
+
+
+class SQLiteRepository(Repository):
+    """
+    Repository on an embedded SQLite file in WAL mode: no server to start, so
+    it suits single-user setups and CI. Same behaviour as Neo4jRepository,
+    including the rating aggregates and keyset pagination.
+
+    One connection is shared by the caller's threads and serialized by a
+    lock; every write is one immediate transaction. Other processes may read
+    the file while it is written (WAL).
+
+    Full-text search uses one FTS5 table per kind, kept in sync by triggers
+    and ranked with bm25.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = DEFAULT_BATCH_SIZE, busy_timeout: float = 5.0):
+        """
+        Args:
+            db_path: Database file (created with its directory if missing), or ":memory:".
+            batch_size: Rows per executemany call in the batch write methods.
+            busy_timeout: Seconds to wait for another process's write lock before failing.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self._batch_size = batch_size
+        self._lock = threading.RLock()
+        self._conn = None
+        try:
+            if db_path != ":memory:" and os.path.dirname(str(db_path)):
+                os.makedirs(os.path.dirname(str(db_path)), exist_ok=True)
+            conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # Durable across process crashes in WAL mode
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(_SCHEMA)
+            if conn.execute("SELECT 1 FROM tags LIMIT 1").fetchone() is None:
+                conn.execute("INSERT OR IGNORE INTO tags (tag_name) SELECT DISTINCT tag_name FROM image_tags")
+            conn.executescript(_search_schema())
+            _backfill_search(conn)
+            self._conn = conn
+            # logger.info("SQLite repository opened", db_path=db_path)
+        except Exception as e:
+            # logger.error("Failed to open SQLite database", db_path=db_path, error=e)
+            raise ConnectionError(f"Failed to open SQLite database {db_path}: {e}")
+
+    @classmethod
+    def from_settings(cls, database: "DatabaseSettings") -> "SQLiteRepository":
+        """Build a repository from grid.config's DatabaseSettings (settings.database)."""
+        return cls(str(database.sqlite_path), batch_size=database.neo4j_batch_size)
+
+    def close_connection(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+                # logger.info("SQLite connection closed")
+
+    def check_connection(self) -> bool:
+        if not self._conn:
+            return False
+        try:
+            self._read(lambda conn: conn.execute("SELECT 1").fetchone())
+            return True
+        except Exception:
+            return False
+
+    def _read(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            if not self._conn:
+                raise ConnectionError("Database connection is not open.")
+            return func(self._conn)
+
+    def _write(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run func inside an immediate (write-locked) transaction."""
+        with self._lock:
+            if not self._conn:
+                raise ConnectionError("Database connection is not open.")
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _chunks(rows: List[Any], size: int) -> Iterable[List[Any]]:
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    def _executemany(self, conn: sqlite3.Connection, sql: str, rows: List[Any], batch_size: Optional[int] = None) -> int:
+        changed = 0
+        for chunk in self._chunks(rows, batch_size or self._batch_size):
+            changed += conn.executemany(sql, chunk).rowcount
+        return changed
+
+    # --- Vibes ---
+
+    @staticmethod
+    def _vibe_row(vibe_image: VibeImage) -> Tuple[Any, ...]:
+        return (vibe_image.vibeID, vibe_image.imagePath, vibe_image.vibeType, vibe_image.encodedIE, vibe_image.encodedVibePath,
+                vibe_image.notes, vibe_image.createdAt.isoformat())
+
+    _INSERT_VIBE = """
+    INSERT INTO vibes (vibe_id, image_path, vibe_type, encoded_ie, encoded_vibe_path, notes, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def create_vibe(self, vibe_image: VibeImage):
+        try:
+            self._write(lambda conn: conn.execute(self._INSERT_VIBE, self._vibe_row(vibe_image)))
+            # logger.info("Vibe created successfully", vibe_id=vibe_image.vibeID)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create vibe", vibe_id=vibe_image.vibeID, error=e)
+            raise RuntimeError(f"Failed to create vibe node {vibe_image.vibeID}: {e}")
+
+    def create_vibes(self, vibe_images: List[VibeImage], batch_size: Optional[int] = None) -> int:
+        rows = [self._vibe_row(vibe_image) for vibe_image in vibe_images]
+        try:
+            return self._write(lambda conn: self._executemany(conn, self._INSERT_VIBE, rows, batch_size))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create vibes", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to create {len(rows)} vibe nodes: {e}")
+
+    @staticmethod
+    def _vibe_from_row(row: sqlite3.Row) -> VibeImage:
+        return VibeImage(vibeID=row["vibe_id"], imagePath=row["image_path"], vibeType=row["vibe_type"], encodedIE=row["encoded_ie"],
+                         encodedVibePath=row["encoded_vibe_path"], notes=row["notes"],
+                         createdAt=datetime.fromisoformat(row["created_at"]))
+
+    def get_vibe(self, vibe_id: str) -> Optional[VibeImage]:
+        try:
+            row = self._read(lambda conn: conn.execute("SELECT * FROM vibes WHERE vibe_id = ?", (vibe_id,)).fetchone())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to get vibe node {vibe_id}: {e}")
+        return self._vibe_from_row(row) if row is not None else None
+
+    def list_encoded_vibe_paths(self) -> List[str]:
+        try:
+            rows = self._read(lambda conn: conn.execute("SELECT DISTINCT encoded_vibe_path FROM vibes").fetchall())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to list encoded vibe paths: {e}")
+        return [row[0] for row in rows]
+
+    # --- Prompt templates and parameter sets ---
+
+    def create_prompt_template(self, template: PromptTemplate):
+        try:
+            self._write(lambda conn: conn.execute(
+                """
+                INSERT INTO prompt_templates (template_id, name, description, content_positive, content_negative, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (template.templateID, template.name, template.description, template.contentPositive, template.contentNegative,
+                 template.createdAt.isoformat())))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create prompt template", template_id=template.templateID, error=e)
+            raise RuntimeError(f"Failed to create PromptTemplate node {template.templateID}: {e}")
+
+    def create_parameter_set(self, parameter_set: ParameterSet):
+        try:
+            self._write(lambda conn: conn.execute(
+                "INSERT INTO parameter_sets (set_id, name, description, parameters, created_at) VALUES (?, ?, ?, ?, ?)",
+                (parameter_set.setID, parameter_set.name, parameter_set.description, parameter_set.parameters,
+                 parameter_set.createdAt.isoformat())))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create parameter set", set_id=parameter_set.setID, error=e)
+            raise RuntimeError(f"Failed to create ParameterSet node {parameter_set.setID}: {e}")
+
+    # --- Sessions ---
+
+    _INSERT_SESSION = """
+    INSERT INTO sessions (session_id, name, timestamp, base_parameters, base_prompt_positive, base_prompt_negative,
+                          notes, overall_status, user_id, model_name)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    @staticmethod
+    def _session_row(session: GenerationSession, user_id: str, model_name: str) -> Tuple[Any, ...]:
+        return (session.sessionID, session.name, session.timestamp.isoformat(), session.baseParameters, session.basePromptPositive,
+                session.basePromptNegative, session.notes, session.overallStatus, user_id, model_name)
+
+    @staticmethod
+    def _session_from_row(row: sqlite3.Row) -> GenerationSession:
+        return GenerationSession(sessionID=row["session_id"], name=row["name"], timestamp=datetime.fromisoformat(row["timestamp"]),
+                                 baseParameters=row["base_parameters"], basePromptPositive=row["base_prompt_positive"],
+                                 basePromptNegative=row["base_prompt_negative"], notes=row["notes"],
+                                 overallStatus=row["overall_status"])
+
+    def create_session(self, session: GenerationSession, user_id: str, model_name: str):
+        def _create_session(conn):
+            conn.execute("INSERT OR IGNORE INTO users (user_id, created_at) VALUES (?, ?)", (user_id, datetime.now().isoformat()))
+            conn.execute("INSERT OR IGNORE INTO ai_models (model_name) VALUES (?)", (model_name,))
+            conn.execute(self._INSERT_SESSION, self._session_row(session, user_id, model_name))
+
+        try:
+            self._write(_create_session)
+            # logger.info("Session created successfully", session_id=session.sessionID)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create session", session_id=session.sessionID, error=e)
+            raise RuntimeError(f"Failed to create session node {session.sessionID}: {e}")
+
+    def get_session(self, session_id: str) -> Optional[GenerationSession]:
+        try:
+            row = self._read(lambda conn: conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to get session node {session_id}: {e}")
+        return self._session_from_row(row) if row is not None else None
+
+    def create_sessions(self, records: List[SessionRecord], batch_size: Optional[int] = None) -> int:
+        """Batch version of create_session + link_session_resources (one transaction)."""
+        now = datetime.now().isoformat()
+
+        def _create_sessions(conn):
+            self._executemany(conn, "INSERT OR IGNORE INTO users (user_id, created_at) VALUES (?, ?)",
+                              [(user_id, now) for user_id in dict.fromkeys(record.userID for record in records)], batch_size)
+            self._executemany(conn, "INSERT OR IGNORE INTO ai_models (model_name) VALUES (?)",
+                              [(model_name,) for model_name in dict.fromkeys(record.modelName for record in records)], batch_size)
+            created = self._executemany(conn, self._INSERT_SESSION,
+                                        [self._session_row(record, record.userID, record.modelName) for record in records], batch_size)
+            self._executemany(conn, self._LINK_VIBE, [(record.sessionID, index, vibe_id) for record in records
+                                                      for index, vibe_id in enumerate(record.vibeIDs)], batch_size)
+            self._executemany(conn, self._LINK_TEMPLATE_AND_SET,
+                              [(record.templateID, record.parameterSetID, record.sessionID) for record in records
+                               if record.templateID or record.parameterSetID], batch_size)
+            return created
+
+        try:
+            return self._write(_create_sessions)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create sessions", count=len(records), error=e)
+            raise RuntimeError(f"Failed to create {len(records)} session nodes: {e}")
+
+    def update_session_status(self, session_id: str, status: str):
+        try:
+            self._write(lambda conn: conn.execute("UPDATE sessions SET overall_status = ? WHERE session_id = ?", (status, session_id)))
+            # logger.info("Session status updated", session_id=session_id, status=status)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update session status", session_id=session_id, status=status, error=e)
+            raise RuntimeError(f"Failed to update status for session {session_id}: {e}")
+
+    # INSERT ... SELECT only links vibes that exist
+    _LINK_VIBE = """
+    INSERT INTO session_vibes (session_id, vibe_id, idx)
+    SELECT ?, vibe_id, ? FROM vibes WHERE vibe_id = ?
+    ON CONFLICT (session_id, vibe_id) DO UPDATE SET idx = excluded.idx
+    """
+
+    _LINK_TEMPLATE_AND_SET = """
+    UPDATE sessions
+    SET template_id = coalesce((SELECT template_id FROM prompt_templates WHERE template_id = ?), template_id),
+        parameter_set_id = coalesce((SELECT set_id FROM parameter_sets WHERE set_id = ?), parameter_set_id)
+    WHERE session_id = ?
+    """
+
+    def link_session_resources(self, session_id: str, vibe_ids: Optional[List[str]] = None, template_id: Optional[str] = None,
+                               parameter_set_id: Optional[str] = None):
+        """Unknown vibes, templates and parameter sets are skipped, as in Neo4jRepository. Call before creating the session's images."""
+        def _link_resources(conn):
+            conn.executemany(self._LINK_VIBE, [(session_id, index, vibe_id) for index, vibe_id in enumerate(vibe_ids or [])])
+            conn.execute(self._LINK_TEMPLATE_AND_SET, (template_id, parameter_set_id, session_id))
+
+        try:
+            self._write(_link_resources)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to link session resources", session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to link resources to session {session_id}: {e}")
+
+    # --- Images ---
+
+    def _create_images(self, conn: sqlite3.Connection, images: List[GeneratedImage], session_id: str, batch_size: int) -> int:
+        """Insert images and fold their ratings into rating_stats, inside the caller's transaction."""
+        session_row = conn.execute("SELECT timestamp, template_id, parameter_set_id FROM sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+        if session_row is None:
+            # Like Neo4jRepository: images are never silently dropped for want of a session
+            raise ValueError(f"Session {session_id} does not exist.")
+        vibes = [{"vibeID": row["vibe_id"], "index": row["idx"]} for row in
+                 conn.execute("SELECT vibe_id, idx FROM session_vibes WHERE session_id = ?", (session_id,))]
+
+        image_rows, parameter_rows, key_rows, stats = [], [], [], {}
+        for image in images:
+            image_rows.append((
+                image.imageID, session_id, session_row["timestamp"], image.imagePath, image.seed,
+                json.dumps(image.actualParameters, sort_keys=True, ensure_ascii=False), image.actualPromptPositive,
+                image.actualPromptNegative, image.rating, image.eagleItemID, image.generationStatus, image.errorMessage,
+                int(image.isVibeCandidate), image.sweepCoordinates,
+            ))
+            parameter_rows.extend((image.imageID, name, value) for name, value in flatten_parameters(image.actualParameters).items())
+            rated = image.rating > 0
+            for stat in rating_stat_rows(image.actualParameters, vibes, session_row["template_id"], session_row["parameter_set_id"]):
+                key_rows.append((image.imageID, stat["key"]))
+                # Buckets are created even for unrated images, so later rating updates only need UPDATE
+                entry = stats.setdefault(stat["key"], dict(stat["props"], key=stat["key"], count=0, sum=0, sumSquares=0))
+                if rated:
+                    entry["count"] += 1
+                    entry["sum"] += image.rating
+                    entry["sumSquares"] += image.rating * image.rating
+
+        created = self._executemany(conn, """
+            INSERT INTO images (image_id, session_id, session_timestamp, image_path, seed, actual_parameters,
+                                actual_prompt_positive, actual_prompt_negative, rating, eagle_item_id, generation_status,
+                                error_message, is_vibe_candidate, sweep_coordinates)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, image_rows, batch_size)
+        self._executemany(conn, "INSERT INTO image_parameters (image_id, name, value) VALUES (?, ?, ?)", parameter_rows, batch_size)
+        self._executemany(conn, """
+            INSERT INTO rating_stats (key, kind, vibe_id, parameter, bucket, bucket_width, template_id, set_id, count, sum, sum_squares)
+            VALUES (:key, :kind, :vibeID, :parameter, :bucket, :bucketWidth, :templateID, :setID, :count, :sum, :sumSquares)
+            ON CONFLICT (key) DO UPDATE SET count = count + excluded.count, sum = sum + excluded.sum,
+                                            sum_squares = sum_squares + excluded.sum_squares
+            """, [{"vibeID": None, "parameter": None, "bucket": None, "bucketWidth": None, "templateID": None, "setID": None, **row}
+                  for row in stats.values()], batch_size)
+        self._executemany(conn, "INSERT OR IGNORE INTO image_rating_keys (image_id, key) VALUES (?, ?)", key_rows, batch_size)
+        return created
+
+    def create_generated_image(self, image: GeneratedImage, session_id: str):
+        try:
+            self._write(lambda conn: self._create_images(conn, [image], session_id, self._batch_size))
+            # logger.info("GeneratedImage created successfully", image_id=image.imageID, session_id=session_id)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create GeneratedImage", image_id=image.imageID, session_id=session_id, error=e)
+            raise RuntimeError(f"Failed to create GeneratedImage node {image.imageID} for session {session_id}: {e}")
+
+    def create_generated_images(self, images: List[GeneratedImage], session_id: str, batch_size: Optional[int] = None) -> int:
+        if not images:
+            return 0
+        try:
+            return self._write(lambda conn: self._create_images(conn, list(images), session_id, batch_size or self._batch_size))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to create GeneratedImages", session_id=session_id, count=len(images), error=e)
+            raise RuntimeError(f"Failed to create {len(images)} GeneratedImage nodes for session {session_id}: {e}")
+
+    @staticmethod
+    def _image_from_row(row: sqlite3.Row) -> GeneratedImage:
+        image_data = {field: row[column] for field, column in _IMAGE_COLUMNS.items()}
+        image_data["actualParameters"] = json.loads(image_data["actualParameters"])
+        image_data["isVibeCandidate"] = bool(image_data["isVibeCandidate"])
+        return GeneratedImage(**image_data)
+
+    def get_image(self, image_id: str) -> Optional[GeneratedImage]:
+        try:
+            row = self._read(lambda conn: conn.execute("SELECT * FROM images WHERE image_id = ?", (image_id,)).fetchone())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to get GeneratedImage node {image_id}: {e}")
+        return self._image_from_row(row) if row is not None else None
+
+    def query_images(self, query: Optional[ImageQuery] = None, limit: int = 50, cursor: Optional[str] = None) -> ImagePage:
+        """
+        Same filters and keyset pagination as Neo4jRepository.query_images.
+        Pages are read in index order from idx_images_newest/idx_images_rating
+        (or idx_images_session for a single session); tag and parameter
+        filters are semi-joins on their (name, value) indexes.
+        """
+        query = query or ImageQuery()
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+        order_columns = [_IMAGE_ORDER_COLUMNS[field] for field in IMAGE_ORDER_FIELDS[query.orderBy]]
+
+        conditions, params = [], []
+        if query.sessionID:
+            conditions.append("i.session_id = ?")
+            params.append(query.sessionID)
+        if query.minRating is not None:
+            conditions.append("i.rating >= ?")
+            params.append(query.minRating)
+        if query.maxRating is not None:
+            conditions.append("i.rating <= ?")
+            params.append(query.maxRating)
+        if query.generationStatus is not None:
+            conditions.append("i.generation_status = ?")
+            params.append(query.generationStatus)
+        for tag_name in query.tags:
+            conditions.append("i.image_id IN (SELECT image_id FROM image_tags WHERE tag_name = ?)")
+            params.append(tag_name)
+        for name, (low, high) in sorted(query.parameterRanges.items()):
+            bounds = ["name = ?"]
+            params.append(parameter_property(name))
+            if low is not None:
+                bounds.append("value >= ?")
+                params.append(low)
+            if high is not None:
+                bounds.append("value <= ?")
+                params.append(high)
+            conditions.append(f"i.image_id IN (SELECT image_id FROM image_parameters WHERE {' AND '.join(bounds)})")
+        for name, value in sorted(query.parameterEquals.items()):
+            conditions.append("i.image_id IN (SELECT image_id FROM image_parameters WHERE name = ? AND value = ?)")
+            params.extend([parameter_property(name), value])
+        # Session timestamps are stored as ISO 8601 strings, which sort chronologically
+        if query.sessionsSince is not None:
+            conditions.append("i.session_timestamp >= ?")
+            params.append(query.sessionsSince.isoformat())
+        if query.sessionsUntil is not None:
+            conditions.append("i.session_timestamp < ?")
+            params.append(query.sessionsUntil.isoformat())
+        if cursor is not None:
+            keys = decode_cursor(cursor, query.orderBy)
+            conditions.append(f"({', '.join(order_columns)}) < ({', '.join('?' for _ in keys)})")
+            params.extend(keys)
+
+        sql = f"""
+        SELECT i.* FROM images i
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY {", ".join(f"{column} DESC" for column in order_columns)}
+        LIMIT ?
+        """
+        params.append(limit + 1)
+
+        try:
+            rows = self._read(lambda conn: conn.execute(sql, params).fetchall())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to query images", error=e)
+            raise RuntimeError(f"Failed to query images: {e}")
+
+        page = ImagePage()
+        for row in rows[:limit]:
+            image = self._image_from_row(row)
+            page.images.append(image)
+            page.sessionIDs[image.imageID] = row["session_id"]
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            values = {"timestamp": last["session_timestamp"], "imageID": last["image_id"], "rating": last["rating"]}
+            page.nextCursor = encode_cursor(query.orderBy, [values[field] for field in IMAGE_ORDER_FIELDS[query.orderBy]])
+        return page
+
+    def update_image_status(self, image_id: str, status: str, error_message: Optional[str] = None):
+        self.update_image_statuses([(image_id, status, error_message)])
+
+    def update_image_statuses(self, updates: List[Tuple[str, str, Optional[str]]], batch_size: Optional[int] = None) -> int:
+        rows = [(status, error_message, image_id) for image_id, status, error_message in updates]
+        try:
+            return self._write(lambda conn: self._executemany(
+                conn, "UPDATE images SET generation_status = ?, error_message = ? WHERE image_id = ?", rows, batch_size))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage statuses", count=len(rows), error=e)
+            raise RuntimeError(f"Failed to update status for {len(rows)} images: {e}")
+
+    def update_image_rating(self, image_id: str, rating: int):
+        self.update_image_ratings({image_id: rating})
+
+    def update_image_ratings(self, ratings: Dict[str, int], batch_size: Optional[int] = None) -> int:
+        """Ratings and their rating_stats deltas are applied in one transaction."""
+        for image_id, rating in ratings.items():
+            if not (0 <= rating <= 5):
+                raise ValueError(f"Rating must be between 0 and 5 (image {image_id}: {rating}).")
+
+        def _update_ratings(conn):
+            updated = 0
+            for image_id, rating in ratings.items():
+                row = conn.execute("SELECT rating FROM images WHERE image_id = ?", (image_id,)).fetchone()
+                if row is None:
+                    continue
+                old = row["rating"]
+                conn.execute("UPDATE images SET rating = ? WHERE image_id = ?", (rating, image_id))
+                conn.execute(
+                    """
+                    UPDATE rating_stats SET count = count + ?, sum = sum + ?, sum_squares = sum_squares + ?
+                    WHERE key IN (SELECT key FROM image_rating_keys WHERE image_id = ?)
+                    """,
+                    ((rating > 0) - (old > 0), rating - old, rating * rating - old * old, image_id))
+                updated += 1
+            return updated
+
+        try:
+            return self._write(_update_ratings)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to update GeneratedImage ratings", count=len(ratings), error=e)
+            raise RuntimeError(f"Failed to update rating for {len(ratings)} images: {e}")
+
+    # --- Rating aggregates ---
+
+    def _read_rating_stats(self, label: str, where: str, params: List[Any], min_count: int, limit: int) -> List[RatingStat]:
+        if min_count < 1:
+            raise ValueError("min_count must be at least 1.")
+        sql = f"""
+        SELECT * FROM rating_stats
+        WHERE {where} AND count >= ?
+        ORDER BY CAST(sum AS REAL) / count DESC, count DESC
+        LIMIT ?
+        """
+        try:
+            rows = self._read(lambda conn: conn.execute(sql, [*params, min_count, limit]).fetchall())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to read rating stats ({label}): {e}")
+        return [RatingStat(**{field: row[column] for field, column in _RATING_STAT_COLUMNS.items()}) for row in rows]
+
+    def best_vibe_parameter_buckets(self, vibe_id: str, parameter: Optional[str] = None, min_count: int = 1,
+                                    limit: int = 20) -> List[RatingStat]:
+        where, params = "vibe_id = ?", [vibe_id]
+        if parameter is not None:
+            where += " AND parameter = ?"
+            params.append(parameter)
+        return self._read_rating_stats("best_vibe_parameter_buckets", where, params, min_count, limit)
+
+    def best_template_parameter_sets(self, template_id: Optional[str] = None, min_count: int = 1,
+                                     limit: int = 20) -> List[RatingStat]:
+        where, params = "kind = 'template_parameter_set'", []
+        if template_id is not None:
+            where += " AND template_id = ?"
+            params.append(template_id)
+        return self._read_rating_stats("best_template_parameter_sets", where, params, min_count, limit)
+
+    def rebuild_rating_stats(self) -> int:
+        def _rebuild_stats(conn):
+            conn.execute("UPDATE rating_stats SET count = 0, sum = 0, sum_squares = 0")
+            return conn.execute(
+                """
+                UPDATE rating_stats SET count = agg.rated, sum = agg.total, sum_squares = agg.squares
+                FROM (
+                    SELECT k.key AS key, count(*) AS rated, sum(i.rating) AS total, sum(i.rating * i.rating) AS squares
+                    FROM image_rating_keys k JOIN images i ON i.image_id = k.image_id
+                    WHERE i.rating > 0
+                    GROUP BY k.key
+                ) AS agg
+                WHERE rating_stats.key = agg.key
+                """).rowcount
+
+        try:
+            return self._write(_rebuild_stats)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to rebuild rating stats", error=e)
+            raise RuntimeError(f"Failed to rebuild rating stats: {e}")
+
+    # --- Tags ---
+
+    def add_tags_to_images(self, image_tags: List[Tuple[str, str]], batch_size: Optional[int] = None) -> int:
+        pairs = list(dict.fromkeys(image_tags))
+
+        def _add_tags(conn):
+            image_ids = list({image_id for image_id, _ in pairs})
+            existing = set()
+            for chunk in self._chunks(image_ids, _MAX_SQL_VARIABLES):
+                existing.update(row[0] for row in conn.execute(
+                    f"SELECT image_id FROM images WHERE image_id IN ({', '.join('?' for _ in chunk)})", chunk))
+            rows = [pair for pair in pairs if pair[0] in existing] # Unknown images are skipped, as with MATCH
+            self._executemany(conn, "INSERT OR IGNORE INTO tags (tag_name) VALUES (?)",
+                              [(tag_name,) for tag_name in dict.fromkeys(tag_name for _, tag_name in rows)], batch_size)
+            self._executemany(conn, "INSERT OR IGNORE INTO image_tags (image_id, tag_name) VALUES (?, ?)", rows, batch_size)
+            return len(rows)
+
+        try:
+            return self._write(_add_tags)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to add tags to GeneratedImages", count=len(pairs), error=e)
+            raise RuntimeError(f"Failed to add {len(pairs)} tags to images: {e}")
+
+    def get_image_tags(self, image_id: str) -> List[str]:
+        try:
+            rows = self._read(lambda conn: conn.execute(
+                "SELECT tag_name FROM image_tags WHERE image_id = ? ORDER BY tag_name", (image_id,)).fetchall())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to get tags of image {image_id}: {e}")
+        return [row[0] for row in rows]
+
+    # --- Search ---
+
+    def search_text(self, text: str, kinds: List[str], limit: int) -> List[SearchHit]:
+        """Prefix query on the FTS5 table of each kind, ranked by bm25 (title matches weigh 4x)."""
+        unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown search kinds: {unknown}.")
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        terms = search_terms(text)
+        if not terms or not kinds:
+            return []
+        # Every term quoted (no FTS5 operators from user input) and matched as a prefix
+        match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+        def _search(conn):
+            hits = []
+            for kind in kinds:
+                table = _SEARCH_SOURCES[kind][0]
+                rows = conn.execute(
+                    f"""
+                    SELECT item_id, title, snippet, bm25({table}, 0.0, 4.0, 1.0, 0.0) AS rank
+                    FROM {table} WHERE {table} MATCH ?
+                    ORDER BY rank LIMIT ?
+                    """, (match, limit)).fetchall()
+                hits.extend(SearchHit(kind=kind, id=row["item_id"], title=row["title"] or row["item_id"], snippet=row["snippet"],
+                                      score=-row["rank"]) for row in rows)
+            return hits
+
+        try:
+            return self._read(_search)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Full-text search failed", text=text, kinds=kinds, error=e)
+            raise RuntimeError(f"Full-text search for {text!r} failed: {e}")
+
+    # --- Bulk export ---
+
+    def _read_page(self, label: str, sql: str, params: Tuple[Any, ...]) -> List[sqlite3.Row]:
+        try:
+            return self._read(lambda conn: conn.execute(sql, params).fetchall())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # logger.error("Failed to read export page", query=label, error=e)
+            raise RuntimeError(f"Failed to read {label} page: {e}")
+
+    def export_vibes(self, after: Optional[str], limit: int) -> List[VibeImage]:
+        rows = self._read_page("export_vibes", "SELECT * FROM vibes WHERE vibe_id > ? ORDER BY vibe_id LIMIT ?", (after or "", limit))
+        return [self._vibe_from_row(row) for row in rows]
+
+    def export_prompt_templates(self, after: Optional[str], limit: int) -> List[PromptTemplate]:
+        rows = self._read_page("export_prompt_templates",
+                               "SELECT * FROM prompt_templates WHERE template_id > ? ORDER BY template_id LIMIT ?", (after or "", limit))
+        return [PromptTemplate(templateID=row["template_id"], name=row["name"], description=row["description"],
+                               contentPositive=row["content_positive"], contentNegative=row["content_negative"],
+                               createdAt=datetime.fromisoformat(row["created_at"])) for row in rows]
+
+    def export_parameter_sets(self, after: Optional[str], limit: int) -> List[ParameterSet]:
+        rows = self._read_page("export_parameter_sets", "SELECT * FROM parameter_sets WHERE set_id > ? ORDER BY set_id LIMIT ?",
+                               (after or "", limit))
+        return [ParameterSet(setID=row["set_id"], name=row["name"], description=row["description"], parameters=row["parameters"],
+                             createdAt=datetime.fromisoformat(row["created_at"])) for row in rows]
+
+    def export_sessions(self, after: Optional[str], limit: int) -> List[SessionRecord]:
+        rows = self._read_page(
+            "export_sessions",
+            """
+            SELECT s.*, (SELECT json_group_array(vibe_id) FROM (SELECT vibe_id FROM session_vibes
+                                                                 WHERE session_id = s.session_id ORDER BY idx)) AS vibe_ids
+            FROM sessions AS s WHERE s.session_id > ? ORDER BY s.session_id LIMIT ?
+            """, (after or "", limit))
+        return [SessionRecord(**self._session_from_row(row).model_dump(), userID=row["user_id"], modelName=row["model_name"],
+                              vibeIDs=json.loads(row["vibe_ids"]), templateID=row["template_id"],
+                              parameterSetID=row["parameter_set_id"]) for row in rows]
+
+    def export_images(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, GeneratedImage]]:
+        after_session, after_image = after or ("", "")
+        # session_timestamp is constant within a session, so this order is (session_id, image_id) read from idx_images_session
+        rows = self._read_page(
+            "export_images",
+            """
+            SELECT * FROM images
+            WHERE (session_id, session_timestamp, image_id) >
+                  (?, coalesce((SELECT timestamp FROM sessions WHERE session_id = ?), ''), ?)
+            ORDER BY session_id, session_timestamp, image_id LIMIT ?
+            """, (after_session, after_session, after_image, limit))
+        return [(row["session_id"], self._image_from_row(row)) for row in rows]
+
+    def export_image_tags(self, after: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        after_image, after_tag = after or ("", "")
+        rows = self._read_page("export_image_tags",
+                               "SELECT image_id, tag_name FROM image_tags WHERE (image_id, tag_name) > (?, ?) "
+                               "ORDER BY image_id, tag_name LIMIT ?", (after_image, after_tag, limit))
+        return [(row["image_id"], row["tag_name"]) for row in rows]
@@ -0,0 +1,225 @@
+"""
+Application-level backup and migration of the Grid library.
+
+export_graph streams vibes, prompt templates, parameter sets, sessions (with
+their user, model and resource links), images and image tags out of any
+Repository into gzip-compressed JSONL or CSV chunk files plus a manifest.
+Records are read one keyset page at a time and written as they arrive, so
+memory use does not grow with the library.
+
+import_graph rebuilds the library in another (empty) repository, possibly of
+the other backend: the chunks of each kind are loaded by parallel workers
+with the batch write methods (UNWIND statements on Neo4j). Rating aggregates
+are rebuilt as the images are created.
+"""
+import csv
+import gzip
+import itertools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, Any, Dict, List, Iterator
+
+from grid.core.db.base import Repository
+from grid.core.models.vibe import VibeImage
+from grid.core.models.session import SessionRecord
+from grid.core.models.image import GeneratedImage
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.parameter_set import ParameterSet
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+FORMAT_VERSION = 1
+EXPORT_FORMATS = ("jsonl", "csv")
+MANIFEST_NAME = "manifest.json"
+
+# Records read per repository call / written per chunk file
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Columns per kind (CSV header; JSONL objects have the same keys)
+_COLUMNS = {
+    "vibes": list(VibeImage.model_fields),
+    "prompt_templates": list(PromptTemplate.model_fields),
+    "parameter_sets": list(ParameterSet.model_fields),
+    "sessions": list(SessionRecord.model_fields),
+    "images": ["sessionID"] + list(GeneratedImage.model_fields),
+    "image_tags": ["imageID", "tagName"],
+}
+
+# kind: (Repository export method, page key of a record, record -> row)
+_EXPORTERS = {
+    "vibes": ("export_vibes", lambda vibe: vibe.vibeID, lambda vibe: vibe.model_dump(mode="json")),
+    "prompt_templates": ("export_prompt_templates", lambda template: template.templateID,
+                         lambda template: template.model_dump(mode="json")),
+    "parameter_sets": ("export_parameter_sets", lambda parameter_set: parameter_set.setID,
+                       lambda parameter_set: parameter_set.model_dump(mode="json")),
+    "sessions": ("export_sessions", lambda record: record.sessionID, lambda record: record.model_dump(mode="json")),
+    "images": ("export_images", lambda pair: (pair[0], pair[1].imageID),
+               lambda pair: {"sessionID": pair[0], **pair[1].model_dump(mode="json")}),
+    "image_tags": ("export_image_tags", lambda pair: pair, lambda pair: {"imageID": pair[0], "tagName": pair[1]}),
+}
+
+# Import phases: every kind only references kinds of earlier phases, and the
+# chunks within a phase are independent, so they are loaded in parallel.
+_IMPORT_PHASES = (("vibes", "prompt_templates", "parameter_sets"), ("sessions",), ("images",), ("image_tags",))
+
+
+def _export_rows(repo: Repository, kind: str, page_size: int) -> Iterator[Dict[str, Any]]:
+    method, key, to_row = _EXPORTERS[kind]
+    after = None
+    while True:
+        page = getattr(repo, method)(after, page_size)
+        for record in page:
+            yield to_row(record)
+        if len(page) < page_size:
+            return
+        after = key(page[-1])
+
+
+class _ChunkWriter:
+    """Writes rows of one kind to <kind>-00000.<format>.gz, <kind>-00001..., chunk_size rows per file."""
+
+    def __init__(self, directory: str, kind: str, fmt: str, chunk_size: int):
+        self._directory = directory
+        self._kind = kind
+        self._fmt = fmt
+        self._chunk_size = chunk_size
+        self._file = None
+        self._writer = None
+        self.chunks: List[Dict[str, Any]] = []
+
+    def write(self, row: Dict[str, Any]):
+        if self._file is None or self.chunks[-1]["records"] >= self._chunk_size:
+            self._open_next()
+        if self._fmt == "csv":
+            # Every cell is JSON, so types, nulls and nested parameters survive the round trip
+            self._writer.writerow([json.dumps(row[column], ensure_ascii=False) for column in _COLUMNS[self._kind]])
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.chunks[-1]["records"] += 1
+
+    def _open_next(self):
+        self.close()
+        name = f"{self._kind}-{len(self.chunks):05d}.{self._fmt}.gz"
+        self._file = gzip.open(os.path.join(self._directory, name), "wt", encoding="utf-8", newline="")
+        if self._fmt == "csv":
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(_COLUMNS[self._kind])
+        self.chunks.append({"file": name, "records": 0})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def export_graph(repo: Repository, directory: str, fmt: str = "jsonl", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, int]:
+    """
+    Export the whole library of repo into directory (created if needed). The
+    manifest is written last, so a directory without one holds an incomplete
+    export.
+
+    Returns:
+        kind -> number of records exported.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {EXPORT_FORMATS}.")
+    if chunk_size < 1 or page_size < 1:
+        raise ValueError("chunk_size and page_size must be at least 1.")
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        raise ValueError(f"{directory} already contains an export.")
+
+    kinds = {}
+    for kind in _EXPORTERS:
+        writer = _ChunkWriter(directory, kind, fmt, chunk_size)
+        try:
+            for row in _export_rows(repo, kind, page_size):
+                writer.write(row)
+        finally:
+            writer.close()
+        kinds[kind] = {"records": sum(chunk["records"] for chunk in writer.chunks), "chunks": writer.chunks}
+        # logger.info("Exported records", kind=kind, records=kinds[kind]["records"], chunks=len(writer.chunks))
+
+    manifest = {"version": FORMAT_VERSION, "format": fmt, "exportedAt": datetime.now(timezone.utc).isoformat(), "kinds": kinds}
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return {kind: info["records"] for kind, info in kinds.items()}
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        raise ValueError(f"{directory} has no {MANIFEST_NAME}; it is not a (complete) export.")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export version {manifest.get('version')!r} (expected {FORMAT_VERSION}).")
+    return manifest
+
+
+def _read_chunk(path: str, fmt: str) -> List[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            columns = next(reader)
+            return [{column: json.loads(cell) for column, cell in zip(columns, cells)} for cells in reader]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _load_chunk(repo: Repository, kind: str, path: str, fmt: str, batch_size: Optional[int]) -> int:
+    rows = _read_chunk(path, fmt)
+    if kind == "vibes":
+        repo.create_vibes([VibeImage(**row) for row in rows], batch_size)
+    elif kind == "prompt_templates":
+        for row in rows:
+            repo.create_prompt_template(PromptTemplate(**row))
+    elif kind == "parameter_sets":
+        for row in rows:
+            repo.create_parameter_set(ParameterSet(**row))
+    elif kind == "sessions":
+        repo.create_sessions([SessionRecord(**row) for row in rows], batch_size)
+    elif kind == "images":
+        # Chunks are ordered by session: one batch write per session
+        for session_id, session_rows in itertools.groupby(rows, key=lambda row: row["sessionID"]):
+            images = [GeneratedImage(**{key: value for key, value in row.items() if key != "sessionID"}) for row in session_rows]
+            repo.create_generated_images(images, session_id, batch_size)
+    elif kind == "image_tags":
+        repo.add_tags_to_images([(row["imageID"], row["tagName"]) for row in rows], batch_size)
+    else:
+        raise ValueError(f"Unknown export kind {kind!r}.")
+    return len(rows)
+
+
+def import_graph(repo: Repository, directory: str, workers: int = 4, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Load an export_graph directory into repo, which should be empty (records
+    that already exist make their chunk fail). Up to `workers` chunks are
+    loaded at once; each chunk is written in batches of batch_size rows
+    (the repository's default when None).
+
+    Returns:
+        kind -> number of records loaded.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1.")
+    manifest = read_manifest(directory)
+    fmt = manifest["format"]
+    loaded = {kind: 0 for kind in manifest["kinds"]}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for phase in _IMPORT_PHASES:
+            futures = [(kind, chunk["file"], executor.submit(_load_chunk, repo, kind, os.path.join(directory, chunk["file"]), fmt,
+                                                             batch_size))
+                       for kind in phase for chunk in manifest["kinds"].get(kind, {}).get("chunks", [])]
+            for kind, name, future in futures:
+                try:
+                    loaded[kind] += future.result()
+                except Exception as e:
+                    # logger.error("Failed to import chunk", kind=kind, file=name, error=e)
+                    raise RuntimeError(f"Failed to import {name}: {e}")
+            # logger.info("Import phase finished", kinds=phase, loaded={kind: loaded[kind] for kind in phase})
+    return loaded
@@ -1,8 +1,11 @@
 from .user import User
-from .session import GenerationSession
-from .image import GeneratedImage
+from .session import GenerationSession, SessionRecord, SessionResources
+from .image import GeneratedImage, ImageQuery, ImagePage
 from .vibe import VibeImage
 from .prompt_template import PromptTemplate
 from .parameter_set import ParameterSet
 from .tag import Tag
-from .ai_model import AiModel
\ No newline at end of file
+from .ai_model import AiModel
+from .rating_stat import RatingStat
+from .search import SearchHit, SearchPage
+from .similarity import SimilarHit
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Literal, Tuple
 
 class GeneratedImage(BaseModel):
     imageID: str = Field(...) # PK
@@ -12,4 +13,23 @@ class GeneratedImage(BaseModel):
     eagleItemID: Optional[str] = None
     generationStatus: str = Field(...) # 'pending', 'processing', 'success', 'error'
     errorMessage: Optional[str] = None
-    isVibeCandidate: bool = Field(default=False) # 将来拡張だがMVP設計書にあるため含める
\ No newline at end of file
+    isVibeCandidate: bool = Field(default=False) # 将来拡張だがMVP設計書にあるため含める
+    sweepCoordinates: Optional[str] = None # パラメータスイープの軸座標 (JSON文字列)。スイープ外の生成ではNone
+
+class ImageQuery(BaseModel):
+    """Filters for Neo4jRepository.query_images. Unset filters match everything."""
+    sessionID: Optional[str] = None
+    minRating: Optional[int] = None # 0-5, inclusive
+    maxRating: Optional[int] = None # 0-5, inclusive
+    generationStatus: Optional[str] = None # 'pending', 'processing', 'success', 'error'
+    tags: List[str] = Field(default_factory=list) # 画像がすべてのタグを持つこと (AND)
+    parameterRanges: Dict[str, Tuple[Optional[float], Optional[float]]] = Field(default_factory=dict) # 例: {"scale": (5, 7)} 両端を含む。Noneは無制限
+    parameterEquals: Dict[str, Any] = Field(default_factory=dict) # 例: {"sampler": "k_euler_ancestral"}
+    sessionsSince: Optional[datetime] = None # GenerationSession.timestamp >= (inclusive)
+    sessionsUntil: Optional[datetime] = None # GenerationSession.timestamp < (exclusive)
+    orderBy: Literal["newest", "rating"] = "newest" # newest: セッションの新しい順 / rating: 評価の高い順
+
+class ImagePage(BaseModel):
+    images: List[GeneratedImage] = Field(default_factory=list)
+    sessionIDs: Dict[str, str] = Field(default_factory=dict) # imageID -> sessionID
+    nextCursor: Optional[str] = None # 次ページの取得に渡すカーソル。最終ページではNone
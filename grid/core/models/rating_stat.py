@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class RatingStat(BaseModel):
+    key: str = Field(...) # PK, 'vibe:<vibeID>|<parameter>|<bucket>' または 'template:<templateID>|set:<setID>'
+    kind: str = Field(...) # 'vibe_parameter', 'template_parameter_set'
+    count: int = 0 # 評価済み(rating > 0)画像の数
+    sum: float = 0 # ratingの合計
+    sumSquares: float = 0 # ratingの二乗和
+    vibeID: Optional[str] = None
+    parameter: Optional[str] = None
+    bucket: Optional[float] = None # バケットの下限値
+    bucketWidth: Optional[float] = None
+    templateID: Optional[str] = None
+    setID: Optional[str] = None
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return max(self.sumSquares / self.count - self.mean ** 2, 0.0)
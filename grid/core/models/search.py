@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
+
+SearchKind = Literal["vibe", "template", "parameter_set", "session", "tag"]
+SEARCH_KINDS = ("vibe", "template", "parameter_set", "session", "tag")
+
+class SearchHit(BaseModel):
+    kind: SearchKind = Field(...) # 'vibe', 'template', 'parameter_set', 'session', 'tag'
+    id: str = Field(...) # vibeID / templateID / setID / sessionID / tagName
+    title: str = Field(...) # 一覧に表示する名前
+    snippet: Optional[str] = None # 補足表示 (テンプレートの内容、セッションのプロンプトなど)
+    score: float = 0.0 # 大きいほど関連度が高い
+
+class SearchPage(BaseModel):
+    hits: List[SearchHit] = Field(default_factory=list)
+    nextCursor: Optional[str] = None # 次ページの取得に渡すカーソル。最終ページではNone
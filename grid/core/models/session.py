@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 class GenerationSession(BaseModel):
     sessionID: str = Field(...) # PK, UUIDv7推奨
@@ -10,4 +10,18 @@ class GenerationSession(BaseModel):
     basePromptPositive: str = Field(...)
     basePromptNegative: Optional[str] = None
     notes: Optional[str] = None
-    overallStatus: str = Field(...) # 'pending', 'running', 'completed', 'partially_failed', 'failed'
\ No newline at end of file
+    overallStatus: str = Field(...) # 'pending', 'running', 'completed', 'partially_failed', 'failed'
+
+class SessionResources(BaseModel):
+    """Library resources a session is generated with; its images' rating aggregates are keyed by them."""
+    vibeIDs: List[str] = Field(default_factory=list) # reference_*_multipleの順
+    templateID: Optional[str] = None
+    parameterSetID: Optional[str] = None
+
+class SessionRecord(GenerationSession):
+    """A session with the relationships needed to recreate it (bulk export/import)."""
+    userID: str = Field(...)
+    modelName: str = Field(...)
+    vibeIDs: List[str] = Field(default_factory=list) # reference_*_multipleの順
+    templateID: Optional[str] = None
+    parameterSetID: Optional[str] = None
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+
+SimilarKind = Literal["session", "image"]
+
+class SimilarHit(BaseModel):
+    kind: SimilarKind = Field(...) # 'session', 'image'
+    id: str = Field(...) # sessionID / imageID
+    score: float = 0.0 # 特徴ベクトルのコサイン類似度 (-1〜1)。大きいほど似ている
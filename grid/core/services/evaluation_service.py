@@ -5,7 +5,7 @@ from typing import List, Dict, Any, Optional, Tuple
 # from grid.config import settings # 後で実装する構造化ログをインポート
 # import structlog # 後で実装する構造化ログをインポート
 
-from grid.core.db.repository import Neo4jRepository
+from grid.core.db.base import Repository
 from grid.core.api.eagle import EagleClient
 from grid.core.services.tagging_service import TaggingService
 from grid.core.models.image import GeneratedImage
@@ -13,7 +13,7 @@ from grid.core.models.image import GeneratedImage
 # logger = structlog.get_logger(__name__) # ロガーの初期化
 
 class EvaluationService:
-    def __init__(self, neo4j_repo: Neo4jRepository, eagle_client: EagleClient, tagging_service: TaggingService):
+    def __init__(self, neo4j_repo: Repository, eagle_client: EagleClient, tagging_service: TaggingService):
         self._neo4j_repo = neo4j_repo
         self._eagle_client = eagle_client
         self._tagging_service = tagging_service
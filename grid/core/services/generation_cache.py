@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List, Callable
+
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+DEFAULT_INDEX_PATH = os.path.join("data", "generated", "result_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MAX_AGE = 90 * 24 * 3600.0
+# Expired and surplus entries are removed on open and every this many puts
+_PRUNE_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    request_key TEXT PRIMARY KEY,
+    paths TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_created_at ON results (created_at);
+"""
+
+
+def make_request_key(prompt: str, model: str, action: str, parameters: Dict[str, Any]) -> Optional[str]:
+    """
+    Canonical hash of a generate-image request.
+
+    The negative prompt and seed are part of parameters. Returns None when the
+    request has no explicit seed: NovelAI then picks a random one, so the
+    output is not reproducible and must not be cached.
+    """
+    if parameters.get("seed") is None:
+        return None
+    canonical = json.dumps(
+        {"prompt": prompt, "model": model, "action": action, "parameters": parameters},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class GenerationResultCache:
+    """
+    Maps a canonical generate-image request to the image files it produced.
+
+    NovelAI output is deterministic for a fixed (prompt, negative prompt,
+    model, parameters, seed), so re-running an identical session can reuse the
+    images already on disk instead of spending quota. The index is a SQLite
+    table (WAL mode), so recording a result writes one row however large the
+    cache has grown; entries whose files have gone missing are dropped on
+    lookup.
+
+    Entries older than max_age seconds are removed, and beyond max_entries the
+    oldest ones are, when the cache is opened and every _PRUNE_EVERY puts.
+    Only index entries are removed: the image files belong to the library.
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age: Optional[float] = DEFAULT_MAX_AGE, clock: Callable[[], float] = time.time):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        if max_age is not None and max_age <= 0:
+            raise ValueError("max_age must be positive.")
+        self._max_entries = max_entries
+        self._max_age = max_age
+        self._clock = clock
+        if os.path.dirname(index_path):
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        # One connection shared by the pipeline's threads, serialized by a lock
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL") # Losing the last entries on power loss only costs a regeneration
+            self._conn.executescript(_SCHEMA)
+            self._prune()
+        # logger.info("GenerationResultCache initialized", index_path=index_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _prune(self) -> int:
+        removed = 0
+        if self._max_age is not None:
+            removed += self._conn.execute("DELETE FROM results WHERE created_at < ?",
+                                          (self._clock() - self._max_age,)).rowcount
+        removed += self._conn.execute(
+            "DELETE FROM results WHERE request_key IN ("
+            " SELECT request_key FROM results ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self._max_entries,)).rowcount
+        self._puts_since_prune = 0
+        return removed
+
+    def prune(self) -> int:
+        """Remove expired entries and the oldest ones beyond max_entries now. Returns how many were removed."""
+        with self._lock:
+            return self._prune()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return the cached image paths for key, or None if unknown or any file is missing."""
+        with self._lock:
+            row = self._conn.execute("SELECT paths FROM results WHERE request_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            paths = json.loads(row[0])
+            if not all(os.path.exists(path) for path in paths):
+                self._conn.execute("DELETE FROM results WHERE request_key = ?", (key,))
+                return None
+            return paths
+
+    def put(self, key: str, paths: List[str]):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results (request_key, paths, created_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(list(paths), ensure_ascii=False), self._clock()))
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= _PRUNE_EVERY:
+                self._prune()
+        # logger.info("Generation result cached", key=key, num_images=len(paths))
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE request_key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Optional, Dict, Any, List, Tuple, Iterable, AsyncIterator
+
+from pydantic import BaseModel, Field
+
+# import structlog # 後で実装する構造化ログをインポート
+
+from grid.core.api.novelai_async import AsyncNovelAIClient
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+class GenerationRequest(BaseModel):
+    prompt: str = Field(...)
+    model: str = Field(...)
+    action: str = "generate"
+    parameters: Dict[str, Any] = Field(...)
+    key: Optional[str] = None # 呼び出し側が結果を対応付けるための任意の識別子
+
+class GenerationResult(BaseModel):
+    request: GenerationRequest = Field(...)
+    images: List[Tuple[str, bytes]] = Field(default_factory=list) # (filename, binary_data)
+    error: Optional[str] = None
+    elapsed: float = 0.0 # 秒
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class GenerationQueue:
+    """
+    Keeps a bounded number of generate-image requests in flight and yields
+    each result as soon as its request finishes (completion order, not
+    submission order).
+    """
+
+    def __init__(self, client: AsyncNovelAIClient, max_in_flight: int = 4):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self._client = client
+        self._max_in_flight = max_in_flight
+        # logger.info("GenerationQueue initialized", max_in_flight=max_in_flight)
+
+    async def _execute(self, request: GenerationRequest) -> GenerationResult:
+        started = time.perf_counter()
+        try:
+            images = await self._client.generate_image(request.prompt, request.model, request.action, request.parameters)
+            return GenerationResult(request=request, images=images, elapsed=time.perf_counter() - started)
+        except Exception as e:
+            # logger.error("Queued generation request failed", key=request.key, error=e)
+            # A single failed request must not abort the remaining ones
+            return GenerationResult(request=request, error=str(e), elapsed=time.perf_counter() - started)
+
+    async def run(self, requests: Iterable[GenerationRequest]) -> AsyncIterator[GenerationResult]:
+        """
+        Execute requests with at most max_in_flight running concurrently.
+
+        Args:
+            requests: The requests to execute. Consumed lazily, so a generator of
+                      any length can be passed without materializing it.
+
+        Yields:
+            A GenerationResult per request, as soon as it completes. Failed
+            requests are reported through GenerationResult.error.
+        """
+        request_iter = iter(requests)
+        pending = set()
+
+        def fill():
+            while len(pending) < self._max_in_flight:
+                try:
+                    request = next(request_iter)
+                except StopIteration:
+                    return
+                pending.add(asyncio.ensure_future(self._execute(request)))
+
+        fill()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                fill() # Refill before yielding so the client stays saturated while the caller works
+                for task in done:
+                    yield task.result()
+        finally:
+            # The caller stopped iterating early: drop whatever is still running
+            for task in pending:
+                task.cancel()
@@ -1,26 +1,86 @@
 import uuid
 import os
 from datetime import datetime
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Iterable, Mapping, BinaryIO
 import json # jsonモジュールをインポート
 
+from pydantic import BaseModel, Field
+
 # import structlog # 後で実装する構造化ログをインポート
 
 from grid.core.api.novelai import NovelAIClient
-from grid.core.db.repository import Neo4jRepository
-from grid.core.models.session import GenerationSession
+from grid.core.services.generation_cache import GenerationResultCache, make_request_key
+from grid.core.services.job_queue import PersistentJobQueue, QueuedJob
+from grid.core.services.parameter_sweep import ParameterSweep, SweepResult
+from grid.core.services.pipeline import PipelineItem, PipelineStage, StagedPipeline
+from grid.core.services.similarity_service import SimilarityService
+from grid.core.db.base import Repository
+from grid.core.models.session import GenerationSession, SessionResources
 from grid.core.models.image import GeneratedImage
 from grid.core.models.vibe import VibeImage # Needed to process vibe info from session
 
 # logger = structlog.get_logger(__name__) # ロガーの初期化
 
+# Generated images are saved under <output_dir>/YYYY/MM/DD/<session>/
+DEFAULT_OUTPUT_DIR = os.path.join("data", "generated")
+# Image model every session is generated with and recorded under, unless the service is given another
+DEFAULT_MODEL = "nai-diffusion-4-full"
+
+class SessionGenerationResult(BaseModel):
+    session: GenerationSession = Field(...)
+    images: List[GeneratedImage] = Field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 class GenerationService:
-    def __init__(self, novelai_client: NovelAIClient, neo4j_repo: Neo4jRepository):
+    def __init__(self, novelai_client: NovelAIClient, neo4j_repo: Repository, result_cache: Optional[GenerationResultCache] = None,
+                 job_queue: Optional[PersistentJobQueue] = None, similarity: Optional[SimilarityService] = None,
+                 output_dir: str = DEFAULT_OUTPUT_DIR, model_name: str = DEFAULT_MODEL):
         self._novelai_client = novelai_client
         self._neo4j_repo = neo4j_repo
+        self._output_dir = output_dir
+        self._model_name = model_name
+        # Recorded sessions and images are added to its nearest-neighbour indexes
+        self._similarity = similarity
+        # Identical (prompt, model, parameters, seed) requests are served from already-saved images
+        self._result_cache = result_cache if result_cache is not None else GenerationResultCache()
+        # Durable run state for enqueue_run/resume_run; created lazily so plain generation needs no SQLite file
+        self._job_queue = job_queue
+        self._last_pipeline: Optional[StagedPipeline] = None
         # logger.info("GenerationService initialized")
 
-    def generate_images(self, session: GenerationSession, user_id: str) -> List[GeneratedImage]:
+    def _create_session(self, session: GenerationSession, user_id: str, model_name: str, resources: Optional[SessionResources] = None):
+        self._neo4j_repo.create_session(session, user_id, model_name)
+        # Linked before any image is recorded: the images' rating aggregates are keyed by these resources
+        if resources is not None and (resources.vibeIDs or resources.templateID or resources.parameterSetID):
+            self._neo4j_repo.link_session_resources(session.sessionID, resources.vibeIDs, resources.templateID,
+                                                    resources.parameterSetID)
+        if self._similarity is not None:
+            self._similarity.add_session(session)
+
+    def generate_images(self, session: GenerationSession, user_id: str, use_cache: bool = True,
+                        resources: Optional[SessionResources] = None) -> List[GeneratedImage]:
+        """
+        Generate the images for a session and record them in the database.
+
+        Args:
+            session: The session to generate.
+            user_id: The user the session is recorded under.
+            use_cache: When True (default), a request identical to one already
+                       generated (same prompt, model, parameters and explicit
+                       seed) reuses the saved image files without calling the
+                       API. Pass False to force a fresh API call.
+            resources: The vibes (in reference_*_multiple order), prompt
+                       template and parameter set the session uses. They are
+                       linked to the session so its images count towards the
+                       per-vibe and per-template rating aggregates.
+
+        Returns:
+            The GeneratedImage records that were saved.
+        """
         # logger.info("Starting image generation process", session_id=session.sessionID, user_id=user_id)
         generated_images = []
 
@@ -30,9 +90,8 @@ class GenerationService:
 
         try:
             # 1. Save session information to database
-            # TODO: Get model_name from session or config
-            model_name = "nai-diffusion-4-full" # Placeholder model name
-            self._neo4j_repo.create_session(session, user_id, model_name)
+            model_name = self._model_name
+            self._create_session(session, user_id, model_name, resources)
             # logger.info("Session saved to database", session_id=session.sessionID)
 
             # 2. Prepare parameters for API call
@@ -40,75 +99,10 @@ class GenerationService:
             prompt = session.basePromptPositive
             model = model_name # Use the same model name
             action = "generate" # Assuming normal generation
+            parameters = self._load_parameters(session, model)
 
-            # Load parameters from session.baseParameters
-            try:
-                parameters: Dict[str, Any] = json.loads(session.baseParameters)
-            except json.JSONDecodeError as e:
-                # logger.error("Failed to parse baseParameters JSON", session_id=session.sessionID, error=e)
-                raise ValueError(f"Invalid JSON in session.baseParameters for session {session.sessionID}: {e}")
-
-            # TODO: Add vibe parameters if session includes vibe info
-            # if session.vibe_info: # Assuming session has vibe_info attribute
-            #     parameters["reference_image_multiple"] = [v.encodedVibePath for v in session.vibe_info] # Need Base64 data, not path
-            #     parameters["reference_strength_multiple"] = [v.strength for v in session.vibe_info] # Need strength
-
-            # Ensure model is included in parameters (API requirement)
-            parameters["model"] = model # Use the determined model name
-
-            # 3. Execute image generation via API client
-            # The generate_image method returns a list of (filename, binary_data) tuples
-            generated_image_data = self._novelai_client.generate_image(prompt, model, action, parameters)
-            # logger.info("Image generation API call completed", session_id=session.sessionID, num_images=len(generated_image_data))
-
-            # 4. Process and save generated images
-            for index, (filename, binary_data) in enumerate(generated_image_data): # Added index
-                image_id = str(uuid.uuid4()) # Generate UUID for the image
-                seed = parameters.get("seed", 0) + index # Extract seed from parameters and add index for uniqueness if multiple images generated in one API call
-                actual_parameters: Dict[str, Any] = parameters # Use the parameters sent to API
-                actual_prompt_positive = prompt # Use the prompt sent to API
-                actual_prompt_negative = parameters.get("negative_prompt", "") # Extract negative prompt
-
-                # Determine save path (data/generated/YYYY/MM/DD/<session>/<image_id>.png)
-                now = datetime.now()
-                # Use session ID in the directory path
-                save_dir = os.path.join("data", "generated", str(now.year), f"{now.month:02d}", f"{now.day:02d}", session.sessionID)
-                os.makedirs(save_dir, exist_ok=True) # Create directories if they don't exist
-
-                # Use image_id in the filename to ensure uniqueness
-                image_file_name = f"{image_id}.png" # Use image_id for unique filename
-                image_path = os.path.join(save_dir, image_file_name)
-
-                try:
-                    with open(image_path, "wb") as f:
-                        f.write(binary_data)
-                    # logger.info("Generated image saved to file", image_id=image_id, image_path=image_path)
-
-                    # Create GeneratedImage model
-                    image_model = GeneratedImage(
-                        imageID=image_id,
-                        imagePath=image_path,
-                        seed=seed, # Use the potentially adjusted seed
-                        actualParameters=actual_parameters,
-                        actualPromptPositive=actual_prompt_positive,
-                        actualPromptNegative=actual_prompt_negative,
-                        rating=0, # Default rating
-                        eagleItemID=None, # Not sent to Eagle yet
-                        generationStatus="success", # Assuming success for now
-                        errorMessage=None,
-                        isVibeCandidate=False # Default
-                    )
-                    generated_images.append(image_model)
-
-                    # Save GeneratedImage node to database
-                    self._neo4j_repo.create_generated_image(image_model, session.sessionID)
-                    # logger.info("GeneratedImage node saved to database", image_id=image_id)
-
-                except Exception as e:
-                    # logger.error("Failed to save generated image or save to DB", image_id=image_id, error=e)
-                    # TODO: Update image status in DB to 'error'
-                    # self._neo4j_repo.update_image_status(image_id, "error", str(e))
-                    pass # Continue processing other images
+            # 3-4. Generate (or serve from the result cache) and record images
+            generated_images = self._generate_and_record(session.sessionID, prompt, model, action, parameters, use_cache)
 
             # logger.info("Image generation process completed", session_id=session.sessionID, num_successfully_processed=len(generated_images))
             # TODO: Update session status in DB to 'completed' or 'partially_failed'
@@ -122,4 +116,368 @@ class GenerationService:
 
         return generated_images
 
-    # TODO: Add other generation-related methods later
\ No newline at end of file
+    @staticmethod
+    def _load_parameters(session: GenerationSession, model: str) -> Dict[str, Any]:
+        # Load parameters from session.baseParameters
+        try:
+            parameters: Dict[str, Any] = json.loads(session.baseParameters)
+        except json.JSONDecodeError as e:
+            # logger.error("Failed to parse baseParameters JSON", session_id=session.sessionID, error=e)
+            raise ValueError(f"Invalid JSON in session.baseParameters for session {session.sessionID}: {e}")
+
+        # TODO: Add vibe parameters if session includes vibe info
+        # if session.vibe_info: # Assuming session has vibe_info attribute
+        #     parameters["reference_image_multiple"] = [v.encodedVibePath for v in session.vibe_info] # Need Base64 data, not path
+        #     parameters["reference_strength_multiple"] = [v.strength for v in session.vibe_info] # Need strength
+
+        # Ensure model is included in parameters (API requirement)
+        parameters["model"] = model # Use the determined model name
+        return parameters
+
+    def _generate_and_record(self, session_id: str, prompt: str, model: str, action: str, parameters: Dict[str, Any],
+                             use_cache: bool, sweep_coordinates: Optional[Dict[str, Any]] = None) -> List[GeneratedImage]:
+        """Run one generate-image request (or serve it from the result cache) and save its images under session_id."""
+        job = _GenerationJob(session_id, prompt, model, action, parameters, use_cache, sweep_coordinates,
+                             output_dir=self._output_dir)
+
+        # 3. Serve identical requests from disk, otherwise execute image generation via API client
+        if not self._lookup_cached(job):
+            # Images are streamed from the zip response straight to their final
+            # location (<output_dir>/YYYY/MM/DD/<session>/<image_id>.png), so no
+            # image bytes are held in memory here.
+            image_paths = self._novelai_client.generate_image_to_dir(
+                prompt, model, action, parameters, job.save_dir,
+                filename_factory=lambda index, member_name: f"{uuid.uuid4()}.png" # Use a fresh image_id for a unique filename
+            )
+            # logger.info("Image generation API call completed", session_id=session_id, num_images=len(image_paths))
+            self._store_written(job, image_paths)
+
+        # 4. Record generated images
+        self._persist_stage(job)
+        return job.images
+
+    def _lookup_cached(self, job: "_GenerationJob") -> bool:
+        job.cache_key = make_request_key(job.prompt, job.model, job.action, job.parameters) if job.use_cache else None
+        cached_paths = self._result_cache.get(job.cache_key) if job.cache_key is not None else None
+        if cached_paths is None:
+            return False
+        # logger.info("Generation served from result cache", session_id=job.session_id, num_images=len(cached_paths))
+        job.image_paths = cached_paths
+        # The files belong to an earlier session's images, so this session's nodes get fresh IDs
+        job.image_ids = [str(uuid.uuid4()) for _ in cached_paths]
+        return True
+
+    def _store_written(self, job: "_GenerationJob", image_paths: List[str]):
+        job.image_paths = image_paths
+        job.image_ids = [os.path.splitext(os.path.basename(path))[0] for path in image_paths] # The filename stem is the image_id
+        if job.cache_key is not None and image_paths:
+            self._result_cache.put(job.cache_key, image_paths)
+
+    def _fetch_stage(self, job: "_GenerationJob") -> "_GenerationJob":
+        """Pipeline stage 1 (network): download the zip archive unless the result cache has the images."""
+        if not self._lookup_cached(job):
+            job.archive = self._novelai_client.download_image_archive(job.prompt, job.model, job.action, job.parameters)
+        return job
+
+    def _write_stage(self, job: "_GenerationJob") -> "_GenerationJob":
+        """Pipeline stage 2 (disk): extract the downloaded archive to the session's image directory."""
+        if job.archive is None:
+            return job # Served from the result cache
+        try:
+            image_paths = self._novelai_client.extract_image_archive(
+                job.archive, job.save_dir,
+                filename_factory=lambda index, member_name: f"{uuid.uuid4()}.png" # Use a fresh image_id for a unique filename
+            )
+        finally:
+            job.archive.close()
+            job.archive = None
+        self._store_written(job, image_paths)
+        return job
+
+    def _persist_stage(self, job: "_GenerationJob") -> "_GenerationJob":
+        """Pipeline stage 3 (graph): create the GeneratedImage nodes of a job in one batch write."""
+        parameters = job.parameters
+        for index, (image_id, image_path) in enumerate(zip(job.image_ids, job.image_paths)): # Added index
+            seed = parameters.get("seed", 0) + index # Extract seed from parameters and add index for uniqueness if multiple images generated in one API call
+            actual_parameters: Dict[str, Any] = parameters # Use the parameters sent to API
+            actual_prompt_positive = job.prompt # Use the prompt sent to API
+            actual_prompt_negative = parameters.get("negative_prompt", "") # Extract negative prompt
+
+            # Create GeneratedImage model
+            image_model = GeneratedImage(
+                imageID=image_id,
+                imagePath=image_path,
+                seed=seed, # Use the potentially adjusted seed
+                actualParameters=actual_parameters,
+                actualPromptPositive=actual_prompt_positive,
+                actualPromptNegative=actual_prompt_negative,
+                rating=0, # Default rating
+                eagleItemID=None, # Not sent to Eagle yet
+                generationStatus="success", # Assuming success for now
+                errorMessage=None,
+                isVibeCandidate=False, # Default
+                sweepCoordinates=json.dumps(job.sweep_coordinates, sort_keys=True) if job.sweep_coordinates is not None else None
+            )
+            job.images.append(image_model)
+
+        try:
+            # Save all GeneratedImage nodes of the request in a single UNWIND transaction
+            # (with a write-behind OutboxRepository this only appends to the local journal)
+            self._neo4j_repo.create_generated_images(job.images, job.session_id)
+            # logger.info("GeneratedImage nodes saved to database", session_id=job.session_id, num_images=len(job.images))
+        except Exception as e:
+            # logger.error("Failed to save generated images to DB", session_id=job.session_id, error=e)
+            # Fail the job rather than drop its records: the image files are kept and the error is reported
+            raise RuntimeError(f"Failed to record {len(job.images)} images of session {job.session_id}: {e}")
+        if self._similarity is not None:
+            self._similarity.add_images(job.images)
+        return job
+
+    def _run_pipeline(self, jobs: Iterable["_GenerationJob"], max_concurrency: int) -> Iterator[PipelineItem]:
+        """
+        Push jobs through fetch -> write -> persist stages connected by bounded
+        queues, so the next NovelAI request never waits on disk or Neo4j.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        pipeline = StagedPipeline([
+            PipelineStage("fetch", self._fetch_stage, workers=max_concurrency),
+            PipelineStage("write", self._write_stage, workers=1),
+            PipelineStage("persist", self._persist_stage, workers=1),
+        ], queue_size=max_concurrency)
+        self._last_pipeline = pipeline
+        return pipeline.run(jobs)
+
+    def pipeline_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage timing of the running (or most recent) pipelined run:
+        items, errors, busy/idle/blocked seconds for fetch, write and persist.
+        The stage with the most busy_seconds is the bottleneck.
+        """
+        return self._last_pipeline.stats() if self._last_pipeline is not None else {}
+
+    def generate_sessions(self, sessions: Iterable[GenerationSession], user_id: str, max_concurrency: int = 2,
+                          use_cache: bool = True, resources: Optional[Mapping[str, SessionResources]] = None
+                          ) -> Iterator[SessionGenerationResult]:
+        """
+        Generate many sessions through the staged pipeline.
+
+        Args:
+            sessions: The sessions to generate, consumed lazily.
+            user_id: The user the sessions are recorded under.
+            max_concurrency: Maximum number of generate-image requests in flight.
+            use_cache: See generate_images.
+            resources: SessionResources by sessionID (see generate_images).
+
+        Yields:
+            A SessionGenerationResult per session, in completion order. Failed
+            sessions are reported through SessionGenerationResult.error.
+        """
+        model_name = self._model_name
+        failures: List[SessionGenerationResult] = []
+
+        def jobs():
+            for session in sessions:
+                try:
+                    parameters = self._load_parameters(session, model_name)
+                    self._create_session(session, user_id, model_name, (resources or {}).get(session.sessionID))
+                except Exception as e:
+                    # logger.error("Failed to prepare session for generation", session_id=session.sessionID, error=e)
+                    failures.append(SessionGenerationResult(session=session, error=str(e)))
+                    continue
+                yield _GenerationJob(session.sessionID, session.basePromptPositive, model_name, "generate", parameters,
+                                     use_cache, session=session, output_dir=self._output_dir)
+
+        for item in self._run_pipeline(jobs(), max_concurrency):
+            while failures:
+                yield failures.pop(0)
+            if item.failed_stage == "input":
+                raise item.error # The sessions iterable itself failed
+            job = item.value
+            if item.ok:
+                yield SessionGenerationResult(session=job.session, images=job.images)
+            else:
+                yield SessionGenerationResult(session=job.session, error=str(item.error))
+        while failures:
+            yield failures.pop(0)
+
+    def run_sweep(self, session: GenerationSession, user_id: str, sweep: ParameterSweep, max_concurrency: int = 4,
+                  use_cache: bool = True, resources: Optional[SessionResources] = None) -> Iterator[SweepResult]:
+        """
+        Generate one job per point of a parameter sweep around a base session.
+
+        The session is saved once as the parent; each sweep point overrides its
+        axes on top of session.baseParameters and its images are linked to the
+        parent session with their axis coordinates (GeneratedImage.sweepCoordinates).
+        Points are expanded lazily and run through the fetch -> write -> persist
+        pipeline with at most max_concurrency requests in flight.
+
+        Args:
+            session: The base (parent) session.
+            user_id: The user the session is recorded under.
+            sweep: The axes to sweep, e.g. ParameterSweep([SweepAxis.range("scale", 3, 7.5, 0.5), ...]).
+            max_concurrency: Maximum number of generate-image requests in flight.
+            use_cache: See generate_images.
+            resources: See generate_images.
+
+        Yields:
+            A SweepResult per sweep point, in completion order. A failed job is
+            reported through SweepResult.error without stopping the sweep.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        model_name = self._model_name
+        prompt = session.basePromptPositive
+        action = "generate"
+        base_parameters = self._load_parameters(session, model_name)
+        self._create_session(session, user_id, model_name, resources)
+        # logger.info("Sweep session saved to database", session_id=session.sessionID, num_jobs=len(sweep))
+
+        jobs = (
+            _GenerationJob(session.sessionID, prompt, model_name, action, sweep.apply(base_parameters, coordinates),
+                           use_cache, coordinates, output_dir=self._output_dir)
+            for coordinates in sweep
+        )
+        for item in self._run_pipeline(jobs, max_concurrency):
+            if item.failed_stage == "input":
+                raise item.error # Expanding the sweep itself failed
+            job = item.value
+            if item.ok:
+                yield SweepResult(coordinates=job.sweep_coordinates, images=job.images)
+            else:
+                # logger.error("Sweep job failed", session_id=session.sessionID, coordinates=job.sweep_coordinates, error=item.error)
+                yield SweepResult(coordinates=job.sweep_coordinates, error=str(item.error))
+
+    @property
+    def job_queue(self) -> PersistentJobQueue:
+        if self._job_queue is None:
+            self._job_queue = PersistentJobQueue()
+        return self._job_queue
+
+    def enqueue_run(self, session: GenerationSession, user_id: str, sweep: Optional[ParameterSweep] = None,
+                    run_id: Optional[str] = None, resources: Optional[SessionResources] = None) -> str:
+        """
+        Record a session (optionally swept) as a durable run in the job queue,
+        one job per sweep point (a single job without a sweep). Nothing is
+        generated yet; call resume_run to execute it.
+
+        Enqueueing again with the same run_id adds no duplicate jobs and does
+        not recreate the session node. resources (see generate_images) are
+        linked together with the session.
+
+        Returns:
+            The run ID.
+        """
+        model_name = self._model_name
+        self._load_parameters(session, model_name) # Reject invalid baseParameters before anything is recorded
+        if run_id is None or self.job_queue.get_run(run_id) is None:
+            self._create_session(session, user_id, model_name, resources)
+        points = sweep if sweep is not None else [{}]
+        run_id = self.job_queue.create_run(session.sessionID, user_id, session.model_dump_json(),
+                                           ({"coordinates": coordinates} for coordinates in points), run_id=run_id)
+        # logger.info("Generation run enqueued", run_id=run_id, session_id=session.sessionID)
+        return run_id
+
+    def resume_run(self, run_id: str, max_concurrency: int = 4, use_cache: bool = True) -> Iterator[SweepResult]:
+        """
+        Execute the unfinished jobs of a run through the fetch -> write ->
+        persist pipeline. Jobs are leased one at a time as the pipeline has
+        room, and marked done (with their image IDs and paths) as soon as their
+        images are recorded, so after a crash only unfinished jobs run again.
+        A failed job is retried up to the queue's max_attempts.
+
+        The session's overallStatus is set to 'running' while jobs execute and
+        to 'completed', 'partially_failed' or 'failed' once none are left.
+
+        Yields:
+            A SweepResult per finished job (done or permanently failed), in
+            completion order. Unswept runs report empty coordinates.
+        """
+        queue = self.job_queue
+        run = queue.get_run(run_id)
+        if run is None:
+            raise ValueError(f"Unknown generation run: {run_id}")
+        session = GenerationSession.model_validate_json(run.session_json)
+        model_name = self._model_name
+        base_parameters = self._load_parameters(session, model_name)
+        self._neo4j_repo.update_session_status(session.sessionID, "running")
+
+        def jobs():
+            while True:
+                leased = queue.lease(run_id)
+                if not leased:
+                    return
+                queued = leased[0]
+                coordinates = queued.payload.get("coordinates") or {}
+                job = _GenerationJob(session.sessionID, session.basePromptPositive, model_name, "generate",
+                                     ParameterSweep.apply(base_parameters, coordinates), use_cache,
+                                     coordinates or None, session=session, output_dir=self._output_dir)
+                job.queued = queued
+                yield job
+
+        # Jobs that failed and went back to pending after the input ran dry get another pass
+        processed = True
+        while processed:
+            processed = False
+            for item in self._run_pipeline(jobs(), max_concurrency):
+                if item.failed_stage == "input":
+                    raise item.error # The queue itself failed
+                processed = True
+                job = item.value
+                coordinates = job.sweep_coordinates or {}
+                if item.ok:
+                    queue.complete(job.queued.job_id, {"imageIDs": job.image_ids, "imagePaths": job.image_paths})
+                    yield SweepResult(coordinates=coordinates, images=job.images)
+                elif queue.fail(job.queued.job_id, str(item.error)) == "failed":
+                    # logger.error("Generation job failed permanently", run_id=run_id, coordinates=coordinates, error=item.error)
+                    yield SweepResult(coordinates=coordinates, error=str(item.error))
+
+        counts = queue.counts(run_id)
+        if counts["pending"] == 0 and counts["in_flight"] == 0:
+            if counts["failed"] == 0:
+                status = "completed"
+            else:
+                status = "partially_failed" if counts["done"] else "failed"
+            self._neo4j_repo.update_session_status(session.sessionID, status)
+            # logger.info("Generation run finished", run_id=run_id, status=status, **counts)
+
+    def resume_unfinished(self, max_concurrency: int = 4, use_cache: bool = True) -> Iterator[Tuple[str, SweepResult]]:
+        """
+        Resume every run left unfinished by an earlier process, oldest first.
+        Leases held by processes that died are released first.
+
+        Yields:
+            (run_id, SweepResult) per finished job.
+        """
+        self.job_queue.recover_orphaned()
+        for run_id in self.job_queue.unfinished_runs():
+            for result in self.resume_run(run_id, max_concurrency, use_cache):
+                yield run_id, result
+
+    # TODO: Add other generation-related methods later
+
+
+class _GenerationJob:
+    """State of one generate-image request as it moves through the pipeline stages."""
+
+    def __init__(self, session_id: str, prompt: str, model: str, action: str, parameters: Dict[str, Any], use_cache: bool,
+                 sweep_coordinates: Optional[Dict[str, Any]] = None, session: Optional[GenerationSession] = None,
+                 output_dir: str = DEFAULT_OUTPUT_DIR):
+        self.session_id = session_id
+        self.prompt = prompt
+        self.model = model
+        self.action = action
+        self.parameters = parameters
+        self.use_cache = use_cache
+        self.sweep_coordinates = sweep_coordinates
+        self.session = session
+        now = datetime.now()
+        # Use session ID in the directory path
+        self.save_dir = os.path.join(output_dir, str(now.year), f"{now.month:02d}", f"{now.day:02d}", session_id)
+        self.cache_key: Optional[str] = None
+        self.archive: Optional[BinaryIO] = None
+        self.image_paths: List[str] = []
+        self.image_ids: List[str] = []
+        self.images: List[GeneratedImage] = []
+        self.queued: Optional[QueuedJob] = None # Set for jobs leased from the PersistentJobQueue
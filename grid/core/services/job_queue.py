@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any, List, Iterable, Callable
+
+from pydantic import BaseModel, Field
+
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+DEFAULT_DB_PATH = os.path.join("data", "jobs.sqlite3")
+
+JOB_STATUSES = ("pending", "in_flight", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_json TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires_at REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_run_status ON jobs (run_id, status, seq);
+"""
+
+
+class QueuedJob(BaseModel):
+    job_id: str = Field(...)
+    run_id: str = Field(...)
+    seq: int = Field(...)
+    payload: Dict[str, Any] = Field(...)
+    attempts: int = 0
+
+
+class RunInfo(BaseModel):
+    run_id: str = Field(...)
+    session_id: str = Field(...)
+    user_id: str = Field(...)
+    session_json: str = Field(...) # GenerationSession.model_dump_json()
+
+
+class PersistentJobQueue:
+    """
+    Crash-safe local queue of generation jobs backed by SQLite in WAL mode.
+
+    A run (one session, optionally swept) is enqueued as one job per request.
+    Workers lease jobs: a lease marks the job in_flight until lease_seconds
+    from now, and a job whose lease expired (its worker died) is handed out
+    again. Completed jobs are never re-run, so a run interrupted by a crash
+    resumes where it stopped. Delivery is at-least-once: a job that finished
+    but was not marked done before the crash runs again.
+
+    Leases record the worker ("<host>:<pid>"); recover_orphaned() releases
+    leases held by dead processes on this host right away instead of waiting
+    for them to expire.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, lease_seconds: float = 600.0, max_attempts: int = 3,
+                 clock: Callable[[], float] = time.time):
+        if lease_seconds <= 0:
+            raise ValueError("lease_seconds must be positive.")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1.")
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        self._clock = clock
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # One connection shared by the pipeline's threads, serialized by a lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL") # Durable across process crashes in WAL mode
+            self._conn.executescript(_SCHEMA)
+        # logger.info("PersistentJobQueue initialized", db_path=db_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run func inside an immediate (write-locked) transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def job_id_for(run_id: str, payload: Dict[str, Any]) -> str:
+        """Deterministic job ID, so enqueueing the same run twice does not duplicate work."""
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return f"{run_id}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]}"
+
+    def create_run(self, session_id: str, user_id: str, session_json: str, payloads: Iterable[Dict[str, Any]],
+                   run_id: Optional[str] = None, batch_size: int = 500) -> str:
+        """
+        Record a run and enqueue one job per payload. Payloads are consumed in
+        batches, so a large sweep is never materialized in memory.
+
+        Returns:
+            The run ID (generated when not given).
+        """
+        run_id = run_id or str(uuid.uuid4())
+        now = self._clock()
+        self._write(lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO runs (run_id, session_id, user_id, session_json, created_at) VALUES (?, ?, ?, ?, ?)",
+            (run_id, session_id, user_id, session_json, now)))
+
+        batch = []
+        for seq, payload in enumerate(payloads):
+            batch.append((self.job_id_for(run_id, payload), run_id, seq, json.dumps(payload, default=str), now))
+            if len(batch) >= batch_size:
+                self._insert_jobs(batch)
+                batch = []
+        if batch:
+            self._insert_jobs(batch)
+        # logger.info("Generation run enqueued", run_id=run_id, session_id=session_id)
+        return run_id
+
+    def _insert_jobs(self, rows: List[tuple]):
+        self._write(lambda conn: conn.executemany(
+            "INSERT OR IGNORE INTO jobs (job_id, run_id, seq, payload, updated_at) VALUES (?, ?, ?, ?, ?)", rows))
+
+    def get_run(self, run_id: str) -> Optional[RunInfo]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, session_id, user_id, session_json FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        return RunInfo(run_id=row[0], session_id=row[1], user_id=row[2], session_json=row[3])
+
+    def unfinished_runs(self) -> List[str]:
+        """Runs that still have pending or in-flight jobs, oldest first (what to resume after a restart)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.run_id FROM runs r WHERE EXISTS ("
+                " SELECT 1 FROM jobs j WHERE j.run_id = r.run_id AND j.status IN ('pending', 'in_flight'))"
+                " ORDER BY r.created_at").fetchall()
+        return [row[0] for row in rows]
+
+    def lease(self, run_id: str, limit: int = 1) -> List[QueuedJob]:
+        """
+        Atomically take up to `limit` jobs of a run: pending ones first, then
+        in-flight ones whose lease has expired.
+        """
+        def _lease(conn):
+            now = self._clock()
+            rows = conn.execute(
+                "SELECT job_id, seq, payload, attempts FROM jobs"
+                " WHERE run_id = ? AND (status = 'pending' OR (status = 'in_flight' AND lease_expires_at < ?))"
+                " ORDER BY seq LIMIT ?", (run_id, now, limit)).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'in_flight', attempts = attempts + 1, lease_expires_at = ?, worker = ?, updated_at = ? WHERE job_id = ?",
+                [(now + self._lease_seconds, self._worker_id, now, row[0]) for row in rows])
+            return [QueuedJob(job_id=row[0], run_id=run_id, seq=row[1], payload=json.loads(row[2]), attempts=row[3] + 1) for row in rows]
+
+        return self._write(_lease)
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True # Exists, owned by another user
+        return True
+
+    def recover_orphaned(self) -> int:
+        """
+        Return in-flight jobs leased by processes on this host that no longer
+        exist to pending. Call on startup before resuming runs.
+
+        Returns:
+            The number of jobs released.
+        """
+        host = socket.gethostname()
+
+        def _recover(conn):
+            orphaned = []
+            for job_id, worker in conn.execute("SELECT job_id, worker FROM jobs WHERE status = 'in_flight'").fetchall():
+                worker_host, _, pid = (worker or "").rpartition(":")
+                if worker_host == host and pid.isdigit() and not self._is_alive(int(pid)):
+                    orphaned.append((self._clock(), job_id))
+            conn.executemany(
+                "UPDATE jobs SET status = 'pending', lease_expires_at = NULL, worker = NULL, updated_at = ? WHERE job_id = ?",
+                orphaned)
+            return len(orphaned)
+
+        released = self._write(_recover)
+        # logger.info("Orphaned generation jobs released", count=released)
+        return released
+
+    def renew(self, job_id: str):
+        """Extend the lease of a long-running job."""
+        now = self._clock()
+        self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE job_id = ? AND status = 'in_flight'",
+            (now + self._lease_seconds, now, job_id)))
+
+    def complete(self, job_id: str, result: Optional[Dict[str, Any]] = None):
+        now = self._clock()
+        self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = 'done', lease_expires_at = NULL, worker = NULL, result = ?, error = NULL, updated_at = ? WHERE job_id = ?",
+            (json.dumps(result, default=str) if result is not None else None, now, job_id)))
+
+    def fail(self, job_id: str, error: str, retry: bool = True) -> Optional[str]:
+        """
+        Record a failure. The job goes back to pending until max_attempts is reached.
+
+        Returns:
+            The job's new status ('pending' or 'failed'), or None for an unknown job.
+        """
+        def _fail(conn):
+            row = conn.execute("SELECT attempts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = "pending" if retry and row[0] < self._max_attempts else "failed"
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires_at = NULL, worker = NULL, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, self._clock(), job_id))
+            return status
+
+        return self._write(_fail)
+
+    def counts(self, run_id: str) -> Dict[str, int]:
+        """Number of jobs of a run per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (run_id,)).fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
@@ -1,95 +1,63 @@
 import uuid # Import uuid module
 from datetime import datetime
-import requests # Import requests
 import os # Import os
-import base64 # Import base64
-from PIL import Image # Import Image
-import io # Import io
 
-from typing import Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Optional, List, Dict, Iterable, Deque, Tuple
+
+from pydantic import BaseModel, Field
 # import structlog # 後で実装する構造化ログをインポート
 
 # from grid.config import settings # 後で実装する設定管理からインポート
-from grid.core.db.repository import Neo4jRepository
+from grid.core.api.novelai import NovelAIClient, prepare_vibe_image
+from grid.core.api.rate_limit import RequestScheduler
+from grid.core.api.transport import NovelAITransport
+from grid.core.api.vibe_cache import VibeCache
+from grid.core.db.base import Repository
 from grid.core.models.vibe import VibeImage
 # from novelai_api.NovelAI_API import NovelAIAPI # novelai-apiは直接encode-vibeを提供しないため使用しない
 
 # logger = structlog.get_logger(__name__) # ロガーの初期化
 
+# Model passed to /ai/encode-vibe (value from the Web UI example)
+ENCODE_VIBE_MODEL = "nai-diffusion-4-full"
+
+class VibeRegistrationResult(BaseModel):
+    image_path: str = Field(...)
+    vibe: Optional[VibeImage] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 class LibraryService:
-    # Modify constructor to accept Neo4jRepository and potentially settings
-    def __init__(self, neo4j_repo: Neo4jRepository):
+    # Modify constructor to accept a Repository and potentially settings
+    def __init__(self, neo4j_repo: Repository, scheduler: Optional[RequestScheduler] = None, vibe_cache: Optional[VibeCache] = None,
+                 base_url: Optional[str] = None, transport: Optional[NovelAITransport] = None,
+                 novelai_client: Optional[NovelAIClient] = None):
         self._neo4j_repo = neo4j_repo
         # TODO: Load NovelAI API key and base URL from settings
         self._novelai_api_key = os.getenv("NOVELAI_API_KEY") # Temporarily load from env var
-        self._novelai_base_url = "https://image.novelai.net" # Base URL for image API
+        # encode-vibe goes through NovelAIClient so both services share one scheduler,
+        # vibe cache and pooled transport (pass the application's client to share them)
+        if novelai_client is None:
+            novelai_client = NovelAIClient(self._novelai_api_key, scheduler=scheduler, vibe_cache=vibe_cache,
+                                           base_url=base_url, transport=transport)
+        else:
+            self._novelai_api_key = novelai_client.api_key
+        self._novelai_client = novelai_client
+        self._vibe_cache = novelai_client.vibe_cache
         # logger.info("LibraryService initialized")
 
     def _encode_vibe_api_call(self, image_path: str, ie_value: float) -> str:
-        """Internal method to call NovelAI /ai/encode-vibe endpoint directly."""
-        if not os.path.exists(image_path):
-            # logger.error("Image file not found for encoding", image_path=image_path)
-            raise FileNotFoundError(f"Image file not found at {image_path}")
-
-        try:
-            with Image.open(image_path) as img:
-                # Convert image to RGB if necessary (JPEG does not support alpha channel)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                # Save image to a buffer and base64 encode
-                buf = io.BytesIO()
-                img.save(buf, format='JPEG') # Use JPEG format
-                image_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-
-        except Exception as e:
-            # logger.error("Failed to read or process image for encoding", image_path=image_path, error=e)
-            raise RuntimeError(f"Failed to read or process image {image_path}: {e}")
-
-        url = f"{self._novelai_base_url}/ai/encode-vibe"
-        payload = {
-            "image": image_base64,
-            # Cast ie_value to int
-            "information_extracted": int(ie_value),
-            # Set model to the specific value from Web UI example
-            "model": "nai-diffusion-4-full"
-            # Remove mask parameter as it's not in the Web UI example
-            # "mask": "", # Add mask parameter with empty string
-        }
-
-        headers = {
-            "Authorization": f"Bearer {self._novelai_api_key}", # Keep Bearer scheme for now
-            "Content-Type": "application/json"
-        }
-
-        try:
-            # logger.info("Sending encode-vibe request to NovelAI API", image_path=image_path, ie_value=ie_value)
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-            # Save the binary response content to a file
-            encoded_vibe_data = response.content
-
-            # Determine save path (data/encoded/YYYY/MM/DD/vibe_<uuid>.naiv4vibe)
-            now = datetime.now()
-            save_dir = os.path.join("data", "encoded", str(now.year), f"{now.month:02d}", f"{now.day:02d}")
-            os.makedirs(save_dir, exist_ok=True) # Create directories if they don't exist
+        """Encode a vibe image via NovelAIClient (served from the vibe cache when possible)."""
+        # Cast ie_value to int, matching what the Web UI sends
+        return self._novelai_client.encode_vibe(image_path, int(ie_value), ENCODE_VIBE_MODEL)
 
-            vibe_file_name = f"vibe_{uuid.uuid4()}.naiv4vibe" # Use uuid4 for file name
-            save_path = os.path.join(save_dir, vibe_file_name)
-
-            with open(save_path, "wb") as f:
-                f.write(encoded_vibe_data)
-
-            # logger.info("Encoded vibe saved successfully", save_path=save_path)
-            return save_path
-
-        except requests.exceptions.RequestException as e:
-            # logger.error("NovelAI API encode-vibe request failed", url=url, error=e)
-            raise RuntimeError(f"NovelAI API encode-vibe request failed: {e}")
-        except Exception as e:
-            # logger.error("Failed to save encoded vibe data after API call", error=e)
-            raise RuntimeError(f"Failed to save encoded vibe data: {e}")
+    def _upload_vibe_image(self, image_base64: str, information_extracted: int, cache_key: str) -> str:
+        return self._novelai_client.upload_vibe_image(image_base64, information_extracted, ENCODE_VIBE_MODEL, cache_key)
 
 
     def register_vibe(self, image_path: str, vibe_type: str, ie_value: float, notes: Optional[str] = None) -> VibeImage:
@@ -134,4 +102,142 @@ class LibraryService:
             # logger.error("An unexpected error occurred during vibe registration", error=e)
             raise RuntimeError(f"Vibe registration failed: {e}") # Wrap unexpected errors
 
+    def register_vibes(self, image_paths: Iterable[str], vibe_type: str, ie_value: float, notes: Optional[str] = None,
+                       max_concurrency: int = 4, process_workers: Optional[int] = None) -> List[VibeRegistrationResult]:
+        """
+        Register many vibe images at once.
+
+        The work runs as three overlapping stages: images are decoded and
+        JPEG-encoded in a process pool, each prepared image is handed to a
+        bounded thread pool for the encode-vibe call as soon as it is ready
+        (at most process_workers + max_concurrency payloads are in memory), and
+        every resulting VibeImage node is written in a single UNWIND transaction.
+        Images already in the vibe cache skip the first two stages.
+
+        Args:
+            image_paths: Paths of the images to register.
+            vibe_type: Vibe type applied to every image ('Generic', 'Parent', 'Child').
+            ie_value: Information-extracted value applied to every image.
+            notes: Optional notes applied to every image.
+            max_concurrency: Maximum number of encode-vibe requests in flight
+                             (the scheduler's endpoint limits still apply).
+            process_workers: Size of the image-preparation process pool.
+                             Defaults to the number of CPUs.
+
+        Returns:
+            One VibeRegistrationResult per input path, in input order. Failures
+            are reported through VibeRegistrationResult.error instead of
+            aborting the batch.
+
+        Raises:
+            ValueError: If the API key is not set or max_concurrency is below 1.
+        """
+        # logger.info("Starting batch vibe registration", vibe_type=vibe_type, ie_value=ie_value)
+        if not self._novelai_api_key:
+             raise ValueError("NovelAI API key is not set.")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        image_paths = list(image_paths)
+        information_extracted = int(ie_value)
+        encoded_paths: Dict[int, str] = {}
+        errors: Dict[int, str] = {}
+
+        # 1. Resolve cache hits; everything else needs encoding
+        to_encode: Dict[int, str] = {} # index -> cache key
+        for index, image_path in enumerate(image_paths):
+            if not os.path.exists(image_path):
+                errors[index] = f"Image file not found at {image_path}"
+                continue
+            try:
+                cache_key = VibeCache.make_key(image_path, information_extracted, ENCODE_VIBE_MODEL)
+            except OSError as e:
+                errors[index] = f"Failed to read image {image_path}: {e}"
+                continue
+            cached_path = self._vibe_cache.get(cache_key)
+            if cached_path is not None:
+                encoded_paths[index] = cached_path
+            else:
+                to_encode[index] = cache_key
+
+        # 2. Prepare images in worker processes and upload each one as soon as it is ready.
+        # Preparation is only fed while an upload slot is near, so prepared payloads held in
+        # memory stay bounded by the pool sizes however far preparation outpaces the uploads.
+        if to_encode:
+            prepare_window = process_workers or os.cpu_count() or 1
+            pending = iter(to_encode)
+            with ProcessPoolExecutor(max_workers=process_workers) as process_pool, \
+                    ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="encode-vibe") as upload_pool:
+                prepare_futures: Dict[Future, int] = {}
+                upload_futures: Dict[Future, int] = {}
+                prepared: Deque[Tuple[int, str]] = deque() # Waiting for an upload slot
+                while True:
+                    while len(prepare_futures) + len(prepared) < prepare_window:
+                        index = next(pending, None)
+                        if index is None:
+                            break
+                        prepare_futures[process_pool.submit(prepare_vibe_image, image_paths[index])] = index
+                    while prepared and len(upload_futures) < max_concurrency:
+                        index, image_base64 = prepared.popleft()
+                        upload_futures[upload_pool.submit(self._upload_vibe_image, image_base64, information_extracted, to_encode[index])] = index
+                    if not prepare_futures and not upload_futures:
+                        break
+                    done, _ = wait(list(prepare_futures) + list(upload_futures), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in prepare_futures:
+                            index = prepare_futures.pop(future)
+                            try:
+                                prepared.append((index, future.result()))
+                            except Exception as e:
+                                errors[index] = str(e)
+                            continue
+                        index = upload_futures.pop(future)
+                        try:
+                            encoded_paths[index] = future.result()
+                        except Exception as e:
+                            # logger.error("Vibe encoding failed in batch", image_path=image_paths[index], error=e)
+                            errors[index] = str(e)
+
+        # 3. Persist every successfully encoded vibe in one transaction
+        vibes: Dict[int, VibeImage] = {}
+        created_at = datetime.now()
+        for index in sorted(encoded_paths):
+            vibes[index] = VibeImage(
+                vibeID=str(uuid.uuid4()),
+                imagePath=image_paths[index],
+                vibeType=vibe_type,
+                encodedIE=ie_value,
+                encodedVibePath=encoded_paths[index],
+                notes=notes,
+                createdAt=created_at
+            )
+        if vibes:
+            try:
+                self._neo4j_repo.create_vibes(list(vibes.values()))
+            except Exception as e:
+                # logger.error("Failed to save vibe nodes in batch", count=len(vibes), error=e)
+                for index in vibes:
+                    errors[index] = str(e)
+                vibes = {}
+
+        # logger.info("Batch vibe registration completed", total=len(image_paths), failed=len(errors))
+        return [
+            VibeRegistrationResult(image_path=image_path, vibe=vibes.get(index), error=errors.get(index))
+            for index, image_path in enumerate(image_paths)
+        ]
+
+    def collect_vibe_cache_garbage(self, min_age: float = 3600.0) -> List[str]:
+        """
+        Delete cached encoded vibes that no VibeImage node references.
+
+        Args:
+            min_age: Unreferenced entries used more recently than this (seconds)
+                     are kept, protecting registrations that are still in progress.
+
+        Returns:
+            The paths of the removed files.
+        """
+        referenced_paths = self._neo4j_repo.list_encoded_vibe_paths()
+        return self._vibe_cache.collect_garbage(referenced_paths, min_age=min_age)
+
     # TODO: Add other library-related methods later (get_vibe, list_vibes, etc.)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import copy
+import itertools
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Iterator, Sequence
+
+from pydantic import BaseModel, Field
+
+from grid.core.models.image import GeneratedImage
+
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+SWEEP_MODES = ("product", "zip")
+
+
+class SweepAxis(BaseModel):
+    """
+    One swept parameter.
+
+    `name` is a key of the generation parameters. Dotted segments address
+    nested values and list elements, e.g. "reference_strength_multiple.0"
+    sweeps the strength of the first vibe.
+    """
+    name: str = Field(...)
+    values: List[Any] = Field(...)
+
+    @classmethod
+    def range(cls, name: str, start: float, stop: float, step: float) -> "SweepAxis":
+        """Inclusive arithmetic range. Decimal arithmetic keeps 0.1 steps free of float drift."""
+        if step == 0:
+            raise ValueError("step must not be zero.")
+        start_d, stop_d, step_d = Decimal(str(start)), Decimal(str(stop)), Decimal(str(step))
+        values = []
+        current = start_d
+        while (step_d > 0 and current <= stop_d) or (step_d < 0 and current >= stop_d):
+            values.append(int(current) if all(isinstance(v, int) for v in (start, stop, step)) else float(current))
+            current += step_d
+        return cls(name=name, values=values)
+
+    @classmethod
+    def of(cls, name: str, values: Sequence[Any]) -> "SweepAxis":
+        return cls(name=name, values=list(values))
+
+
+def set_parameter(parameters: Dict[str, Any], path: str, value: Any):
+    """Set a (possibly dotted) parameter path in place."""
+    segments = path.split(".")
+    target: Any = parameters
+    for segment in segments[:-1]:
+        target = target[int(segment)] if isinstance(target, list) else target.setdefault(segment, {})
+    last = segments[-1]
+    if isinstance(target, list):
+        target[int(last)] = value
+    else:
+        target[last] = value
+
+
+class ParameterSweep:
+    """
+    A set of axes expanded lazily into sweep points.
+
+    mode="product" yields the cartesian product of the axes (a 10x10
+    scale/strength grid is 100 points); mode="zip" walks the axes in lockstep
+    and requires them to have the same length.
+    """
+
+    def __init__(self, axes: Sequence[SweepAxis], mode: str = "product"):
+        if not axes:
+            raise ValueError("At least one sweep axis is required.")
+        if mode not in SWEEP_MODES:
+            raise ValueError(f"mode must be one of {SWEEP_MODES}, got {mode!r}.")
+        names = [axis.name for axis in axes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate sweep axes: {names}")
+        if mode == "zip" and len({len(axis.values) for axis in axes}) > 1:
+            raise ValueError("All axes must have the same number of values in zip mode.")
+        self._axes = list(axes)
+        self._mode = mode
+
+    @property
+    def axes(self) -> List[SweepAxis]:
+        return list(self._axes)
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def __len__(self) -> int:
+        if self._mode == "zip":
+            return len(self._axes[0].values)
+        count = 1
+        for axis in self._axes:
+            count *= len(axis.values)
+        return count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Yield each point as {axis name: value}, without materializing the grid."""
+        names = [axis.name for axis in self._axes]
+        combine = itertools.product if self._mode == "product" else zip
+        for values in combine(*(axis.values for axis in self._axes)):
+            yield dict(zip(names, values))
+
+    @staticmethod
+    def apply(base_parameters: Dict[str, Any], coordinates: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of base_parameters with the point's coordinates applied."""
+        parameters = copy.deepcopy(base_parameters)
+        for path, value in coordinates.items():
+            set_parameter(parameters, path, value)
+        return parameters
+
+
+class SweepResult(BaseModel):
+    coordinates: Dict[str, Any] = Field(...)
+    images: List[GeneratedImage] = Field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+from typing import Optional, Dict, Any, List, Callable, Iterable, Iterator
+
+# import structlog # 後で実装する構造化ログをインポート
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+# How often blocked workers re-check whether the pipeline was stopped
+_POLL_INTERVAL = 0.1
+
+
+class PipelineStage:
+    """One step of a StagedPipeline: `func` transforms an item and runs on `workers` threads."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class PipelineItem:
+    """An item travelling through the pipeline. Once a stage fails, later stages skip it."""
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.error: Optional[Exception] = None
+        self.failed_stage: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _Done:
+    pass
+
+_DONE = _Done()
+
+
+class StagedPipeline:
+    """
+    Runs items through stages on dedicated threads, connected by bounded queues.
+
+    Each stage only waits on its own work: a slow disk or database stage fills
+    its input queue, and only once that queue is full does backpressure reach
+    the stage before it. Input is consumed lazily. Results come out in
+    completion order.
+
+    stats() reports per stage how long workers spent working (busy), waiting
+    for input (idle) and waiting for room downstream (blocked). The bottleneck
+    is the stage with the most busy time; its upstream stages show blocked time.
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 4):
+        if not stages:
+            raise ValueError("At least one stage is required.")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1.")
+        self._stages = list(stages)
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self._lock:
+            self._stats = {
+                stage.name: {"items": 0, "errors": 0, "busy_seconds": 0.0, "idle_seconds": 0.0, "blocked_seconds": 0.0}
+                for stage in self._stages
+            }
+
+    def _record(self, stage: str, **amounts: float):
+        with self._lock:
+            for key, amount in amounts.items():
+                self._stats[stage][key] += amount
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage counters for the current (or most recent) run."""
+        with self._lock:
+            return {stage: dict(values) for stage, values in self._stats.items()}
+
+    @staticmethod
+    def _put(target: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(source: "queue.Queue", stop: threading.Event) -> Any:
+        while not stop.is_set():
+            try:
+                return source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def run(self, items: Iterable[Any]) -> Iterator[PipelineItem]:
+        """
+        Push items through every stage.
+
+        Yields:
+            A PipelineItem per input, as soon as it leaves the last stage (or
+            fails in any stage). Stopping iteration early stops the pipeline.
+        """
+        self._reset_stats()
+        stop = threading.Event()
+        # queues[i] feeds stage i; the last queue is the output
+        queues = [queue.Queue(maxsize=self._queue_size) for _ in self._stages]
+        queues.append(queue.Queue(maxsize=self._queue_size))
+        remaining = [stage.workers for stage in self._stages]
+        threads: List[threading.Thread] = []
+
+        def feed():
+            try:
+                for value in items:
+                    if not self._put(queues[0], PipelineItem(value), stop):
+                        return
+            except Exception as e:
+                # The input iterator itself failed: surface it as a failed item
+                failed = PipelineItem(None)
+                failed.error, failed.failed_stage = e, "input"
+                self._put(queues[-1], failed, stop)
+            finally:
+                for _ in range(self._stages[0].workers):
+                    self._put(queues[0], _DONE, stop)
+
+        def work(index: int):
+            stage = self._stages[index]
+            source, target = queues[index], queues[index + 1]
+            while True:
+                waited = time.perf_counter()
+                item = self._get(source, stop)
+                self._record(stage.name, idle_seconds=time.perf_counter() - waited)
+                if item is _DONE:
+                    break
+                if item.ok:
+                    started = time.perf_counter()
+                    try:
+                        item.value = stage.func(item.value)
+                    except Exception as e:
+                        # logger.error("Pipeline stage failed", stage=stage.name, error=e)
+                        item.error, item.failed_stage = e, stage.name
+                        self._record(stage.name, errors=1)
+                    self._record(stage.name, items=1, busy_seconds=time.perf_counter() - started)
+                waited = time.perf_counter()
+                if not self._put(target, item, stop):
+                    return
+                self._record(stage.name, blocked_seconds=time.perf_counter() - waited)
+            # The last worker of a stage tells the next stage that no more input is coming
+            with self._lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                followers = self._stages[index + 1].workers if index + 1 < len(self._stages) else 1
+                for _ in range(followers):
+                    self._put(target, _DONE, stop)
+
+        threads.append(threading.Thread(target=feed, name="pipeline-input", daemon=True))
+        for index, stage in enumerate(self._stages):
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}-{worker}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(queues[-1], stop)
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
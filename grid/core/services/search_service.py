@@ -0,0 +1,105 @@
+import base64
+import json
+from typing import Optional, Dict, List, Iterable
+
+# import structlog # 後で実装する構造化ログをインポート
+
+from grid.core.db.base import Repository, search_terms
+from grid.core.models.search import SearchHit, SearchPage, SEARCH_KINDS
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+# Deepest result a search pages to (offset + limit). Typing a fragment is answered
+# from the first pages; deeper results need a longer query, not more scrolling.
+MAX_SEARCH_DEPTH = 500
+
+# Largest page search returns
+MAX_SEARCH_PAGE_SIZE = 100
+
+# Multipliers on the normalized score of hits whose title is the query, or starts with it
+EXACT_TITLE_BOOST = 2.0
+PREFIX_TITLE_BOOST = 1.5
+
+
+def _encode_cursor(text: str, kinds: List[str], offset: int) -> str:
+    payload = json.dumps({"q": text, "k": kinds, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str, text: str, kinds: List[str]) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(payload["o"])
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if payload.get("q") != text or payload.get("k") != kinds or offset < 0:
+        raise ValueError("Cursor does not belong to this search.")
+    return offset
+
+
+class SearchService:
+    """
+    Ranked, paginated search over vibes, prompt templates, parameter sets,
+    sessions and tags, on the repository's full-text indexes.
+
+    Each kind is queried separately (scores of different indexes are not
+    comparable), normalized by its best hit and boosted when the title is the
+    query or starts with it, then merged. Pages are offsets into that merged
+    ranking: each page re-runs the query with the per-kind limit raised to
+    offset + limit, which stays cheap because depth is capped at MAX_SEARCH_DEPTH.
+    """
+
+    def __init__(self, neo4j_repo: Repository):
+        self._neo4j_repo = neo4j_repo
+        # logger.info("SearchService initialized")
+
+    def search(self, text: str, kinds: Optional[Iterable[str]] = None, limit: int = 20, cursor: Optional[str] = None) -> SearchPage:
+        """
+        Search the library for a typed fragment (every word matched as a prefix).
+
+        Args:
+            text: The query. Blank text returns an empty page.
+            kinds: Restrict to these SEARCH_KINDS (default: all).
+            limit: Page size, 1 to MAX_SEARCH_PAGE_SIZE.
+            cursor: SearchPage.nextCursor of the previous page of the same search.
+        """
+        kinds = list(SEARCH_KINDS) if kinds is None else list(dict.fromkeys(kinds))
+        unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown search kinds: {unknown}.")
+        if not 1 <= limit <= MAX_SEARCH_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_SEARCH_PAGE_SIZE}.")
+        terms = search_terms(text)
+        if not terms or not kinds:
+            return SearchPage()
+        query = " ".join(terms)
+        offset = _decode_cursor(cursor, query, kinds) if cursor else 0
+        if offset >= MAX_SEARCH_DEPTH:
+            return SearchPage()
+        depth = min(offset + limit, MAX_SEARCH_DEPTH)
+
+        # One extra hit per kind tells whether another page exists
+        hits = self._neo4j_repo.search_text(query, kinds, depth + 1)
+        ranked = self._rank(hits, query, kinds)
+        page = ranked[offset:depth]
+        has_more = len(ranked) > depth and depth < MAX_SEARCH_DEPTH
+        # logger.debug("Search", query=query, kinds=kinds, offset=offset, hits=len(page))
+        return SearchPage(hits=page, nextCursor=_encode_cursor(query, kinds, depth) if has_more else None)
+
+    @staticmethod
+    def _rank(hits: List[SearchHit], query: str, kinds: List[str]) -> List[SearchHit]:
+        best: Dict[str, float] = {}
+        for hit in hits:
+            best[hit.kind] = max(best.get(hit.kind, 0.0), hit.score)
+        ranked = []
+        for hit in hits:
+            score = hit.score / best[hit.kind] if best[hit.kind] > 0 else 0.0
+            title = hit.title.lower()
+            if title == query:
+                score *= EXACT_TITLE_BOOST
+            elif title.startswith(query):
+                score *= PREFIX_TITLE_BOOST
+            ranked.append(hit.model_copy(update={"score": round(score, 6)}))
+        # The order must be total for offsets to page consistently
+        ranked.sort(key=lambda hit: (-hit.score, kinds.index(hit.kind), hit.id))
+        return ranked
@@ -0,0 +1,237 @@
+"""
+Feature vectors of sessions and images, and the in-memory index that finds
+the most similar ones.
+
+A vector has VECTOR_DIMENSIONS float32 components in two blocks:
+
+- parameters: each of NUMERIC_FEATURES scaled from its typical range to
+  [-1, 1] (missing values stay 0, i.e. neutral; per-vibe lists use their mean);
+- prompt: the prompt's tags and their words, plus the categorical parameters
+  (sampler, noise schedule), feature-hashed into PROMPT_DIMENSIONS signed
+  buckets, so prompts sharing tags point the same way whatever their order
+  or emphasis.
+
+Both blocks are weighted and the vector is normalised to unit length, so
+the dot product of two vectors is their cosine similarity.
+"""
+import math
+import os
+import re
+import json
+import threading
+import zlib
+from typing import Optional, Any, Dict, List, Tuple, Iterable
+
+import numpy as np
+
+from grid.core.models.image import GeneratedImage
+from grid.core.models.session import GenerationSession
+
+# (parameter, low, high): the typical range mapped to [-1, 1]; values outside are clipped
+NUMERIC_FEATURES: Tuple[Tuple[str, float, float], ...] = (
+    ("scale", 0.0, 10.0),
+    ("steps", 1.0, 50.0),
+    ("width", 64.0, 2048.0),
+    ("height", 64.0, 2048.0),
+    ("cfg_rescale", 0.0, 1.0),
+    ("reference_strength_multiple", 0.0, 1.0),
+    ("reference_information_extracted_multiple", 0.0, 1.0),
+)
+CATEGORICAL_PARAMETERS = ("sampler", "noise_schedule")
+
+VECTOR_DIMENSIONS = 128
+PROMPT_DIMENSIONS = VECTOR_DIMENSIONS - len(NUMERIC_FEATURES)
+
+# Share of each block in the (unit) vector; the prompt decides more than the settings
+PARAMETER_WEIGHT = 0.5
+PROMPT_WEIGHT = 1.0
+
+# Token weights within the prompt block
+TAG_WEIGHT = 1.0
+WORD_WEIGHT = 0.5 # Words of multi-word tags: "long hair" still partly matches "short hair"
+CATEGORICAL_WEIGHT = 0.5
+
+# NovelAI emphasis syntax: {tag}, [tag], (tag), 1.2::tag::
+_EMPHASIS = re.compile(r"-?\d+(?:\.\d+)?::|::|[{}\[\]()]")
+_TAG_SEPARATORS = re.compile(r"[,|\n]")
+
+
+def prompt_tokens(prompt: Optional[str]) -> Dict[str, float]:
+    """Weighted tokens of a prompt: "t:<tag>" per tag and "w:<word>" per word of a multi-word tag."""
+    tokens: Dict[str, float] = {}
+    for tag in _TAG_SEPARATORS.split(_EMPHASIS.sub(" ", (prompt or "").lower())):
+        words = tag.split()
+        if not words:
+            continue
+        key = "t:" + " ".join(words)
+        tokens[key] = tokens.get(key, 0.0) + TAG_WEIGHT
+        if len(words) > 1:
+            for word in words:
+                tokens["w:" + word] = tokens.get("w:" + word, 0.0) + WORD_WEIGHT
+    return tokens
+
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, list): # Per-vibe lists: their mean
+        numbers = [_numeric(item) for item in value]
+        numbers = [number for number in numbers if number is not None]
+        return sum(numbers) / len(numbers) if numbers else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def feature_vector(parameters: Dict[str, Any], prompt: Optional[str]) -> np.ndarray:
+    """Unit feature vector (float32, VECTOR_DIMENSIONS) of generation parameters and a positive prompt."""
+    vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    count = len(NUMERIC_FEATURES)
+    for position, (name, low, high) in enumerate(NUMERIC_FEATURES):
+        value = _numeric(parameters.get(name))
+        if value is not None:
+            vector[position] = min(max(2.0 * (value - low) / (high - low) - 1.0, -1.0), 1.0)
+    vector[:count] *= PARAMETER_WEIGHT / math.sqrt(count)
+
+    tokens = prompt_tokens(prompt)
+    for name in CATEGORICAL_PARAMETERS:
+        value = parameters.get(name)
+        if isinstance(value, str):
+            tokens[f"p:{name}={value.lower()}"] = CATEGORICAL_WEIGHT
+    # Feature hashing: a stable hash picks the bucket, one of its bits the sign, so collisions tend to cancel out
+    block = np.zeros(PROMPT_DIMENSIONS, dtype=np.float32)
+    for token, weight in tokens.items():
+        digest = zlib.crc32(token.encode("utf-8"))
+        block[digest % PROMPT_DIMENSIONS] += weight if digest & 0x80000000 else -weight
+    norm = np.linalg.norm(block)
+    if norm > 0:
+        vector[count:] = PROMPT_WEIGHT * block / norm
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def session_vector(session: GenerationSession) -> np.ndarray:
+    """feature_vector of baseParameters (invalid JSON counts as no parameters) and basePromptPositive."""
+    try:
+        parameters = json.loads(session.baseParameters) if session.baseParameters else {}
+    except (TypeError, json.JSONDecodeError):
+        parameters = {}
+    return feature_vector(parameters if isinstance(parameters, dict) else {}, session.basePromptPositive)
+
+
+def image_vector(image: GeneratedImage) -> np.ndarray:
+    """feature_vector of actualParameters and actualPromptPositive."""
+    return feature_vector(image.actualParameters, image.actualPromptPositive)
+
+
+class VectorIndex:
+    """
+    Exact nearest-neighbour index over unit vectors: one NumPy matrix, one
+    row per key, searched with a single matrix-vector product (a few ms per
+    100k rows at 128 dimensions: it reads the 50 MB matrix once), so there
+    is no structure to rebuild as rows are added. The matrix grows by
+    doubling; removed rows are filled with the last one. Thread-safe.
+    """
+
+    def __init__(self, dimensions: int = VECTOR_DIMENSIONS, initial_capacity: int = 1024):
+        if dimensions < 1 or initial_capacity < 1:
+            raise ValueError("dimensions and initial_capacity must be at least 1.")
+        self._dimensions = dimensions
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((initial_capacity, dimensions), dtype=np.float32)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    @property
+    def dimensions(self) -> int:
+        return self._dimensions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._rows
+
+    def _check(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self._dimensions,):
+            raise ValueError(f"Expected a vector of {self._dimensions} dimensions, got shape {vector.shape}.")
+        return vector
+
+    def add(self, key: str, vector: np.ndarray):
+        """Insert or replace the vector of key."""
+        self.add_many([(key, vector)])
+
+    def add_many(self, items: Iterable[Tuple[str, np.ndarray]]):
+        items = [(key, self._check(vector)) for key, vector in items]
+        with self._lock:
+            for key, vector in items:
+                row = self._rows.get(key)
+                if row is None:
+                    row = len(self._keys)
+                    if row == len(self._matrix):
+                        grown = np.zeros((2 * len(self._matrix), self._dimensions), dtype=np.float32)
+                        grown[:row] = self._matrix[:row]
+                        self._matrix = grown
+                    self._keys.append(key)
+                    self._rows[key] = row
+                self._matrix[row] = vector
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            last = len(self._keys) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._keys[row] = self._keys[last]
+                self._rows[self._keys[row]] = row
+            self._keys.pop()
+            self._matrix[last] = 0
+            return True
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(key)
+            return self._matrix[row].copy() if row is not None else None
+
+    def query(self, vector: np.ndarray, k: int = 20, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        The k keys whose vectors have the largest dot product with vector
+        (cosine similarity for unit vectors), best first; ties by key.
+        """
+        vector = self._check(vector)
+        if k < 1:
+            raise ValueError("k must be at least 1.")
+        with self._lock:
+            count = len(self._keys)
+            excluded = {self._rows[key] for key in exclude if key in self._rows}
+            take = min(k + len(excluded), count)
+            if take == 0:
+                return []
+            scores = self._matrix[:count] @ vector
+            # argpartition finds the top rows in O(n); only those are sorted
+            top = np.argpartition(scores, count - take)[count - take:]
+            hits = [(self._keys[row], float(scores[row])) for row in top if row not in excluded]
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:k]
+
+    def save(self, path: str):
+        """Write the index to path (NumPy .npz), replacing it atomically."""
+        with self._lock:
+            keys = np.array(self._keys, dtype=str)
+            vectors = self._matrix[:len(self._keys)].copy()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, keys=keys, vectors=vectors)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        with np.load(path, allow_pickle=False) as data:
+            keys, vectors = data["keys"], data["vectors"]
+        index = cls(dimensions=vectors.shape[1], initial_capacity=max(len(keys), 1))
+        index.add_many(zip(keys.tolist(), vectors))
+        return index
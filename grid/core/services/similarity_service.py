@@ -0,0 +1,122 @@
+from typing import Optional, Dict, List, Iterable
+
+# import structlog # 後で実装する構造化ログをインポート
+
+from grid.core.db.base import Repository
+from grid.core.models.image import GeneratedImage
+from grid.core.models.session import GenerationSession
+from grid.core.models.similarity import SimilarHit
+from grid.core.services.similarity_index import VectorIndex, session_vector, image_vector
+
+# logger = structlog.get_logger(__name__) # ロガーの初期化
+
+# Largest number of neighbours a lookup returns
+MAX_SIMILAR = 100
+
+
+class SimilarityService:
+    """
+    "What did I do last time that looked like this?": the sessions (and,
+    optionally, images) nearest to a given one by feature vector (see
+    similarity_index), answered from in-memory VectorIndexes without
+    touching the graph.
+
+    build() fills the indexes from the repository once (or load a saved
+    index and skip it); afterwards add_session/add_images keep them current,
+    which GenerationService does for every session and image it records.
+    Images are only indexed when an image_index is given.
+    """
+
+    def __init__(self, neo4j_repo: Repository, session_index: Optional[VectorIndex] = None,
+                 image_index: Optional[VectorIndex] = None):
+        self._neo4j_repo = neo4j_repo
+        self._session_index = session_index if session_index is not None else VectorIndex()
+        self._image_index = image_index
+        # logger.info("SimilarityService initialized", sessions=len(self._session_index))
+
+    @property
+    def session_index(self) -> VectorIndex:
+        return self._session_index
+
+    @property
+    def image_index(self) -> Optional[VectorIndex]:
+        return self._image_index
+
+    def build(self, page_size: int = 1000) -> Dict[str, int]:
+        """
+        Index every session (and image, with an image_index) of the
+        repository, reading its export pages. Entries already indexed are
+        replaced, so rebuilding over a loaded index is safe.
+
+        Returns:
+            {"sessions": n, "images": n} entries indexed.
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1.")
+        counts = {"sessions": 0, "images": 0}
+        after = None
+        while True:
+            page = self._neo4j_repo.export_sessions(after, page_size)
+            self._session_index.add_many((record.sessionID, session_vector(record)) for record in page)
+            counts["sessions"] += len(page)
+            if len(page) < page_size:
+                break
+            after = page[-1].sessionID
+        if self._image_index is not None:
+            after = None
+            while True:
+                page = self._neo4j_repo.export_images(after, page_size)
+                self._image_index.add_many((image.imageID, image_vector(image)) for _, image in page)
+                counts["images"] += len(page)
+                if len(page) < page_size:
+                    break
+                after = (page[-1][0], page[-1][1].imageID)
+        # logger.info("Similarity indexes built", **counts)
+        return counts
+
+    def add_session(self, session: GenerationSession):
+        self._session_index.add(session.sessionID, session_vector(session))
+
+    def add_images(self, images: Iterable[GeneratedImage]):
+        """No-op without an image_index."""
+        if self._image_index is not None:
+            self._image_index.add_many((image.imageID, image_vector(image)) for image in images)
+
+    @staticmethod
+    def _check_k(k: int):
+        if not 1 <= k <= MAX_SIMILAR:
+            raise ValueError(f"k must be between 1 and {MAX_SIMILAR}.")
+
+    def similar_sessions(self, session_id: str, k: int = 20) -> List[SimilarHit]:
+        """
+        The k sessions most similar to session_id (itself excluded), best
+        first. A session missing from the index is read from the repository
+        and indexed.
+        """
+        self._check_k(k)
+        vector = self._session_index.vector(session_id)
+        if vector is None:
+            session = self._neo4j_repo.get_session(session_id)
+            if session is None:
+                raise ValueError(f"Session {session_id} not found.")
+            self.add_session(session)
+            vector = session_vector(session)
+        return [SimilarHit(kind="session", id=key, score=round(score, 6))
+                for key, score in self._session_index.query(vector, k, exclude=[session_id])]
+
+    def similar_to(self, session: GenerationSession, k: int = 20) -> List[SimilarHit]:
+        """The k indexed sessions most similar to a session that need not be saved (e.g. one being edited)."""
+        self._check_k(k)
+        return [SimilarHit(kind="session", id=key, score=round(score, 6))
+                for key, score in self._session_index.query(session_vector(session), k, exclude=[session.sessionID])]
+
+    def similar_images(self, image_id: str, k: int = 20) -> List[SimilarHit]:
+        """The k images most similar to an indexed image (itself excluded), best first. Needs an image_index."""
+        self._check_k(k)
+        if self._image_index is None:
+            raise ValueError("Images are not indexed (SimilarityService was created without an image_index).")
+        vector = self._image_index.vector(image_id)
+        if vector is None:
+            raise ValueError(f"Image {image_id} is not indexed.")
+        return [SimilarHit(kind="image", id=key, score=round(score, 6))
+                for key, score in self._image_index.query(vector, k, exclude=[image_id])]
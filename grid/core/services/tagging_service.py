@@ -1,24 +1,58 @@
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable
 
 # from grid.config import settings # 後で実装する設定管理からインポート
 # import structlog # 後で実装する構造化ログをインポート
 
-from grid.core.db.repository import Neo4jRepository
+from grid.core.db.base import Repository
 from grid.core.models.image import GeneratedImage
 
 # logger = structlog.get_logger(__name__) # ロガーの初期化
 
 class TaggingService:
-    def __init__(self, neo4j_repo: Neo4jRepository):
+    def __init__(self, neo4j_repo: Repository):
         self._neo4j_repo = neo4j_repo
         # logger.info("TaggingService initialized")
 
     def generate_and_add_tags(self, image: GeneratedImage):
         """
         Generate simple tags based on image parameters and prompt, and add them to the image in the database.
+        All tags are attached in one round trip; re-tagging an image does not duplicate relationships.
         """
         # logger.info("Generating and adding tags for image", image_id=image.imageID)
+        generated_tags = self.build_tags(image)
+
+        # Add generated tags to the database
+        try:
+            self._neo4j_repo.add_tags_to_image(image.imageID, generated_tags)
+            # logger.debug("Added tags to DB", image_id=image.imageID, num_tags=len(generated_tags))
+        except Exception as e:
+            # logger.error("Failed to add tags to DB", image_id=image.imageID, error=e)
+            pass # Tagging is best-effort; the caller still gets the tag names
+
+        # logger.info("Finished generating and adding tags for image", image_id=image.imageID, num_tags=len(generated_tags))
+        return generated_tags # Return the list of generated tags
+
+    def generate_and_add_tags_batch(self, images: Iterable[GeneratedImage]) -> Dict[str, List[str]]:
+        """
+        Tag many images (e.g. a whole session) with a single batch write.
+
+        Returns:
+            image_id -> generated tag names.
+        """
+        tags_by_image = {image.imageID: self.build_tags(image) for image in images}
+        pairs = [(image_id, tag_name) for image_id, tags in tags_by_image.items() for tag_name in tags]
+        try:
+            self._neo4j_repo.add_tags_to_images(pairs)
+            # logger.info("Tags added to images", num_images=len(tags_by_image), num_tags=len(pairs))
+        except Exception as e:
+            # logger.error("Failed to add tags to DB", num_images=len(tags_by_image), error=e)
+            pass # Tagging is best-effort; the caller still gets the tag names
+        return tags_by_image
+
+    @staticmethod
+    def build_tags(image: GeneratedImage) -> List[str]:
+        """Derive parameter and prompt keyword tags for an image (duplicates removed, order kept)."""
         generated_tags = []
 
         # 1. Parameter Tags
@@ -55,15 +89,4 @@ class TaggingService:
                  generated_tags.append(tag_name)
                  # logger.debug("Generated negative prompt tag", image_id=image.imageID, tag=tag_name)
 
-
-        # Add generated tags to the database
-        for tag_name in generated_tags:
-            try:
-                self._neo4j_repo.add_tag_to_image(image.imageID, tag_name)
-                # logger.debug("Added tag to DB", image_id=image.imageID, tag=tag_name)
-            except Exception as e:
-                # logger.error("Failed to add tag to DB", image_id=image.imageID, tag_name=tag_name, error=e)
-                pass # Continue with other tags
-
-        # logger.info("Finished generating and adding tags for image", image_id=image.imageID, num_tags=len(generated_tags))
-        return generated_tags # Return the list of generated tags
\ No newline at end of file
+        return list(dict.fromkeys(generated_tags))
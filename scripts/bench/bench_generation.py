@@ -0,0 +1,214 @@
+"""
+Throughput benchmark for the NovelAI call sites, run against the local mock server.
+
+Drives the real NovelAIClient / GenerationService / LibraryService (with an
+in-memory repository standing in for Neo4j) and reports images/sec,
+p50/p95/p99 request latency and peak RSS.
+
+Usage:
+    python -m scripts.bench.bench_generation --mode client --requests 200 --concurrency 4 --latency 0.2
+    python -m scripts.bench.bench_generation --mode encode --requests 100 --url http://127.0.0.1:8765
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable
+
+from grid.core.api.novelai import NovelAIClient
+from grid.core.api.rate_limit import EndpointLimit, RequestScheduler, RetryPolicy
+from grid.core.api.transport import NovelAITransport
+from grid.core.api.vibe_cache import VibeCache
+from grid.core.models.session import GenerationSession
+from scripts.bench.mock_novelai_server import MockNovelAIConfig, MockNovelAIServer, make_png
+
+
+class InMemoryRepository:
+    """Records what the services would write to Neo4j, so the benchmark measures the generation path only."""
+
+    def __init__(self):
+        self.sessions = []
+        self.images = []
+        self.vibes = []
+
+    def create_session(self, session, user_id, model_name):
+        self.sessions.append(session)
+
+    def create_generated_image(self, image, session_id):
+        self.images.append(image)
+
+    def create_generated_images(self, images, session_id):
+        self.images.extend(images)
+        return len(images)
+
+    def create_vibe(self, vibe_image):
+        self.vibes.append(vibe_image)
+
+    def create_vibes(self, vibe_images):
+        self.vibes.extend(vibe_images)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _scheduler(concurrency: int) -> RequestScheduler:
+    # Generous limits: the benchmark should measure the client, not the default 1 req/s throttle
+    limit = EndpointLimit(rate=1000.0, burst=max(concurrency, 1), max_concurrency=concurrency)
+    return RequestScheduler(limits={"/ai/generate-image": limit, "/ai/encode-vibe": limit},
+                            retry_policy=RetryPolicy(base_delay=0.05, max_delay=2.0))
+
+
+def _timed(func: Callable[[], int], latencies: List[float], errors: List[str]) -> int:
+    started = time.perf_counter()
+    try:
+        count = func()
+    except Exception as e:
+        errors.append(str(e))
+        return 0
+    finally:
+        latencies.append(time.perf_counter() - started)
+    return count
+
+
+def run_benchmark(mode: str, base_url: str, requests: int, concurrency: int, n_samples: int,
+                  width: int, height: int, work_dir: str) -> Dict[str, Any]:
+    parameters = {"n_samples": n_samples, "width": width, "height": height, "seed": 0}
+    latencies: List[float] = []
+    errors: List[str] = []
+    transport = NovelAITransport("mock", base_url, pool_maxsize=concurrency)
+    client = NovelAIClient(api_key="mock", scheduler=_scheduler(concurrency), transport=transport,
+                           vibe_cache=VibeCache(os.path.join(work_dir, "vibe_cache")))
+
+    if mode == "client":
+        def job(index: int) -> int:
+            params = dict(parameters, seed=index)
+            save_dir = os.path.join(work_dir, "generated", str(index))
+            return len(client.generate_image_to_dir("bench", "nai-diffusion-4-full", "generate", params, save_dir))
+    elif mode == "service":
+        from grid.core.services.generation_cache import GenerationResultCache
+        from grid.core.services.generation_service import GenerationService
+        service = GenerationService(client, InMemoryRepository(),
+                                    result_cache=GenerationResultCache(os.path.join(work_dir, "result_cache.sqlite3")),
+                                    output_dir=os.path.join(work_dir, "generated"))
+
+        def job(index: int) -> int:
+            session = GenerationSession(sessionID=str(uuid.uuid4()), timestamp=datetime.now(),
+                                        baseParameters=json.dumps(dict(parameters, seed=index)),
+                                        basePromptPositive="bench", overallStatus="pending")
+            return len(service.generate_images(session, "default"))
+    elif mode == "encode":
+        from grid.core.services.library_service import LibraryService
+        os.environ.setdefault("NOVELAI_API_KEY", "mock")
+        image_dir = os.path.join(work_dir, "vibes")
+        os.makedirs(image_dir, exist_ok=True)
+        paths = []
+        for index in range(requests):
+            path = os.path.join(image_dir, f"vibe_{index}.png")
+            with open(path, "wb") as f:
+                f.write(make_png(width, height, seed=index)) # Distinct content, so no cache hits
+            paths.append(path)
+        service = LibraryService(InMemoryRepository(), novelai_client=client)
+        upload = service._upload_vibe_image
+
+        def timed_upload(*args):
+            # Time each encode-vibe call on its own; failures still reach register_vibes
+            started = time.perf_counter()
+            try:
+                return upload(*args)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+        service._upload_vibe_image = timed_upload
+        started = time.perf_counter()
+        results = service.register_vibes(paths, "Generic", 1.0, max_concurrency=concurrency)
+        elapsed = time.perf_counter() - started
+        errors = [result.error for result in results if not result.ok]
+        return _report(mode, len(results) - len(errors), elapsed, latencies, errors, client)
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        counts = list(pool.map(lambda index: _timed(lambda: job(index), latencies, errors), range(requests)))
+    elapsed = time.perf_counter() - started
+    return _report(mode, sum(counts), elapsed, latencies, errors, client)
+
+
+def _report(mode: str, images: int, elapsed: float, latencies: List[float], errors: List[str], client: NovelAIClient) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "mode": mode,
+        "images": images,
+        "elapsed_seconds": round(elapsed, 3),
+        "images_per_second": round(images / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_p50": round(percentile(ordered, 50), 4),
+        "latency_p95": round(percentile(ordered, 95), 4),
+        "latency_p99": round(percentile(ordered, 99), 4),
+        "errors": len(errors),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if peak_rss_mb() is not None else None,
+        "scheduler": client.scheduler.stats(),
+        "transport": client.transport.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NovelAI generation path against the mock server.")
+    parser.add_argument("--mode", choices=("client", "service", "encode"), default="client")
+    parser.add_argument("--url", default=None, help="Use an already running mock server instead of starting one in-process")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--n-samples", type=int, default=1)
+    parser.add_argument("--width", type=int, default=832)
+    parser.add_argument("--height", type=int, default=1216)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--server-concurrency", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        config = MockNovelAIConfig(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                                   throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                                   max_concurrency=args.server_concurrency, seed=args.seed)
+        server = MockNovelAIServer(config).start()
+        base_url = server.url
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="grid-bench-") as work_dir:
+            report = run_benchmark(args.mode, base_url, args.requests, args.concurrency, args.n_samples,
+                                   args.width, args.height, work_dir)
+        if server is not None:
+            report["server"] = server.stats()
+        print(json.dumps(report, indent=2))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
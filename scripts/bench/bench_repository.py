@@ -0,0 +1,171 @@
+"""
+Write and query throughput of the repository backends, on the same workload.
+
+Each run creates vibes, sessions and their images (batch writes), tags and
+rates the images, then pages through them, reads vibes back and runs
+full-text searches for typed fragments. Reports
+operations/sec and p50/p95/p99 latency per phase and backend.
+
+The Neo4j backend writes to the configured database (IDs are prefixed with a
+fresh run ID, nothing is deleted afterwards), so point it at a scratch instance.
+
+Usage:
+    python -m scripts.bench.bench_repository --backend sqlite --sessions 20 --images 200
+    NEO4J_PASSWORD=... python -m scripts.bench.bench_repository --backend both --uri bolt://localhost:7687
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable
+
+from grid.core.db.base import Repository
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.models.image import GeneratedImage, ImageQuery
+from grid.core.models.session import GenerationSession
+from grid.core.models.vibe import VibeImage
+from grid.core.services.search_service import SearchService
+from scripts.bench.bench_generation import percentile
+
+TAGS = ["style:anime", "style:painterly", "subject:1girl", "subject:landscape", "rating:keep"]
+PROMPT_WORDS = ["1girl", "landscape", "castle", "forest", "night", "city", "watercolor", "portrait", "sunset", "neon", "ruins",
+                "garden", "ocean", "snow", "armor", "kimono", "library", "rain", "lantern", "dragon"]
+# Fragments as typed, one keystroke at a time
+SEARCH_FRAGMENTS = ["ca", "cas", "castle", "castle ni", "wat", "watercolor sun", "neo", "style:an", "dra", "forest rain"]
+
+
+def _phase(name: str, operations: int, latencies: List[float]) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    elapsed = sum(latencies)
+    return {
+        "phase": name,
+        "operations": operations,
+        "elapsed_seconds": round(elapsed, 3),
+        "operations_per_second": round(operations / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_p50": round(percentile(ordered, 50), 5),
+        "latency_p95": round(percentile(ordered, 95), 5),
+        "latency_p99": round(percentile(ordered, 99), 5),
+    }
+
+
+def _timed(func: Callable[[], Any], latencies: List[float]) -> Any:
+    start = time.perf_counter()
+    result = func()
+    latencies.append(time.perf_counter() - start)
+    return result
+
+
+def run_benchmark(repo: Repository, sessions: int, images_per_session: int, vibes: int, page_size: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    run_id = uuid.uuid4().hex[:8]
+    base_time = datetime(2025, 1, 1)
+    phases = []
+
+    vibe_ids = [f"{run_id}-vibe-{n}" for n in range(vibes)]
+    latencies: List[float] = []
+    _timed(lambda: repo.create_vibes([
+        VibeImage(vibeID=vibe_id, imagePath=f"{vibe_id}.png", vibeType="Generic", encodedIE=1.0,
+                  encodedVibePath=f"{vibe_id}.naiv4vibe", createdAt=base_time) for vibe_id in vibe_ids]), latencies)
+    phases.append(_phase("create_vibes", vibes, latencies))
+
+    image_ids: List[str] = []
+    session_latencies: List[float] = []
+    image_latencies: List[float] = []
+    for s in range(sessions):
+        session_id = f"{run_id}-session-{s}"
+        session = GenerationSession(sessionID=session_id, timestamp=base_time + timedelta(minutes=s), baseParameters="{}",
+                                    basePromptPositive=", ".join(rng.sample(PROMPT_WORDS, k=4)), overallStatus="running")
+        used_vibes = rng.sample(vibe_ids, k=min(2, len(vibe_ids)))
+        _timed(lambda: (repo.create_session(session, "bench", "nai-diffusion-4-full"),
+                        repo.link_session_resources(session_id, used_vibes)), session_latencies)
+        batch = []
+        for n in range(images_per_session):
+            image_id = f"{session_id}-image-{n}"
+            image_ids.append(image_id)
+            batch.append(GeneratedImage(
+                imageID=image_id, imagePath=f"{image_id}.png", seed=rng.randrange(2 ** 32), rating=rng.choice([0, 0, 3, 4, 5]),
+                generationStatus="success", actualPromptPositive="1girl",
+                actualParameters={"scale": round(rng.uniform(3, 9), 1), "steps": rng.choice([23, 28, 40]), "sampler": "k_euler",
+                                  "reference_strength_multiple": [round(rng.uniform(0.3, 1.0), 2) for _ in used_vibes]}))
+        _timed(lambda: repo.create_generated_images(batch, session_id), image_latencies)
+    phases.append(_phase("create_session", sessions, session_latencies))
+    phases.append(_phase("create_generated_images (per image)", len(image_ids), image_latencies))
+
+    latencies = []
+    pairs = [(image_id, tag) for image_id in image_ids for tag in rng.sample(TAGS, k=2)]
+    _timed(lambda: repo.add_tags_to_images(pairs), latencies)
+    phases.append(_phase("add_tags_to_images (per pair)", len(pairs), latencies))
+
+    latencies = []
+    ratings = {image_id: rng.randint(0, 5) for image_id in rng.sample(image_ids, k=len(image_ids) // 2)}
+    _timed(lambda: repo.update_image_ratings(ratings), latencies)
+    phases.append(_phase("update_image_ratings (per image)", len(ratings), latencies))
+
+    for name, query in [("query_images newest", ImageQuery()), ("query_images rating", ImageQuery(orderBy="rating")),
+                        ("query_images tag+scale", ImageQuery(tags=["style:anime"], parameterRanges={"scale": (5, 7)}))]:
+        latencies, cursor, pages = [], None, 0
+        while True:
+            page = _timed(lambda: repo.query_images(query, limit=page_size, cursor=cursor), latencies)
+            pages += 1
+            cursor = page.nextCursor
+            if cursor is None:
+                break
+        phases.append(_phase(f"{name} (per page)", pages, latencies))
+
+    latencies = []
+    for vibe_id in rng.choices(vibe_ids, k=500):
+        _timed(lambda: repo.get_vibe(vibe_id), latencies)
+    phases.append(_phase("get_vibe", 500, latencies))
+
+    latencies = []
+    for vibe_id in vibe_ids:
+        _timed(lambda: repo.best_vibe_parameter_buckets(vibe_id, parameter="scale"), latencies)
+    phases.append(_phase("best_vibe_parameter_buckets", len(vibe_ids), latencies))
+
+    latencies = []
+    search = SearchService(repo)
+    for fragment in SEARCH_FRAGMENTS * 10:
+        _timed(lambda: search.search(fragment), latencies)
+    phases.append(_phase("search (first page)", len(latencies), latencies))
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare write and query throughput of the Neo4j and SQLite repositories.")
+    parser.add_argument("--backend", choices=("sqlite", "neo4j", "both"), default="sqlite")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--images", type=int, default=200, help="Images per session")
+    parser.add_argument("--vibes", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sqlite-path", default=None, help="Database file (default: a temporary file)")
+    parser.add_argument("--uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("NEO4J_USER", "neo4j"))
+    args = parser.parse_args()
+
+    reports = []
+    backends = ["sqlite", "neo4j"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory(prefix="grid-bench-") as work_dir:
+        for backend in backends:
+            if backend == "sqlite":
+                repo = SQLiteRepository(args.sqlite_path or os.path.join(work_dir, "grid.sqlite3"))
+            else:
+                from grid.core.db.repository import Neo4jRepository
+                password = os.getenv("NEO4J_PASSWORD")
+                if not password:
+                    raise SystemExit("Error: NEO4J_PASSWORD environment variable not set.")
+                repo = Neo4jRepository(args.uri, args.user, password, cache_size=0) # Measure the database, not the cache
+            try:
+                phases = run_benchmark(repo, args.sessions, args.images, args.vibes, args.page_size, args.seed)
+            finally:
+                repo.close_connection()
+            reports.append({"backend": backend, "phases": phases})
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Local stand-in for the NovelAI image API, for offline benchmarks and tests.
+
+Serves /ai/generate-image (a zip of synthetic PNGs as binary/octet-stream,
+like the real API) and /ai/encode-vibe (opaque bytes). Latency, error rate,
+429 injection and a concurrency cap are configurable, so the clients' retry
+and scheduling behaviour can be exercised without spending Anlas.
+
+Usage:
+    python -m scripts.bench.mock_novelai_server --port 8765 --latency 0.5 --throttle-rate 0.05
+"""
+import argparse
+import io
+import json
+import random
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any
+
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    """Build a valid solid-colour RGB PNG without Pillow."""
+    rng = random.Random(seed)
+    pixel = bytes(rng.randrange(256) for _ in range(3))
+    row = b"\x00" + pixel * width # filter type 0 + RGB pixels
+    raw = row * height
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def make_image_zip(count: int, width: int, height: int, seed: int = 0) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        for index in range(count):
+            zf.writestr(f"image_{index}.png", make_png(width, height, seed + index))
+    return buf.getvalue()
+
+
+class MockNovelAIConfig:
+    """Behaviour knobs for the mock server. Rates are probabilities in [0, 1]."""
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 1.0, max_concurrency: Optional[int] = None,
+                 encode_vibe_size: int = 64 * 1024, seed: Optional[int] = None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_concurrency = max_concurrency # Requests beyond this get a 429, like the real API
+        self.encode_vibe_size = encode_vibe_size
+        self.seed = seed
+
+
+class MockNovelAIServer:
+    """
+    Threaded HTTP server implementing the mock endpoints.
+
+    Can be used as a context manager; `url` is the base URL to pass to
+    NovelAIClient / LibraryService.
+    """
+
+    def __init__(self, config: Optional[MockNovelAIConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockNovelAIConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats: Dict[str, int] = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self) -> "MockNovelAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-novelai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockNovelAIServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _record(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _decide(self) -> Optional[int]:
+        """Pick an injected failure status for the next request, or None to succeed."""
+        config = self.config
+        with self._lock:
+            self._stats["requests"] += 1
+            if config.max_concurrency is not None and self._in_flight >= config.max_concurrency:
+                return 429
+            roll = self._rng.random()
+            if roll < config.throttle_rate:
+                return 429
+            if roll < config.throttle_rate + config.error_rate:
+                return 500
+            self._in_flight += 1
+            return None
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _latency(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-self.config.latency_jitter, self.config.latency_jitter)
+        return max(0.0, self.config.latency + jitter)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass # Keep benchmark output clean
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_error(self, status: int):
+                headers = {"Retry-After": f"{server.config.retry_after:g}"} if status == 429 else None
+                body = json.dumps({"statusCode": status, "message": "injected by mock server"}).encode("utf-8")
+                self._send(status, body, "application/json", headers)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload: Dict[str, Any] = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, b'{"message": "invalid JSON"}', "application/json")
+                    return
+
+                if self.path not in ("/ai/generate-image", "/ai/encode-vibe"):
+                    self._send(404, b'{"message": "not found"}', "application/json")
+                    return
+
+                failure = server._decide()
+                if failure is not None:
+                    server._record("throttled" if failure == 429 else "errors")
+                    self._send_error(failure)
+                    return
+                try:
+                    time.sleep(server._latency())
+                    if self.path == "/ai/generate-image":
+                        parameters = payload.get("parameters") or {}
+                        body = make_image_zip(
+                            int(parameters.get("n_samples", 1)),
+                            int(parameters.get("width", 64)),
+                            int(parameters.get("height", 64)),
+                            int(parameters.get("seed", 0)),
+                        )
+                    else:
+                        body = b"\0" * server.config.encode_vibe_size
+                    server._record("ok") # Before sending, so the count is visible once the client has the response
+                    self._send(200, body, "binary/octet-stream")
+                finally:
+                    server._release()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local NovelAI API stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response latency in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Uniform +/- jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429s")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Concurrent requests allowed before 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockNovelAIConfig(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                               max_concurrency=args.max_concurrency, seed=args.seed)
+    server = MockNovelAIServer(config, host=args.host, port=args.port)
+    print(f"Mock NovelAI API listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+One-time cleanup of duplicate HAS_TAG relationships.
+
+Before tag attachment switched to MERGE, re-tagging an image created a new
+HAS_TAG edge every time. This collapses each (image, tag) pair to a single
+relationship.
+
+    NEO4J_PASSWORD=... python scripts/maintenance/dedupe_tag_relationships.py --batch-size 1000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from grid.core.db.repository import Neo4jRepository
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("NEO4J_USER", "neo4j"))
+    parser.add_argument("--batch-size", type=int, default=1000, help="(image, tag) pairs cleaned per transaction")
+    args = parser.parse_args(argv)
+
+    password = os.getenv("NEO4J_PASSWORD")
+    if not password:
+        print("Error: NEO4J_PASSWORD environment variable not set.")
+        return 1
+
+    repo = Neo4jRepository(args.uri, args.user, password)
+    try:
+        deleted = repo.deduplicate_tag_relationships(batch_size=args.batch_size)
+    finally:
+        repo.close_connection()
+    print(f"Removed {deleted} duplicate HAS_TAG relationships.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
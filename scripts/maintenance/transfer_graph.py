@@ -0,0 +1,62 @@
+"""
+Export the Grid library to compressed chunk files, or import such an export.
+
+Works on Neo4j (default) or an SQLite database file, so it also migrates
+between the two backends. Import into an empty database.
+
+    NEO4J_PASSWORD=... python scripts/maintenance/transfer_graph.py export backups/2025-01-01 --format jsonl
+    NEO4J_PASSWORD=... python scripts/maintenance/transfer_graph.py import backups/2025-01-01 --workers 8
+    python scripts/maintenance/transfer_graph.py import backups/2025-01-01 --sqlite data/grid.sqlite3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from grid.core.db.transfer import export_graph, import_graph, EXPORT_FORMATS, DEFAULT_CHUNK_SIZE, DEFAULT_PAGE_SIZE
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("directory", help="Export directory")
+    parser.add_argument("--sqlite", default=None, help="Use this SQLite database file instead of Neo4j")
+    parser.add_argument("--uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("NEO4J_USER", "neo4j"))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl", help="Chunk file format (export)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Records per chunk file (export)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Records read per query (export)")
+    parser.add_argument("--workers", type=int, default=4, help="Chunks loaded in parallel (import)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per batch write (import)")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        from grid.core.db.sqlite_repository import SQLiteRepository
+        repo = SQLiteRepository(args.sqlite)
+    else:
+        from grid.core.db.repository import Neo4jRepository
+        password = os.getenv("NEO4J_PASSWORD")
+        if not password:
+            print("Error: NEO4J_PASSWORD environment variable not set.")
+            return 1
+        repo = Neo4jRepository(args.uri, args.user, password, cache_size=0)
+
+    started = time.perf_counter()
+    try:
+        if args.command == "export":
+            counts = export_graph(repo, args.directory, fmt=args.format, chunk_size=args.chunk_size, page_size=args.page_size)
+        else:
+            counts = import_graph(repo, args.directory, workers=args.workers, batch_size=args.batch_size)
+    finally:
+        repo.close_connection()
+    elapsed = time.perf_counter() - started
+    for kind, count in counts.items():
+        print(f"{kind}: {count}")
+    print(f"{args.command.capitalize()}ed {sum(counts.values())} records in {elapsed:.1f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
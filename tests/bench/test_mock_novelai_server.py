@@ -0,0 +1,59 @@
+import io
+import json
+import urllib.error
+import urllib.request
+import zipfile
+
+import pytest
+
+from scripts.bench.mock_novelai_server import MockNovelAIConfig, MockNovelAIServer, make_png
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    return urllib.request.urlopen(request, timeout=5)
+
+
+def test_make_png_has_valid_signature_and_size():
+    """生成されたPNGのシグネチャとIHDRの幅・高さが正しいことをテストする。"""
+    png = make_png(16, 8, seed=1)
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    assert int.from_bytes(png[16:20], "big") == 16
+    assert int.from_bytes(png[20:24], "big") == 8
+
+
+def test_generate_image_returns_zip_of_pngs():
+    """generate-imageがn_samples枚のPNGを含むzipをbinary/octet-streamで返すことをテストする。"""
+    with MockNovelAIServer() as server:
+        response = _post(f"{server.url}/ai/generate-image", {"parameters": {"n_samples": 2, "width": 8, "height": 8}})
+        assert response.headers["Content-Type"] == "binary/octet-stream"
+        with zipfile.ZipFile(io.BytesIO(response.read())) as zf:
+            names = zf.namelist()
+            assert names == ["image_0.png", "image_1.png"]
+            assert zf.read(names[0])[:4] == b"\x89PNG"
+        assert server.stats()["ok"] == 1
+
+
+def test_encode_vibe_returns_configured_size():
+    """encode-vibeが設定サイズのバイナリを返すことをテストする。"""
+    with MockNovelAIServer(MockNovelAIConfig(encode_vibe_size=128)) as server:
+        assert len(_post(f"{server.url}/ai/encode-vibe", {"image": ""}).read()) == 128
+
+
+def test_throttle_injection_sends_retry_after():
+    """429注入時にRetry-Afterヘッダーが付与されることをテストする。"""
+    with MockNovelAIServer(MockNovelAIConfig(throttle_rate=1.0, retry_after=2)) as server:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _post(f"{server.url}/ai/generate-image", {"parameters": {}})
+        assert excinfo.value.code == 429
+        assert excinfo.value.headers["Retry-After"] == "2"
+        assert server.stats()["throttled"] == 1
+
+
+def test_error_injection_returns_500():
+    """エラー注入時に500が返されることをテストする。"""
+    with MockNovelAIServer(MockNovelAIConfig(error_rate=1.0)) as server:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _post(f"{server.url}/ai/encode-vibe", {})
+        assert excinfo.value.code == 500
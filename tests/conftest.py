@@ -0,0 +1,205 @@
+"""
+Neo4jドライバのフェイク。
+
+トランザクションで実行されたクエリを記録し、テストごとのハンドラ
+(query, params) -> 応答 で答える。応答はレコード(dict)1件、レコードの
+リスト、またはFakeResultのいずれかで、Noneなら既定の応答になる。
+モジュールでneo4j_handlerフィクスチャを上書きすると、そのモジュールの
+ドライバ全てがそのハンドラで答える。summaryを設定すると、各結果の
+consume()が (query, params) -> ResultSummary相当 の値を返す。
+
+非同期ドライバ(AsyncGraphDatabase)のフェイクも同じ記録と応答を使う。
+"""
+import time
+
+import neo4j
+import pytest
+
+from grid.core.db import async_repository as async_repository_module
+from grid.core.db import repository as repository_module
+from grid.core.db.async_repository import AsyncNeo4jRepository
+from grid.core.db.repository import Neo4jRepository
+
+
+def default_response(query, params):
+    """UNWINDで書き込んだ行数を返す既定の応答"""
+    return {"count": len(params.get("rows", []))}
+
+
+class FakeResult:
+    def __init__(self, records=(), summary=None):
+        self.records = list(records)
+        self.summary = summary
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def consume(self):
+        return self.summary
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class AsyncFakeResult(FakeResult):
+    async def single(self):
+        return FakeResult.single(self)
+
+    async def consume(self):
+        return self.summary
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+
+def _result(response, summary=None):
+    if isinstance(response, FakeResult):
+        return response
+    return FakeResult([response] if isinstance(response, dict) else response, summary)
+
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def run(self, query, parameters=None, **params):
+        return self._driver.respond(query, {**(parameters or {}), **params})
+
+
+class FakeSession:
+    """ドライバのマネージドトランザクションと同様に、一時的なエラーでトランザクション関数を再実行するフェイクセッション"""
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __enter__(self):
+        self._driver.sessions += 1
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, func, *args, **kwargs):
+        time.sleep(self._driver.acquire_delay)
+        while True:
+            self._driver.transactions += 1
+            try:
+                return func(FakeTransaction(self._driver), *args, **kwargs)
+            except neo4j.exceptions.TransientError:
+                continue
+
+    execute_read = execute_write
+
+
+class FakeAsyncTransaction(FakeTransaction):
+    async def run(self, query, parameters=None, **params):
+        return FakeTransaction.run(self, query, parameters, **params)
+
+
+class FakeAsyncSession(FakeSession):
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute_write(self, func, *args, **kwargs):
+        while True:
+            self._driver.transactions += 1
+            try:
+                return await func(FakeAsyncTransaction(self._driver), *args, **kwargs)
+            except neo4j.exceptions.TransientError:
+                continue
+
+    execute_read = execute_write
+
+
+class FakeDriver:
+    """
+    クエリとセッション・トランザクションの回数を記録し、handlerで応答する
+    フェイクドライバ。acquire_delayは接続待ち、query_delayはクエリ時間を模倣し、
+    transient_failuresの回数だけクエリがTransientErrorで失敗する。
+    """
+
+    def __init__(self, uri, auth, config, handler=default_response):
+        self.uri = uri
+        self.auth = auth
+        self.config = config
+        self.handler = handler
+        self.summary = None
+        self.acquire_delay = 0.0
+        self.query_delay = 0.0
+        self.transient_failures = 0
+        self.queries = []
+        self.sessions = 0
+        self.transactions = 0
+        self.closed = False
+
+    def respond(self, query, params):
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise neo4j.exceptions.TransientError("Deadlock detected")
+        self.queries.append((query, params))
+        time.sleep(self.query_delay)
+        response = self.handler(query, params)
+        summary = self.summary(query, params) if self.summary else None
+        return _result(default_response(query, params) if response is None else response, summary)
+
+    def count(self, marker):
+        """markerを含むクエリが実行された回数"""
+        return sum(1 for query, _ in self.queries if marker in query)
+
+    def session(self, **config):
+        return FakeSession(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncDriver(FakeDriver):
+    def respond(self, query, params):
+        result = FakeDriver.respond(self, query, params)
+        return AsyncFakeResult(result.records, result.summary)
+
+    def session(self, **config):
+        return FakeAsyncSession(self)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def neo4j_handler():
+    return default_response
+
+
+@pytest.fixture
+def fake_neo4j(monkeypatch, neo4j_handler):
+    """GraphDatabase.driverとAsyncGraphDatabase.driverがneo4j_handlerで応答するフェイクを返すようにする"""
+    monkeypatch.setattr(repository_module.neo4j.GraphDatabase, "driver",
+                        lambda uri, auth, **config: FakeDriver(uri, auth, config, neo4j_handler))
+    monkeypatch.setattr(async_repository_module.neo4j.AsyncGraphDatabase, "driver",
+                        lambda uri, auth, **config: FakeAsyncDriver(uri, auth, config, neo4j_handler))
+
+
+@pytest.fixture
+def make_repo(fake_neo4j):
+    def _make(**kwargs):
+        return Neo4jRepository("bolt://localhost:7687", "neo4j", "password", **kwargs)
+    return _make
+
+
+@pytest.fixture
+def repo(make_repo):
+    return make_repo()
+
+
+@pytest.fixture
+def make_async_repo(fake_neo4j):
+    def _make(**kwargs):
+        return AsyncNeo4jRepository("bolt://localhost:7687", "neo4j", "password", **kwargs)
+    return _make
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from grid.core.models.image import GeneratedImage, ImageQuery
+from grid.core.models.vibe import VibeImage
+
+
+class StoredRecords:
+    """書き込みには行数を、読み取りには設定されたレコードを返すハンドラ"""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, query, params):
+        return None if "rows" in params else self.records
+
+
+@pytest.fixture
+def neo4j_handler():
+    return StoredRecords()
+
+
+@pytest.fixture
+def repo(make_async_repo):
+    return make_async_repo(batch_size=2)
+
+
+def _vibe(vibe_id):
+    return VibeImage(vibeID=vibe_id, imagePath=f"{vibe_id}.png", vibeType="Generic", encodedIE=1.0, encodedVibePath=f"{vibe_id}.naiv4vibe",
+                     createdAt=datetime(2025, 1, 1))
+
+
+def test_batch_write_runs_every_chunk_in_one_managed_transaction(repo):
+    """一括書き込みが1つのマネージドトランザクション内でバッチごとのUNWINDとして実行されることをテストする。"""
+    created = asyncio.run(repo.create_vibes([_vibe(f"v{n}") for n in range(5)]))
+
+    assert created == 5
+    assert repo._driver.transactions == 1
+    assert [len(params["rows"]) for _, params in repo._driver.queries] == [2, 2, 1]
+    assert repo.pool_metrics()["queries"]["create_vibes"]["count"] == 1
+
+
+def test_transient_errors_rerun_the_transaction_function(repo, neo4j_handler):
+    """一時的なエラーの後、トランザクション関数が最初から再実行されて結果が変わらないことをテストする。"""
+    repo._driver.transient_failures = 2
+    neo4j_handler.records = [{"vibes": [{"vibeID": "v1", "index": 0}], "templateID": None, "setID": None}]
+    images = [GeneratedImage(imageID=f"img-{n}", imagePath=f"{n}.png", seed=n, rating=3, generationStatus="success",
+                             actualPromptPositive="1girl", actualParameters={"scale": 5.0}) for n in range(3)]
+
+    assert asyncio.run(repo.create_generated_images(images, "s1")) == 3
+    assert repo._driver.transactions == 3
+    # Only the successful attempt's statements reached the server: context, 2 image chunks, rating buckets
+    assert [query.strip().split()[0] for query, _ in repo._driver.queries] == ["MATCH", "MATCH", "MATCH", "UNWIND"]
+    assert repo.pool_metrics()["queries"]["create_generated_images"]["errors"] == 2
+
+
+def test_reads_are_cached_and_writes_invalidate(repo, neo4j_handler):
+    neo4j_handler.records = [{"v": {"vibeID": "v1", "imagePath": "v1.png", "vibeType": "Generic", "encodedIE": 1.0,
+                                   "encodedVibePath": "v1.naiv4vibe", "createdAt": "2025-01-01T00:00:00"}}]
+
+    async def scenario():
+        first = await repo.get_vibe("v1")
+        await repo.get_vibe("v1")
+        await repo.create_vibe(_vibe("v1"))
+        await repo.get_vibe("v1")
+        return first
+
+    assert asyncio.run(scenario()).createdAt == datetime(2025, 1, 1)
+    assert repo.cache_stats()["hits"] == 1
+    assert repo._driver.transactions == 3
+
+
+def test_query_images_matches_the_synchronous_statement(repo, make_repo, neo4j_handler):
+    """同期版と同じCypherとパラメータで画像を検索し、同じページ形式で返すことをテストする。"""
+    node = {"imageID": "img-1", "imagePath": "1.png", "seed": 1, "actualParameters": '{"scale": 5}', "actualPromptPositive": "1girl",
+            "rating": 4, "generationStatus": "success"}
+    neo4j_handler.records = [{"i": node, "sessionID": "s1", "sessionTimestamp": "2025-01-01T00:00:00"}] * 2
+    query = ImageQuery(minRating=3, tags=["style:anime"], parameterRanges={"scale": (4.0, 6.0)})
+
+    page = asyncio.run(repo.query_images(query, limit=1))
+
+    sync_repo = make_repo()
+    sync_page = sync_repo.query_images(query, limit=1)
+
+    assert repo._driver.queries == sync_repo._driver.queries
+    assert page == sync_page
+    assert page.images[0].actualParameters == {"scale": 5} and page.nextCursor is not None
+
+
+def test_validation_and_closing(repo):
+    with pytest.raises(ValueError):
+        asyncio.run(repo.update_image_ratings({"img-1": 6}))
+    with pytest.raises(ValueError):
+        asyncio.run(repo.query_images(limit=0))
+    assert repo._driver.transactions == 0
+
+    async def scenario():
+        async with repo:
+            pass
+
+    asyncio.run(scenario())
+    assert repo._driver.closed
+    assert repo._driver.config["max_transaction_retry_time"] == 30.0
@@ -0,0 +1,118 @@
+import json
+import os
+import uuid
+from datetime import datetime
+
+from grid.core.models.session import GenerationSession
+from grid.core.services.generation_cache import GenerationResultCache, make_request_key
+from grid.core.services.generation_service import GenerationService
+
+
+class FakeClient:
+    """generate_image_to_dirの呼び出し回数を記録し、ダミー画像を書き出すフェイククライアント"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_image_to_dir(self, prompt, model, action, parameters, save_dir, filename_factory=None):
+        self.calls += 1
+        os.makedirs(save_dir, exist_ok=True)
+        path = os.path.join(save_dir, filename_factory(0, "image_0.png"))
+        with open(path, "wb") as f:
+            f.write(b"png")
+        return [path]
+
+
+class FakeRepository:
+    def __init__(self):
+        self.images = []
+
+    def create_session(self, session, user_id, model_name):
+        pass
+
+    def create_generated_image(self, image, session_id):
+        self.images.append(image)
+
+    def create_generated_images(self, images, session_id):
+        self.images.extend(images)
+        return len(images)
+
+
+def _session(parameters):
+    return GenerationSession(sessionID=str(uuid.uuid4()), timestamp=datetime.now(), baseParameters=json.dumps(parameters),
+                             basePromptPositive="1girl", overallStatus="pending")
+
+
+def test_request_key_is_canonical():
+    """パラメータの順序に依存せず同一キーとなり、値が変わればキーも変わることをテストする。"""
+    key = make_request_key("1girl", "m", "generate", {"seed": 1, "steps": 28, "negative_prompt": "bad"})
+    assert make_request_key("1girl", "m", "generate", {"negative_prompt": "bad", "steps": 28, "seed": 1}) == key
+    assert make_request_key("1girl", "m", "generate", {"seed": 2, "steps": 28, "negative_prompt": "bad"}) != key
+    assert make_request_key("1girl", "m", "generate", {"seed": 1, "steps": 28, "negative_prompt": "worse"}) != key
+
+
+def test_request_without_seed_is_not_cacheable():
+    """シード未指定のリクエストはキャッシュ対象外となることをテストする。"""
+    assert make_request_key("1girl", "m", "generate", {"steps": 28}) is None
+
+
+def test_cache_drops_entries_with_missing_files(tmp_path):
+    """ファイルが欠けたエントリはミスとして扱われることをテストする。"""
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    cache = GenerationResultCache(str(tmp_path / "result_cache.sqlite3"))
+    cache.put("k", [str(image)])
+
+    assert GenerationResultCache(str(tmp_path / "result_cache.sqlite3")).get("k") == [str(image)]
+    image.unlink()
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_index_is_bounded_by_age_and_size(tmp_path):
+    """古いエントリと上限を超えた古い順のエントリが削除され、画像ファイルは残ることをテストする。"""
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    now = [0.0]
+    path = str(tmp_path / "result_cache.sqlite3")
+    cache = GenerationResultCache(path, max_entries=3, max_age=100, clock=lambda: now[0])
+    for n in range(5):
+        now[0] = float(n)
+        cache.put(f"k{n}", [str(image)])
+
+    assert cache.prune() == 2
+    assert [key for key in ("k0", "k1", "k2", "k3", "k4") if cache.get(key)] == ["k2", "k3", "k4"]
+
+    now[0] = 103.5
+    cache.close()
+    reopened = GenerationResultCache(path, max_entries=3, max_age=100, clock=lambda: now[0])
+    assert len(reopened) == 1 and reopened.get("k4") == [str(image)]
+    assert image.exists()
+
+
+def test_identical_session_is_served_from_cache(tmp_path, monkeypatch):
+    """同一条件のセッション再実行ではAPIを呼ばず、保存済みファイルを再利用することをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    client, repo = FakeClient(), FakeRepository()
+    service = GenerationService(client, repo, result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")))
+    parameters = {"seed": 42, "steps": 28}
+
+    first = service.generate_images(_session(parameters), "default")
+    second = service.generate_images(_session(parameters), "default")
+
+    assert client.calls == 1
+    assert second[0].imagePath == first[0].imagePath
+    assert second[0].imageID != first[0].imageID
+
+
+def test_use_cache_false_forces_api_call(tmp_path, monkeypatch):
+    """use_cache=Falseの場合はキャッシュを無視してAPIを呼ぶことをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    client = FakeClient()
+    service = GenerationService(client, FakeRepository(), result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")))
+    parameters = {"seed": 42}
+
+    service.generate_images(_session(parameters), "default")
+    service.generate_images(_session(parameters), "default", use_cache=False)
+
+    assert client.calls == 2
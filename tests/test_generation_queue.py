@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from grid.core.api.novelai_async import AsyncNovelAIClient
+from grid.core.services.generation_queue import GenerationQueue, GenerationRequest
+
+
+class FakeAsyncClient:
+    """generate_imageの呼び出しを遅延付きで模倣し、同時実行数を記録するフェイククライアント"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_image(self, prompt, model, action, parameters):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[parameters["seed"]])
+            if parameters.get("fail"):
+                raise RuntimeError("boom")
+            return [(f"image_{parameters['seed']}.png", b"png")]
+        finally:
+            self.in_flight -= 1
+
+
+def _requests(count, **extra):
+    for seed in range(count):
+        yield GenerationRequest(prompt="1girl", model="nai-diffusion-4-full", parameters={"seed": seed, **extra}, key=str(seed))
+
+
+async def _collect(queue, requests):
+    return [result async for result in queue.run(requests)]
+
+
+def test_queue_bounds_concurrency():
+    """同時に実行されるリクエスト数がmax_in_flightを超えないことをテストする。"""
+    client = FakeAsyncClient(delays=[0.01] * 10)
+    results = asyncio.run(_collect(GenerationQueue(client, max_in_flight=3), _requests(10)))
+
+    assert len(results) == 10
+    assert client.max_in_flight == 3
+    assert all(result.ok for result in results)
+
+
+def test_queue_yields_in_completion_order():
+    """結果が投入順ではなく完了順に返されることをテストする。"""
+    client = FakeAsyncClient(delays=[0.08, 0.01, 0.04])
+    results = asyncio.run(_collect(GenerationQueue(client, max_in_flight=3), _requests(3)))
+
+    assert [result.request.key for result in results] == ["1", "2", "0"]
+
+
+def test_queue_reports_failures_without_aborting():
+    """失敗したリクエストがerrorとして報告され、残りの処理が継続されることをテストする。"""
+    client = FakeAsyncClient(delays=[0.0] * 4)
+    results = asyncio.run(_collect(GenerationQueue(client, max_in_flight=2), _requests(4, fail=True)))
+
+    assert len(results) == 4
+    assert all(result.error == "boom" for result in results)
+
+
+def test_queue_rejects_invalid_limit():
+    """max_in_flightが1未満の場合にValueErrorとなることをテストする。"""
+    with pytest.raises(ValueError):
+        GenerationQueue(FakeAsyncClient([]), max_in_flight=0)
+
+
+class FakeSyncClient:
+    def generate_image(self, prompt, model, action, parameters):
+        time.sleep(0.05)
+        return [("image.png", b"png")]
+
+    def encode_vibe(self, image_path, ie_value):
+        return f"{image_path}:{ie_value}"
+
+
+def test_async_client_runs_blocking_calls_off_the_event_loop():
+    """AsyncNovelAIClientがブロッキング呼び出しをスレッドプールで並行実行することをテストする。"""
+    async def scenario():
+        async with AsyncNovelAIClient(api_key="dummy", max_workers=4, client=FakeSyncClient()) as client:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            results = await asyncio.gather(*(client.generate_image("p", "m", "generate", {}) for _ in range(4)))
+            elapsed = loop.time() - started
+            encoded = await client.encode_vibe("vibe.png", 1.0)
+        return results, elapsed, encoded
+
+    results, elapsed, encoded = asyncio.run(scenario())
+    assert results == [[("image.png", b"png")]] * 4
+    assert elapsed < 0.15 # 4件の0.05秒呼び出しが直列実行されていない
+    assert encoded == "vibe.png:1.0"
@@ -0,0 +1,176 @@
+import json
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from grid.core.api.novelai import NovelAIClient
+from grid.core.models.session import GenerationSession
+from grid.core.services.generation_cache import GenerationResultCache
+from grid.core.services.generation_service import GenerationService
+from grid.core.services.job_queue import PersistentJobQueue
+from grid.core.services.parameter_sweep import ParameterSweep, SweepAxis
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """生成されたseedを記録し、指定seedで失敗するフェイククライアント"""
+
+    def __init__(self, fail_seeds=()):
+        self.seeds = []
+        self.fail_seeds = set(fail_seeds)
+
+    def download_image_archive(self, prompt, model, action, parameters):
+        self.seeds.append(parameters["seed"])
+        if parameters["seed"] in self.fail_seeds:
+            raise RuntimeError("boom")
+        archive = tempfile.TemporaryFile()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("image_0.png", b"png")
+        archive.seek(0)
+        return archive
+
+    extract_image_archive = staticmethod(NovelAIClient.extract_image_archive)
+
+
+class FakeRepository:
+    def __init__(self):
+        self.sessions = []
+        self.images = []
+        self.statuses = {}
+
+    def create_session(self, session, user_id, model_name):
+        self.sessions.append(session.sessionID)
+
+    def create_generated_image(self, image, session_id):
+        self.images.append((image, session_id))
+
+    def create_generated_images(self, images, session_id):
+        self.images.extend((image, session_id) for image in images)
+        return len(images)
+
+    def update_session_status(self, session_id, status):
+        self.statuses[session_id] = status
+
+
+def _session():
+    return GenerationSession(
+        sessionID=str(uuid.uuid4()), name="overnight", timestamp=datetime.now(),
+        baseParameters=json.dumps({"scale": 5}), basePromptPositive="1girl", basePromptNegative="",
+        notes=None, overallStatus="pending",
+    )
+
+
+def _service(tmp_path, monkeypatch, client, repo, queue):
+    monkeypatch.chdir(tmp_path)
+    return GenerationService(client, repo, result_cache=GenerationResultCache(str(tmp_path / "cache.json")), job_queue=queue)
+
+
+def test_enqueue_is_idempotent_and_lease_is_exclusive(tmp_path):
+    """同じrunの再登録でジョブが重複せず、リースしたジョブが他に渡らないことをテストする。"""
+    queue = PersistentJobQueue(str(tmp_path / "jobs.sqlite3"))
+    payloads = [{"coordinates": {"seed": seed}} for seed in range(3)]
+    run_id = queue.create_run("s1", "default", "{}", payloads)
+    queue.create_run("s1", "default", "{}", payloads, run_id=run_id)
+
+    assert queue.counts(run_id)["pending"] == 3
+    first = queue.lease(run_id, limit=2)
+    second = queue.lease(run_id, limit=2)
+    assert [job.payload["coordinates"]["seed"] for job in first] == [0, 1]
+    assert [job.payload["coordinates"]["seed"] for job in second] == [2]
+    assert queue.lease(run_id) == []
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+    """リース期限が切れたin-flightジョブが再度リースされることをテストする。"""
+    clock = FakeClock()
+    queue = PersistentJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=60, clock=clock)
+    run_id = queue.create_run("s1", "default", "{}", [{"coordinates": {}}])
+
+    job = queue.lease(run_id)[0]
+    assert queue.lease(run_id) == []
+    clock.now += 61
+    again = queue.lease(run_id)
+    assert [j.job_id for j in again] == [job.job_id]
+    assert again[0].attempts == 2
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    """失敗したジョブがmax_attemptsまでpendingに戻り、その後failedになることをテストする。"""
+    queue = PersistentJobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    run_id = queue.create_run("s1", "default", "{}", [{"coordinates": {}}])
+
+    assert queue.fail(queue.lease(run_id)[0].job_id, "boom") == "pending"
+    assert queue.fail(queue.lease(run_id)[0].job_id, "boom") == "failed"
+    assert queue.counts(run_id)["failed"] == 1
+    assert queue.unfinished_runs() == []
+
+
+def test_orphaned_leases_of_dead_processes_are_released(tmp_path, monkeypatch):
+    """終了したプロセスが保持していたリースがrecover_orphanedで解放されることをテストする。"""
+    queue = PersistentJobQueue(str(tmp_path / "jobs.sqlite3"))
+    run_id = queue.create_run("s1", "default", "{}", [{"coordinates": {}}])
+    queue.lease(run_id)
+
+    assert queue.recover_orphaned() == 0 # This process is still alive
+    monkeypatch.setattr(PersistentJobQueue, "_is_alive", staticmethod(lambda pid: False))
+    assert queue.recover_orphaned() == 1
+    assert queue.counts(run_id)["pending"] == 1
+
+
+def test_resume_skips_finished_jobs_after_restart(tmp_path, monkeypatch):
+    """中断されたrunを再開したとき、完了済みのジョブが再生成されないことをテストする。"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    repo = FakeRepository()
+    session = _session()
+    sweep = ParameterSweep([SweepAxis.range("seed", 1, 6, 1)])
+
+    first = _service(tmp_path, monkeypatch, FakeClient(), repo, PersistentJobQueue(db_path))
+    run_id = first.enqueue_run(session, "default", sweep)
+    results = first.resume_run(run_id, max_concurrency=1)
+    next(results)
+    next(results)
+    results.close() # Simulate the process stopping mid-run
+
+    client = FakeClient()
+    restarted = _service(tmp_path, monkeypatch, client, repo, PersistentJobQueue(db_path, lease_seconds=600))
+    monkeypatch.setattr(PersistentJobQueue, "_is_alive", staticmethod(lambda pid: False)) # The first process is gone
+    resumed = list(restarted.resume_unfinished(max_concurrency=2))
+
+    assert {result.coordinates["seed"] for _, result in resumed} | {1, 2} == {1, 2, 3, 4, 5, 6}
+    assert 1 not in client.seeds and 2 not in client.seeds
+    assert repo.sessions == [session.sessionID]
+    assert repo.statuses[session.sessionID] == "completed"
+    assert restarted.job_queue.unfinished_runs() == []
+
+
+def test_resume_marks_session_partially_failed(tmp_path, monkeypatch):
+    """リトライしても失敗するジョブがあるとセッションがpartially_failedになることをテストする。"""
+    repo = FakeRepository()
+    client = FakeClient(fail_seeds={2})
+    queue = PersistentJobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    service = _service(tmp_path, monkeypatch, client, repo, queue)
+    session = _session()
+
+    run_id = service.enqueue_run(session, "default", ParameterSweep([SweepAxis.of("seed", [1, 2, 3])]))
+    results = list(service.resume_run(run_id))
+
+    assert sorted(result.coordinates["seed"] for result in results if result.ok) == [1, 3]
+    assert [result.coordinates["seed"] for result in results if not result.ok] == [2]
+    assert client.seeds.count(2) == 2
+    assert repo.statuses[session.sessionID] == "partially_failed"
+
+
+def test_resume_unknown_run_raises(tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch, FakeClient(), FakeRepository(), PersistentJobQueue(str(tmp_path / "jobs.sqlite3")))
+    with pytest.raises(ValueError):
+        list(service.resume_run("missing"))
@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from grid.core.api.vibe_cache import VibeCache
+from grid.core.services import library_service
+from grid.core.services.library_service import LibraryService
+
+
+class FakeRepository:
+    """create_vibesの呼び出しを記録するフェイクリポジトリ"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def create_vibes(self, vibe_images):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.batches.append(list(vibe_images))
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"vibe_{index}.png"
+        Image.new("RGBA", (8, 8), (index * 40, 0, 0, 255)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _service(monkeypatch, tmp_path, repo, fail_for=()):
+    monkeypatch.setenv("NOVELAI_API_KEY", "dummy")
+    service = LibraryService(repo, vibe_cache=VibeCache(str(tmp_path / "cache")))
+    uploads = []
+    lock = threading.Lock()
+
+    def fake_upload(image_base64, information_extracted, cache_key):
+        with lock:
+            uploads.append(cache_key)
+        if cache_key in fail_for:
+            raise RuntimeError("encode failed")
+        return service._vibe_cache.put(cache_key, b"encoded", information_extracted, "m")
+
+    monkeypatch.setattr(service, "_upload_vibe_image", fake_upload)
+    service.uploads = uploads
+    return service
+
+
+def test_register_vibes_writes_all_nodes_in_one_batch(monkeypatch, tmp_path, images):
+    """全画像がエンコードされ、VibeImageノードが一括で書き込まれることをテストする。"""
+    repo = FakeRepository()
+    service = _service(monkeypatch, tmp_path, repo)
+
+    results = service.register_vibes(images, "Generic", 1.0, max_concurrency=2, process_workers=2)
+
+    assert [result.image_path for result in results] == images
+    assert all(result.ok for result in results)
+    assert len(repo.batches) == 1 and len(repo.batches[0]) == 4
+    assert len(service.uploads) == 4
+
+
+def test_register_vibes_reports_failures_without_aborting(monkeypatch, tmp_path, images):
+    """失敗した画像のみがエラーとして報告され、残りは登録されることをテストする。"""
+    repo = FakeRepository()
+    failing_key = VibeCache.make_key(images[1], 1, "nai-diffusion-4-full")
+    service = _service(monkeypatch, tmp_path, repo, fail_for={failing_key})
+
+    results = service.register_vibes(images + [str(tmp_path / "missing.png")], "Generic", 1.0, process_workers=2)
+
+    assert [result.ok for result in results] == [True, False, True, True, False]
+    assert results[1].error == "encode failed"
+    assert "not found" in results[4].error
+    assert len(repo.batches[0]) == 3
+
+
+def test_register_vibes_skips_cached_images(monkeypatch, tmp_path, images):
+    """キャッシュ済みの画像はエンコードAPIを呼ばないことをテストする。"""
+    service = _service(monkeypatch, tmp_path, FakeRepository())
+    service.register_vibes(images[:2], "Generic", 1.0, process_workers=1)
+    service.uploads.clear()
+
+    results = service.register_vibes(images, "Generic", 1.0, process_workers=1)
+
+    assert all(result.ok for result in results)
+    assert len(service.uploads) == 2
+
+
+def test_register_vibes_marks_all_failed_when_persist_fails(monkeypatch, tmp_path, images):
+    """DB書き込みに失敗した場合は全件がエラーとなることをテストする。"""
+    service = _service(monkeypatch, tmp_path, FakeRepository(fail=True))
+
+    results = service.register_vibes(images, "Generic", 1.0, process_workers=1)
+
+    assert all(result.error == "db down" and result.vibe is None for result in results)
+
+
+def test_register_vibes_bounds_prepared_payloads_in_memory(monkeypatch, tmp_path):
+    """準備がアップロードより速くても、メモリ上の準備済みペイロードがプールサイズ以下に抑えられることをテストする。"""
+    paths = []
+    for index in range(20):
+        path = tmp_path / f"vibe_{index}.png"
+        path.write_bytes(b"image-%d" % index)
+        paths.append(str(path))
+    service = _service(monkeypatch, tmp_path, FakeRepository())
+    lock = threading.Lock()
+    held = {"now": 0, "peak": 0}
+
+    def fake_prepare(image_path):
+        with lock:
+            held["now"] += 1
+            held["peak"] = max(held["peak"], held["now"])
+        return "payload"
+
+    upload = service._upload_vibe_image
+
+    def slow_upload(image_base64, information_extracted, cache_key):
+        time.sleep(0.01)
+        with lock:
+            held["now"] -= 1
+        return upload(image_base64, information_extracted, cache_key)
+
+    # Threads instead of processes, so the fake preparation can be observed
+    monkeypatch.setattr(library_service, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(library_service, "prepare_vibe_image", fake_prepare)
+    monkeypatch.setattr(service, "_upload_vibe_image", slow_upload)
+
+    results = service.register_vibes(paths, "Generic", 1.0, max_concurrency=2, process_workers=3)
+
+    assert all(result.ok for result in results)
+    assert len(service.uploads) == 20
+    assert held["peak"] <= 3 + 2
@@ -0,0 +1,98 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from grid.core.api.novelai import NovelAIClient
+
+
+def _zip_bytes(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+class FakeStreamingResponse:
+    """requests.Responseのストリーミング読み出しを模倣するフェイク"""
+
+    def __init__(self, body, content_type="binary/octet-stream", status_code=200):
+        self._body = body
+        self.headers = {"content-type": content_type}
+        self.status_code = status_code
+        self.content = body
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for offset in range(0, len(self._body), chunk_size):
+            yield self._body[offset:offset + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = NovelAIClient(api_key="dummy")
+    body = _zip_bytes({"image_0.png": b"first", "image_1.png": b"second"})
+    calls = []
+
+    def fake_post(url, **kwargs):
+        calls.append(kwargs)
+        return FakeStreamingResponse(body)
+
+    monkeypatch.setattr(client._session, "post", fake_post)
+    client.calls = calls
+    return client
+
+
+def test_generate_image_to_dir_writes_members_to_disk(client, tmp_path):
+    """zipの各メンバーが指定ディレクトリへ直接書き出され、パスが返されることをテストする。"""
+    save_dir = tmp_path / "generated" / "session"
+    paths = client.generate_image_to_dir("1girl", "nai-diffusion-4-full", "generate", {"seed": 1}, str(save_dir),
+                                         filename_factory=lambda index, name: f"out_{index}.png")
+
+    assert paths == [str(save_dir / "out_0.png"), str(save_dir / "out_1.png")]
+    assert (save_dir / "out_0.png").read_bytes() == b"first"
+    assert (save_dir / "out_1.png").read_bytes() == b"second"
+    assert client.calls[0]["stream"] is True
+
+
+def test_generate_image_to_dir_defaults_to_member_names(client, tmp_path):
+    """filename_factory未指定時にzip内のファイル名が使われることをテストする。"""
+    paths = client.generate_image_to_dir("1girl", "nai-diffusion-4-full", "generate", {}, str(tmp_path))
+
+    assert [os.path.basename(path) for path in paths] == ["image_0.png", "image_1.png"]
+
+
+def test_generate_image_to_dir_rejects_invalid_zip(monkeypatch, tmp_path):
+    """不正なzipを受け取った場合にRuntimeErrorとなり、ファイルが残らないことをテストする。"""
+    client = NovelAIClient(api_key="dummy")
+    monkeypatch.setattr(client._session, "post", lambda url, **kwargs: FakeStreamingResponse(b"not a zip"))
+
+    with pytest.raises(RuntimeError, match="invalid zip"):
+        client.generate_image_to_dir("1girl", "nai-diffusion-4-full", "generate", {}, str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_generate_image_to_dir_rejects_unexpected_content_type(monkeypatch, tmp_path):
+    """Content-Typeがzipでない場合にRuntimeErrorとなることをテストする。"""
+    client = NovelAIClient(api_key="dummy")
+    monkeypatch.setattr(client._session, "post", lambda url, **kwargs: FakeStreamingResponse(b"{}", content_type="application/json"))
+
+    with pytest.raises(RuntimeError, match="Unexpected content type"):
+        client.generate_image_to_dir("1girl", "nai-diffusion-4-full", "generate", {}, str(tmp_path))
+
+
+def test_generate_image_still_returns_bytes(client):
+    """従来のgenerate_imageが(filename, bytes)のリストを返すことをテストする。"""
+    images = client.generate_image("1girl", "nai-diffusion-4-full", "generate", {})
+
+    assert images == [("image_0.png", b"first"), ("image_1.png", b"second")]
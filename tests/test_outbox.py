@@ -0,0 +1,211 @@
+from datetime import datetime
+
+import pytest
+
+from grid.core.db.outbox import OutboxRepository, WriteOutbox
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.models.image import GeneratedImage
+from grid.core.models.session import GenerationSession
+from grid.core.models.vibe import VibeImage
+from grid.core.services.generation_service import GenerationService, _GenerationJob
+
+
+class FlakyRepository(SQLiteRepository):
+    """停止・書き込み拒否・コミット後の例外(ack前のクラッシュ相当)を再現できるSQLiteリポジトリ"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.down = False
+        self.reject = False
+        self.fail_after_commit = False
+        self.calls = []
+
+    def check_connection(self):
+        return not self.down and super().check_connection()
+
+    def _write(self, func):
+        if self.down:
+            raise RuntimeError("ServiceUnavailable")
+        if self.reject:
+            raise RuntimeError("constraint violated")
+        result = super()._write(func)
+        if self.fail_after_commit:
+            self.fail_after_commit = False
+            raise RuntimeError("connection lost before the commit was acknowledged")
+        return result
+
+    def create_generated_images(self, images, session_id, batch_size=None):
+        self.calls.append(("create_generated_images", len(images)))
+        return super().create_generated_images(images, session_id, batch_size)
+
+
+@pytest.fixture
+def target(tmp_path):
+    repository = FlakyRepository(str(tmp_path / "grid.sqlite3"))
+    yield repository
+    repository.close_connection()
+
+
+def _outbox_repo(tmp_path, target, **options):
+    return OutboxRepository(target, WriteOutbox(str(tmp_path / "outbox.sqlite3")), base_delay=0.01, **options)
+
+
+def _session(session_id="s1"):
+    return GenerationSession(sessionID=session_id, timestamp=datetime(2025, 1, 1), baseParameters="{}",
+                             basePromptPositive="1girl", overallStatus="pending")
+
+
+def _image(image_id, rating=0):
+    return GeneratedImage(imageID=image_id, imagePath=f"{image_id}.png", seed=1, rating=rating, generationStatus="success",
+                          actualParameters={"scale": 5.0}, actualPromptPositive="1girl")
+
+
+def test_writes_are_journaled_while_database_is_down_and_replayed_in_order(tmp_path, target):
+    """DB停止中も書き込みは即座に返り、復旧後に記録順で反映されることをテストする。"""
+    repo = _outbox_repo(tmp_path, target)
+    target.down = True
+
+    repo.create_session(_session(), "default", "model")
+    for n in range(3):
+        repo.create_generated_images([_image(f"img-{n}-a"), _image(f"img-{n}-b")], "s1")
+    repo.update_image_rating("img-0-a", 4)
+    repo.update_session_status("s1", "completed")
+
+    assert repo.flush(timeout=0.05) is False
+    assert repo.outbox_stats()["pending"] == 6 and target.get_session("s1") is None
+
+    target.down = False
+    assert repo.flush(timeout=5)
+    assert target.get_session("s1").overallStatus == "completed"
+    assert len(target.query_images().images) == 6
+    assert target.get_image("img-0-a").rating == 4
+    # The three image entries of one session were merged into one write
+    assert target.calls == [("create_generated_images", 6)]
+    stats = repo.outbox_stats()
+    assert stats["pending"] == 0 and stats["flushed"] == 6
+    repo.close_connection()
+
+
+def test_replay_after_unacknowledged_commit_is_idempotent(tmp_path, target):
+    """コミット済みだが未ackのエントリを再送しても重複作成・集計の二重加算が起きないことをテストする。"""
+    target.create_vibe(VibeImage(vibeID="v1", imagePath="v1.png", vibeType="Generic", encodedIE=1.0, encodedVibePath="v1.naiv4vibe",
+                                 createdAt=datetime(2025, 1, 1)))
+    repo = _outbox_repo(tmp_path, target)
+    repo.create_session(_session(), "default", "model")
+    repo.link_session_resources("s1", ["v1"])
+    repo.create_generated_images([_image("a", rating=4)], "s1")
+    repo.add_tags_to_image("a", ["style:anime"])
+
+    repo.flush_once() # create_session
+    repo.flush_once() # link_session_resources
+    target.fail_after_commit = True
+    with pytest.raises(RuntimeError):
+        repo.flush_once()
+    assert repo.flush(timeout=5)
+
+    assert [image.imageID for image in target.query_images().images] == ["a"]
+    assert target.best_vibe_parameter_buckets("v1", parameter="scale")[0].count == 1
+    assert target.get_image_tags("a") == ["style:anime"]
+    repo.close_connection()
+
+
+def test_rejected_entries_are_dead_lettered_without_losing_them(tmp_path, target):
+    repo = _outbox_repo(tmp_path, target, max_attempts=2)
+    repo.create_session(_session(), "default", "model")
+    target.reject = True
+
+    with pytest.raises(RuntimeError):
+        repo.flush_once()
+    assert repo.flush_once() == 0 # Second rejection: dead-lettered
+    assert repo.outbox_stats()["dead"] == 1
+    assert repo.outbox.dead_entries()[0]["error"].endswith("constraint violated")
+
+    target.reject = False
+    assert repo.outbox.requeue_dead() == 1
+    assert repo.flush(timeout=5)
+    assert target.get_session("s1") is not None
+    repo.close_connection()
+
+
+def test_entries_behind_a_dead_session_wait_for_it(tmp_path, target):
+    """セッション作成がデッドレターになっても、その画像・評価がackされて失われず、再投入後に反映されることをテストする。"""
+    repo = _outbox_repo(tmp_path, target, max_attempts=1)
+    repo.create_session(_session("s1"), "default", "model")
+    repo.create_generated_images([_image("a"), _image("b")], "s1")
+    repo.update_image_ratings({"a": 4})
+    repo.create_session(_session("s2"), "default", "model")
+    repo.create_generated_images([_image("c")], "s2")
+    target.reject = True
+    assert repo.flush_once() == 0 # s1 dead-lettered
+    target.reject = False
+
+    assert repo.flush(timeout=5)
+    assert target.get_session("s2") is not None and target.get_image("c") is not None
+    assert target.get_image("a") is None
+    assert [entry["op"] for entry in repo.outbox.dead_entries()] == ["create_session", "create_generated_images", "update_image_ratings"]
+
+    assert repo.outbox.requeue_dead() == 3
+    assert repo.flush(timeout=5)
+    assert target.get_image("a").rating == 4 and target.get_image("b") is not None
+    assert repo.outbox_stats()["dead"] == 0
+    repo.close_connection()
+
+
+def test_images_of_a_missing_session_are_not_acknowledged(tmp_path, target):
+    """セッションが存在しない画像の書き込みはエラーとなり、ジャーナルに残ることをテストする。"""
+    repo = _outbox_repo(tmp_path, target)
+    repo.create_generated_images([_image("a")], "missing")
+
+    with pytest.raises(RuntimeError, match="does not exist"):
+        repo.flush_once()
+    assert repo.outbox_stats()["pending"] == 1
+    repo.close_connection()
+
+
+def test_outage_attempts_do_not_count_towards_dead_lettering(tmp_path, target):
+    repo = _outbox_repo(tmp_path, target, max_attempts=1)
+    repo.create_session(_session(), "default", "model")
+    target.down = True
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            repo.flush_once()
+    assert repo.outbox_stats()["dead"] == 0
+    target.down = False
+    repo.close_connection()
+
+
+def test_journal_survives_restart_and_background_flusher_drains_it(tmp_path, target):
+    """未反映のエントリがプロセス再起動後にバックグラウンドで反映されることをテストする。"""
+    first = _outbox_repo(tmp_path, target)
+    target.down = True
+    first.create_session(_session(), "default", "model")
+    first.stop(timeout=0)
+    first.outbox.close()
+
+    target.down = False
+    second = _outbox_repo(tmp_path, target).start()
+    assert second.flush(timeout=5)
+    assert target.get_session("s1") is not None
+    second.stop()
+
+
+def test_invalid_rating_is_rejected_before_journaling(tmp_path, target):
+    repo = _outbox_repo(tmp_path, target)
+    with pytest.raises(ValueError):
+        repo.update_image_rating("a", 6)
+    assert repo.outbox_stats()["pending"] == 0
+    repo.close_connection()
+
+
+def test_persist_stage_reports_failed_writes_instead_of_dropping_them():
+    """画像レコードの保存に失敗したジョブがエラーとして報告されることをテストする。"""
+    class FailingRepository:
+        def create_generated_images(self, images, session_id):
+            raise RuntimeError("database unavailable")
+
+    service = GenerationService(novelai_client=None, neo4j_repo=FailingRepository(), result_cache=object())
+    job = _GenerationJob("s1", "1girl", "model", "generate", {"seed": 1}, use_cache=False)
+    job.image_ids, job.image_paths = ["a"], ["a.png"]
+
+    with pytest.raises(RuntimeError, match="Failed to record 1 images of session s1"):
+        service._persist_stage(job)
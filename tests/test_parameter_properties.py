@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from grid.core.db.parameters import flatten_parameters, flatten_parameters_json, parameter_property
+from grid.core.models.image import GeneratedImage, ImageQuery
+
+
+class BackfillHandler:
+    """バックフィル用の読み出しには保存済みペイロードを、セッション文脈にはvibeなしを返すハンドラ"""
+
+    def __init__(self):
+        self.stored_images = []
+
+    def __call__(self, query, params):
+        if "RETURN n.imageID AS id" in query:
+            return [r for r in self.stored_images if r["id"] > params["after"]][:params["limit"]]
+        if "RETURN n.sessionID AS id" in query or "RETURN i, s.sessionID" in query:
+            return []
+        return {"count": len(params.get("rows", [])), "vibes": [], "templateID": None, "setID": None}
+
+
+@pytest.fixture
+def neo4j_handler():
+    return BackfillHandler()
+
+
+@pytest.fixture
+def repo(make_repo):
+    return make_repo(batch_size=2)
+
+
+PARAMETERS = {"scale": 5, "steps": 28, "sampler": "k_euler_ancestral", "width": 832, "height": 1216, "seed": 42,
+              "reference_strength_multiple": [0.6, 0.35], "reference_image_multiple": ["..."], "qualityToggle": True}
+
+
+def test_flatten_keeps_only_typed_known_parameters():
+    """既知のパラメータだけが型付きで平坦化され、vibe強度がスロット別になることをテストする。"""
+    flat = flatten_parameters(PARAMETERS)
+
+    assert flat == {"paramScale": 5.0, "paramSteps": 28, "paramSampler": "k_euler_ancestral", "paramWidth": 832,
+                    "paramHeight": 1216, "paramSeed": 42, "paramReferenceStrength0": 0.6, "paramReferenceStrength1": 0.35}
+    assert isinstance(flat["paramScale"], float)
+    assert flatten_parameters({"steps": 28.5, "scale": True, "sampler": 3}) == {}
+    assert flatten_parameters_json("{not json") == {}
+    assert parameter_property("reference_strength_multiple.1") == "paramReferenceStrength1"
+    with pytest.raises(ValueError):
+        parameter_property("prompt")
+
+
+def test_images_store_json_payload_and_typed_properties(repo):
+    image = GeneratedImage(imageID="a", imagePath="a.png", seed=42, actualParameters=PARAMETERS,
+                           actualPromptPositive="1girl", generationStatus="success")
+    repo.create_generated_images([image], "session-1")
+
+    query, params = next((q, p) for q, p in repo._driver.queries if "CREATE (i:GeneratedImage" in q)
+    row = params["rows"][0]
+    assert "SET i += row.flatParameters" in query
+    assert json.loads(row["actualParameters"]) == PARAMETERS
+    assert row["flatParameters"]["paramSteps"] == 28
+
+
+def test_parameter_filters_use_typed_properties(repo):
+    """scaleの範囲指定などが型付きプロパティの条件に変換されることをテストする。"""
+    repo.query_images(ImageQuery(parameterRanges={"scale": (5, 7), "reference_strength_multiple.0": (None, 0.5)},
+                                 parameterEquals={"sampler": "k_euler"}))
+
+    cypher, params = repo._driver.queries[-1]
+    assert "i.paramScale >= $paramMin1" in cypher and "i.paramScale <= $paramMax1" in cypher
+    assert "i.paramReferenceStrength0 <= $paramMax0" in cypher and "$paramMin0" not in cypher
+    assert "i.paramSampler = $paramEq0" in cypher
+    assert (params["paramMin1"], params["paramMax1"], params["paramEq0"]) == (5, 7, "k_euler")
+
+    with pytest.raises(ValueError):
+        repo.query_images(ImageQuery(parameterEquals={"prompt": "1girl"}))
+
+
+def test_backfill_walks_all_stored_images_in_batches(repo, neo4j_handler):
+    neo4j_handler.stored_images = [
+        {"id": "a", "payload": json.dumps({"scale": 5})},
+        {"id": "b", "payload": {"steps": 28}}, # Legacy map-valued payload
+        {"id": "c", "payload": "not json"},
+    ]
+
+    assert repo.flatten_stored_parameters() == {"images": 3, "sessions": 0}
+    writes = [p["rows"] for q, p in repo._driver.queries if "SET n += row.flat" in q]
+    assert [[row["id"] for row in rows] for rows in writes] == [["a", "b"], ["c"]]
+    assert writes[0][1] == {"id": "b", "payload": '{"steps": 28}', "flat": {"paramSteps": 28}}
@@ -0,0 +1,133 @@
+import json
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from grid.core.api.novelai import NovelAIClient
+from grid.core.models.session import GenerationSession
+from grid.core.services.generation_cache import GenerationResultCache
+from grid.core.services.generation_service import GenerationService
+from grid.core.services.parameter_sweep import ParameterSweep, SweepAxis
+
+
+class FakeClient:
+    """呼び出されたパラメータと同時実行数を記録するフェイククライアント"""
+
+    def __init__(self, fail_scale=None):
+        self.parameters = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_scale = fail_scale
+        self._lock = threading.Lock()
+
+    def download_image_archive(self, prompt, model, action, parameters):
+        with self._lock:
+            self.parameters.append(parameters)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01)
+            if parameters.get("scale") == self.fail_scale:
+                raise RuntimeError("boom")
+            archive = tempfile.TemporaryFile()
+            with zipfile.ZipFile(archive, "w") as zf:
+                zf.writestr("image_0.png", b"png")
+            archive.seek(0)
+            return archive
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    extract_image_archive = staticmethod(NovelAIClient.extract_image_archive)
+
+
+class FakeRepository:
+    def __init__(self):
+        self.sessions = []
+        self.models = []
+        self.images = []
+
+    def create_session(self, session, user_id, model_name):
+        self.sessions.append(session.sessionID)
+        self.models.append(model_name)
+
+    def create_generated_image(self, image, session_id):
+        self.images.append((image, session_id))
+
+    def create_generated_images(self, images, session_id):
+        self.images.extend((image, session_id) for image in images)
+        return len(images)
+
+
+def test_range_axis_is_inclusive_without_float_drift():
+    """range軸が終端を含み、浮動小数点の誤差なく展開されることをテストする。"""
+    assert SweepAxis.range("scale", 5.0, 6.0, 0.1).values == [5.0, 5.1, 5.2, 5.3, 5.4, 5.5, 5.6, 5.7, 5.8, 5.9, 6.0]
+    assert SweepAxis.range("steps", 20, 28, 4).values == [20, 24, 28]
+
+
+def test_product_and_zip_expansion():
+    """直積モードとzipモードの展開結果をテストする。"""
+    scale = SweepAxis.of("scale", [5, 6])
+    strength = SweepAxis.of("reference_strength_multiple.0", [0.3, 0.6])
+
+    product = ParameterSweep([scale, strength])
+    zipped = ParameterSweep([scale, strength], mode="zip")
+
+    assert len(product) == 4 and len(list(product)) == 4
+    assert list(zipped) == [{"scale": 5, "reference_strength_multiple.0": 0.3}, {"scale": 6, "reference_strength_multiple.0": 0.6}]
+    with pytest.raises(ValueError):
+        ParameterSweep([scale, SweepAxis.of("steps", [1, 2, 3])], mode="zip")
+
+
+def test_apply_sets_nested_values_on_a_copy():
+    """ドット区切りのパスでリスト要素を上書きし、元のパラメータは変更しないことをテストする。"""
+    base = {"scale": 5, "reference_strength_multiple": [0.5, 0.5]}
+
+    applied = ParameterSweep.apply(base, {"scale": 7, "reference_strength_multiple.1": 0.9})
+
+    assert applied == {"scale": 7, "reference_strength_multiple": [0.5, 0.9]}
+    assert base["reference_strength_multiple"] == [0.5, 0.5]
+
+
+def test_run_sweep_streams_results_with_bounded_concurrency(tmp_path, monkeypatch):
+    """10x10グリッドが1回の呼び出しで実行され、同時実行数が制限され、座標付きで親セッションに紐付くことをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    client, repo = FakeClient(fail_scale=5.5), FakeRepository()
+    service = GenerationService(client, repo, result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")))
+    session = GenerationSession(sessionID=str(uuid.uuid4()), timestamp=datetime.now(),
+                                baseParameters=json.dumps({"seed": 1, "scale": 5, "reference_strength_multiple": [0.5]}),
+                                basePromptPositive="1girl", overallStatus="pending")
+    sweep = ParameterSweep([SweepAxis.range("scale", 5.0, 9.5, 0.5), SweepAxis.range("reference_strength_multiple.0", 0.1, 1.0, 0.1)])
+
+    results = list(service.run_sweep(session, "default", sweep, max_concurrency=3))
+
+    assert len(results) == 100
+    assert client.max_in_flight <= 3
+    assert repo.sessions == [session.sessionID]
+    assert sum(1 for result in results if not result.ok) == 10 # scale=5.5の行のみ失敗
+    image, session_id = repo.images[0]
+    assert session_id == session.sessionID
+    coordinates = json.loads(image.sweepCoordinates)
+    assert image.actualParameters["scale"] == coordinates["scale"]
+    assert image.actualParameters["reference_strength_multiple"] == [coordinates["reference_strength_multiple.0"]]
+
+
+def test_run_sweep_uses_the_service_model(tmp_path, monkeypatch):
+    """セッションの記録とAPI呼び出しの両方でサービスに指定したモデルが使われることをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    client, repo = FakeClient(), FakeRepository()
+    service = GenerationService(client, repo, result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")),
+                                model_name="nai-diffusion-3")
+    session = GenerationSession(sessionID=str(uuid.uuid4()), timestamp=datetime.now(), baseParameters=json.dumps({"seed": 1}),
+                                basePromptPositive="1girl", overallStatus="pending")
+
+    results = list(service.run_sweep(session, "default", ParameterSweep([SweepAxis.of("scale", [5, 6])])))
+
+    assert all(result.ok for result in results)
+    assert repo.models == ["nai-diffusion-3"]
+    assert {parameters["model"] for parameters in client.parameters} == {"nai-diffusion-3"}
@@ -0,0 +1,167 @@
+import os
+import json
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+
+from grid.core.api.novelai import NovelAIClient
+from grid.core.models.session import GenerationSession
+from grid.core.services.generation_cache import GenerationResultCache
+from grid.core.services.generation_service import GenerationService
+from grid.core.services.pipeline import PipelineStage, StagedPipeline
+
+
+def test_pipeline_processes_every_item_through_all_stages():
+    """全アイテムが全ステージを通過し、ステージごとの件数が記録されることをテストする。"""
+    pipeline = StagedPipeline([
+        PipelineStage("double", lambda x: x * 2, workers=3),
+        PipelineStage("inc", lambda x: x + 1),
+    ], queue_size=2)
+
+    results = list(pipeline.run(range(20)))
+
+    assert sorted(item.value for item in results) == [x * 2 + 1 for x in range(20)]
+    stats = pipeline.stats()
+    assert stats["double"]["items"] == 20 and stats["inc"]["items"] == 20
+
+
+def test_pipeline_failed_items_skip_later_stages():
+    """失敗したアイテムは後続ステージをスキップし、失敗ステージが記録されることをテストする。"""
+    calls = []
+
+    def fail_on_odd(x):
+        if x % 2:
+            raise ValueError(f"odd {x}")
+        return x
+
+    pipeline = StagedPipeline([PipelineStage("check", fail_on_odd), PipelineStage("record", lambda x: calls.append(x) or x)])
+
+    results = list(pipeline.run(range(6)))
+
+    failed = [item for item in results if not item.ok]
+    assert len(failed) == 3
+    assert all(item.failed_stage == "check" for item in failed)
+    assert sorted(calls) == [0, 2, 4]
+    assert pipeline.stats()["check"]["errors"] == 3
+
+
+def test_slow_stage_does_not_stall_upstream():
+    """下流ステージが遅くても、キューに空きがある限り上流ステージが先行することをテストする。"""
+    fetched = []
+    pipeline = StagedPipeline([
+        PipelineStage("fetch", lambda x: fetched.append(x) or x),
+        PipelineStage("persist", lambda x: time.sleep(0.05) or x),
+    ], queue_size=4)
+
+    iterator = pipeline.run(range(5))
+    next(iterator)
+
+    assert len(fetched) == 5 # 最初の結果が出る前に全件の取得が完了している
+    list(iterator)
+    stats = pipeline.stats()
+    assert stats["persist"]["busy_seconds"] > stats["fetch"]["busy_seconds"]
+
+
+def test_pipeline_stops_when_caller_stops_iterating():
+    """呼び出し側が途中で反復をやめると入力の消費が止まることをテストする。"""
+    consumed = []
+
+    def source():
+        for x in range(1000):
+            consumed.append(x)
+            yield x
+
+    iterator = StagedPipeline([PipelineStage("noop", lambda x: x)], queue_size=2).run(source())
+    next(iterator)
+    iterator.close()
+
+    assert len(consumed) < 20
+
+
+class SlowClient:
+    """ネットワーク取得に時間がかかるフェイククライアント"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = []
+
+    def download_image_archive(self, prompt, model, action, parameters):
+        with self.lock:
+            self.started.append(time.perf_counter())
+        time.sleep(0.05)
+        archive = tempfile.TemporaryFile()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("image_0.png", b"png")
+        archive.seek(0)
+        return archive
+
+    extract_image_archive = staticmethod(NovelAIClient.extract_image_archive)
+
+
+class SlowRepository:
+    def __init__(self):
+        self.images = []
+
+    def create_session(self, session, user_id, model_name):
+        pass
+
+    def create_generated_image(self, image, session_id):
+        time.sleep(0.05)
+        self.images.append(image)
+
+    def create_generated_images(self, images, session_id):
+        time.sleep(0.05)
+        self.images.extend(images)
+        return len(images)
+
+
+def test_generate_sessions_overlaps_fetch_with_persistence(tmp_path, monkeypatch):
+    """DB書き込み中も次のリクエストが開始され、ステージ別の計測値が取得できることをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    client, repo = SlowClient(), SlowRepository()
+    service = GenerationService(client, repo, result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")))
+    sessions = [
+        GenerationSession(sessionID=str(uuid.uuid4()), timestamp=datetime.now(), baseParameters=json.dumps({"seed": seed}),
+                          basePromptPositive="1girl", overallStatus="pending")
+        for seed in range(6)
+    ]
+
+    started = time.perf_counter()
+    results = list(service.generate_sessions(sessions, "default", max_concurrency=1))
+    elapsed = time.perf_counter() - started
+
+    assert all(result.ok for result in results) and len(repo.images) == 6
+    assert elapsed < 6 * 0.1 * 0.8 # 取得と永続化が直列なら0.6秒以上かかる
+    stats = service.pipeline_stats()
+    assert set(stats) == {"fetch", "write", "persist"}
+    assert stats["fetch"]["items"] == 6
+
+
+def test_generate_sessions_reports_invalid_parameters(tmp_path):
+    """baseParametersが不正なセッションはエラーとして報告されることをテストする。"""
+    service = GenerationService(SlowClient(), SlowRepository(), result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")))
+    session = GenerationSession(sessionID="bad", timestamp=datetime.now(), baseParameters="{not json",
+                                basePromptPositive="1girl", overallStatus="pending")
+
+    results = list(service.generate_sessions([session], "default"))
+
+    assert len(results) == 1 and "Invalid JSON" in results[0].error
+
+
+def test_generate_sessions_saves_under_output_dir(tmp_path, monkeypatch):
+    """画像がカレントディレクトリではなく指定したoutput_dir配下に保存されることをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    output_dir = str(tmp_path / "out")
+    service = GenerationService(SlowClient(), SlowRepository(), result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")),
+                                output_dir=output_dir)
+    session = GenerationSession(sessionID="s1", timestamp=datetime.now(), baseParameters=json.dumps({"seed": 1}),
+                                basePromptPositive="1girl", overallStatus="pending")
+
+    results = list(service.generate_sessions([session], "default"))
+
+    path = results[0].images[0].imagePath
+    assert path.startswith(output_dir) and os.path.dirname(path).endswith("s1") and os.path.exists(path)
+    assert not os.path.exists(tmp_path / "data")
@@ -0,0 +1,136 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+from grid.core.api.rate_limit import (
+    EndpointLimit,
+    RequestScheduler,
+    RetryPolicy,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    """time.monotonic / time.sleep を置き換える仮想時計"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _scheduler(clock, **policy):
+    return RequestScheduler(
+        limits={"/ai/generate-image": EndpointLimit(rate=100.0, burst=10, max_concurrency=2)},
+        retry_policy=RetryPolicy(rng=random.Random(0), **policy),
+        sleep=clock.sleep,
+        clock=clock,
+    )
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    """Retry-Afterの秒数形式とHTTP日付形式を解釈できることをテストする。"""
+    now = datetime(2025, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Wed, 01 Jan 2025 00:00:30 GMT", now=now) == 30.0
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after(None) is None
+
+
+def test_token_bucket_limits_rate():
+    """バーストを使い切った後はrateに従って待機することをテストする。"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        bucket.acquire()
+
+    assert clock.now == pytest.approx(1.0) # 2件はバースト、残り2件は0.5秒間隔
+
+
+def test_token_bucket_pause_blocks_acquire():
+    """pause中はトークンが発行されないことをテストする。"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10.0, capacity=5, clock=clock, sleep=clock.sleep)
+    bucket.pause(3.0)
+
+    bucket.acquire()
+
+    assert clock.now == pytest.approx(3.1) # 3秒の停止後、バーストは空からの補充となる
+
+
+def test_scheduler_retries_429_honouring_retry_after():
+    """429を受けた場合にRetry-Afterだけ待ってから再試行することをテストする。"""
+    clock = FakeClock()
+    scheduler = _scheduler(clock, base_delay=0.01)
+    responses = [FakeResponse(429, {"Retry-After": "5"}), FakeResponse(200)]
+
+    response = scheduler.execute("/ai/generate-image", lambda: responses.pop(0))
+
+    assert response.status_code == 200
+    assert clock.now >= 5.0
+    stats = scheduler.stats()["/ai/generate-image"]
+    assert stats["throttled"] == 1
+    assert stats["retries"] == 1
+    assert stats["requests"] == 2
+
+
+def test_scheduler_retries_transient_errors_with_backoff():
+    """5xxや接続エラーを指数バックオフで再試行することをテストする。"""
+    clock = FakeClock()
+    scheduler = _scheduler(clock, base_delay=1.0, max_delay=60.0)
+    outcomes = [requests.exceptions.ConnectionError("reset"), FakeResponse(503), FakeResponse(200)]
+
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    response = scheduler.execute("/ai/generate-image", send)
+
+    assert response.status_code == 200
+    assert len(clock.sleeps) == 2
+    assert clock.sleeps[0] <= 1.0 and clock.sleeps[1] <= 2.0
+
+
+def test_scheduler_returns_last_response_when_retries_exhausted():
+    """再試行回数を使い切った場合は最後のレスポンスをそのまま返すことをテストする。"""
+    clock = FakeClock()
+    scheduler = _scheduler(clock, max_retries=2, base_delay=0.01)
+
+    response = scheduler.execute("/ai/generate-image", lambda: FakeResponse(500))
+
+    assert response.status_code == 500
+    assert scheduler.stats()["/ai/generate-image"]["failures"] == 1
+    assert scheduler.stats()["/ai/generate-image"]["requests"] == 3
+
+
+def test_scheduler_does_not_retry_client_errors():
+    """4xx(429以外)は再試行しないことをテストする。"""
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+
+    response = scheduler.execute("/ai/generate-image", lambda: FakeResponse(401))
+
+    assert response.status_code == 401
+    assert clock.sleeps == []
@@ -0,0 +1,127 @@
+import json
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from grid.core.api.novelai import NovelAIClient
+from grid.core.db.rating_stats import bucket_of, rating_stat_rows
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.models.image import GeneratedImage
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.rating_stat import RatingStat
+from grid.core.models.session import GenerationSession, SessionResources
+from grid.core.models.vibe import VibeImage
+from grid.core.services.generation_cache import GenerationResultCache
+from grid.core.services.generation_service import GenerationService
+from grid.core.services.parameter_sweep import ParameterSweep, SweepAxis
+
+
+def rating_context(query, params):
+    """セッション文脈クエリにはvibe/テンプレート情報を、集計の読み出しには保存済みバケットを返すハンドラ"""
+    if "OPTIONAL MATCH (s)-[u:USES_VIBE]" in query:
+        return {"vibes": [{"vibeID": "v1", "index": 0}], "templateID": "t1", "setID": "p1"}
+    if "RETURN st" in query:
+        return [{"st": {"key": "vibe:v1|scale|5.0", "kind": "vibe_parameter", "vibeID": "v1", "parameter": "scale",
+                        "bucket": 5.0, "bucketWidth": 0.5, "count": 4, "sum": 18, "sumSquares": 82}}]
+    return None
+
+
+@pytest.fixture
+def neo4j_handler():
+    return rating_context
+
+
+def _image(image_id, rating, scale):
+    return GeneratedImage(imageID=image_id, imagePath=f"{image_id}.png", seed=1, rating=rating, generationStatus="success",
+                          actualParameters={"scale": scale, "steps": 28, "reference_strength_multiple": [0.65]},
+                          actualPromptPositive="1girl")
+
+
+def test_bucket_keys_cover_vibe_parameters_and_template_pairing():
+    """vibeごとのパラメータバケットとテンプレート×パラメータセットのキーが生成されることをテストする。"""
+    assert bucket_of(5.3, 0.5) == 5.0 and bucket_of(0.65, 0.1) == 0.6 and bucket_of(29, 4) == 28.0
+
+    rows = rating_stat_rows({"scale": 5.3, "steps": 28, "reference_strength_multiple": [0.65, 0.3]},
+                            [{"vibeID": "v1", "index": 0}, {"vibeID": "v2", "index": 1}], "t1", "p1")
+    keys = [row["key"] for row in rows]
+
+    assert "vibe:v1|scale|5.0" in keys and "vibe:v2|scale|5.0" in keys
+    assert "vibe:v1|reference_strength|0.6" in keys and "vibe:v2|reference_strength|0.3" in keys
+    assert "template:t1|set:p1" in keys
+    assert not any("cfg_rescale" in key for key in keys) # Parameters that were not sent are not tracked
+
+
+def test_creating_images_folds_ratings_into_aggregates(repo):
+    """画像作成時に評価済み画像だけがバケットのcount/sum/sumSquaresに加算されることをテストする。"""
+    repo.create_generated_images([_image("a", 4, 5.0), _image("b", 0, 5.2), _image("c", 2, 7.0)], "session-1")
+
+    create_params = next(params for query, params in repo._driver.queries if "CREATE (i:GeneratedImage" in query)
+    assert "template:t1|set:p1" in create_params["rows"][0]["ratingStatKeys"]
+    stats = {row["key"]: row for row in next(params["rows"] for query, params in repo._driver.queries if "MERGE (st:RatingStat" in query)}
+    assert (stats["vibe:v1|scale|5.0"]["count"], stats["vibe:v1|scale|5.0"]["sum"], stats["vibe:v1|scale|5.0"]["sumSquares"]) == (1, 4, 16)
+    assert stats["vibe:v1|scale|7.0"]["sum"] == 2
+    assert (stats["template:t1|set:p1"]["count"], stats["template:t1|set:p1"]["sum"]) == (2, 6)
+
+
+def test_rating_updates_apply_deltas_to_aggregates(repo):
+    repo.update_image_rating("a", 5)
+
+    query, params = repo._driver.queries[-1]
+    assert "MATCH (st:RatingStat {key: key})" in query and "row.rating - old" in query
+    assert params["rows"] == [{"imageID": "a", "rating": 5}]
+
+
+def test_best_buckets_read_only_aggregates(repo):
+    best = repo.best_vibe_parameter_buckets("v1", parameter="scale", min_count=3)
+
+    query, params = repo._driver.queries[-1]
+    assert "MATCH (st:RatingStat)" in query and "GeneratedImage" not in query
+    assert params["vibeId"] == "v1" and params["minCount"] == 3
+    assert best[0].mean == 4.5
+    assert best[0].variance == pytest.approx(82 / 4 - 4.5 ** 2)
+
+
+def test_rating_stat_of_empty_bucket():
+    stat = RatingStat(key="k", kind="vibe_parameter")
+    assert stat.mean == 0.0 and stat.variance == 0.0
+
+
+class ArchiveClient:
+    """1枚の画像を含むzipを返すフェイククライアント"""
+
+    def download_image_archive(self, prompt, model, action, parameters):
+        archive = tempfile.TemporaryFile()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("image_0.png", b"png")
+        archive.seek(0)
+        return archive
+
+    extract_image_archive = staticmethod(NovelAIClient.extract_image_archive)
+
+
+def test_generated_and_rated_images_reach_the_best_buckets(tmp_path):
+    """生成サービスで作った画像に評価を付けると、vibe・テンプレート別の集計に反映されることをテストする。"""
+    repo = SQLiteRepository(str(tmp_path / "grid.sqlite3"))
+    repo.create_vibe(VibeImage(vibeID="v1", imagePath="v1.png", vibeType="Generic", encodedIE=1.0, encodedVibePath="v1.naiv4vibe",
+                               createdAt=datetime(2025, 1, 1)))
+    repo.create_prompt_template(PromptTemplate(templateID="t1", name="portrait", contentPositive="1girl", createdAt=datetime(2025, 1, 1)))
+    repo.create_parameter_set(ParameterSet(setID="p1", name="default", parameters="{}", createdAt=datetime(2025, 1, 1)))
+    service = GenerationService(ArchiveClient(), repo, result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")),
+                                output_dir=str(tmp_path / "generated"))
+    session = GenerationSession(sessionID=str(uuid.uuid4()), timestamp=datetime(2025, 1, 1), basePromptPositive="1girl",
+                                baseParameters=json.dumps({"seed": 1, "reference_strength_multiple": [0.65]}), overallStatus="pending")
+
+    results = list(service.run_sweep(session, "default", ParameterSweep([SweepAxis.of("scale", [5.0, 7.0])]),
+                                     resources=SessionResources(vibeIDs=["v1"], templateID="t1", parameterSetID="p1")))
+    ratings = {result.images[0].imageID: 5 if result.coordinates["scale"] == 5.0 else 2 for result in results}
+    assert repo.update_image_ratings(ratings) == 2
+
+    best = repo.best_vibe_parameter_buckets("v1", parameter="scale")
+    assert [(stat.key, stat.count, stat.mean) for stat in best] == [("vibe:v1|scale|5.0", 1, 5.0), ("vibe:v1|scale|7.0", 1, 2.0)]
+    pairing = repo.best_template_parameter_sets("t1")[0]
+    assert (pairing.key, pairing.count, pairing.mean) == ("template:t1|set:p1", 2, 3.5)
+    repo.close_connection()
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from grid.core.models.session import SessionRecord
+
+
+@pytest.fixture
+def repo(make_repo):
+    return make_repo(batch_size=40)
+
+
+def test_tags_are_written_in_chunks_within_one_transaction(repo):
+    """100画像×30タグが1トランザクション内のチャンク単位のUNWINDで書き込まれることをテストする。"""
+    pairs = [(f"image-{i}", f"tag-{t}") for i in range(100) for t in range(30)]
+
+    assert repo.add_tags_to_images(pairs, batch_size=1000) == 3000
+
+    driver = repo._driver
+    assert (driver.sessions, driver.transactions, len(driver.queries)) == (1, 1, 3)
+    assert all("UNWIND $rows" in query for query, _ in driver.queries)
+    assert [len(params["rows"]) for _, params in driver.queries] == [1000, 1000, 1000]
+
+
+def test_default_batch_size_and_shared_params(repo):
+    """既定のチャンクサイズと全チャンク共通のパラメータをテストする。"""
+    updates = [(f"image-{i}", "error", "boom") for i in range(100)]
+
+    assert repo.update_image_statuses(updates) == 100
+    assert [len(params["rows"]) for _, params in repo._driver.queries] == [40, 40, 20]
+    assert repo._driver.queries[0][1]["rows"][0] == {"imageID": "image-0", "status": "error", "errorMessage": "boom"}
+
+
+def test_empty_batch_does_not_touch_the_database(repo):
+    assert repo.update_image_ratings({}) == 0
+    assert repo._driver.sessions == 0
+
+
+def test_invalid_rating_rejects_whole_batch(repo):
+    with pytest.raises(ValueError):
+        repo.update_image_ratings({"a": 3, "b": 9})
+    assert repo._driver.sessions == 0
+
+
+def test_batch_size_must_be_positive(make_repo):
+    with pytest.raises(ValueError):
+        make_repo(batch_size=0)
+
+
+def test_tag_attachment_merges_relationships_in_one_round_trip(repo):
+    """1画像の全タグが1回のMERGEクエリで付与され、重複ペアが除かれることをテストする。"""
+    assert repo.add_tags_to_image("image-1", ["a", "b", "a"]) == 2
+
+    (query, params), = repo._driver.queries
+    assert "MERGE (i)-[r:HAS_TAG]->(t)" in query and "CREATE (i)-[" not in query
+    assert params["rows"] == [{"imageID": "image-1", "tagName": "a"}, {"imageID": "image-1", "tagName": "b"}]
+
+
+def test_deduplicate_runs_until_nothing_is_left(repo):
+    """重複除去が削除0件になるまでトランザクション単位で繰り返されることをテストする。"""
+    removed = iter([40, 7, 0])
+    repo._driver.handler = lambda query, params: {"count": next(removed)}
+
+    assert repo.deduplicate_tag_relationships() == 47
+    assert repo._driver.transactions == 3
+    assert repo._driver.queries[0][1] == {"limit": 40}
+
+
+def test_session_import_reports_failures_like_other_writes(repo):
+    """セッションの一括作成が他の書き込みと同じく未初期化・失敗をConnectionError/RuntimeErrorで報告することをテストする。"""
+    record = SessionRecord(sessionID="s1", timestamp=datetime(2025, 1, 1), baseParameters="{}", basePromptPositive="1girl",
+                           overallStatus="completed", userID="default", modelName="model")
+    def failing_run(query, params):
+        raise OSError("socket closed")
+
+    repo._driver.handler = failing_run
+    with pytest.raises(RuntimeError, match="Failed to create 1 session nodes: socket closed"):
+        repo.create_sessions([record])
+
+    repo._driver = None
+    with pytest.raises(ConnectionError):
+        repo.create_sessions([record])
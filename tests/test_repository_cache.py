@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+
+from grid.core.db.cache import LRUCache
+from grid.core.models.session import GenerationSession
+from grid.core.models.vibe import VibeImage
+
+
+class CacheHandler:
+    """vibe・セッション・タグの読み取りに答えるハンドラ"""
+
+    def __init__(self):
+        self.status = "pending"
+        self.tags = ["rating:good"]
+
+    def __call__(self, query, params):
+        if "MATCH (v:VibeImage {vibeID: $vibeID})" in query:
+            return {"v": {"vibeID": params["vibeID"], "imagePath": "vibe.png", "vibeType": "Generic", "encodedIE": 1.0,
+                          "encodedVibePath": "vibe.naiv4vibe", "createdAt": "2025-01-01T00:00:00"}}
+        if "MATCH (s:GenerationSession {sessionID: $sessionID})" in query and "RETURN s" in query:
+            return {"s": {"sessionID": params["sessionID"], "timestamp": "2025-01-01T00:00:00", "baseParameters": "{}",
+                          "basePromptPositive": "1girl", "overallStatus": self.status}}
+        if "RETURN DISTINCT t.tagName" in query:
+            return [{"tagName": name} for name in self.tags]
+        return None
+
+
+@pytest.fixture
+def neo4j_handler():
+    return CacheHandler()
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+    """サイズ超過で最も古く使われたエントリが追い出され、TTL経過後はミスになることをテストする。"""
+    now = [0.0]
+    cache = LRUCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1 # "a" is now the most recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None and cache.get("c") == 3
+    now[0] = 10.0
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (2, 2, 1, 1)
+    assert stats["size"] == 1 and stats["hit_rate"] == 0.5
+
+
+def test_get_vibe_is_served_from_cache_until_written(repo):
+    """get_vibeの2回目以降はDBに問い合わせず、同じリポジトリ経由の書き込みで無効化されることをテストする。"""
+    first = repo.get_vibe("v1")
+    first.notes = "mutated by caller"
+    second = repo.get_vibe("v1")
+
+    assert repo._driver.count("MATCH (v:VibeImage") == 1
+    assert second.notes is None # Callers get copies; the cached entry is not shared
+
+    repo.create_vibe(VibeImage(vibeID="v1", imagePath="vibe.png", vibeType="Generic", encodedIE=1.0,
+                                encodedVibePath="vibe.naiv4vibe", createdAt=datetime(2025, 1, 1)))
+    repo.get_vibe("v1")
+    assert repo._driver.count("MATCH (v:VibeImage") == 2
+    assert repo.cache_stats()["hits"] == 1
+
+
+def test_session_status_update_invalidates_cached_session(repo, neo4j_handler):
+    assert repo.get_session("s1").overallStatus == "pending"
+    neo4j_handler.status = "running"
+    assert repo.get_session("s1").overallStatus == "pending" # Written elsewhere: stale until TTL
+
+    repo.update_session_status("s1", "running")
+    assert repo.get_session("s1").overallStatus == "running"
+
+    repo.create_session(GenerationSession(sessionID="s1", timestamp=datetime(2025, 1, 1), baseParameters="{}",
+                                          basePromptPositive="1girl", overallStatus="pending"), "default", "model")
+    assert repo.cache_stats()["size"] == 0
+
+
+def test_tag_writes_invalidate_cached_tags(repo, neo4j_handler):
+    """タグ付けした画像のタグキャッシュだけが無効化されることをテストする。"""
+    assert repo.get_image_tags("a") == ["rating:good"]
+    assert repo.get_image_tags("b") == ["rating:good"]
+    neo4j_handler.tags = ["rating:good", "style:anime"]
+
+    repo.add_tags_to_images([("a", "style:anime")])
+
+    assert repo.get_image_tags("a") == ["rating:good", "style:anime"]
+    assert repo.get_image_tags("b") == ["rating:good"]
+    assert repo._driver.count("RETURN DISTINCT t.tagName") == 3
+
+
+def test_zero_cache_size_disables_cache(make_repo):
+    repo = make_repo(cache_size=0)
+
+    repo.get_vibe("v1")
+    repo.get_vibe("v1")
+
+    assert repo._driver.count("MATCH (v:VibeImage") == 2
+    assert repo.cache_stats()["misses"] == 2
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from grid.core.db.metrics import Histogram, query_name, plan_tree
+from grid.core.db.repository import Neo4jRepository
+
+
+def test_pool_settings_are_passed_to_the_driver(make_repo):
+    repo = make_repo(max_connection_pool_size=16, connection_acquisition_timeout=5.0, max_connection_lifetime=600.0, fetch_size=200)
+
+    assert repo._driver.config == {"max_connection_pool_size": 16, "connection_acquisition_timeout": 5.0,
+                                   "max_connection_lifetime": 600.0, "fetch_size": 200}
+    assert repo.pool_metrics()["max_pool_size"] == 16
+
+
+def test_from_settings_reads_database_settings(fake_neo4j):
+    database = SimpleNamespace(neo4j_uri="neo4j://db:7687", neo4j_user="neo4j", neo4j_password="secret", neo4j_batch_size=250,
+                               neo4j_max_connection_pool_size=32, neo4j_connection_acquisition_timeout=10.0,
+                               neo4j_max_connection_lifetime=1800.0, neo4j_fetch_size=500,
+                               neo4j_cache_size=16, neo4j_cache_ttl=5.0, neo4j_slow_query_threshold=0.1,
+                               neo4j_profile_slow_queries=True)
+
+    repo = Neo4jRepository.from_settings(database)
+
+    assert repo._driver.uri == "neo4j://db:7687" and repo._driver.auth == ("neo4j", "secret")
+    assert repo._driver.config["max_connection_pool_size"] == 32 and repo._driver.config["fetch_size"] == 500
+    assert repo._batch_size == 250
+    assert repo.cache_stats()["max_entries"] == 16 and repo.cache_stats()["ttl_seconds"] == 5.0
+    assert repo._profile_slow_queries is True
+
+
+def test_acquisition_wait_and_query_latency_are_recorded_separately(make_repo):
+    """接続待ち時間とクエリ時間が別々のヒストグラムに記録されることをテストする。"""
+    repo = make_repo()
+    repo._driver.acquire_delay = 0.03
+    repo._driver.query_delay = 0.002
+
+    repo.update_image_status("image-1", "error", "boom")
+    repo.update_image_ratings({"image-1": 3})
+    metrics = repo.pool_metrics()
+
+    assert metrics["acquisition"]["count"] == 2
+    assert metrics["acquisition"]["p50_seconds"] >= 0.025
+    assert set(metrics["queries"]) == {"update_image_status", "update_image_ratings"}
+    assert metrics["queries"]["update_image_ratings"]["max_seconds"] < 0.03
+    assert metrics["in_use"] == 0
+
+    repo.reset_pool_metrics()
+    assert repo.pool_metrics()["acquisition"]["count"] == 0
+
+
+def test_peak_in_use_tracks_concurrent_transactions(make_repo):
+    repo = make_repo()
+    repo._driver.query_delay = 0.05
+
+    threads = [threading.Thread(target=repo.update_image_rating, args=(f"image-{i}", 1)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics = repo.pool_metrics()
+    assert metrics["peak_in_use"] >= 2
+    assert metrics["queries"]["update_image_rating"]["count"] == 4
+
+
+def test_failed_queries_are_counted(make_repo):
+    repo = make_repo()
+
+    def deadlock(query, params):
+        raise RuntimeError("deadlock")
+
+    repo._driver.handler = deadlock
+    with pytest.raises(RuntimeError):
+        repo.update_image_rating("image-1", 1)
+    assert repo.pool_metrics()["queries"]["update_image_rating"]["errors"] == 1
+
+
+def test_histogram_quantiles_and_query_names():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.5] * 10:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.99) == 1.0
+
+    def _create_vibe_tx(tx):
+        pass
+    assert query_name(_create_vibe_tx) == "test_histogram_quantiles_and_query_names"
+    _create_vibe_tx.__qualname__ = "_create_vibe_tx"
+    assert query_name(_create_vibe_tx) == "create_vibe"
+
+
+def summary_of(available_ms, consumed_ms, nodes_created=0):
+    """文ごとのResultSummary相当を返すsummary関数。available_msは文から待ち時間を決め、PROFILE付きの文には計画が付く"""
+    def summary(statement, params):
+        profile = None
+        if statement.startswith("PROFILE "):
+            profile = {"operatorType": "ProduceResults@neo4j", "args": {"Rows": 1, "DbHits": 0}, "children": [
+                {"operatorType": "NodeUniqueIndexSeek@neo4j", "args": {"Rows": 1, "DbHits": 2, "Details": "UNIQUE i:GeneratedImage(imageID)"},
+                 "children": []}]}
+        return SimpleNamespace(result_available_after=available_ms(statement), result_consumed_after=consumed_ms, profile=profile,
+                               counters=SimpleNamespace(nodes_created=nodes_created, properties_set=3))
+    return summary
+
+
+def test_statement_summaries_are_aggregated_and_slow_ones_profiled(make_repo, tmp_path):
+    """サーバー側の処理時間・更新カウンタがメソッドごとに集計され、閾値を超えた文がPROFILE計画付きで記録されることをテストする。"""
+    repo = make_repo(slow_query_threshold=0.1, profile_slow_queries=True)
+    repo._driver.summary = summary_of(lambda statement: 150 if "rating" in statement else 2, consumed_ms=5, nodes_created=1)
+
+    repo.update_image_status("image-1", "error", "boom")
+    repo.update_image_rating("image-1", 3)
+
+    assert all(statement.startswith("PROFILE ") for statement, _ in repo._driver.queries)
+    metrics = repo.pool_metrics()
+    status = metrics["queries"]["update_image_status"]
+    assert (status["statements"], status["result_available_after_ms"], status["result_consumed_after_ms"]) == (1, 2, 5)
+    assert status["counters"] == {"nodes_created": 1, "properties_set": 3}
+    assert metrics["slow_queries"] == 1
+
+    slow = repo.slow_queries()[0]
+    assert slow["query"] == "update_image_rating" and slow["server_seconds"] == 0.155
+    assert not slow["statement"].startswith("PROFILE") and slow["parameters"] == ["rows"]
+    assert slow["plan"]["children"][0]["details"] == "UNIQUE i:GeneratedImage(imageID)" and slow["db_hits"] == 2
+
+    path = tmp_path / "metrics.json"
+    repo.dump_query_metrics(str(path))
+    dumped = json.loads(path.read_text())
+    assert dumped["slow_queries"][0]["query"] == "update_image_rating"
+    assert dumped["metrics"]["queries"]["update_image_status"]["statements"] == 1
+
+    repo.reset_pool_metrics()
+    assert repo.slow_queries() == []
+
+
+def test_statements_run_unprofiled_by_default(make_repo):
+    repo = make_repo()
+    repo._driver.summary = summary_of(lambda statement: 900, 0)
+
+    repo.update_image_rating("image-1", 3)
+    assert not repo._driver.queries[0][0].startswith("PROFILE")
+    assert repo.slow_queries()[0]["plan"] is None
+
+
+def test_plan_tree_reads_driver_and_server_plan_keys():
+    plan = plan_tree({"operatorType": "Filter", "dbHits": 7, "rows": 3, "args": {"Details": "i.rating > 0"},
+                      "children": [{"operatorType": "NodeByLabelScan", "args": {"DbHits": 11, "Rows": 10}, "children": []}]})
+    assert plan == {"operator": "Filter", "rows": 3, "dbHits": 7, "details": "i.rating > 0",
+                    "children": [{"operator": "NodeByLabelScan", "rows": 10, "dbHits": 11, "details": None, "children": []}]}
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pytest
+
+from grid.core.models.image import ImageQuery
+
+
+def _node(image_id, rating=0, status="success"):
+    return {"imageID": image_id, "imagePath": f"{image_id}.png", "seed": 1, "actualParameters": '{"scale": 5}',
+            "actualPromptPositive": "1girl", "actualPromptNegative": None, "rating": rating, "eagleItemID": None,
+            "generationStatus": status, "errorMessage": None, "isVibeCandidate": False, "sweepCoordinates": None}
+
+
+class KeysetHandler:
+    """newest順のキーセット条件をPythonで評価してページを返すハンドラ"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __call__(self, query, params):
+        rows = sorted(self.rows, key=lambda r: (r["sessionTimestamp"], r["i"]["imageID"]), reverse=True)
+        if "cursor0" in params and "cursor2" not in params: # Rating-order cursors are only checked as statements
+            after = (params["cursor0"], params["cursor1"])
+            rows = [r for r in rows if (r["sessionTimestamp"], r["i"]["imageID"]) < after]
+        return rows[:params["limit"]]
+
+
+@pytest.fixture
+def neo4j_handler():
+    # 3 sessions x 5 images, several images sharing a session timestamp
+    return KeysetHandler([{"i": _node(f"img-{session}-{index}"), "sessionID": f"s{session}", "sessionTimestamp": f"2024-01-0{session}T00:00:00"}
+                          for session in range(1, 4) for index in range(5)])
+
+
+def test_paging_visits_every_image_once_in_order(repo):
+    """カーソルで全ページを辿ると、全画像が新しい順に一度ずつ返ることをテストする。"""
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = repo.query_images(limit=4, cursor=cursor)
+        seen.extend(image.imageID for image in page.images)
+        pages += 1
+        cursor = page.nextCursor
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert len(seen) == len(set(seen)) == 15
+    assert seen[:5] == [f"img-3-{index}" for index in range(4, -1, -1)]
+    assert all("SKIP" not in query for query, _ in repo._driver.queries)
+    assert repo._driver.queries[1][1]["limit"] == 5 # One extra row tells whether another page exists
+
+
+def test_filters_become_indexed_predicates(repo):
+    """フィルタがインデックス対象プロパティの条件とタグのMATCHに変換されることをテストする。"""
+    query = ImageQuery(sessionID="s1", minRating=3, generationStatus="success", tags=["keyword:1girl", "param:steps:28"],
+                       sessionsSince=datetime(2024, 1, 1), orderBy="rating")
+    page = repo.query_images(query, limit=2)
+
+    cypher, params = repo._driver.queries[0]
+    assert "MATCH (i:GeneratedImage)-[:HAS_TAG]->(:Tag {tagName: $tag0})" in cypher
+    assert "MATCH (i:GeneratedImage)-[:HAS_TAG]->(:Tag {tagName: $tag1})" in cypher
+    assert "(s:GenerationSession {sessionID: $sessionID})" in cypher
+    assert "i.rating IS NOT NULL" in cypher and "i.rating >= $minRating" in cypher
+    assert "ORDER BY i.rating DESC, i.sessionTimestamp DESC, i.imageID DESC" in cypher
+    assert params["sessionsSince"] == "2024-01-01T00:00:00"
+    assert page.images[0].actualParameters == {"scale": 5}
+    assert page.sessionIDs[page.images[0].imageID] == "s3"
+
+
+def test_rating_pages_seek_from_the_cursor(repo):
+    """評価順の2ページ目が、同じ評価の残りと低い評価の2つのインデックスシークの和になることをテストする。"""
+    cursor = repo.query_images(ImageQuery(orderBy="rating", minRating=0), limit=2).nextCursor
+    repo.query_images(ImageQuery(orderBy="rating", minRating=0), limit=2, cursor=cursor)
+
+    cypher, params = repo._driver.queries[-1]
+    assert cypher.count("UNION ALL") == 1 and cypher.count("LIMIT $limit") == 3
+    assert "i.rating = $cursor0 AND i.sessionTimestamp <= $cursor1" in cypher
+    assert "i.rating < $cursor0" in cypher and "OR (i.rating = $cursor0" not in cypher
+    assert cypher.count("i.rating >= $minRating") == 2 # Filters apply to both seeks
+    assert [params["cursor0"], params["cursor1"], params["cursor2"]] == [0, "2024-01-03T00:00:00", "img-3-3"]
+
+
+def test_backfill_image_session_timestamps_runs_in_batches(repo):
+    """sessionTimestampの補完が、残りがなくなるまでバッチ単位で実行されることをテストする。"""
+    remaining = [5]
+
+    def backfill(query, params):
+        done = min(params["limit"], remaining[0])
+        remaining[0] -= done
+        return {"count": done}
+
+    repo._driver.handler = backfill
+    assert repo.backfill_image_session_timestamps(batch_size=2) == 5
+    assert repo._driver.transactions == len(repo._driver.queries) == 3
+    assert "SET i.sessionTimestamp = s.timestamp" in repo._driver.queries[0][0]
+
+
+def test_cursor_is_bound_to_its_order(repo):
+    cursor = repo.query_images(limit=2).nextCursor
+
+    with pytest.raises(ValueError):
+        repo.query_images(ImageQuery(orderBy="rating"), cursor=cursor)
+    with pytest.raises(ValueError):
+        repo.query_images(cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        repo.query_images(limit=0)
@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.models.image import GeneratedImage
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.session import GenerationSession
+from grid.core.models.vibe import VibeImage
+from grid.core.services.search_service import SearchService
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "grid.sqlite3"))
+    yield repository
+    repository.close_connection()
+
+
+def _template(template_id, name, content, description=None):
+    return PromptTemplate(templateID=template_id, name=name, description=description, contentPositive=content,
+                          createdAt=datetime(2025, 1, 1))
+
+
+def _session(session_id, prompt, name=None):
+    return GenerationSession(sessionID=session_id, name=name, timestamp=datetime(2025, 1, 1), baseParameters="{}",
+                             basePromptPositive=prompt, overallStatus="completed")
+
+
+def _image(image_id):
+    return GeneratedImage(imageID=image_id, imagePath=f"{image_id}.png", seed=1, generationStatus="success", actualParameters={},
+                          actualPromptPositive="landscape")
+
+
+def test_fragments_match_as_prefixes_across_kinds(repo):
+    """入力途中の語が前方一致で、テンプレート・セッション・タグ・vibeを横断して検索されることをテストする。"""
+    repo.create_prompt_template(_template("t1", "Portrait", "1girl, upper body, watercolor"))
+    repo.create_parameter_set(ParameterSet(setID="p1", name="Watercolor soft", parameters="{}", createdAt=datetime(2025, 1, 1)))
+    repo.create_session(_session("s1", "landscape, watercolor, sunset", name="Evening study"), "default", "model")
+    repo.create_vibe(VibeImage(vibeID="v1", imagePath="vibes/watercolor_wash.png", vibeType="Generic", encodedIE=1.0,
+                               encodedVibePath="v1.naiv4vibe", notes="Wet watercolour wash", createdAt=datetime(2025, 1, 1)))
+    repo.create_generated_image(_image("img-1"), "s1")
+    repo.add_tags_to_image("img-1", ["style:watercolor", "subject:landscape"])
+
+    page = SearchService(repo).search("water")
+    assert {(hit.kind, hit.id) for hit in page.hits} == {("template", "t1"), ("parameter_set", "p1"), ("session", "s1"),
+                                                         ("vibe", "v1"), ("tag", "style:watercolor")}
+    # Every word must match: "sun" only narrows to the session
+    assert [(hit.kind, hit.id, hit.title) for hit in SearchService(repo).search("water SUN").hits] == [("session", "s1", "Evening study")]
+    assert [hit.id for hit in SearchService(repo).search("style:wat", kinds=["tag"]).hits] == ["style:watercolor"]
+    assert SearchService(repo).search("   ").hits == []
+    # FTS5 operators in the input are searched for literally, not interpreted
+    assert SearchService(repo).search('water" OR NEAR(').hits == []
+
+
+def test_title_matches_rank_first_and_pages_cover_every_hit_once(repo):
+    """タイトル一致が上位に来て、カーソルで全件を重複なくページングできることをテストする。"""
+    for n in range(25):
+        repo.create_prompt_template(_template(f"t{n:02d}", f"Scene {n}", "castle interior, candle light"))
+    repo.create_prompt_template(_template("t-exact", "Castle", "stone walls"))
+    service = SearchService(repo)
+
+    first = service.search("castle", kinds=["template"], limit=10)
+    assert first.hits[0].id == "t-exact"
+    assert first.hits[0].score > first.hits[1].score
+
+    seen, page = [], first
+    while True:
+        seen.extend(hit.id for hit in page.hits)
+        if page.nextCursor is None:
+            break
+        page = service.search("castle", kinds=["template"], limit=10, cursor=page.nextCursor)
+    assert len(seen) == len(set(seen)) == 26
+
+    with pytest.raises(ValueError):
+        service.search("candle", kinds=["template"], limit=10, cursor=first.nextCursor)
+    with pytest.raises(ValueError):
+        service.search("castle", kinds=["unknown"])
+
+
+def test_pagination_stops_at_max_depth(repo, monkeypatch):
+    """MAX_SEARCH_DEPTHより深いページは返さないことをテストする。"""
+    monkeypatch.setattr("grid.core.services.search_service.MAX_SEARCH_DEPTH", 15)
+    for n in range(30):
+        repo.create_prompt_template(_template(f"t{n:02d}", f"Forest {n}", "trees"))
+    service = SearchService(repo)
+    first = service.search("forest", limit=10)
+    second = service.search("forest", limit=10, cursor=first.nextCursor)
+    assert len(second.hits) == 5 and second.nextCursor is None
+
+
+def test_existing_rows_are_indexed_when_database_is_reopened(tmp_path):
+    """検索用インデックスがない既存データベースを開くと、既存の行が索引付けされることをテストする。"""
+    path = str(tmp_path / "grid.sqlite3")
+    repo = SQLiteRepository(path)
+    repo.create_session(_session("s1", "night city, neon"), "default", "model")
+    repo.close_connection()
+    # Simulate a database written before full-text search existed
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE fts_sessions; DROP TRIGGER IF EXISTS fts_sessions_insert;")
+    conn.close()
+
+    repo = SQLiteRepository(path)
+    assert [hit.id for hit in SearchService(repo).search("neo").hits] == ["s1"]
+    repo.close_connection()
+
+
+def test_neo4j_search_queries_each_fulltext_index_with_escaped_prefix_terms(make_repo):
+    """Neo4jでは種類ごとの全文インデックスを、エスケープした前方一致クエリで検索することをテストする。"""
+    repo = make_repo()
+    driver = repo._driver
+    driver.handler = lambda query, params: [{"id": "t1", "title": "Portrait", "snippet": "1girl", "score": 1.5}]
+
+    hits = repo.search_text("Style:Anime 1gi", ["template", "tag"], limit=5)
+
+    assert [(query_params["index"], query_params["limit"]) for _, query_params in driver.queries] == [("fulltext_templates", 5),
+                                                                                                    ("fulltext_tags", 5)]
+    assert driver.queries[0][1]["query"] == "(style\\:anime^2 OR style\\:anime*) AND (1gi^2 OR 1gi*)"
+    assert [(hit.kind, hit.id) for hit in hits] == [("template", "t1"), ("tag", "t1")]
+    assert repo.search_text("  ", ["template"], limit=5) == [] and len(driver.queries) == 2
@@ -0,0 +1,133 @@
+import json
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from grid.core.api.novelai import NovelAIClient
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.models.session import GenerationSession
+from grid.core.services.generation_cache import GenerationResultCache
+from grid.core.services.generation_service import GenerationService
+from grid.core.services.similarity_index import VectorIndex, feature_vector, session_vector, prompt_tokens, VECTOR_DIMENSIONS
+from grid.core.services.similarity_service import SimilarityService
+
+
+def _session(session_id, prompt, **parameters):
+    return GenerationSession(sessionID=session_id, timestamp=datetime(2025, 1, 1), baseParameters=json.dumps(parameters),
+                             basePromptPositive=prompt, overallStatus="completed")
+
+
+def test_prompt_tags_match_regardless_of_order_and_emphasis():
+    """タグの順序や強調記法が違っても同じプロンプトとして扱われることをテストする。"""
+    assert prompt_tokens("1girl, {{long hair}}, 1.3::smile::") == {"t:1girl": 1.0, "t:long hair": 1.0, "w:long": 0.5,
+                                                                  "w:hair": 0.5, "t:smile": 1.0}
+    a = feature_vector({"scale": 5}, "1girl, long hair, smile, night city")
+    b = feature_vector({"scale": 5}, "{night city}, smile, 1girl, [long hair]")
+    c = feature_vector({"scale": 5}, "landscape, mountains, snow")
+
+    assert a.dtype == np.float32 and a.shape == (VECTOR_DIMENSIONS,)
+    assert float(np.linalg.norm(a)) == pytest.approx(1.0, abs=1e-5)
+    assert float(a @ b) == pytest.approx(1.0, abs=1e-5)
+    assert float(a @ c) < 0.5
+
+
+def test_parameters_move_the_vector():
+    """同じプロンプトでは、生成パラメータが近いほど類似度が高いことをテストする。"""
+    base = feature_vector({"scale": 5, "steps": 28, "sampler": "k_euler"}, "1girl")
+    near = feature_vector({"scale": 5.5, "steps": 28, "sampler": "k_euler"}, "1girl")
+    far = feature_vector({"scale": 9.5, "steps": 50, "sampler": "ddim"}, "1girl")
+    assert float(base @ near) > float(base @ far)
+    # Invalid baseParameters only lose the parameter block
+    assert float(session_vector(_session("s1", "1girl", scale=5)) @ session_vector(GenerationSession(
+        sessionID="s2", timestamp=datetime(2025, 1, 1), baseParameters="{not json", basePromptPositive="1girl",
+        overallStatus="completed"))) > 0.8
+
+
+def test_vector_index_grows_replaces_removes_and_persists(tmp_path):
+    """インデックスが容量を超えて拡張され、置換・削除・保存・読み込みが正しく動作することをテストする。"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(10, 4)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = VectorIndex(dimensions=4, initial_capacity=2)
+    index.add_many((f"k{n}", vector) for n, vector in enumerate(vectors))
+
+    assert len(index) == 10
+    assert [key for key, _ in index.query(vectors[3], k=3)][0] == "k3"
+    assert "k3" not in [key for key, _ in index.query(vectors[3], k=3, exclude=["k3"])]
+    assert len(index.query(vectors[3], k=9, exclude=["k3"])) == 9
+
+    index.add("k3", vectors[7]) # Replace
+    assert len(index) == 10 and index.query(vectors[7], k=2)[1][1] == pytest.approx(1.0, abs=1e-5)
+    assert index.remove("k0") and not index.remove("k0")
+    assert "k0" not in index and np.allclose(index.vector("k9"), vectors[9])
+
+    path = str(tmp_path / "sessions.npz")
+    index.save(path)
+    loaded = VectorIndex.load(path)
+    assert len(loaded) == 9 and loaded.query(vectors[5], k=4) == index.query(vectors[5], k=4)
+
+    with pytest.raises(ValueError):
+        index.add("bad", np.zeros(3))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "grid.sqlite3"))
+    yield repository
+    repository.close_connection()
+
+
+def test_similar_sessions_from_the_built_index(repo):
+    """既存セッションからインデックスを構築し、自分以外の似たセッションを類似度順に返すことをテストする。"""
+    repo.create_session(_session("cat-1", "1girl, cat ears, maid, smile", scale=5, steps=28), "default", "model")
+    repo.create_session(_session("cat-2", "smile, cat ears, 1girl, maid, indoors", scale=5.5, steps=28), "default", "model")
+    repo.create_session(_session("castle", "castle, night, moon, ruins", scale=7, steps=40), "default", "model")
+    repo.create_session(_session("cat-3", "cat ears, 1girl", scale=9, steps=50), "default", "model")
+
+    service = SimilarityService(repo, image_index=VectorIndex())
+    assert service.build(page_size=2) == {"sessions": 4, "images": 0}
+
+    hits = service.similar_sessions("cat-1", k=2)
+    assert [hit.id for hit in hits] == ["cat-2", "cat-3"]
+    assert hits[0].kind == "session" and hits[0].score > hits[1].score
+    assert [hit.id for hit in service.similar_to(_session("draft", "castle ruins, night"), k=1)] == ["castle"]
+
+    # Sessions created after build are picked up from the repository on first lookup
+    repo.create_session(_session("cat-4", "1girl, cat ears, maid, smile", scale=5, steps=28), "default", "model")
+    assert service.similar_sessions("cat-4", k=1)[0].id == "cat-1"
+    with pytest.raises(ValueError):
+        service.similar_sessions("missing")
+    with pytest.raises(ValueError):
+        service.similar_sessions("cat-1", k=0)
+
+
+class FakeClient:
+    def download_image_archive(self, prompt, model, action, parameters):
+        archive = tempfile.TemporaryFile()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("image_0.png", b"png")
+        archive.seek(0)
+        return archive
+
+    extract_image_archive = staticmethod(NovelAIClient.extract_image_archive)
+
+
+def test_generation_service_indexes_new_sessions_and_images(repo, tmp_path, monkeypatch):
+    """GenerationServiceが記録したセッションと画像が、そのまま類似検索の対象になることをテストする。"""
+    monkeypatch.chdir(tmp_path)
+    similarity = SimilarityService(repo, image_index=VectorIndex())
+    service = GenerationService(FakeClient(), repo, result_cache=GenerationResultCache(str(tmp_path / "result_cache.sqlite3")),
+                                similarity=similarity)
+    sessions = [_session(str(uuid.uuid4()), prompt, seed=seed) for seed, prompt in enumerate(["1girl, beach", "1girl, beach, sunset"])]
+
+    results = list(service.generate_sessions(sessions, "default"))
+
+    assert all(result.ok for result in results)
+    assert len(similarity.session_index) == 2
+    assert similarity.similar_sessions(sessions[0].sessionID, k=5)[0].id == sessions[1].sessionID
+    image_id = results[0].images[0].imageID
+    assert [hit.id for hit in similarity.similar_images(image_id)] == [results[1].images[0].imageID]
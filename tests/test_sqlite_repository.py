@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from grid.core.db.base import create_repository
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.models.image import GeneratedImage, ImageQuery
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.session import GenerationSession
+from grid.core.models.vibe import VibeImage
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "db" / "grid.sqlite3"))
+    yield repository
+    repository.close_connection()
+
+
+def _vibe(vibe_id):
+    return VibeImage(vibeID=vibe_id, imagePath=f"{vibe_id}.png", vibeType="Generic", encodedIE=1.0,
+                     encodedVibePath=f"{vibe_id}.naiv4vibe", createdAt=datetime(2025, 1, 1))
+
+
+def _session(session_id, hours=0):
+    return GenerationSession(sessionID=session_id, timestamp=datetime(2025, 1, 1) + timedelta(hours=hours), baseParameters="{}",
+                             basePromptPositive="1girl", overallStatus="pending")
+
+
+def _image(image_id, rating=0, scale=5.0):
+    return GeneratedImage(imageID=image_id, imagePath=f"{image_id}.png", seed=1, rating=rating, generationStatus="success",
+                          actualParameters={"scale": scale, "steps": 28, "sampler": "k_euler", "reference_strength_multiple": [0.65]},
+                          actualPromptPositive="1girl")
+
+
+def test_database_uses_wal_and_round_trips_vibes_and_sessions(repo):
+    """WALモードで開かれ、vibeとセッションが保存・取得できることをテストする。"""
+    assert repo._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert repo.check_connection()
+
+    assert repo.create_vibes([_vibe("v1"), _vibe("v2")]) == 2
+    assert repo.get_vibe("v1") == _vibe("v1")
+    assert repo.get_vibe("missing") is None
+    assert sorted(repo.list_encoded_vibe_paths()) == ["v1.naiv4vibe", "v2.naiv4vibe"]
+    with pytest.raises(RuntimeError):
+        repo.create_vibe(_vibe("v1")) # vibeID is unique
+
+    repo.create_session(_session("s1"), "default", "nai-diffusion-4-full")
+    repo.update_session_status("s1", "running")
+    assert repo.get_session("s1").overallStatus == "running"
+
+
+def test_query_images_filters_and_paginates(repo):
+    """タグ・パラメータ範囲で絞り込み、キーセットページングで重複なく全件を返すことをテストする。"""
+    repo.create_session(_session("old", hours=0), "default", "model")
+    repo.create_session(_session("new", hours=1), "default", "model")
+    assert repo.create_generated_images([_image(f"old-{n}", scale=4.0 + n) for n in range(3)], "old") == 3
+    assert repo.create_generated_images([_image(f"new-{n}", scale=4.0 + n) for n in range(3)], "new") == 3
+    with pytest.raises(RuntimeError, match="does not exist"): # Never dropped silently
+        repo.create_generated_images([_image("orphan")], "missing")
+    assert repo.add_tags_to_images([("old-1", "style:anime"), ("new-2", "style:anime"), ("nope", "style:anime")]) == 2
+    assert repo.add_tags_to_image("old-1", ["style:anime"]) == 1 # Idempotent
+
+    seen, cursor = [], None
+    while True:
+        page = repo.query_images(limit=4, cursor=cursor)
+        seen.extend(image.imageID for image in page.images)
+        cursor = page.nextCursor
+        if cursor is None:
+            break
+    assert seen == ["new-2", "new-1", "new-0", "old-2", "old-1", "old-0"]
+    assert page.sessionIDs["old-0"] == "old"
+
+    tagged = repo.query_images(ImageQuery(tags=["style:anime"], parameterRanges={"scale": (4.5, None)}))
+    assert [image.imageID for image in tagged.images] == ["new-2", "old-1"]
+    assert tagged.images[0].actualParameters["reference_strength_multiple"] == [0.65]
+    assert repo.get_image_tags("old-1") == ["style:anime"]
+    assert [image.imageID for image in repo.query_images(ImageQuery(parameterEquals={"scale": 6.0})).images] == ["new-2", "old-2"]
+
+
+def test_ratings_update_aggregates_and_rebuild_agrees(repo):
+    """評価更新で集計が差分更新され、rebuild_rating_statsの再計算結果と一致することをテストする。"""
+    repo.create_vibe(_vibe("v1"))
+    repo.create_session(_session("s1"), "default", "model")
+    repo.create_prompt_template(PromptTemplate(templateID="t1", name="portrait", contentPositive="1girl", createdAt=datetime(2025, 1, 1)))
+    repo.create_parameter_set(ParameterSet(setID="p1", name="default", parameters="{}", createdAt=datetime(2025, 1, 1)))
+    repo.link_session_resources("s1", ["v1", "unknown"], template_id="t1", parameter_set_id="p1")
+    repo.create_generated_images([_image("a", rating=4), _image("b"), _image("c", rating=2, scale=7.0)], "s1")
+
+    assert repo.update_image_ratings({"a": 5, "b": 3, "missing": 1}) == 2
+    repo.update_image_rating("c", 0)
+
+    best = repo.best_vibe_parameter_buckets("v1", parameter="scale")
+    assert [(stat.key, stat.count, stat.sum, stat.sumSquares) for stat in best] == [("vibe:v1|scale|5.0", 2, 8, 34)]
+    pairing = repo.best_template_parameter_sets("t1")[0]
+    assert (pairing.count, pairing.mean) == (2, 4.0)
+
+    before = {stat.key: stat for stat in repo.best_vibe_parameter_buckets("v1", limit=100)}
+    repo.rebuild_rating_stats()
+    after = {stat.key: stat for stat in repo.best_vibe_parameter_buckets("v1", limit=100)}
+    assert before == after
+
+
+def test_failed_batch_writes_nothing(repo):
+    repo.create_session(_session("s1"), "default", "model")
+    with pytest.raises(RuntimeError):
+        repo.create_generated_images([_image("a"), _image("a")], "s1")
+    assert repo.query_images().images == []
+
+
+def test_create_repository_selects_backend(tmp_path):
+    database = SimpleNamespace(backend="sqlite", sqlite_path=tmp_path / "grid.sqlite3", neo4j_batch_size=100)
+    repository = create_repository(database)
+    assert isinstance(repository, SQLiteRepository) and repository._batch_size == 100
+    repository.close_connection()
+    assert not repository.check_connection()
+
+    with pytest.raises(ValueError):
+        create_repository(SimpleNamespace(backend="mysql"))
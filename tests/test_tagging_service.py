@@ -0,0 +1,47 @@
+from grid.core.models.image import GeneratedImage
+from grid.core.services.tagging_service import TaggingService
+
+
+class FakeRepository:
+    """タグ付与の呼び出しを記録するフェイクリポジトリ"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def add_tags_to_image(self, image_id, tag_names):
+        self.calls.append([(image_id, tag_name) for tag_name in tag_names])
+        if self.fail:
+            raise RuntimeError("db down")
+        return len(tag_names)
+
+    def add_tags_to_images(self, image_tags):
+        self.calls.append(list(image_tags))
+        return len(self.calls[-1])
+
+
+def _image(image_id, prompt="1girl, solo, 1girl"):
+    return GeneratedImage(imageID=image_id, imagePath=f"{image_id}.png", seed=1, actualParameters={"steps": 28, "scale": 5},
+                          actualPromptPositive=prompt, actualPromptNegative="lowres", generationStatus="success")
+
+
+def test_tags_for_one_image_are_written_in_one_call():
+    """1画像のタグが重複なく1回の呼び出しで書き込まれることをテストする。"""
+    repo = FakeRepository()
+    tags = TaggingService(repo).generate_and_add_tags(_image("a"))
+
+    assert tags == ["param:steps:28", "param:scale:5", "keyword:1girl", "keyword:solo", "negative_keyword:lowres"]
+    assert repo.calls == [[("a", tag) for tag in tags]]
+
+
+def test_batch_tags_many_images_in_one_call():
+    repo = FakeRepository()
+    tags_by_image = TaggingService(repo).generate_and_add_tags_batch([_image("a"), _image("b", prompt="cat")])
+
+    assert set(tags_by_image) == {"a", "b"}
+    assert len(repo.calls) == 1
+    assert len(repo.calls[0]) == len(tags_by_image["a"]) + len(tags_by_image["b"])
+
+
+def test_database_errors_do_not_lose_tag_names():
+    assert TaggingService(FakeRepository(fail=True)).generate_and_add_tags(_image("a"))
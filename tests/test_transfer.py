@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from grid.core.db.sqlite_repository import SQLiteRepository
+from grid.core.db.transfer import export_graph, import_graph, read_manifest
+from grid.core.models.image import GeneratedImage, ImageQuery
+from grid.core.models.parameter_set import ParameterSet
+from grid.core.models.prompt_template import PromptTemplate
+from grid.core.models.session import GenerationSession
+from grid.core.models.vibe import VibeImage
+
+
+@pytest.fixture
+def source(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "source.sqlite3"))
+    for n in range(3):
+        repo.create_vibe(VibeImage(vibeID=f"v{n}", imagePath=f"v{n}.png", vibeType="Generic", encodedIE=1.0,
+                                   encodedVibePath=f"v{n}.naiv4vibe", notes="ink, \"wash\"" if n == 0 else None,
+                                   createdAt=datetime(2025, 1, 1)))
+    repo.create_prompt_template(PromptTemplate(templateID="t1", name="Portrait", contentPositive="1girl", createdAt=datetime(2025, 1, 2)))
+    repo.create_parameter_set(ParameterSet(setID="p1", name="Soft", parameters='{"scale": 5}', createdAt=datetime(2025, 1, 3)))
+    for s in range(4):
+        session_id = f"s{s}"
+        repo.create_session(GenerationSession(sessionID=session_id, name=f"Session {s}", timestamp=datetime(2025, 2, 1) + timedelta(hours=s),
+                                              baseParameters='{"scale": 5}', basePromptPositive="1girl, 城", overallStatus="completed"),
+                            "default", "nai-diffusion-4-full")
+        repo.link_session_resources(session_id, ["v2", "v0"], template_id="t1" if s % 2 == 0 else None, parameter_set_id="p1")
+        repo.create_generated_images([
+            GeneratedImage(imageID=f"{session_id}-img-{n}", imagePath=f"{session_id}/{n}.png", seed=n, rating=n % 6,
+                           generationStatus="success", actualPromptPositive="1girl",
+                           actualParameters={"scale": 5.0 + n % 3, "steps": 28, "reference_strength_multiple": [0.6, 0.4]})
+            for n in range(7)], session_id)
+        repo.add_tags_to_images([(f"{session_id}-img-{n}", tag) for n in range(7) for tag in ("style:anime", f"n:{n % 2}")])
+    yield repo
+    repo.close_connection()
+
+
+def _snapshot(repo):
+    images = repo.query_images(ImageQuery(orderBy="rating"), limit=1000)
+    return {
+        "vibes": repo.export_vibes(None, 100),
+        "templates": repo.export_prompt_templates(None, 100),
+        "sets": repo.export_parameter_sets(None, 100),
+        "sessions": repo.export_sessions(None, 100),
+        "images": [(image.model_dump(), images.sessionIDs[image.imageID]) for image in images.images],
+        "tags": repo.export_image_tags(None, 1000),
+        "vibe_stats": [stat.model_dump() for stat in repo.best_vibe_parameter_buckets("v0", limit=100)],
+        "pairings": [stat.model_dump() for stat in repo.best_template_parameter_sets(limit=100)],
+    }
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_and_import_round_trip(source, tmp_path, fmt):
+    """エクスポートしたチャンクを空のDBに並列インポートすると、リレーションと評価集計を含めて同じ内容になることをテストする。"""
+    directory = str(tmp_path / "export")
+    counts = export_graph(source, directory, fmt=fmt, chunk_size=10, page_size=3)
+    assert counts == {"vibes": 3, "prompt_templates": 1, "parameter_sets": 1, "sessions": 4, "images": 28, "image_tags": 56}
+
+    manifest = read_manifest(directory)
+    assert [chunk["records"] for chunk in manifest["kinds"]["images"]["chunks"]] == [10, 10, 8]
+    assert all(name.endswith(f".{fmt}.gz") for name in os.listdir(directory) if name != "manifest.json")
+
+    target = SQLiteRepository(str(tmp_path / "target.sqlite3"))
+    assert import_graph(target, directory, workers=3, batch_size=4) == counts
+    assert _snapshot(target) == _snapshot(source)
+    assert target.export_sessions(None, 1)[0].vibeIDs == ["v2", "v0"]
+    target.close_connection()
+
+
+def test_export_refuses_to_overwrite_and_import_requires_a_manifest(source, tmp_path):
+    directory = str(tmp_path / "export")
+    export_graph(source, directory)
+    with pytest.raises(ValueError):
+        export_graph(source, directory)
+
+    os.remove(os.path.join(directory, "manifest.json"))
+    with pytest.raises(ValueError):
+        import_graph(source, directory)
+
+
+def test_failed_chunk_names_the_file(source, tmp_path):
+    """既存データと衝突したチャンクがファイル名付きのエラーになることをテストする。"""
+    directory = str(tmp_path / "export")
+    export_graph(source, directory)
+    with pytest.raises(RuntimeError, match="vibes-00000.jsonl.gz"):
+        import_graph(source, directory)
+
+
+def test_jsonl_chunks_hold_one_model_per_line(source, tmp_path):
+    directory = str(tmp_path / "export")
+    export_graph(source, directory)
+    with gzip.open(os.path.join(directory, "sessions-00000.jsonl.gz"), "rt", encoding="utf-8") as f:
+        first = json.loads(f.readline())
+    assert first["sessionID"] == "s0" and first["userID"] == "default" and first["templateID"] == "t1"
+    assert first["basePromptPositive"] == "1girl, 城"
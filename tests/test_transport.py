@@ -0,0 +1,52 @@
+import pytest
+
+from grid.core.api.transport import NovelAITransport
+from scripts.bench.mock_novelai_server import MockNovelAIServer
+
+
+def test_transport_reuses_warm_connections():
+    """連続したリクエストが同一のkeep-alive接続を再利用することをテストする。"""
+    with MockNovelAIServer() as server:
+        transport = NovelAITransport("dummy", server.url, pool_maxsize=2)
+        try:
+            for _ in range(5):
+                response = transport.post("/ai/encode-vibe", json={"image": ""})
+                response.raise_for_status()
+                response.content # 接続をプールへ返すためにボディを読み切る
+            stats = transport.stats()
+        finally:
+            transport.close()
+
+    assert stats["requests_sent"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
+    assert stats["endpoints"]["/ai/encode-vibe"]["requests"] == 5
+
+
+def test_transport_applies_per_endpoint_timeouts(monkeypatch):
+    """エンドポイントごとのタイムアウトが適用され、明示指定が優先されることをテストする。"""
+    transport = NovelAITransport("dummy", "http://example.invalid/", timeouts={"/ai/generate-image": (1.0, 2.0)}, default_timeout=5.0)
+    calls = []
+    monkeypatch.setattr(transport.session, "post", lambda url, **kwargs: calls.append((url, kwargs)))
+
+    transport.post("/ai/generate-image", json={})
+    transport.post("/ai/encode-vibe", json={})
+    transport.post("/ai/encode-vibe", json={}, timeout=9.0)
+
+    assert calls[0] == ("http://example.invalid/ai/generate-image", {"json": {}, "timeout": (1.0, 2.0)})
+    assert calls[1][1]["timeout"] == 5.0
+    assert calls[2][1]["timeout"] == 9.0
+
+
+def test_transport_sends_bearer_auth_and_keep_alive():
+    """認証ヘッダーとkeep-alive設定がセッションに反映されることをテストする。"""
+    transport = NovelAITransport("secret", "http://example.invalid", keep_alive=False)
+
+    assert transport.session.headers["Authorization"] == "Bearer secret"
+    assert transport.session.headers["Connection"] == "close"
+
+
+def test_transport_rejects_invalid_pool_size():
+    """pool_maxsizeが1未満の場合にValueErrorとなることをテストする。"""
+    with pytest.raises(ValueError):
+        NovelAITransport("dummy", "http://example.invalid", pool_maxsize=0)
@@ -0,0 +1,106 @@
+import os
+import time
+
+from grid.core.api.vibe_cache import VibeCache
+
+
+def _image(tmp_path, name="vibe.png", data=b"image-bytes"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_key_depends_on_image_ie_and_model(tmp_path):
+    """キーが画像内容・IE値・モデルのいずれかが変わると変化することをテストする。"""
+    image = _image(tmp_path)
+    same_content = _image(tmp_path, "copy.png")
+    other = _image(tmp_path, "other.png", b"other-bytes")
+
+    key = VibeCache.make_key(image, 1, "nai-diffusion-4-full")
+    assert VibeCache.make_key(same_content, 1, "nai-diffusion-4-full") == key # パスではなく内容で決まる
+    assert VibeCache.make_key(other, 1, "nai-diffusion-4-full") != key
+    assert VibeCache.make_key(image, 0.5, "nai-diffusion-4-full") != key
+    assert VibeCache.make_key(image, 1, "nai-diffusion-3") != key
+
+
+def test_put_and_get_survive_restart(tmp_path):
+    """登録したエントリがインデックス経由で再起動後も取得できることをテストする。"""
+    cache_dir = str(tmp_path / "cache")
+    key = VibeCache.make_key(_image(tmp_path), 1, "m")
+    path = VibeCache(cache_dir).put(key, b"encoded", 1, "m")
+
+    reopened = VibeCache(cache_dir)
+    assert reopened.get(key) == path
+    with open(path, "rb") as f:
+        assert f.read() == b"encoded"
+    assert reopened.get("missing") is None
+
+
+def test_put_does_not_duplicate_files(tmp_path):
+    """同じキーを二度登録してもファイルが増えないことをテストする。"""
+    cache = VibeCache(str(tmp_path / "cache"))
+    key = VibeCache.make_key(_image(tmp_path), 1, "m")
+
+    first = cache.put(key, b"encoded", 1, "m")
+    second = cache.put(key, b"encoded", 1, "m")
+
+    assert first == second
+    assert len(cache) == 1
+    assert os.listdir(os.path.dirname(first)) == [os.path.basename(first)]
+
+
+def test_get_drops_entries_whose_file_was_deleted(tmp_path):
+    """ファイルが外部から削除された場合はキャッシュミスとなることをテストする。"""
+    cache = VibeCache(str(tmp_path / "cache"))
+    path = cache.put("abcd", b"encoded", 1, "m")
+    os.remove(path)
+
+    assert cache.get("abcd") is None
+    assert len(cache) == 0
+
+
+def test_collect_garbage_removes_only_unreferenced_old_entries(tmp_path):
+    """参照されていない古いエントリのみがGCで削除されることをテストする。"""
+    cache = VibeCache(str(tmp_path / "cache"))
+    kept = cache.put("aa01", b"kept", 1, "m")
+    orphan = cache.put("bb02", b"orphan", 1, "m")
+    fresh_orphan = cache.put("cc03", b"fresh", 1, "m")
+    cache._index["bb02"]["lastUsedAt"] = time.time() - 7200
+
+    removed = cache.collect_garbage([kept], min_age=3600)
+
+    assert removed == [orphan]
+    assert not os.path.exists(orphan)
+    assert os.path.exists(kept) and os.path.exists(fresh_orphan)
+    assert VibeCache(cache.cache_dir).get("bb02") is None
+
+
+def test_hits_update_last_used_in_memory_and_flush_in_batches(tmp_path, monkeypatch):
+    """ヒット時はインデックスを書き直さず、flushや次の書き込みでまとめて保存されることをテストする。"""
+    cache = VibeCache(str(tmp_path / "cache"))
+    cache.put("aa01", b"encoded", 1, "m")
+    cache._index["aa01"]["lastUsedAt"] = 0.0
+    writes = []
+    original = cache._save_index
+    monkeypatch.setattr(cache, "_save_index", lambda: writes.append(1) or original())
+
+    for _ in range(100):
+        assert cache.get("aa01") is not None
+    assert writes == []
+    assert VibeCache(cache.cache_dir)._index["aa01"]["lastUsedAt"] != cache._index["aa01"]["lastUsedAt"]
+
+    cache.flush()
+    cache.flush()
+    assert writes == [1]
+    assert VibeCache(cache.cache_dir)._index["aa01"]["lastUsedAt"] == cache._index["aa01"]["lastUsedAt"]
+
+
+def test_usage_is_flushed_after_the_interval(tmp_path):
+    """usage_flush_intervalを過ぎたヒットでは最終利用時刻が保存されることをテストする。"""
+    cache = VibeCache(str(tmp_path / "cache"), usage_flush_interval=0)
+    cache.put("aa01", b"encoded", 1, "m")
+    cache._index["aa01"]["lastUsedAt"] = 0.0
+
+    cache.get("aa01")
+
+    assert VibeCache(cache.cache_dir)._index["aa01"]["lastUsedAt"] > 0